@@ -115,6 +115,32 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     ALGORITHM: str = "HS256"
     REDIS_URL: str = os.getenv("REDIS_URL", "")
+    SCAN_CACHE_MAX_ENTRIES: int = int(os.getenv("SCAN_CACHE_MAX_ENTRIES", "2048"))
+    SCAN_CACHE_TTL_SECONDS: int = int(os.getenv("SCAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    SCAN_CPU_WORKERS: int = int(os.getenv("SCAN_CPU_WORKERS") or os.cpu_count() or 2)
+    SCAN_CPU_QUEUE: int = int(os.getenv("SCAN_CPU_QUEUE", "32"))
+    SCAN_IO_WORKERS: int = int(os.getenv("SCAN_IO_WORKERS", "16"))
+    SCAN_IO_QUEUE: int = int(os.getenv("SCAN_IO_QUEUE", "64"))
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "4"))
+    WORKER_MODE: str = os.getenv("WORKER_MODE", "thread").lower()
+    WORKER_TYPE_LIMITS: str = os.getenv("WORKER_TYPE_LIMITS", "web_security_scan=2,authenticated_web_scan=2,executive_report=1,technical_report=1")
+    SHIELD_SCHEDULER: str = os.getenv("SHIELD_SCHEDULER", "api").lower()
+    SHIELD_CHECK_CONCURRENCY: int = int(os.getenv("SHIELD_CHECK_CONCURRENCY", "20"))
+    SHIELD_CHECKS_PER_HOST: int = int(os.getenv("SHIELD_CHECKS_PER_HOST", "2"))
+    SHIELD_JITTER_RATIO: float = float(os.getenv("SHIELD_JITTER_RATIO", "0.1"))
+    MONITOR_LOG_BATCH_SIZE: int = int(os.getenv("MONITOR_LOG_BATCH_SIZE", "200"))
+    MONITOR_LOG_FLUSH_SECONDS: float = float(os.getenv("MONITOR_LOG_FLUSH_SECONDS", "5"))
+    MONITOR_LOG_RETENTION_DAYS: int = int(os.getenv("MONITOR_LOG_RETENTION_DAYS", "30"))
+    MONITOR_HOURLY_ROLLUP_RETENTION_DAYS: int = int(os.getenv("MONITOR_HOURLY_ROLLUP_RETENTION_DAYS", "90"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_SECONDS: int = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+    JOB_RETRY_MAX_SECONDS: int = int(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+    ALLOWLIST_CACHE_SECONDS: int = int(os.getenv("ALLOWLIST_CACHE_SECONDS", "30"))
+    MONITORING_OVERVIEW_CACHE_SECONDS: int = int(os.getenv("MONITORING_OVERVIEW_CACHE_SECONDS", "5"))
+    RATE_LIMIT_IDENTITY_CACHE_SECONDS: int = int(os.getenv("RATE_LIMIT_IDENTITY_CACHE_SECONDS", "30"))
+    RATE_LIMIT_TOKEN_CACHE_SIZE: int = int(os.getenv("RATE_LIMIT_TOKEN_CACHE_SIZE", "4096"))
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "100000"))
     CREDENTIAL_ENCRYPTION_KEY: str = os.getenv("CREDENTIAL_ENCRYPTION_KEY", "")
 
     @property
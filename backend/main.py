@@ -10,12 +10,10 @@ import time
 import json
 import logging
 from logging.handlers import RotatingFileHandler
-from jose import jwt
 from datetime import datetime
 from pathlib import Path
 import shutil
 import asyncio
-import ipaddress
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -27,7 +25,7 @@ from html import escape
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import engine, Base
-from sqlalchemy import inspect, text
+from sqlalchemy import func, inspect, text
 from routes import auth_routes, scan_routes, extended_scan_routes, tools_routes, redteam_routes, blueteam_routes, payment_routes, user_routes, admin_routes, viggio_shield_routes, saas_routes, risk_routes, ai_routes, job_routes, report_routes, integration_routes, ai_action_routes, platform_routes, pipeline_routes, compliance_routes, assurance_routes, sso_routes, security_monitoring_routes
 from utils.email_service import email_service
 from models.public_stats import PublicStats
@@ -171,106 +169,14 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SecurityHeadersMiddleware)
 
-# Rate limiting por plano (requests/min)
-PLAN_RATE_LIMITS = {
-    "free": 60,
-    "starter": 50,
-    "professional": 100,
-    "enterprise": 500,
-}
-
-# Only trust CF-Connecting-IP when the immediate peer is actually Cloudflare.
-# Otherwise a client could spoof the header and evade the application limiter.
-_CLOUDFLARE_NETWORKS = tuple(ipaddress.ip_network(value) for value in (
-    "173.245.48.0/20", "103.21.244.0/22", "103.22.200.0/22", "103.31.4.0/22",
-    "141.101.64.0/18", "108.162.192.0/18", "190.93.240.0/20", "188.114.96.0/20",
-    "197.234.240.0/22", "198.41.128.0/17", "162.158.0.0/15", "104.16.0.0/13",
-    "104.24.0.0/14", "172.64.0.0/13", "131.0.72.0/22", "2400:cb00::/32",
-    "2606:4700::/32", "2803:f800::/32", "2405:b500::/32", "2405:8100::/32",
-    "2a06:98c0::/29", "2c0f:f248::/32",
-))
-
-
-def _rate_limit_client_ip(request: Request) -> str:
-    peer = request.client.host if request.client else "unknown"
-    try:
-        peer_address = ipaddress.ip_address(peer)
-    except ValueError:
-        peer_address = None
-    if peer_address and any(peer_address in network for network in _CLOUDFLARE_NETWORKS):
-        candidate = request.headers.get("cf-connecting-ip", "").strip()
-        try:
-            return str(ipaddress.ip_address(candidate))
-        except ValueError:
-            pass
-    return peer
-
 from database import SessionLocal
 from models.user import User
 from models.scan import Scan
-from models.saas import OrganizationMember
+from middleware.rate_limit import RateLimitMiddleware
 from services.rate_limit import rate_limit_backend
 
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    path = request.url.path
-    if not path.startswith("/api"):
-        return await call_next(request)
-
-    if path in ("/api/health", "/api/uptime") or path.startswith("/api/payments/"):
-        return await call_next(request)
-
-    # Determina chave e plano
-    key = None
-    plan = "free"
-    username = None
-    organization_id = "public"
-    token = request.headers.get("authorization", "")
-    if token.lower().startswith("bearer "):
-        try:
-            payload = jwt.decode(token.split(" ", 1)[1], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username = payload.get("sub")
-        except Exception:
-            username = None
-    
-    if username:
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.username == username).first()
-            if user and user.subscription_plan:
-                plan = user.subscription_plan
-            if user:
-                membership = db.query(OrganizationMember).filter(OrganizationMember.user_id == user.id).first()
-                organization_id = membership.organization_id if membership else "none"
-            key = f"ratelimit:{organization_id}:{user.id if user else username}:{path}"
-        finally:
-            db.close()
-    else:
-        client_ip = _rate_limit_client_ip(request)
-        key = f"ratelimit:public:{client_ip}:{path}"
-
-    limit = PLAN_RATE_LIMITS.get(plan, 10)
-    client_host = request.client.host if request.client else None
-    if client_host in ("127.0.0.1", "::1", "0.0.0.0"):
-        limit = max(limit, 200)
-    allowed, remaining, reset_ts = rate_limit_backend.hit(key, limit, 60)
-    if not allowed:
-        return JSONResponse(
-            status_code=429,
-            content={"detail": "Rate limit exceeded", "plan": plan},
-            headers={
-                "X-RateLimit-Limit": str(limit),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(reset_ts),
-                "Retry-After": str(max(reset_ts - int(time.time()), 1)),
-            },
-        )
-
-    response = await call_next(request)
-    response.headers["X-RateLimit-Limit"] = str(limit)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    response.headers["X-RateLimit-Reset"] = str(reset_ts)
-    return response
+# Rate limiting por plano (requests/min), como middleware ASGI mais externo
+app.add_middleware(RateLimitMiddleware)
 
 # Rotas da API (DEVEM VIR ANTES do mount de arquivos estáticos)
 @app.get("/api/health")
@@ -313,25 +219,11 @@ def public_stats():
     db = SessionLocal()
     try:
         total_users = db.query(User).count()
-        scans = db.query(Scan).all()
-        total_vulnerabilities = 0
-
-        for scan in scans:
-            if not scan.results:
-                continue
-            try:
-                results = json.loads(scan.results)
-            except (TypeError, ValueError):
-                continue
-
-            if isinstance(results.get("total_vulnerabilities"), (int, float)):
-                total_vulnerabilities += int(results["total_vulnerabilities"])
-            elif isinstance(results.get("summary"), dict) and isinstance(
-                results["summary"].get("total_vulnerabilities"), (int, float)
-            ):
-                total_vulnerabilities += int(results["summary"]["total_vulnerabilities"])
-            elif isinstance(results.get("vulnerabilities"), list):
-                total_vulnerabilities += len(results["vulnerabilities"])
+        # Colunas de resumo do Scan: nenhum payload de results é lido
+        total_scans, total_vulnerabilities = db.query(
+            func.count(Scan.id), func.coalesce(func.sum(Scan.findings_total), 0)
+        ).one()
+        total_vulnerabilities = int(total_vulnerabilities)
 
         accumulated = db.query(PublicStats).filter(PublicStats.id == 1).first()
         if not accumulated:
@@ -339,7 +231,7 @@ def public_stats():
             db.add(accumulated)
 
         accumulated.users = max(accumulated.users or 0, total_users)
-        accumulated.scans = max(accumulated.scans or 0, len(scans))
+        accumulated.scans = max(accumulated.scans or 0, total_scans)
         accumulated.vulnerabilities = max(
             accumulated.vulnerabilities or 0, total_vulnerabilities
         )
@@ -388,35 +280,21 @@ async def align_sequences():
 
 @app.on_event("startup")
 async def start_intelligent_automation():
-    """Executa continuamente as verificacoes de monitoramento que chegaram ao prazo."""
-    async def _automation_loop():
-        from routes.viggio_shield_routes import run_automatic_target_check
-        from models.monitor import MonitorTarget
-        while True:
-            db = SessionLocal()
-            try:
-                now = datetime.utcnow()
-                targets = db.query(MonitorTarget).filter(
-                    MonitorTarget.is_active == True,
-                    MonitorTarget.status == "active"
-                ).all()
-                for target in targets:
-                    interval = max(int(target.check_interval or 300), 60)
-                    if not target.last_check or (now - target.last_check).total_seconds() >= interval:
-                        try:
-                            await run_automatic_target_check(target, db)
-                        except Exception as exc:
-                            db.rollback()
-                            print(f"Erro na automacao do alvo {target.id}: {exc}")
-            except Exception as exc:
-                # Uma falha temporária do banco não pode encerrar a tarefa de
-                # automação silenciosamente. O próximo ciclo tenta novamente.
-                db.rollback()
-                print(f"Banco indisponível para automacao; nova tentativa no próximo ciclo: {exc}")
-            finally:
-                db.close()
-            await asyncio.sleep(30)
-    asyncio.create_task(_automation_loop())
+    """Executa as verificacoes automaticas do Iron AI Shield neste processo quando SHIELD_SCHEDULER=api."""
+    if settings.SHIELD_SCHEDULER == "api":
+        from workers.shield_scheduler import ShieldScheduler
+        asyncio.create_task(ShieldScheduler().run())
+
+@app.on_event("shutdown")
+async def close_probe_client():
+    from scanners.network_probes import close_http_client
+    await close_http_client()
+
+@app.on_event("shutdown")
+def stop_scan_executors():
+    from services.scan_executor import cpu_executor, io_executor
+    cpu_executor.shutdown()
+    io_executor.shutdown()
 
 app.include_router(auth_routes.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(scan_routes.router, prefix="/api", tags=["Scans"], dependencies=[Depends(require_enterprise_developer)])
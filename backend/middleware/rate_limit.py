@@ -0,0 +1,90 @@
+"""
+Rate limiting por plano como middleware ASGI puro
+"""
+import ipaddress
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from services.rate_limit import rate_limit_backend
+from services.request_identity import identity_for, token_subject
+from services.security_monitoring_service import is_cloudflare_ip
+
+# Rate limiting por plano (requests/min)
+PLAN_RATE_LIMITS = {
+    "free": 60,
+    "starter": 50,
+    "professional": 100,
+    "enterprise": 500,
+}
+EXEMPT_PATHS = ("/api/health", "/api/uptime")
+LOCAL_HOSTS = ("127.0.0.1", "::1", "0.0.0.0")
+
+
+def client_ip(scope, headers: Headers) -> str:
+    """IP do cliente; CF-Connecting-IP só vale quando o par imediato é a própria Cloudflare,
+    senão um cliente poderia forjar o cabeçalho e escapar do limite."""
+    peer = scope["client"][0] if scope.get("client") else "unknown"
+    if is_cloudflare_ip(peer):
+        candidate = headers.get("cf-connecting-ip", "").strip()
+        try:
+            return str(ipaddress.ip_address(candidate))
+        except ValueError:
+            pass
+    return peer
+
+
+class RateLimitMiddleware:
+    """Limita as rotas /api por organização, usuário e caminho.
+
+    O usuário vem do JWT (decodificado uma vez por token) e o plano/organização
+    do cache de identidade, então o caminho comum não abre sessão de banco; o
+    contador é um GCRA no Redis (script Lua via cliente asyncio) ou em processo.
+    """
+
+    def __init__(self, app, backend=rate_limit_backend, window_seconds: int = 60):
+        self.app = app
+        self.backend = backend
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api") or path in EXEMPT_PATHS or path.startswith("/api/payments/"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        plan, key = await self._identify(scope, headers, path)
+        limit = PLAN_RATE_LIMITS.get(plan, 10)
+        if scope.get("client") and scope["client"][0] in LOCAL_HOSTS:
+            limit = max(limit, 200)
+        allowed, remaining, reset_at, retry_after = await self.backend.hit_async(key, limit, self.window_seconds)
+        rate_headers = {"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(reset_at)}
+        if not allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded", "plan": plan},
+                headers={**rate_headers, "Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_limits(message):
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in rate_headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
+
+    async def _identify(self, scope, headers: Headers, path: str) -> tuple[str, str]:
+        authorization = headers.get("authorization", "")
+        username = token_subject(authorization.split(" ", 1)[1]) if authorization.lower().startswith("bearer ") else None
+        if not username:
+            return "free", f"ratelimit:public:{client_ip(scope, headers)}:{path}"
+        identity = await identity_for(username)
+        if identity is None:
+            return "free", f"ratelimit:public:{username}:{path}"
+        organization_id = identity.organization_id if identity.organization_id is not None else "none"
+        return identity.plan or "free", f"ratelimit:{organization_id}:{identity.user_id}:{path}"
@@ -9,7 +9,7 @@ from sqlalchemy.orm import sessionmaker
 load_dotenv()
 from database import Base
 from models.user import User
-from models.scan import Scan
+from models.scan import Scan, iter_decompressed
 
 def _normalize(url: str) -> str:
     if url.startswith("postgres://"):
@@ -113,9 +113,16 @@ def migrate(sqlite_path: str, postgres_url: str) -> int:
                 pg.commit()
                 users_inserted += 1
 
-        cur.execute("SELECT * FROM scans")
+        # Desde a migração 025 o payload fica comprimido em scan_results e scans.results é NULL
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scan_results'")
+        if cur.fetchone():
+            cur.execute("SELECT scans.*, scan_results.encoding AS results_encoding, scan_results.payload AS results_payload FROM scans LEFT JOIN scan_results ON scan_results.scan_id = scans.id")
+        else:
+            cur.execute("SELECT * FROM scans")
         for row in cur.fetchall():
             data = dict(row)
+            if data.get("results_payload") is not None:
+                data["results"] = b"".join(iter_decompressed(data["results_encoding"], data["results_payload"])).decode("utf-8")
             sid = data.get("id")
             existing_scan = None
             if sid is not None:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, Float, Index, UniqueConstraint
 from datetime import datetime
 from database import Base
 
@@ -69,6 +69,7 @@ class MonitorIncident(Base):
 class MonitorLog(Base):
     """Logs de atividade do monitoramento"""
     __tablename__ = "monitor_logs"
+    __table_args__ = (Index("ix_monitor_logs_target_type_created", "target_id", "log_type", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     target_id = Column(Integer, index=True)
@@ -81,6 +82,24 @@ class MonitorLog(Base):
     
     # Dados adicionais
     data = Column(JSON, nullable=True)
+    # Hash do resultado pesado (security_scan, deep_assessment, vulnerabilities); só as verificações
+    # em que ele mudou guardam esse resultado em data, as demais guardam apenas o hash
+    payload_hash = Column(String(64), nullable=True)
+
+class MonitorCheckRollup(Base):
+    """Agregados de disponibilidade e latência por alvo, por hora e por dia"""
+    __tablename__ = "monitor_check_rollups"
+    __table_args__ = (UniqueConstraint("target_id", "period", "bucket_start", name="uq_monitor_check_rollups_bucket"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    target_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, index=True)
+    period = Column(String(8), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    checks = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    response_time_sum = Column(Float, nullable=False, default=0.0)
+    response_time_max = Column(Float, nullable=False, default=0.0)
 
 class BlockedIP(Base):
     """IPs bloqueados automaticamente"""
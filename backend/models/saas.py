@@ -6,7 +6,7 @@ tables remain usable while new product data is scoped through memberships.
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, JSON, LargeBinary, String, Text, UniqueConstraint
 
 from database import Base
 
@@ -61,7 +61,10 @@ class Asset(Base):
 
 class ScanJob(Base):
     __tablename__ = "scan_jobs"
-    __table_args__ = (Index("ix_scan_jobs_org_status", "organization_id", "status"),)
+    __table_args__ = (
+        Index("ix_scan_jobs_org_status", "organization_id", "status"),
+        Index("ix_scan_jobs_claim", "status", "priority", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -69,6 +72,12 @@ class ScanJob(Base):
     scanner_type = Column(String(80), nullable=False)
     status = Column(String(20), nullable=False, default="queued")
     progress = Column(Integer, nullable=False, default=0)
+    priority = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(160), nullable=True)
     error = Column(Text, nullable=True)
     result_json = Column("result", JSON, nullable=True)
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
@@ -82,6 +91,7 @@ class Finding(Base):
     __table_args__ = (
         UniqueConstraint("organization_id", "fingerprint", name="uq_finding_org_fingerprint"),
         Index("ix_findings_org_status_severity", "organization_id", "status", "severity"),
+        Index("ix_findings_org_risk_scored", "organization_id", "risk_scored_at"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -97,6 +107,7 @@ class Finding(Base):
     status = Column(String(30), nullable=False, default="open")
     risk_score = Column(Integer, nullable=False, default=0)
     risk_factors = Column(JSON, nullable=True)
+    risk_scored_at = Column(DateTime, nullable=True)
     cve = Column(String(40), nullable=True)
     cwe = Column(String(40), nullable=True)
     cvss_score = Column(String(16), nullable=True)
@@ -167,6 +178,20 @@ class SecuritySnapshot(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 
+class OrganizationRiskAggregate(Base):
+    """Open-finding counters and score penalty, kept current by risk.engine on every flush."""
+
+    __tablename__ = "organization_risk_aggregates"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    critical_open = Column(Integer, nullable=False, default=0)
+    high_open = Column(Integer, nullable=False, default=0)
+    medium_open = Column(Integer, nullable=False, default=0)
+    low_open = Column(Integer, nullable=False, default=0)
+    open_penalty = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class AIConversation(Base):
     __tablename__ = "ai_conversations"
 
@@ -191,6 +216,7 @@ class AIMessage(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (Index("ix_reports_cache_key", "organization_id", "report_type", "period_days", "data_watermark"),)
 
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -199,6 +225,21 @@ class Report(Base):
     period_days = Column(Integer, nullable=False, default=30)
     status = Column(String(20), nullable=False, default="completed")
     payload = Column(JSON, nullable=False)
+    job_id = Column(Integer, ForeignKey("scan_jobs.id", ondelete="SET NULL"), nullable=True, index=True)
+    data_watermark = Column(String(64), nullable=True)
+    pdf_etag = Column(String(64), nullable=True)
+    pdf_size = Column(Integer, nullable=True)
+    rendered_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ReportArtifact(Base):
+    """Rendered PDF of a report, kept out of the reports row so listings never load it."""
+
+    __tablename__ = "report_artifacts"
+
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True)
+    content = Column(LargeBinary, nullable=False)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 
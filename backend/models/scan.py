@@ -1,15 +1,158 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, LargeBinary, select
+from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Iterator, Optional
+import json
+import zlib
 from database import Base
 
+SUMMARY_SEVERITIES = ("critical", "high", "medium", "low")
+RESULTS_ENCODING = "deflate"
+COMPRESSION_LEVEL = 6
+STREAM_CHUNK = 64 * 1024
+
+
+class ScanResult(Base):
+    """Payload JSON de um scan, comprimido e fora da tabela scans"""
+    __tablename__ = "scan_results"
+
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), primary_key=True)
+    encoding = Column(String(16), nullable=False, default=RESULTS_ENCODING)
+    raw_size = Column(Integer, nullable=False, default=0)
+    payload = Column(LargeBinary, nullable=False)
+
+    @classmethod
+    def pack(cls, text: str) -> tuple:
+        raw = text.encode("utf-8")
+        return len(raw), zlib.compress(raw, COMPRESSION_LEVEL)
+
+    def set_text(self, text: str) -> None:
+        self.encoding = RESULTS_ENCODING
+        self.raw_size, self.payload = self.pack(text)
+
+    def iter_bytes(self, chunk_size: int = STREAM_CHUNK) -> Iterator[bytes]:
+        """Descomprime em blocos, sem materializar o JSON inteiro"""
+        return iter_decompressed(self.encoding, self.payload, chunk_size)
+
+    def raw(self) -> bytes:
+        return b"".join(self.iter_bytes())
+
+
 class Scan(Base):
     __tablename__ = "scans"
+    __table_args__ = (Index("ix_scans_user_created", "user_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     scan_type = Column(String)  # 'code' or 'api'
     target = Column(String)  # URL or file path
     status = Column(String, default="pending")  # pending, running, completed, failed
-    results = Column(Text)  # JSON string of results
+    # Legado: JSON não comprimido de linhas anteriores à migração 025; novos payloads vão para scan_results
+    stored_results = Column("results", Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    # Resumo gravado junto com results para listagens e dashboard não precisarem decodificar o JSON
+    findings_total = Column(Integer, nullable=False, default=0)
+    critical_count = Column(Integer, nullable=False, default=0)
+    high_count = Column(Integer, nullable=False, default=0)
+    medium_count = Column(Integer, nullable=False, default=0)
+    low_count = Column(Integer, nullable=False, default=0)
+    # Carregado só quando results é acessado; listagens leem apenas as colunas acima
+    result = relationship(ScanResult, uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def results(self) -> Optional[str]:
+        """JSON string of results"""
+        if self.result is not None:
+            return self.result.raw().decode("utf-8")
+        return self.stored_results
+
+    @results.setter
+    def results(self, value: Optional[str]) -> None:
+        if value is None:
+            self.result = None
+        else:
+            if self.result is None:
+                self.result = ScanResult()
+            self.result.set_text(value)
+        self.stored_results = None
+        apply_summary(self, summarize_results(value))
+
+    def load_results(self):
+        """results já decodificado (None se o scan não tem payload)"""
+        if self.result is not None:
+            return json.loads(self.result.raw())
+        return json.loads(self.stored_results) if self.stored_results else None
+
+    def iter_results_bytes(self) -> Iterator[bytes]:
+        if self.result is not None:
+            return self.result.iter_bytes()
+        return iter([self.stored_results.encode("utf-8")] if self.stored_results else [])
+
+
+def delete_scans(db, *criteria) -> int:
+    """Exclusão em massa de scans e seus payloads; retorna quantos scans foram excluídos.
+
+    O bulk delete não passa pelo cascade do ORM e o SQLite não aplica o ON DELETE
+    CASCADE, então os scan_results saem explicitamente antes dos scans.
+    """
+    db.query(ScanResult).filter(ScanResult.scan_id.in_(select(Scan.id).where(*criteria))).delete(synchronize_session=False)
+    return db.query(Scan).filter(*criteria).delete(synchronize_session=False)
+
+
+def iter_decompressed(encoding: str, payload: bytes, chunk_size: int = STREAM_CHUNK) -> Iterator[bytes]:
+    if encoding != RESULTS_ENCODING:
+        raise ValueError(f"Unsupported scan results encoding: {encoding}")
+    decompressor = zlib.decompressobj()
+    view = memoryview(payload)
+    for start in range(0, len(view), chunk_size):
+        data = view[start:start + chunk_size]
+        while data:
+            chunk = decompressor.decompress(data, chunk_size)
+            if chunk:
+                yield chunk
+            data = decompressor.unconsumed_tail
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def _count(value) -> int:
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def summarize_results(results) -> dict:
+    """Total e contagem por severidade de um resultado de scanner (summary, severity_count ou lista de vulnerabilidades)"""
+    if isinstance(results, str):
+        try:
+            results = json.loads(results)
+        except ValueError:
+            results = None
+    empty = {"total": 0, **{severity: 0 for severity in SUMMARY_SEVERITIES}}
+    if not isinstance(results, dict):
+        return empty
+    if isinstance(results.get("summary"), dict) and "total" in results["summary"]:
+        summary = results["summary"]
+        return {"total": _count(summary.get("total")), **{severity: _count(summary.get(severity)) for severity in SUMMARY_SEVERITIES}}
+    if isinstance(results.get("severity_count"), dict):
+        counts = {severity: _count(results["severity_count"].get(severity.upper())) for severity in SUMMARY_SEVERITIES}
+        return {"total": _count(results.get("total_vulnerabilities")) or sum(counts.values()), **counts}
+    vulnerabilities = results.get("vulnerabilities")
+    if not isinstance(vulnerabilities, list):
+        vulnerabilities = [
+            vulnerability
+            for endpoint in results.get("endpoint_results") or []
+            if isinstance(endpoint, dict)
+            for vulnerability in endpoint.get("vulnerabilities") or []
+        ]
+    severities = [str(vulnerability.get("severity", "")).lower() for vulnerability in vulnerabilities if isinstance(vulnerability, dict)]
+    return {"total": len(vulnerabilities), **{severity: severities.count(severity) for severity in SUMMARY_SEVERITIES}}
+
+
+def apply_summary(scan: Scan, summary: dict) -> None:
+    scan.findings_total = summary["total"]
+    for severity in SUMMARY_SEVERITIES:
+        setattr(scan, f"{severity}_count", summary[severity])
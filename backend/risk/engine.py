@@ -1,16 +1,34 @@
-"""Transparent, deterministic risk and organization score calculations."""
+"""Transparent, deterministic risk and organization score calculations.
 
-from datetime import datetime
-from typing import Optional
+Scores are maintained incrementally: a flush listener records which findings had
+a risk input changed and applies the change in each finding's contribution to
+the organization's OrganizationRiskAggregate, so scoring and snapshots cost
+O(changed findings) instead of O(all findings).
+"""
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
 
-from models.saas import Asset, Finding, SecuritySnapshot
+from sqlalchemy import case, event, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+from models.saas import Asset, Finding, OrganizationRiskAggregate, SecuritySnapshot
 
 SEVERITY_BASE = {"informational": 5, "low": 20, "medium": 40, "high": 65, "critical": 82}
 CRITICALITY_FACTOR = {"low": 0, "medium": 5, "high": 10, "critical": 15}
 CONFIDENCE_FACTOR = {"low": 0, "medium": 4, "high": 8, "confirmed": 12}
+COUNTED_SEVERITIES = ("critical", "high", "medium", "low")
+PENALTY_CAP = 35
+# Fields that feed calculate_finding_risk; a change to any of them rescores the finding.
+RISK_INPUTS = ("severity", "confidence", "cve", "first_seen_at", "occurrence_count", "asset_id", "status")
+AGGREGATED = ("status", "severity", "risk_score")
+# The age factor moves in 30-day steps, so scores older than a day are refreshed in bounded batches.
+STALE_AFTER = timedelta(days=1)
+STALE_BATCH = 1000
+ID_CHUNK = 500
+TOUCHED_KEY = "risk_touched_findings"
 
 
 def calculate_finding_risk(finding: Finding, asset: Optional[Asset] = None) -> tuple[int, dict]:
@@ -27,23 +45,174 @@ def calculate_finding_risk(finding: Finding, asset: Optional[Asset] = None) -> t
     return score, factors
 
 
-def refresh_finding_scores(db: Session, organization_id: int) -> None:
+def _contribution(status: Optional[str], severity: Optional[str], risk_score: Optional[int]) -> Counter:
+    """Share of one finding in the aggregate: open findings count by severity and add their capped score."""
+    if (status or "open") != "open":
+        return Counter()
+    contribution = Counter(open_penalty=min(PENALTY_CAP, risk_score or 0))
+    if severity in COUNTED_SEVERITIES:
+        contribution[f"{severity}_open"] = 1
+    return contribution
+
+
+def _previous(instance, name: str):
+    history = attributes.get_history(instance, name)
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(instance, name)
+
+
+def _changed(instance, names: Iterable[str]) -> bool:
+    return any(attributes.get_history(instance, name).has_changes() for name in names)
+
+
+def _apply_deltas(connection, deltas: dict[int, Counter]) -> None:
+    table = OrganizationRiskAggregate.__table__
+    for organization_id, delta in deltas.items():
+        values = {name: table.c[name] + amount for name, amount in delta.items() if amount}
+        if values:
+            connection.execute(update(table).where(table.c.organization_id == organization_id).values(updated_at=datetime.utcnow(), **values))
+
+
+def _mark_touched(session: Session, findings: Iterable[Finding]) -> None:
+    touched = session.info.setdefault(TOUCHED_KEY, defaultdict(set))
+    for finding in findings:
+        touched[finding.organization_id].add(finding.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_finding_changes(session: Session, _context) -> None:
+    deltas: dict[int, Counter] = defaultdict(Counter)
+    touched, rescore, stale_assets = [], [], set()
+    for instance in session.new:
+        if isinstance(instance, Finding):
+            deltas[instance.organization_id].update(_contribution(instance.status, instance.severity, instance.risk_score))
+            touched.append(instance)
+    for instance in session.dirty:
+        if isinstance(instance, Finding):
+            if _changed(instance, AGGREGATED):
+                delta = _contribution(instance.status, instance.severity, instance.risk_score)
+                delta.subtract(_contribution(*(_previous(instance, name) for name in AGGREGATED)))
+                deltas[instance.organization_id].update(delta)
+            if _changed(instance, RISK_INPUTS):
+                touched.append(instance)
+                if not _changed(instance, ("risk_scored_at",)):
+                    rescore.append(instance)
+        elif isinstance(instance, Asset) and _changed(instance, ("internet_exposed", "criticality")):
+            stale_assets.add(instance.id)
+    for instance in session.deleted:
+        if isinstance(instance, Finding):
+            deltas[instance.organization_id].subtract(_contribution(*(_previous(instance, name) for name in AGGREGATED)))
+    connection = session.connection()
+    _apply_deltas(connection, deltas)
+    _mark_touched(session, touched)
+    if rescore:
+        # The in-session ids are lost if the session ends without refresh_finding_scores:
+        # clearing risk_scored_at in the same transaction lets the next refresh pick them up.
+        ids = sorted({instance.id for instance in rescore})
+        for start in range(0, len(ids), ID_CHUNK):
+            connection.execute(update(Finding.__table__).where(Finding.__table__.c.id.in_(ids[start:start + ID_CHUNK])).values(risk_scored_at=None))
+        for instance in rescore:
+            attributes.set_committed_value(instance, "risk_scored_at", None)
+    if stale_assets:
+        # Exposure/criticality feed every finding of the asset: queue them for the next stale sweep.
+        connection.execute(update(Finding.__table__).where(Finding.__table__.c.asset_id.in_(stale_assets)).values(risk_scored_at=None))
+
+
+# Aggregate deltas need the replaced values even when the attribute was expired (e.g. after commit).
+for _attribute in (Finding.status, Finding.severity, Finding.risk_score, Asset.internet_exposed, Asset.criticality):
+    event.listen(_attribute, "set", lambda *args: None, active_history=True)
+
+
+def track_inserted_findings(db: Session, findings: Iterable[Finding]) -> None:
+    """Account for findings written by Core bulk inserts, which bypass the flush listener."""
+    findings = list(findings)
+    deltas: dict[int, Counter] = defaultdict(Counter)
+    for finding in findings:
+        deltas[finding.organization_id].update(_contribution(finding.status, finding.severity, finding.risk_score))
+    _apply_deltas(db.connection(), deltas)
+    _mark_touched(db, findings)
+
+
+def rebuild_risk_aggregate(db: Session, organization_id: int) -> dict:
+    """Recompute the aggregate from the findings table (first use and reconciliation)."""
+    rows = db.execute(
+        select(Finding.severity, func.count(Finding.id), func.coalesce(func.sum(case((Finding.risk_score > PENALTY_CAP, PENALTY_CAP), else_=func.coalesce(Finding.risk_score, 0))), 0))
+        .where(Finding.organization_id == organization_id, Finding.status == "open")
+        .group_by(Finding.severity)
+    ).all()
+    values = {f"{severity}_open": 0 for severity in COUNTED_SEVERITIES}
+    values["open_penalty"] = 0
+    for severity, count, penalty in rows:
+        if severity in COUNTED_SEVERITIES:
+            values[f"{severity}_open"] = count
+        values["open_penalty"] += int(penalty)
+    table = OrganizationRiskAggregate.__table__
+    try:
+        with db.begin_nested():
+            db.execute(table.delete().where(table.c.organization_id == organization_id))
+            db.execute(insert(table).values(organization_id=organization_id, updated_at=datetime.utcnow(), **values))
+    except IntegrityError:
+        pass
+    return values
+
+
+def _risk_aggregate(db: Session, organization_id: int) -> dict:
+    table = OrganizationRiskAggregate.__table__
+    row = db.execute(select(table).where(table.c.organization_id == organization_id)).mappings().first()
+    return dict(row) if row else rebuild_risk_aggregate(db, organization_id)
+
+
+def _load_findings(db: Session, organization_id: int, finding_ids: set[int]) -> list[Finding]:
+    ids = sorted(finding_ids)
+    findings = []
+    for start in range(0, len(ids), ID_CHUNK):
+        findings.extend(db.query(Finding).filter(Finding.organization_id == organization_id, Finding.id.in_(ids[start:start + ID_CHUNK])).all())
+    return findings
+
+
+def refresh_finding_scores(db: Session, organization_id: int, finding_ids: Optional[Iterable[int]] = None) -> int:
+    """Rescore findings whose risk inputs changed in this session (or the given ids) plus a bounded batch of stale scores."""
+    db.flush()
+    now = datetime.utcnow()
+    ids = set(finding_ids or ()) | db.info.get(TOUCHED_KEY, {}).pop(organization_id, set())
+    findings = {finding.id: finding for finding in _load_findings(db, organization_id, ids)}
+    stale = db.query(Finding).filter(
+        Finding.organization_id == organization_id,
+        or_(Finding.risk_scored_at.is_(None), Finding.risk_scored_at < now - STALE_AFTER),
+    ).order_by(Finding.risk_scored_at.isnot(None), Finding.risk_scored_at).limit(STALE_BATCH).all()
+    findings.update((finding.id, finding) for finding in stale)
+    findings = [finding for finding in findings.values() if finding.status != "false_positive"]
+    asset_ids = {finding.asset_id for finding in findings if finding.asset_id}
+    assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.id.in_(asset_ids)).all()} if asset_ids else {}
+    for finding in findings:
+        finding.risk_score, finding.risk_factors = calculate_finding_risk(finding, assets.get(finding.asset_id))
+        finding.risk_scored_at = now
+    db.flush()
+    return len(findings)
+
+
+def rescore_organization(db: Session, organization_id: int) -> dict:
+    """Full recomputation of every score and the aggregate; for repairs, not the scan path."""
     findings = db.query(Finding).filter(Finding.organization_id == organization_id, Finding.status.notin_(["false_positive"])).all()
     assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.organization_id == organization_id).all()}
+    now = datetime.utcnow()
     for finding in findings:
         finding.risk_score, finding.risk_factors = calculate_finding_risk(finding, assets.get(finding.asset_id))
+        finding.risk_scored_at = now
     db.flush()
+    db.info.get(TOUCHED_KEY, {}).pop(organization_id, None)
+    return rebuild_risk_aggregate(db, organization_id)
 
 
 def organization_security_score(db: Session, organization_id: int) -> dict:
     refresh_finding_scores(db, organization_id)
-    findings = db.query(Finding).filter(Finding.organization_id == organization_id, Finding.status == "open").all()
-    assets = db.query(Asset).filter(Asset.organization_id == organization_id).all()
-    counts = {severity: sum(1 for f in findings if f.severity == severity) for severity in ("critical", "high", "medium", "low")}
-    penalty = sum(min(35, f.risk_score or 0) for f in findings)
-    coverage_bonus = min(10, len(assets))
-    score = min(100, max(0, 100 - penalty + coverage_bonus))
-    return {"score": score, "findings": counts, "assets_total": len(assets), "assets_exposed": sum(1 for asset in assets if asset.internet_exposed)}
+    aggregate = _risk_aggregate(db, organization_id)
+    assets_total, assets_exposed = db.query(func.count(Asset.id), func.coalesce(func.sum(case((Asset.internet_exposed == True, 1), else_=0)), 0)).filter(Asset.organization_id == organization_id).one()  # noqa: E712
+    counts = {severity: aggregate[f"{severity}_open"] for severity in COUNTED_SEVERITIES}
+    coverage_bonus = min(10, assets_total)
+    score = min(100, max(0, 100 - aggregate["open_penalty"] + coverage_bonus))
+    return {"score": score, "findings": counts, "assets_total": assets_total, "assets_exposed": int(assets_exposed)}
 
 
 def create_snapshot(db: Session, organization_id: int) -> SecuritySnapshot:
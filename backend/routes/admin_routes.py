@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import func, desc
 from typing import List, Literal, Optional
 from datetime import datetime, timedelta
 from database import get_db
 from models.user import User
-from models.scan import Scan
+from models.scan import Scan, delete_scans
 from auth import get_current_user, get_password_hash
 from middleware.subscription import normalize_subscription_plan, sync_owned_organization_plans, upgrade_user_plan
 from utils.email_service import email_service
@@ -419,7 +419,7 @@ def delete_user(
     username = user.username
     
     # Excluir scans do usuário primeiro (cascade)
-    db.query(Scan).filter(Scan.user_id == user_id).delete()
+    delete_scans(db, Scan.user_id == user_id)
     
     # Excluir usuário
     db.delete(user)
@@ -493,7 +493,7 @@ def clear_activity_logs(
     admin: User = Depends(require_admin)
 ):
     try:
-        deleted = db.query(Scan).delete(synchronize_session=False)
+        deleted = delete_scans(db)
         db.commit()
         return {"success": True, "deleted": deleted}
     except Exception as e:
@@ -839,7 +839,7 @@ def export_data(
     admin: User = Depends(require_admin)
 ) -> Dict[str, Any]:
     users = db.query(User).all()
-    scans = db.query(Scan).all()
+    scans = db.query(Scan).options(selectinload(Scan.result)).all()
     return {
         "users": [
             {
@@ -3,17 +3,21 @@ Extended Scan Routes - Rotas adicionais com novas funcionalidades
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional, List
 import json
 from datetime import datetime
 from database import get_db
 from auth import get_current_user
 from models.user import User
-from models.scan import Scan
+from models.scan import SUMMARY_SEVERITIES, Scan
 from pydantic import BaseModel
 from middleware.subscription import increment_scan_count, check_subscription_status, check_tool_access, ensure_tool_access
 from services.finding_service import persist_scan_findings
+from services.account_report_service import excerpt, iter_file, write_account_report
 
 # Import novos scanners
 from scanners.multilang_scanner import scan_code as multilang_scan
@@ -346,7 +350,7 @@ async def generate_report_endpoint(
         if not scan:
             raise HTTPException(status_code=404, detail="Scan not found")
         
-        selected = json.loads(scan.results) if scan.results else {}
+        selected = scan.load_results() or {}
 
         def extract_vulns(res: dict) -> List[dict]:
             vulns = []
@@ -413,7 +417,7 @@ async def generate_report_endpoint(
             "vulnerabilities": selected_vulns
         }
 
-        scans_all = db.query(Scan).filter(Scan.user_id == current_user.id).order_by(Scan.created_at.desc()).all()
+        scans_all = db.query(Scan).options(selectinload(Scan.result)).filter(Scan.user_id == current_user.id).order_by(Scan.created_at.desc()).all()
         agg_sc = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
         agg_total = 0
         tools_map = {
@@ -429,7 +433,7 @@ async def generate_report_endpoint(
         for s in scans_all:
             res = {}
             try:
-                res = json.loads(s.results) if s.results else {}
+                res = s.load_results() or {}
             except Exception:
                 res = {}
             vulns = extract_vulns(res)
@@ -567,218 +571,31 @@ async def generate_full_report(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Relatório consolidado da conta: uma passada pelos scans, PDF em arquivo temporário e resposta em streaming"""
     try:
-        def extract_vulns(res: dict) -> List[dict]:
-            vulns = []
-            if isinstance(res, dict):
-                if res.get('vulnerabilities'):
-                    vulns = res['vulnerabilities']
-                elif res.get('findings'):
-                    vulns = res['findings']
-                elif res.get('endpoint_results'):
-                    for er in res['endpoint_results']:
-                        for v in er.get('vulnerabilities', []):
-                            vulns.append(v)
-            if isinstance(vulns, dict):
-                vulns = list(vulns.values())
-            if not isinstance(vulns, list):
-                return []
-            return _dedupe_findings([v for v in vulns if isinstance(v, dict)])
-
-        def extract_summary(res: dict) -> dict:
-            def to_int(x):
-                try:
-                    return int(x)
-                except Exception:
-                    return 0
-            if not isinstance(res, dict):
-                return {'total': 0, 'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
-            if res.get('summary'):
-                s = res['summary']
-                return {
-                    'total': to_int(s.get('total', s.get('total_vulnerabilities', 0))),
-                    'critical': to_int(s.get('critical', 0)),
-                    'high': to_int(s.get('high', 0)),
-                    'medium': to_int(s.get('medium', 0)),
-                    'low': to_int(s.get('low', 0))
-                }
-            if res.get('severity_count'):
-                sc = res['severity_count']
-                return {
-                    'total': to_int(res.get('total_vulnerabilities', sum(to_int(v) for v in sc.values()))),
-                    'critical': to_int(sc.get('CRITICAL', 0)),
-                    'high': to_int(sc.get('HIGH', 0)),
-                    'medium': to_int(sc.get('MEDIUM', 0)),
-                    'low': to_int(sc.get('LOW', 0))
-                }
-            vulns = extract_vulns(res)
-            return {
-                'total': to_int(len(vulns)),
-                'critical': to_int(sum(1 for v in vulns if v.get('severity') == 'CRITICAL')),
-                'high': to_int(sum(1 for v in vulns if v.get('severity') == 'HIGH')),
-                'medium': to_int(sum(1 for v in vulns if v.get('severity') == 'MEDIUM')),
-                'low': to_int(sum(1 for v in vulns if v.get('severity') == 'LOW'))
-            }
-
-        scans_all = db.query(Scan).filter(Scan.user_id == current_user.id).order_by(Scan.created_at.desc()).all()
-        agg_sc = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
-        agg_total = 0
-        tools_map = {
-            'code': 'Code Scanner',
-            'api': 'API Scanner',
-            'dependencies': 'Dependency Scanner',
-            'docker': 'Docker Scanner',
-            'graphql': 'GraphQL Scanner',
-            'network': 'Port Scanner'
-        }
-        tools_summary = {}
-        scans_details = []
-        consolidated_vulnerabilities = []
-
-        for s in scans_all:
-            res = {}
-            try:
-                res = json.loads(s.results) if s.results else {}
-            except Exception:
-                res = {}
-            vulns = extract_vulns(res)
-            tname = tools_map.get(s.scan_type, s.scan_type)
-            for vuln in vulns:
-                if not isinstance(vuln, dict):
-                    continue
-                detailed_vuln = dict(vuln)
-                detailed_vuln.setdefault('scan_id', s.id)
-                detailed_vuln.setdefault('scanner', tname)
-                detailed_vuln.setdefault('file', s.target)
-                consolidated_vulnerabilities.append(detailed_vuln)
-            summ = extract_summary(res)
-            agg_total += summ.get('total', 0)
-            agg_sc['CRITICAL'] += summ.get('critical', 0)
-            agg_sc['HIGH'] += summ.get('high', 0)
-            agg_sc['MEDIUM'] += summ.get('medium', 0)
-            agg_sc['LOW'] += summ.get('low', 0)
-            if tname not in tools_summary:
-                tools_summary[tname] = {'tool': tname, 'scans': 0, 'vulnerabilities': 0}
-            tools_summary[tname]['scans'] += 1
-            tools_summary[tname]['vulnerabilities'] += summ.get('total', 0)
-            try:
-                raw_json = json.dumps(res, ensure_ascii=False, indent=2)
-            except Exception:
-                raw_json = str(res)
-            max_len = 3000
-            raw_excerpt = (raw_json[:max_len] + ('\n... (conteúdo truncado)' if len(raw_json) > max_len else ''))
-            scans_details.append({
-                'id': s.id,
-                'tool': tname,
-                'scan_type': s.scan_type,
-                'target': s.target,
-                'created_at': s.created_at.isoformat(),
-                'total_vulnerabilities': summ.get('total', 0),
-                'severity_count': {
-                    'CRITICAL': summ.get('critical', 0),
-                    'HIGH': summ.get('high', 0),
-                    'MEDIUM': summ.get('medium', 0),
-                    'LOW': summ.get('low', 0)
-                },
-                'raw_excerpt': raw_excerpt
-            })
-
+        extra_items = []
         try:
             phishing_captures = await list_phishing_captures(current_user)
         except Exception:
             phishing_captures = {"captures": []}
         for capture in phishing_captures.get('captures', []):
-            try:
-                raw_json = json.dumps(capture, ensure_ascii=False, indent=2)
-            except Exception:
-                raw_json = str(capture)
-            max_len = 3000
-            raw_excerpt = (raw_json[:max_len] + ('\n... (conteúdo truncado)' if len(raw_json) > max_len else ''))
-            if 'Phishing Generator' not in tools_summary:
-                tools_summary['Phishing Generator'] = {'tool': 'Phishing Generator', 'scans': 0, 'vulnerabilities': 0}
-            tools_summary['Phishing Generator']['scans'] += 1
-            scans_details.append({
-                'id': capture.get('capture_id', 'N/A'),
-                'tool': 'Phishing Generator',
-                'scan_type': 'phishing_capture',
-                'target': capture.get('page_id', 'N/A'),
-                'created_at': capture.get('timestamp', 'N/A'),
-                'total_vulnerabilities': 0,
-                'severity_count': {
-                    'CRITICAL': 0,
-                    'HIGH': 0,
-                    'MEDIUM': 0,
-                    'LOW': 0
-                },
-                'raw_excerpt': raw_excerpt
-            })
-
+            extra_items.append(_phishing_item(
+                capture.get('capture_id', 'N/A'), 'phishing_capture', capture.get('page_id', 'N/A'),
+                capture.get('timestamp', 'N/A'), capture
+            ))
         try:
             generated_pages = await list_generated_pages(current_user)
         except Exception:
             generated_pages = {"pages": []}
         for page in generated_pages.get('pages', []):
-            try:
-                raw_json = json.dumps(page, ensure_ascii=False, indent=2)
-            except Exception:
-                raw_json = str(page)
-            max_len = 3000
-            raw_excerpt = (raw_json[:max_len] + ('\n... (conteúdo truncado)' if len(raw_json) > max_len else ''))
-            if 'Phishing Generator' not in tools_summary:
-                tools_summary['Phishing Generator'] = {'tool': 'Phishing Generator', 'scans': 0, 'vulnerabilities': 0}
-            tools_summary['Phishing Generator']['scans'] += 1
-            scans_details.append({
-                'id': page.get('filename', 'N/A'),
-                'tool': 'Phishing Generator',
-                'scan_type': 'phishing_page',
-                'target': page.get('short_url') or page.get('url') or 'N/A',
-                'created_at': page.get('created_at', 'N/A'),
-                'total_vulnerabilities': 0,
-                'severity_count': {
-                    'CRITICAL': 0,
-                    'HIGH': 0,
-                    'MEDIUM': 0,
-                    'LOW': 0
-                },
-                'raw_excerpt': raw_excerpt
-            })
-
-        consolidated_vulnerabilities = _dedupe_findings(consolidated_vulnerabilities)
-        agg_sc = {
-            'CRITICAL': sum(1 for item in consolidated_vulnerabilities if str(item.get('severity', '')).upper() == 'CRITICAL'),
-            'HIGH': sum(1 for item in consolidated_vulnerabilities if str(item.get('severity', '')).upper() == 'HIGH'),
-            'MEDIUM': sum(1 for item in consolidated_vulnerabilities if str(item.get('severity', '')).upper() == 'MEDIUM'),
-            'LOW': sum(1 for item in consolidated_vulnerabilities if str(item.get('severity', '')).upper() == 'LOW')
-        }
-        agg_total = len(consolidated_vulnerabilities)
-        overall_summary = {
-            'total': agg_total,
-            'critical': agg_sc['CRITICAL'],
-            'high': agg_sc['HIGH'],
-            'medium': agg_sc['MEDIUM'],
-            'low': agg_sc['LOW']
-        }
-
-        scan_data = {
-            'scan_id': 'ALL',
-            'scan_type': 'full',
-            'target': 'Todos',
-            'report_theme': 'platform',
-            'created_at': datetime.utcnow().isoformat(),
-            'summary': overall_summary,
-            'vulnerabilities': consolidated_vulnerabilities,
-            'user_overview': {
-                'total_scans': len(scans_all),
-                'total_vulnerabilities': agg_total,
-                'severity_count': agg_sc
-            },
-            'tools_summary': list(tools_summary.values()),
-            'scans_details': scans_details
-        }
-
-        pdf_bytes = generate_pdf_report(scan_data)
-        return Response(
-            content=pdf_bytes,
+            extra_items.append(_phishing_item(
+                page.get('filename', 'N/A'), 'phishing_page', page.get('short_url') or page.get('url') or 'N/A',
+                page.get('created_at', 'N/A'), page
+            ))
+
+        report = await run_in_threadpool(write_account_report, db, current_user.id, extra_items)
+        return StreamingResponse(
+            iter_file(report),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": "attachment; filename=security-report-full.pdf"
@@ -788,6 +605,19 @@ async def generate_full_report(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _phishing_item(item_id, scan_type: str, target, created_at, raw) -> dict:
+    return {
+        'id': item_id,
+        'tool': 'Phishing Generator',
+        'scan_type': scan_type,
+        'target': target,
+        'created_at': created_at,
+        'total_vulnerabilities': 0,
+        'severity_count': {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0},
+        'raw_excerpt': excerpt(raw)
+    }
+
+
 # ========== CI/CD INTEGRATION ==========
 
 class CICDConfigRequest(BaseModel):
@@ -950,29 +780,27 @@ async def get_analytics_overview(
     db: Session = Depends(get_db)
 ):
     """Retorna overview analítico dos scans"""
-    scans = db.query(Scan).filter(Scan.user_id == current_user.id).all()
+    # Uma agregação por tipo sobre as colunas de resumo, sem descomprimir results
+    rows = db.query(
+        Scan.scan_type,
+        func.count(Scan.id),
+        *(func.coalesce(func.sum(getattr(Scan, f"{severity}_count")), 0) for severity in SUMMARY_SEVERITIES)
+    ).filter(Scan.user_id == current_user.id).group_by(Scan.scan_type).all()
     
     # Estatísticas por tipo de scan
     scan_types = {}
     total_vulns_by_severity = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
-    vulnerabilities_trend = []
     
-    for scan in scans:
-        scan_type = scan.scan_type
-        scan_types[scan_type] = scan_types.get(scan_type, 0) + 1
-        
-        if scan.results:
-            results = json.loads(scan.results)
-            summary = results.get('summary', {})
-            
-            for severity in ['critical', 'high', 'medium', 'low']:
-                count = summary.get(severity, 0)
-                total_vulns_by_severity[severity.upper()] += count
+    for scan_type, count, *severities in rows:
+        scan_types[scan_type] = count
+        for severity, total in zip(SUMMARY_SEVERITIES, severities):
+            total_vulns_by_severity[severity.upper()] += int(total)
     
+    total_scans = sum(scan_types.values())
     return {
-        "total_scans": len(scans),
+        "total_scans": total_scans,
         "scans_by_type": scan_types,
         "vulnerabilities_by_severity": total_vulns_by_severity,
-        "average_vulnerabilities_per_scan": sum(total_vulns_by_severity.values()) / len(scans) if scans else 0,
+        "average_vulnerabilities_per_scan": sum(total_vulns_by_severity.values()) / total_scans if total_scans else 0,
         "most_common_scan_type": max(scan_types.items(), key=lambda x: x[1])[0] if scan_types else None
     }
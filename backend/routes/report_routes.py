@@ -1,31 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models.saas import Report
 from services.audit_service import record_audit
-from services.report_service import generate_report, render_report_pdf
+from services.report_service import PENDING_STATUSES, report_pdf_content, request_report
 from services.tenant import TenantContext, get_tenant_context, require_roles
 
 router = APIRouter()
+RETRY_AFTER_SECONDS = "5"
+
+
+def _report_summary(report: Report) -> dict:
+    return {"id": report.id, "report_type": report.report_type, "period_days": report.period_days, "status": report.status, "created_at": report.created_at.isoformat(), "rendered_at": report.rendered_at.isoformat() if report.rendered_at else None}
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {item.strip().removeprefix("W/") for item in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
 
 
 @router.post("/reports/{report_type}")
 def create_report(report_type: str, request: Request, period_days: int = 30, context: TenantContext = Depends(require_roles("owner", "admin", "analyst")), db: Session = Depends(get_db)):
     try:
-        report = generate_report(db, context.organization.id, context.user.id, report_type, period_days)
+        report, cached = request_report(db, context.organization.id, context.user.id, report_type, period_days)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    record_audit(db, context, "report_generated", "report", report.id, request, {"type": report_type, "period_days": period_days})
+    if cached:
+        return {**_report_summary(report), "payload": report.payload, "cached": True}
+    record_audit(db, context, "report_generated", "report", report.id, request, {"type": report_type, "period_days": period_days, "job_id": report.job_id})
     db.commit()
     db.refresh(report)
-    return {"id": report.id, "report_type": report.report_type, "payload": report.payload, "created_at": report.created_at.isoformat()}
+    return JSONResponse({**_report_summary(report), "job_id": report.job_id, "cached": False}, status_code=202, headers={"Retry-After": RETRY_AFTER_SECONDS})
 
 
 @router.get("/reports")
 def list_reports(context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
     reports = db.query(Report).filter(Report.organization_id == context.organization.id).order_by(Report.created_at.desc()).limit(100).all()
-    return {"reports": [{"id": report.id, "report_type": report.report_type, "period_days": report.period_days, "status": report.status, "created_at": report.created_at.isoformat()} for report in reports]}
+    return {"reports": [_report_summary(report) for report in reports]}
 
 
 @router.get("/reports/{report_id}")
@@ -33,12 +48,22 @@ def report_detail(report_id: int, context: TenantContext = Depends(get_tenant_co
     report = db.query(Report).filter(Report.id == report_id, Report.organization_id == context.organization.id).first()
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return {"id": report.id, "report_type": report.report_type, "payload": report.payload, "created_at": report.created_at.isoformat()}
+    return {**_report_summary(report), "payload": report.payload}
 
 
 @router.get("/reports/{report_id}/pdf")
-def report_pdf(report_id: int, context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
+def report_pdf(report_id: int, if_none_match: str | None = Header(default=None), context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
     report = db.query(Report).filter(Report.id == report_id, Report.organization_id == context.organization.id).first()
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return Response(render_report_pdf(report), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=iron-ai-{report.report_type}-{report.id}.pdf"})
+    if report.status in PENDING_STATUSES:
+        return JSONResponse(_report_summary(report), status_code=202, headers={"Retry-After": RETRY_AFTER_SECONDS})
+    if report.status == "failed":
+        raise HTTPException(status_code=409, detail="Report generation failed")
+    if report.pdf_etag and _etag_matches(if_none_match, f'"{report.pdf_etag}"'):
+        return Response(status_code=304, headers={"ETag": f'"{report.pdf_etag}"', "Cache-Control": "private, no-cache"})
+    content = report_pdf_content(db, report)
+    return Response(content, media_type="application/pdf", headers={
+        "Content-Disposition": f"attachment; filename=iron-ai-{report.report_type}-{report.id}.pdf",
+        "ETag": f'"{report.pdf_etag}"', "Cache-Control": "private, no-cache",
+    })
@@ -1,8 +1,8 @@
-import json
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
 
 from database import get_db
 from models.saas import Asset, Finding, SecuritySnapshot
@@ -63,11 +63,11 @@ def finding_detail(finding_id: int, context: TenantContext = Depends(get_tenant_
 
 @router.post("/findings/reconcile")
 def reconcile_legacy_scans(request: Request, context: TenantContext = Depends(require_roles("owner", "admin", "analyst")), db: Session = Depends(get_db)):
-    scans = db.query(Scan).filter(Scan.user_id == context.user.id, Scan.results.isnot(None)).all()
+    scans = db.query(Scan).options(selectinload(Scan.result)).filter(Scan.user_id == context.user.id, or_(Scan.stored_results.isnot(None), Scan.result.has())).all()
     total = 0
     for scan in scans:
         try:
-            results = json.loads(scan.results)
+            results = scan.load_results()
         except (TypeError, ValueError):
             continue
         total += len(persist_scan_findings(db, context.user, results, scan.scan_type or "legacy", scan.target or "unknown"))
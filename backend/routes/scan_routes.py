@@ -1,20 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Iterator, Optional
+import base64
 import json
+import os
+import shutil
+import tempfile
 from datetime import datetime
-from database import get_db
+from database import SessionLocal, get_db
 from auth import get_current_user
 from models.user import User
-from models.scan import Scan
+from models.scan import SUMMARY_SEVERITIES, Scan, ScanResult, iter_decompressed
 from scanners.code_scanner import scan_code
 from scanners.api_scanner import APISecurityScanner
+from scanners.repository_scanner import ArchiveError, extract_archive, iter_repository_scan, merge_results, scan_archive
 from pydantic import BaseModel
 from middleware.subscription import increment_scan_count, check_subscription_status, check_tool_access, ensure_tool_access
 from services.finding_service import persist_scan_findings
+from services.scan_executor import ExecutorSaturated, cpu_executor, io_executor
 
 router = APIRouter()
 
+SCANS_PAGE_SIZE = 50
+SCANS_MAX_PAGE_SIZE = 200
+SUMMARY_COLUMNS = [getattr(Scan, f"{severity}_count") for severity in SUMMARY_SEVERITIES]
+
+
+async def _offload(executor, function, *args, **kwargs):
+    """Executa trabalho bloqueante fora do event loop; com o pool cheio responde 503 em vez de enfileirar sem limite"""
+    try:
+        return await executor.run(function, *args, **kwargs)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "scanner_busy", "message": "Todos os workers de scan estão ocupados. Tente novamente em instantes."},
+            headers={"Retry-After": "5"},
+        )
+
+
+def _save_scan(db: Session, user: User, scan_type: str, target: str, results: dict, scanner: str) -> Scan:
+    scan = Scan(
+        user_id=user.id,
+        scan_type=scan_type,
+        target=target,
+        status="completed",
+        results=json.dumps(results),
+        completed_at=datetime.utcnow()
+    )
+    db.add(scan)
+    db.commit()
+    db.refresh(scan)
+    persist_scan_findings(db, user, results, scanner, target or "unknown")
+    db.commit()
+    increment_scan_count(user, db)
+    return scan
+
+
 class ScanOptions(BaseModel):
     sql_injection: bool = True
     xss: bool = True
@@ -69,26 +114,11 @@ async def scan_code_endpoint(
             "insecure_functions": True
         }
         
-        # Executa scan com opções
-        results = scan_code(request.code, options=scan_options)
+        # Executa scan com opções (CPU: pool de processos)
+        results = await _offload(cpu_executor, scan_code, request.code, options=scan_options)
         
-        # Salva no banco
-        scan = Scan(
-            user_id=current_user.id,
-            scan_type="code",
-            target=request.filename,
-            status="completed",
-            results=json.dumps(results),
-            completed_at=datetime.utcnow()
-        )
-        db.add(scan)
-        db.commit()
-        db.refresh(scan)
-        persist_scan_findings(db, current_user, results, "code_scanner", request.filename or "unknown")
-        db.commit()
-        
-        # Incrementar contador de scans
-        increment_scan_count(current_user, db)
+        # O scan já foi admitido: a gravação final não passa pelo controle de fila para não perder o resultado
+        scan = await run_in_threadpool(_save_scan, db, current_user, "code", request.filename, results, "code_scanner")
         
         return {
             "scan_id": scan.id,
@@ -128,24 +158,12 @@ async def scan_api_endpoint(
             headers=request.headers or {}
         )
         
-        # Executa scan
-        results = scanner.full_scan(request.endpoints)
+        # Executa scan: o motor httpx assíncrono roda em um loop próprio numa thread do pool de I/O,
+        # mantendo o controle de admissão e o parsing das respostas fora do event loop da API
+        results = await _offload(io_executor, scanner.full_scan, request.endpoints)
         
         # Salva no banco
-        scan = Scan(
-            user_id=current_user.id,
-            scan_type="api",
-            target=request.base_url,
-            status="completed",
-            results=json.dumps(results),
-            completed_at=datetime.utcnow()
-        )
-        db.add(scan)
-        db.commit()
-        db.refresh(scan)
-        persist_scan_findings(db, current_user, results, "api_scanner", request.base_url)
-        db.commit()
-        increment_scan_count(current_user, db)
+        scan = await run_in_threadpool(_save_scan, db, current_user, "api", request.base_url, results, "api_scanner")
         return {
             "scan_id": scan.id,
             "results": results
@@ -183,23 +201,10 @@ async def upload_file_scan(
         code = content.decode('utf-8')
         
         # Executa scan
-        results = scan_code(code)
+        results = await _offload(cpu_executor, scan_code, code)
         
         # Salva no banco
-        scan = Scan(
-            user_id=current_user.id,
-            scan_type="code",
-            target=file.filename,
-            status="completed",
-            results=json.dumps(results),
-            completed_at=datetime.utcnow()
-        )
-        db.add(scan)
-        db.commit()
-        db.refresh(scan)
-        persist_scan_findings(db, current_user, results, "code_scanner", file.filename or "unknown")
-        db.commit()
-        increment_scan_count(current_user, db)
+        scan = await run_in_threadpool(_save_scan, db, current_user, "code", file.filename, results, "code_scanner")
         return {
             "scan_id": scan.id,
             "filename": file.filename,
@@ -210,37 +215,150 @@ async def upload_file_scan(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _stream_repository_scan(root: str, target: str, user_id: int, file_results: Iterator, first: Optional[dict]) -> StreamingResponse:
+    """NDJSON: uma linha por arquivo escaneado e, ao final, o resumo consolidado com o scan_id"""
+    def save(results: dict) -> int:
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            return _save_scan(db, user, "repository", target, results, "multilang_scanner").id
+        finally:
+            db.close()
+
+    async def events():
+        scanned = []
+        if first is not None:
+            scanned.append(first)
+            yield json.dumps({"file_result": first}, ensure_ascii=False) + "\n"
+            async for item in iterate_in_threadpool(file_results):
+                scanned.append(item)
+                yield json.dumps({"file_result": item}, ensure_ascii=False) + "\n"
+        results = merge_results(scanned, target)
+        # O scan já foi admitido: a gravação final não passa pelo controle de fila para não perder o resultado
+        scan_id = await run_in_threadpool(save, results)
+        summary = {key: value for key, value in results.items() if key != "vulnerabilities"}
+        yield json.dumps({"scan_id": scan_id, "results": summary}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(shutil.rmtree, root, ignore_errors=True))
+
+
+@router.post("/scan/repository")
+async def repository_scan(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Escaneia um repositório enviado como .zip ou tarball, arquivo por arquivo, em um pool de processos"""
+    try:
+        ensure_tool_access("code_scanner", current_user)
+        check_result = check_subscription_status(current_user)
+        if not check_result["active"]:
+            raise HTTPException(status_code=403, detail=check_result["message"])
+        if not check_tool_access("code_scanner", current_user):
+            raise HTTPException(
+                status_code=403,
+                detail={
+                    "error": "tool_locked",
+                    "message": "Esta ferramenta não está disponível no seu plano atual",
+                    "tool": "code_scanner",
+                    "current_plan": current_user.subscription_plan,
+                    "upgrade_url": "/pricing"
+                }
+            )
+        target = os.path.basename(file.filename or "repository.zip")
+        if stream:
+            root = tempfile.mkdtemp(prefix="repo-scan-")
+            try:
+                await _offload(io_executor, extract_archive, file.file, target, root)
+            except Exception:
+                shutil.rmtree(root, ignore_errors=True)
+                raise
+            # O primeiro lote passa pela admissão antes da resposta começar, então o pool cheio ainda responde 503
+            file_results = iter_repository_scan(root, cpu_executor.batches(), cpu_executor.max_workers)
+            try:
+                first = await _offload(io_executor, next, file_results, None)
+            except Exception:
+                shutil.rmtree(root, ignore_errors=True)
+                raise
+            return _stream_repository_scan(root, target, current_user.id, file_results, first)
+        # A orquestração ocupa uma thread; os lotes de arquivos vão para o pool de processos compartilhado, com admissão
+        results = await _offload(io_executor, scan_archive, file.file, target, cpu_executor.batches(), cpu_executor.max_workers)
+        scan = await run_in_threadpool(_save_scan, db, current_user, "repository", target, results, "multilang_scanner")
+        return {
+            "scan_id": scan.id,
+            "results": results
+        }
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _encode_cursor(created_at: datetime, scan_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{scan_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, scan_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(scan_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
 @router.get("/scans")
 async def get_user_scans(
+    limit: int = Query(SCANS_PAGE_SIZE, ge=1, le=SCANS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_results: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Retorna todos os scans do usuário"""
-    scans = db.query(Scan).filter(Scan.user_id == current_user.id).order_by(Scan.created_at.desc()).all()
-    
+    """Lista os scans do usuário, mais recentes primeiro, paginados por cursor (created_at, id).
+
+    Só as colunas de metadados e o resumo são lidos; o JSON completo de results
+    vem apenas com include_results=true (ou em /scans/{scan_id}).
+    """
+    columns = [Scan.id, Scan.scan_type, Scan.target, Scan.status, Scan.created_at, Scan.completed_at, Scan.findings_total, *SUMMARY_COLUMNS]
+    if include_results:
+        columns += [Scan.stored_results, ScanResult.encoding, ScanResult.payload]
+    query = db.query(*columns).filter(Scan.user_id == current_user.id)
+    if include_results:
+        query = query.outerjoin(ScanResult, ScanResult.scan_id == Scan.id)
+    if cursor:
+        created_at, scan_id = _decode_cursor(cursor)
+        query = query.filter(or_(Scan.created_at < created_at, and_(Scan.created_at == created_at, Scan.id < scan_id)))
+    rows = query.order_by(Scan.created_at.desc(), Scan.id.desc()).limit(limit + 1).all()
+    total = db.query(func.count(Scan.id)).filter(Scan.user_id == current_user.id).scalar()
+
     scans_list = []
-    for scan in scans:
+    for row in rows[:limit]:
         scan_data = {
-            "id": scan.id,
-            "scan_type": scan.scan_type,
-            "target": scan.target,
-            "status": scan.status,
-            "created_at": scan.created_at.isoformat(),
-            "completed_at": scan.completed_at.isoformat() if scan.completed_at else None
+            "id": row.id,
+            "scan_type": row.scan_type,
+            "target": row.target,
+            "status": row.status,
+            "created_at": row.created_at.isoformat(),
+            "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+            "summary": {"total": row.findings_total, **{severity: getattr(row, f"{severity}_count") for severity in SUMMARY_SEVERITIES}},
         }
-        
-        # Adiciona results para cálculo de vulnerabilidades
-        if scan.results:
+        if include_results:
             try:
-                scan_data["results"] = json.loads(scan.results)
-            except:
+                if row.payload is not None:
+                    scan_data["results"] = json.loads(b"".join(iter_decompressed(row.encoding, row.payload)))
+                else:
+                    scan_data["results"] = json.loads(row.stored_results) if row.stored_results else {}
+            except ValueError:
                 scan_data["results"] = {}
-        
         scans_list.append(scan_data)
-    
+
+    last = rows[limit - 1] if len(rows) > limit else None
     return {
-        "total": len(scans_list),
-        "scans": scans_list
+        "total": total,
+        "scans": scans_list,
+        "next_cursor": _encode_cursor(last.created_at, last.id) if last else None
     }
 
 @router.get("/scans/{scan_id}")
@@ -258,48 +376,60 @@ async def get_scan_details(
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    return {
+    details = {
         "id": scan.id,
         "scan_type": scan.scan_type,
         "target": scan.target,
         "status": scan.status,
-        "results": json.loads(scan.results) if scan.results else None,
         "created_at": scan.created_at.isoformat(),
         "completed_at": scan.completed_at.isoformat() if scan.completed_at else None
     }
+    # O JSON de results é repassado descomprimindo em blocos, sem json.loads/json.dumps do payload inteiro
+    chunks = scan.iter_results_bytes()
+    if scan.result is None and scan.stored_results:
+        # Linhas legadas não passaram pelo gravador atual: só são repassadas se forem JSON válido, senão vão como string
+        try:
+            json.loads(scan.stored_results)
+        except ValueError:
+            chunks = iter([json.dumps(scan.stored_results).encode()])
+    first = next(chunks, None)
+
+    def body():
+        yield json.dumps(details)[:-1].encode() + b', "results": '
+        if first is None:
+            yield b"null"
+        else:
+            yield first
+            yield from chunks
+        yield b"}"
+
+    return StreamingResponse(body(), media_type="application/json")
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Retorna estatísticas para o dashboard"""
-    scans = db.query(Scan).filter(Scan.user_id == current_user.id).all()
-    
-    total_scans = len(scans)
-    total_vulnerabilities = 0
-    severity_count = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
-    
-    for scan in scans:
-        if scan.results:
-            results = json.loads(scan.results)
-            if 'total_vulnerabilities' in results:
-                total_vulnerabilities += results['total_vulnerabilities']
-            if 'severity_count' in results:
-                for severity, count in results['severity_count'].items():
-                    if severity in severity_count:
-                        severity_count[severity] += count
-    
+    """Retorna estatísticas para o dashboard a partir das colunas de resumo (uma agregação, sem ler results)"""
+    totals = db.query(
+        func.count(Scan.id),
+        func.coalesce(func.sum(Scan.findings_total), 0),
+        *(func.coalesce(func.sum(column), 0) for column in SUMMARY_COLUMNS)
+    ).filter(Scan.user_id == current_user.id).one()
+    recent = db.query(Scan.id, Scan.scan_type, Scan.target, Scan.created_at).filter(
+        Scan.user_id == current_user.id
+    ).order_by(Scan.created_at.desc(), Scan.id.desc()).limit(5).all()
+
     return {
-        "total_scans": total_scans,
-        "total_vulnerabilities": total_vulnerabilities,
-        "severity_count": severity_count,
+        "total_scans": totals[0],
+        "total_vulnerabilities": int(totals[1]),
+        "severity_count": {severity.upper(): int(count) for severity, count in zip(SUMMARY_SEVERITIES, totals[2:])},
         "recent_scans": [{
             "id": scan.id,
             "scan_type": scan.scan_type,
             "target": scan.target,
             "created_at": scan.created_at.isoformat()
-        } for scan in scans[:5]]
+        } for scan in recent]
     }
 
 @router.delete("/scans/{scan_id}")
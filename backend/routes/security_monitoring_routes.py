@@ -4,33 +4,77 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import hashlib
 import ipaddress
+import json
 import secrets
 from pathlib import Path
-from typing import Literal, Optional
+import time
+from typing import Callable, Literal, Optional
+import zlib
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel, Field
 import requests
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import SessionLocal, get_db
 from models.saas import (
     Asset, AuditLog, ContainmentAction, ContainmentTest, Integration, IntegrationCredential,
     Organization, ProtectionAllowlist, SecurityAlertSubscription, SecurityEvent, SecuritySensor,
     SensorEnrollment,
 )
 from services.audit_service import record_audit
-from services.alert_service import _send, queue_security_alerts, validate_target
+from services.alert_service import _send, queue_security_alerts_batch, validate_target
+from services.allowlist_service import invalidate_allowlist, is_allowlisted
 from services.credential_vault import CredentialVault
+from services.monitoring_overview_service import cached_overview, overview_state
+from services.monitoring_stream import monitoring_bus
 from services.rate_limit import rate_limit_backend
-from services.security_monitoring_service import classify_telemetry, correlate_event, is_blockable_ip, safe_source_ip
+from services.security_monitoring_service import classify_batch, classify_telemetry, correlate_event, correlate_events, is_blockable_ip, safe_source_ip
 from services.tenant import TenantContext, get_tenant_context, require_roles
 from services.plan_policy import REALTIME_MONITORING_PLANS, normalize_plan
 
-router = APIRouter(prefix="/security-monitoring")
 CLOUDFLARE_API = "https://api.cloudflare.com/client/v4"
+# A full TelemetryBatch (100 items with maximum-length fields) stays well below this once inflated.
+MAX_INFLATED_BODY_BYTES = 1024 * 1024
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = 15 * 60
+STREAM_RETRY_MS = 3000
+STREAM_FIELDS = ("metrics", "cloudflare_connected", "host_firewall_ready", "protection_status", "latest_id")
+
+
+class GzipRequest(Request):
+    """Request whose body is transparently inflated when the sensor sends Content-Encoding: gzip."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_inflated"):
+            body = await super().body()
+            if "gzip" in self.headers.get("content-encoding", "").lower():
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                try:
+                    body = inflater.decompress(body, MAX_INFLATED_BODY_BYTES)
+                except zlib.error as exc:
+                    raise HTTPException(status_code=400, detail="Corpo gzip inválido") from exc
+                if inflater.unconsumed_tail:
+                    raise HTTPException(status_code=413, detail="Telemetria descompactada excede o limite")
+            self._body = self._inflated = body
+        return self._inflated
+
+
+class GzipRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def gzip_handler(request: Request):
+            return await handler(GzipRequest(request.scope, request.receive))
+
+        return gzip_handler
+
+
+router = APIRouter(prefix="/security-monitoring", route_class=GzipRoute)
 
 
 class SensorCreate(BaseModel):
@@ -135,19 +179,6 @@ def _canonical_network(value: str) -> str:
     return str(network)
 
 
-def _is_allowlisted(db: Session, organization_id: int, asset_id: int | None, value: str | None) -> bool:
-    try:
-        address = ipaddress.ip_address(value or "")
-    except ValueError:
-        return False
-    rows = db.query(ProtectionAllowlist.network).filter(
-        ProtectionAllowlist.organization_id == organization_id,
-        ProtectionAllowlist.active.is_(True),
-        (ProtectionAllowlist.asset_id.is_(None) | (ProtectionAllowlist.asset_id == asset_id)),
-    ).all()
-    return any(address in ipaddress.ip_network(network, strict=False) for (network,) in rows)
-
-
 def _sensor_installer_path() -> Path:
     return Path(__file__).resolve().parents[2] / "scripts" / "iron_ai_sensor.py"
 
@@ -404,7 +435,9 @@ def sensor_actions(
     db: Session = Depends(get_db),
 ):
     """Return only typed containment actions assigned to this authenticated sensor."""
-    context.sensor.containment_enabled = "host_firewall" in {item.strip() for item in capabilities.split(",")}
+    containment_enabled = "host_firewall" in {item.strip() for item in capabilities.split(",")}
+    capability_changed = bool(context.sensor.containment_enabled) != containment_enabled
+    context.sensor.containment_enabled = containment_enabled
     context.sensor.agent_version = agent_version[:40] or context.sensor.agent_version
     now = datetime.utcnow()
     expired = db.query(ContainmentAction).filter(
@@ -423,6 +456,9 @@ def sensor_actions(
         ContainmentAction.status.in_(["approved", "executed", "release_pending"]),
     ).order_by(ContainmentAction.created_at.asc()).limit(20).all()
     db.commit()
+    # Sensors poll this every interval; only changes the dashboard shows are published.
+    if expired or capability_changed:
+        monitoring_bus.publish(context.organization.id)
     return {"actions": [{
         "id": item.id,
         "operation": "unblock_ip" if item.status == "release_pending" else "block_ip",
@@ -471,6 +507,7 @@ def report_sensor_action(action_id: int, payload: SensorActionResult, request: R
         metadata_json={"target": action.target, "sensor_id": context.sensor.id, "backend": payload.firewall_backend},
     ))
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return {"accepted": True, "status": action.status}
 
 
@@ -483,6 +520,7 @@ def revoke_sensor(sensor_id: int, request: Request, context: TenantContext = Dep
     sensor.revoked_at = sensor.revoked_at or datetime.utcnow()
     record_audit(db, context, "security_sensor_revoked", "security_sensor", sensor.id, request)
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return {"revoked": True}
 
 
@@ -492,13 +530,9 @@ def ingest_telemetry(payload: TelemetryBatch, request: Request, context: SensorC
     asset = db.query(Asset).filter(Asset.id == context.sensor.asset_id, Asset.organization_id == context.organization.id).first()
     if not asset:
         raise HTTPException(status_code=404, detail="Ativo do sensor não encontrado")
-    detected = []
-    for item in payload.events:
-        classification = classify_telemetry(item.model_dump())
-        if classification:
-            detected.append(correlate_event(db, context.organization.id, asset.id, context.sensor.id, classification))
-    for event in detected:
-        queue_security_alerts(db, event)
+    detected = correlate_events(db, context.organization.id, asset.id, context.sensor.id, classify_batch([item.model_dump() for item in payload.events]))
+    queue_security_alerts_batch(db, detected)
+    event_ids = sorted({event.id for event in detected})
     if detected:
         db.add(AuditLog(
             organization_id=context.organization.id, action="security_events_ingested", resource_type="security_sensor",
@@ -506,7 +540,9 @@ def ingest_telemetry(payload: TelemetryBatch, request: Request, context: SensorC
             user_agent=(request.headers.get("user-agent", "")[:512] if request else None), metadata_json={"received": len(payload.events), "detected": len(detected)},
         ))
     db.commit()
-    return {"received": len(payload.events), "detected": len(detected), "event_ids": sorted({event.id for event in detected})}
+    if detected:
+        monitoring_bus.publish(context.organization.id)
+    return {"received": len(payload.events), "detected": len(detected), "event_ids": event_ids}
 
 
 @router.post("/containment-tests")
@@ -605,52 +641,117 @@ def open_containment_test(raw_token: str, request: Request, db: Session = Depend
         metadata_json={"asset_id": asset.id, "security_event_id": event.id},
     ))
     db.commit()
+    monitoring_bus.publish(organization.id)
     return _test_page("Teste recebido", "A Iron AI identificou esta conexão. Volte ao painel para conferir o IP e aprovar o bloqueio.", success=True)
 
 
-@router.get("/overview")
-def monitoring_overview(since_id: int = 0, context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
-    _require_realtime_plan(context.user.subscription_plan)
-    query = db.query(SecurityEvent, Asset.name).join(Asset, Asset.id == SecurityEvent.asset_id).filter(SecurityEvent.organization_id == context.organization.id)
+def _overview_events(db: Session, organization_id: int, state: dict, since_id: int = 0) -> list[dict]:
+    query = db.query(SecurityEvent, Asset.name).join(Asset, Asset.id == SecurityEvent.asset_id).filter(SecurityEvent.organization_id == organization_id)
     if since_id > 0:
         query = query.filter(SecurityEvent.id > since_id)
     rows = query.order_by(SecurityEvent.last_seen_at.desc()).limit(100).all()
-    open_count = db.query(func.count(SecurityEvent.id)).filter(SecurityEvent.organization_id == context.organization.id, SecurityEvent.status.in_(["open", "investigating"])).scalar() or 0
-    critical_count = db.query(func.count(SecurityEvent.id)).filter(SecurityEvent.organization_id == context.organization.id, SecurityEvent.status.in_(["open", "investigating"]), SecurityEvent.severity == "critical").scalar() or 0
-    since = datetime.utcnow() - timedelta(hours=24)
-    last_24h = db.query(func.count(SecurityEvent.id)).filter(SecurityEvent.organization_id == context.organization.id, SecurityEvent.last_seen_at >= since).scalar() or 0
-    active_sensors = db.query(func.count(SecuritySensor.id)).filter(SecuritySensor.organization_id == context.organization.id, SecuritySensor.revoked_at.is_(None), SecuritySensor.last_seen_at >= datetime.utcnow() - timedelta(minutes=5)).scalar() or 0
-    host_firewalls = db.query(func.count(SecuritySensor.id)).filter(SecuritySensor.organization_id == context.organization.id, SecuritySensor.revoked_at.is_(None), SecuritySensor.containment_enabled.is_(True), SecuritySensor.last_seen_at >= datetime.utcnow() - timedelta(minutes=5)).scalar() or 0
-    active_blocks = db.query(func.count(ContainmentAction.id)).filter(ContainmentAction.organization_id == context.organization.id, ContainmentAction.status == "executed").scalar() or 0
-    waf = db.query(Integration).filter(Integration.organization_id == context.organization.id, Integration.provider == "cloudflare_waf", Integration.status == "connected").first()
-    actions = db.query(ContainmentAction).filter(ContainmentAction.organization_id == context.organization.id, ContainmentAction.status.in_(["approved", "executed", "release_pending"])).order_by(ContainmentAction.created_at.asc()).all()
-    action_by_event = {item.security_event_id: item for item in actions if item.security_event_id}
-    host_firewall_assets = {
-        asset_id for (asset_id,) in db.query(SecuritySensor.asset_id).filter(
-            SecuritySensor.organization_id == context.organization.id,
-            SecuritySensor.revoked_at.is_(None),
-            SecuritySensor.containment_enabled.is_(True),
-            SecuritySensor.last_seen_at >= datetime.utcnow() - timedelta(minutes=5),
-        ).all()
-    }
-    events = [_event_dict(
+    action_by_event = state["action_by_event"]
+    return [_event_dict(
         event,
         asset_name,
-        action_by_event[event.id].id if event.id in action_by_event else None,
-        action_by_event[event.id].provider if event.id in action_by_event else None,
-        bool(waf or event.asset_id in host_firewall_assets),
+        *action_by_event.get(event.id, (None, None)),
+        bool(state["waf_configuration"] is not None or event.asset_id in state["host_firewall_assets"]),
     ) for event, asset_name in rows]
-    cloudflare_managed_waf = bool((waf.configuration or {}).get("managed_waf")) if waf else False
-    cloudflare_rate_limit = bool((waf.configuration or {}).get("api_rate_limit")) if waf else False
+
+
+def _overview_snapshot(db: Session, organization_id: int) -> dict:
+    state = overview_state(db, organization_id)
+    metrics = state["metrics"]
+    waf = state["waf_configuration"]
+    cloudflare_managed_waf = bool(waf.get("managed_waf")) if waf is not None else False
+    cloudflare_rate_limit = bool(waf.get("api_rate_limit")) if waf is not None else False
+    host_firewall_ready = metrics["host_firewalls"] > 0
     protection_checks = {
-        "cloudflare_connected": bool(waf),
+        "cloudflare_connected": waf is not None,
         "managed_waf_enabled": cloudflare_managed_waf,
         "edge_rate_limit_enabled": cloudflare_rate_limit,
-        "host_firewall_ready": host_firewalls > 0,
-        "telemetry_active": active_sensors > 0,
+        "host_firewall_ready": host_firewall_ready,
+        "telemetry_active": metrics["active_sensors"] > 0,
     }
-    protection_level = "healthy" if (cloudflare_managed_waf and cloudflare_rate_limit) or host_firewalls > 0 else "degraded" if waf or active_sensors else "unconfigured"
-    return {"events": events, "metrics": {"open": open_count, "critical": critical_count, "last_24h": last_24h, "active_sensors": active_sensors, "host_firewalls": host_firewalls, "active_blocks": active_blocks}, "cloudflare_connected": bool(waf), "host_firewall_ready": host_firewalls > 0, "protection_status": {"level": protection_level, "checks": protection_checks}, "latest_id": max([event["id"] for event in events], default=since_id)}
+    protection_level = "healthy" if (cloudflare_managed_waf and cloudflare_rate_limit) or host_firewall_ready else "degraded" if waf is not None or metrics["active_sensors"] else "unconfigured"
+    events = _overview_events(db, organization_id, state)
+    return {
+        "state": state,
+        "response": {"events": events, "metrics": metrics, "cloudflare_connected": waf is not None, "host_firewall_ready": host_firewall_ready, "protection_status": {"level": protection_level, "checks": protection_checks}, "latest_id": max([event["id"] for event in events], default=0)},
+    }
+
+
+@router.get("/overview")
+def monitoring_overview(since_id: int = 0, context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
+    _require_realtime_plan(context.user.subscription_plan)
+    organization_id = context.organization.id
+    snapshot = cached_overview(organization_id, lambda: _overview_snapshot(db, organization_id))
+    response = snapshot["response"]
+    if since_id <= 0:
+        return response
+    # Incremental polls without newer events are answered from the snapshot alone.
+    events = _overview_events(db, organization_id, snapshot["state"], since_id) if snapshot["state"]["latest_event_id"] > since_id else []
+    return {**response, "events": events, "latest_id": max([event["id"] for event in events], default=since_id)}
+
+
+def _current_overview(organization_id: int) -> dict:
+    def build() -> dict:
+        db = SessionLocal()
+        try:
+            return _overview_snapshot(db, organization_id)
+        finally:
+            db.close()
+
+    return cached_overview(organization_id, build)["response"]
+
+
+def _overview_delta(sent: dict, response: dict) -> dict | None:
+    """What changed since the overview last sent on a stream (`sent`, updated in place); None when nothing did."""
+    delta = {"reset": True} if not sent else {}
+    events = {event["id"]: event for event in response["events"]}
+    previous = sent.get("events", {})
+    changed = [event for event_id, event in events.items() if previous.get(event_id) != event]
+    removed = [event_id for event_id in previous if event_id not in events]
+    if changed or removed or delta:
+        delta.update(events=changed, removed=removed)
+    for field in STREAM_FIELDS:
+        if field not in sent or sent[field] != response[field]:
+            delta[field] = sent[field] = response[field]
+    sent["events"] = events
+    return delta or None
+
+
+@router.get("/stream")
+async def monitoring_stream(context: TenantContext = Depends(get_tenant_context), db: Session = Depends(get_db)):
+    """Server-sent events with overview changes of the organization, pushed as soon as they are committed.
+
+    The first `overview` message carries the whole overview (`reset`); later ones
+    only changed or new events, removed event ids and changed fields. Streams
+    end after STREAM_MAX_SECONDS so the client reconnects with a fresh token.
+    """
+    _require_realtime_plan(context.user.subscription_plan)
+    organization_id = context.organization.id
+    # Release the request's connection: the stream reads through the shared cached overview.
+    db.close()
+
+    async def events():
+        subscription = monitoring_bus.subscribe(organization_id)
+        sent: dict = {}
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while (remaining := deadline - time.monotonic()) > 0:
+                delta = _overview_delta(sent, await run_in_threadpool(_current_overview, organization_id))
+                if delta is not None:
+                    yield "event: overview\ndata: " + json.dumps(delta, ensure_ascii=False) + "\n\n"
+                else:
+                    yield ": keepalive\n\n"
+                # Woken by a notification or, for time-based figures such as last_24h, by the keepalive timeout.
+                await subscription.wait(min(STREAM_KEEPALIVE_SECONDS, remaining))
+        finally:
+            subscription.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.get("/allowlist")
@@ -682,6 +783,7 @@ def create_protection_allowlist(payload: ProtectionAllowlistCreate, request: Req
         db.flush()
     record_audit(db, context, "protection_allowlist_added", "protection_allowlist", row.id, request, {"network": network, "asset_id": payload.asset_id})
     db.commit()
+    invalidate_allowlist(context.organization.id)
     return {"id": row.id, "network": row.network, "asset_id": row.asset_id, "label": row.label, "active": row.active}
 
 
@@ -694,6 +796,7 @@ def delete_protection_allowlist(allowlist_id: int, request: Request, context: Te
     row.active = False
     record_audit(db, context, "protection_allowlist_removed", "protection_allowlist", row.id, request, {"network": row.network, "asset_id": row.asset_id})
     db.commit()
+    invalidate_allowlist(context.organization.id)
     return {"removed": True}
 
 
@@ -768,6 +871,7 @@ def update_event(event_id: int, payload: EventStatusUpdate, request: Request, co
     event.resolved_at = datetime.utcnow() if payload.status in {"resolved", "false_positive"} else None
     record_audit(db, context, "security_event_status_changed", "security_event", event.id, request, {"status": payload.status})
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return _event_dict(event)
 
 
@@ -811,6 +915,7 @@ def connect_cloudflare(payload: CloudflareConnect, request: Request, context: Te
         db.add(IntegrationCredential(organization_id=context.organization.id, integration_id=integration.id, encrypted_secret=encrypted, secret_hint=payload.api_token[-4:]))
     record_audit(db, context, "cloudflare_waf_connected", "integration", integration.id, request, {"zone_id": zone_id, "zone_name": zone.get("name") or domain})
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return {"connected": True, "zone_name": zone.get("name")}
 
 
@@ -855,6 +960,7 @@ def enable_cloudflare_protection(payload: CloudflareProtectionRequest, request:
     integration.last_synced_at = datetime.utcnow()
     record_audit(db, context, "cloudflare_protection_enabled", "integration", integration.id, request, {"zone_id": zone_id, "managed_waf_rule_id": managed_rule.get("id"), "rate_limit_rule_id": rate_rule.get("id"), "path_prefix": prefix})
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return {"enabled": True, "managed_waf": managed_rule, "rate_limit": rate_rule, "configuration": configuration["api_rate_limit"]}
 
 
@@ -868,7 +974,7 @@ def contain_event(event_id: int, request: Request, context: TenantContext = Depe
         raise HTTPException(status_code=409, detail="Reabra o incidente antes de bloquear a origem")
     if not is_blockable_ip(event.source_ip):
         raise HTTPException(status_code=400, detail="O evento não possui um IP público bloqueável")
-    if _is_allowlisted(db, context.organization.id, event.asset_id, event.source_ip):
+    if is_allowlisted(db, context.organization.id, event.asset_id, event.source_ip):
         raise HTTPException(status_code=409, detail="Este IP está protegido pela allowlist e não pode ser bloqueado")
     active_actions = db.query(ContainmentAction).filter(
         ContainmentAction.organization_id == context.organization.id,
@@ -934,6 +1040,7 @@ def contain_event(event_id: int, request: Request, context: TenantContext = Depe
         raise HTTPException(status_code=502, detail=errors[0])
     event.containment_status = "blocked" if any(item.status == "executed" for item in all_actions) else "pending"
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     primary = next((item for item in reversed(all_actions) if item.status == "executed"), all_actions[-1])
     return {
         "success": True, "action_id": primary.id, "status": primary.status, "source_ip": event.source_ip,
@@ -950,7 +1057,7 @@ def manual_containment(payload: ManualContainmentCreate, request: Request, conte
     source_ip = safe_source_ip(payload.ip_address)
     if not is_blockable_ip(source_ip):
         raise HTTPException(status_code=400, detail="Informe um IP público válido. IPs privados, reservados e redes de infraestrutura não podem ser bloqueados")
-    if _is_allowlisted(db, context.organization.id, payload.asset_id, source_ip):
+    if is_allowlisted(db, context.organization.id, payload.asset_id, source_ip):
         raise HTTPException(status_code=409, detail="Este IP está protegido pela allowlist e não pode ser bloqueado")
     asset = db.query(Asset).filter(
         Asset.id == payload.asset_id,
@@ -988,6 +1095,7 @@ def release_containment(action_id: int, request: Request, context: TenantContext
         action.status = "release_pending"
         record_audit(db, context, "host_firewall_release_approved", "containment_action", action.id, request, {"source_ip": action.target, "sensor_id": action.sensor_id})
         db.commit()
+        monitoring_bus.publish(context.organization.id)
         return {"released": False, "status": "release_pending", "message": "Remoção enviada ao sensor"}
     if not action.external_id:
         raise HTTPException(status_code=404, detail="Identificador do bloqueio no Cloudflare não encontrado")
@@ -1007,6 +1115,7 @@ def release_containment(action_id: int, request: Request, context: TenantContext
         event.containment_status = "blocked" if remaining else "released"
     record_audit(db, context, "attack_source_unblocked", "containment_action", action.id, request, {"source_ip": action.target, "provider": "cloudflare"})
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     return {"released": True}
 
 
@@ -1035,6 +1144,7 @@ def release_event_containment(event_id: int, request: Request, context: TenantCo
             action.released_at = datetime.utcnow()
             record_audit(db, context, "host_firewall_pending_block_cancelled", "containment_action", action.id, request, {"source_ip": action.target, "sensor_id": action.sensor_id})
             db.commit()
+            monitoring_bus.publish(context.organization.id)
             results.append({"provider": action.provider, "status": "released"})
             continue
         try:
@@ -1051,5 +1161,6 @@ def release_event_containment(event_id: int, request: Request, context: TenantCo
     ).scalar() or 0
     event.containment_status = "blocked" if remaining else "released"
     db.commit()
+    monitoring_bus.publish(context.organization.id)
     pending = any(item["status"] == "release_pending" for item in results)
     return {"released": not errors and not pending, "pending": pending, "layers": results, "warnings": errors}
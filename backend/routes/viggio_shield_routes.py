@@ -10,17 +10,17 @@ from models.user import User
 from models.monitor import MonitorTarget, MonitorIncident, MonitorLog, BlockedIP
 from auth import get_current_user
 from middleware.subscription import ensure_tool_access
-from scanners.port_scanner import scan_ports
+from scanners.port_scanner import scan_ports_async
+from scanners.network_probes import host_reachable, probe_http, probe_tcp_ports, resolve
+from services.monitor_history import checks_since, monitor_log_writer, rollup_series
 from scanners.deep_security_scanner import deep_web_scan
 from scanners.appsec_platform_scanner import run_appsec_scan, add_governance
 from scanners.pdf_generator import generate_pdf_report
 from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
 import ipaddress
 import socket
-import requests
-import subprocess
+import httpx
 import re
 import hashlib
 import json
@@ -323,39 +323,6 @@ def deactivate_expired_blocks(db: Session, user_id: int):
         BlockedIP.expires_at <= datetime.utcnow()
     ).update({"is_active": False}, synchronize_session=False)
 
-def check_tcp_port(host: str, port: int, timeout: int = 3) -> Dict[str, Any]:
-    """Testa uma porta TCP de forma isolada para permitir execução paralela."""
-    started_at = datetime.now()
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return {
-                "port": port,
-                "open": True,
-                "response_time": (datetime.now() - started_at).total_seconds() * 1000,
-                "error": None
-            }
-    except Exception as exc:
-        return {
-            "port": port,
-            "open": False,
-            "response_time": (datetime.now() - started_at).total_seconds() * 1000,
-            "error": str(exc)
-        }
-
-def check_tcp_ports(host: str, ports: List[int]) -> List[Dict[str, Any]]:
-    """Executa checagens de portas em paralelo para reduzir latência total."""
-    if not ports:
-        return []
-
-    workers = min(16, len(ports))
-    results = []
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(check_tcp_port, host, port) for port in ports]
-        for future in as_completed(futures):
-            results.append(future.result())
-
-    return sorted(results, key=lambda item: item["port"])
-
 async def check_target_health(target: MonitorTarget) -> Dict[str, Any]:
     """Verifica saúde do alvo monitorado"""
     result = {
@@ -371,23 +338,16 @@ async def check_target_health(target: MonitorTarget) -> Dict[str, Any]:
 
         if target.target_type == "api":
             # Testa endpoint API
-            start_time = datetime.now()
-            response = await asyncio.to_thread(
-                requests.get,
-                address,
-                timeout=(3.05, 10),
-                allow_redirects=True,
-                headers={"User-Agent": "IronAI-Shield/1.0"}
-            )
-            response_time = (datetime.now() - start_time).total_seconds() * 1000
+            response = await probe_http(address)
+            response_time = response["response_time"]
             
             result["response_time"] = response_time
-            result["metadata"]["status_code"] = response.status_code
-            result["metadata"]["content_length"] = len(response.content)
+            result["metadata"]["status_code"] = response["status_code"]
+            result["metadata"]["content_length"] = response["content_length"]
             
-            if response.status_code >= 400:
+            if response["status_code"] >= 400:
                 result["is_healthy"] = False
-                result["issues"].append(f"Status code anormal: {response.status_code}")
+                result["issues"].append(f"Status code anormal: {response['status_code']}")
             
             if response_time > 5000:
                 result["issues"].append(f"Resposta lenta: {response_time:.2f}ms")
@@ -398,31 +358,25 @@ async def check_target_health(target: MonitorTarget) -> Dict[str, Any]:
             result["metadata"]["host"] = host
 
             try:
-                socket.gethostbyname(host)
+                resolved = await resolve(host)
             except socket.gaierror:
                 result["is_healthy"] = False
                 result["issues"].append("DNS não resolve o alvo")
                 return result
             
-            # Testa ping
+            # Testa alcance (eco ICMP no próprio processo, ou TCP quando o ICMP não é permitido)
             ping_ok = None
             try:
-                ping_result = await asyncio.to_thread(
-                    subprocess.run,
-                    ["ping", "-c", "1", "-W", "2", host],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                ping_ok = ping_result.returncode == 0
+                ping_ok, method = await host_reachable(resolved)
                 result["metadata"]["ping_ok"] = ping_ok
-            except:
+                result["metadata"]["ping_method"] = method
+            except Exception:
                 result["metadata"]["ping_ok"] = None
             
             # Testa portas específicas
             if target.monitoring_ports:
                 started_at = datetime.now()
-                port_results = await asyncio.to_thread(check_tcp_ports, host, target.monitoring_ports)
+                port_results = await probe_tcp_ports(host, target.monitoring_ports)
                 open_ports = [item["port"] for item in port_results if item["open"]]
                 closed_ports = [item["port"] for item in port_results if not item["open"]]
                 result["response_time"] = (datetime.now() - started_at).total_seconds() * 1000
@@ -438,28 +392,20 @@ async def check_target_health(target: MonitorTarget) -> Dict[str, Any]:
 
         elif target.target_type == "application":
             # Testa aplicação web
-            start_time = datetime.now()
-            response = await asyncio.to_thread(
-                requests.get,
-                address,
-                timeout=(3.05, 10),
-                allow_redirects=True,
-                headers={"User-Agent": "IronAI-Shield/1.0"}
-            )
-            response_time = (datetime.now() - start_time).total_seconds() * 1000
+            response = await probe_http(address)
             
-            result["response_time"] = response_time
-            result["metadata"]["status_code"] = response.status_code
-            result["metadata"]["content_length"] = len(response.content)
-            result["is_healthy"] = response.status_code < 400
+            result["response_time"] = response["response_time"]
+            result["metadata"]["status_code"] = response["status_code"]
+            result["metadata"]["content_length"] = response["content_length"]
+            result["is_healthy"] = response["status_code"] < 400
             
             if not result["is_healthy"]:
-                result["issues"].append(f"Aplicação retornou erro: {response.status_code}")
+                result["issues"].append(f"Aplicação retornou erro: {response['status_code']}")
 
         # Iron AI Shield e automacao inteligente tambem executam a mesma analise
         # de servicos, banners e riscos conhecidos utilizada pelo Port Scanner.
         host = extract_host(address)
-        security_scan = await asyncio.to_thread(scan_ports, host, target.monitoring_ports)
+        security_scan = await scan_ports_async(host, target.monitoring_ports)
         port_vulnerabilities = security_scan.get("vulnerabilities", [])
         deep_assessment = None
         deep_vulnerabilities = []
@@ -474,10 +420,10 @@ async def check_target_health(target: MonitorTarget) -> Dict[str, Any]:
         result["metadata"]["vulnerabilities"] = dedupe_findings(port_vulnerabilities + deep_vulnerabilities)
         result["metadata"]["security_summary"] = security_scan.get("summary", {})
                 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         result["is_healthy"] = False
         result["issues"].append("Timeout na requisição")
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         result["is_healthy"] = False
         result["issues"].append("Erro de conexão")
     except Exception as e:
@@ -560,20 +506,16 @@ async def detect_threats(target: MonitorTarget, db: Session) -> List[Dict]:
     threats = []
     
     try:
-        # Análise de logs recentes (últimas 10 tentativas)
-        recent_logs = db.query(MonitorLog).filter(
-            MonitorLog.target_id == target.id,
-            MonitorLog.log_type == "check",
-            MonitorLog.created_at >= datetime.utcnow() - timedelta(hours=1)
-        ).all()
+        # Verificações da última hora (janela exata, só log_type check, incluindo as ainda no buffer do gravador)
+        recent_checks = checks_since(db, target.id, datetime.utcnow() - timedelta(hours=1))
         
         # Detecta scan de portas (múltiplas tentativas em portas diferentes)
-        if len(recent_logs) > 10:
+        if recent_checks > 10:
             threats.append({
                 "type": "port_scan",
                 "severity": "medium",
                 "description": "Possível varredura de portas detectada",
-                "details": f"{len(recent_logs)} tentativas na última hora"
+                "details": f"{recent_checks} tentativas na última hora"
             })
         
         # Verifica incidentes recentes similares
@@ -628,14 +570,14 @@ async def run_automatic_target_check(target: MonitorTarget, db: Session) -> Dict
         ((target.total_checks - (target.failed_checks or 0)) / target.total_checks) * 100
         if target.total_checks else None
     )
-    db.add(MonitorLog(
-        target_id=target.id,
-        user_id=target.user_id,
-        log_type="alert" if not health_result["is_healthy"] else "check",
-        message=f"Verificacao automatica: {'Saudavel' if health_result['is_healthy'] else 'Problemas detectados'}",
-        level="info" if health_result["is_healthy"] else "warning",
-        data=health_result
-    ))
+    # O log vai para o gravador em lote; o estado do alvo e os incidentes são gravados agora.
+    monitor_log_writer.add(
+        db, target,
+        "alert" if not health_result["is_healthy"] else "check",
+        f"Verificacao automatica: {'Saudavel' if health_result['is_healthy'] else 'Problemas detectados'}",
+        "info" if health_result["is_healthy"] else "warning",
+        health_result
+    )
     db.commit()
     return {"health": health_result, "new_incident": new_incident, "vulnerabilities_found": vulnerabilities_found}
 
@@ -829,6 +771,10 @@ async def get_target_details(
             "check_interval": target.check_interval,
             "created_at": target.created_at
         },
+        "history": {
+            "hourly": rollup_series(db, target.id, "hour", datetime.utcnow() - timedelta(hours=23)),
+            "daily": rollup_series(db, target.id, "day", datetime.utcnow() - timedelta(days=29))
+        },
         "recent_incidents": [
             {
                 "id": inc.id,
@@ -925,17 +871,14 @@ async def manual_check_target(
     
     db.commit()
     
-    # Log
-    log = MonitorLog(
-        target_id=target.id,
-        user_id=current_user.id,
-        log_type="check",
-        message=f"Verificação manual: {'Saudável' if health_result['is_healthy'] else 'Problemas detectados'}",
-        level="info" if health_result["is_healthy"] else "warning",
-        data=health_result
+    # Log (gravado já, junto com o lote pendente das verificações automáticas)
+    monitor_log_writer.add(
+        db, target, "check",
+        f"Verificação manual: {'Saudável' if health_result['is_healthy'] else 'Problemas detectados'}",
+        "info" if health_result["is_healthy"] else "warning",
+        health_result
     )
-    db.add(log)
-    db.commit()
+    await asyncio.to_thread(monitor_log_writer.flush)
     
     return {
         "success": True,
@@ -1,20 +1,63 @@
-import requests
-import json
-from typing import Dict, List
+import asyncio
+import httpx
+from typing import Dict, List, Optional
 from urllib.parse import urljoin, urlparse, parse_qsl
 import time
 
 class APISecurityScanner:
-    """Scanner completo para testes de segurança em APIs"""
-    
-    def __init__(self, base_url: str, headers: dict = None):
+    """Scanner completo para testes de segurança em APIs.
+
+    Todos os testes de todos os endpoints rodam concorrentemente sobre um único
+    httpx.AsyncClient (pool de conexões compartilhado). Para não sobrecarregar o
+    alvo, cada host aceita no máximo per_host_concurrency requisições simultâneas
+    e o scan inteiro respeita um orçamento de tempo global.
+    """
+
+    MAX_CONNECTIONS = 64
+    PER_HOST_CONCURRENCY = 8
+    ENDPOINT_CONCURRENCY = 16
+    REQUEST_TIMEOUT = 5.0
+    TIME_BUDGET = 120.0
+    RATE_LIMIT_PROBES = 50
+
+    def __init__(self, base_url: str, headers: dict = None, per_host_concurrency: Optional[int] = None,
+                 time_budget: Optional[float] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.base_url = base_url
         self.headers = headers or {}
+        self.per_host_concurrency = per_host_concurrency or self.PER_HOST_CONCURRENCY
+        self.time_budget = time_budget or self.TIME_BUDGET
+        self.transport = transport
         self.results = []
         self.errors = []
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._shared_gets: Dict[tuple, asyncio.Task] = {}
+        self._deadline = 0.0
 
     def _record_error(self, operation: str, endpoint: str, exc: Exception) -> None:
-        self.errors.append({"operation": operation, "endpoint": endpoint, "error": str(exc)})
+        self.errors.append({"operation": operation, "endpoint": endpoint, "error": str(exc) or type(exc).__name__})
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Requisição limitada por host e pelo orçamento de tempo restante do scan"""
+        remaining = self._deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise TimeoutError("Orçamento de tempo do scan esgotado")
+        target = httpx.URL(url)
+        host = f"{target.host}:{target.port or ''}"
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        async with limit:
+            remaining = self._deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError("Orçamento de tempo do scan esgotado")
+            return await self._client.request(method, url, timeout=min(self.REQUEST_TIMEOUT, remaining), **kwargs)
+
+    async def _get_shared(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """GET idempotente feito uma única vez por scan e compartilhado entre os testes que o repetem"""
+        key = (url, tuple(sorted((headers or {}).items())))
+        task = self._shared_gets.get(key)
+        if task is None:
+            task = self._shared_gets[key] = asyncio.ensure_future(self._request("GET", url, headers=headers))
+        return await asyncio.shield(task)
 
     @staticmethod
     def _dedupe(vulnerabilities: List[Dict]) -> List[Dict]:
@@ -27,7 +70,7 @@ class APISecurityScanner:
                 unique.append(vuln)
         return unique
     
-    def test_sql_injection(self, endpoint: str, params: dict) -> List[Dict]:
+    async def test_sql_injection(self, endpoint: str, params: dict) -> List[Dict]:
         """Testa injeção SQL em endpoints"""
         sql_payloads = [
             "' OR '1'='1",
@@ -38,104 +81,103 @@ class APISecurityScanner:
             "1' AND '1'='1",
         ]
         
-        vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
         
-        for payload in sql_payloads:
-            for param_name in params.keys():
-                test_params = params.copy()
-                test_params[param_name] = payload
+        async def probe(payload: str, param_name: str) -> List[Dict]:
+            test_params = params.copy()
+            test_params[param_name] = payload
+            try:
+                response = await self._request("GET", url, params=test_params)
                 
-                try:
-                    response = requests.get(url, params=test_params, timeout=5)
-                    
-                    # Detecta possíveis vulnerabilidades
-                    if any(error in response.text.lower() for error in 
-                           ['sql', 'mysql', 'sqlite', 'postgresql', 'oracle', 'syntax error']):
-                        vulnerabilities.append({
-                            'type': 'SQL Injection',
-                            'severity': 'CRITICAL',
-                            'endpoint': endpoint,
-                            'parameter': param_name,
-                            'payload': payload,
-                            'response_code': response.status_code,
-                            'description': 'Possível SQL Injection detectada através de mensagem de erro'
-                        })
-                except Exception as e:
-                    self._record_error("sql_injection", endpoint, e)
+                # Detecta possíveis vulnerabilidades
+                if any(error in response.text.lower() for error in 
+                       ['sql', 'mysql', 'sqlite', 'postgresql', 'oracle', 'syntax error']):
+                    return [{
+                        'type': 'SQL Injection',
+                        'severity': 'CRITICAL',
+                        'endpoint': endpoint,
+                        'parameter': param_name,
+                        'payload': payload,
+                        'response_code': response.status_code,
+                        'description': 'Possível SQL Injection detectada através de mensagem de erro'
+                    }]
+            except Exception as e:
+                self._record_error("sql_injection", endpoint, e)
+            return []
         
-        return vulnerabilities
+        found = await asyncio.gather(*(probe(payload, param_name) for payload in sql_payloads for param_name in params.keys()))
+        return [vuln for items in found for vuln in items]
     
-    def test_authentication(self, endpoint: str) -> List[Dict]:
+    async def test_authentication(self, endpoint: str) -> List[Dict]:
         """Testa falhas de autenticação"""
-        vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
+        invalid_headers = {'Authorization': 'Bearer invalid_token_12345'}
+        anonymous, invalid_token = await asyncio.gather(
+            self._get_shared(url), self._get_shared(url, invalid_headers), return_exceptions=True
+        )
+        vulnerabilities = []
         
         # Teste sem autenticação
-        try:
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                vulnerabilities.append({
-                    'type': 'Broken Authentication',
-                    'severity': 'HIGH',
-                    'endpoint': endpoint,
-                    'description': 'Endpoint acessível sem autenticação',
-                    'response_code': response.status_code
-                })
-        except Exception as e:
-            self._record_error("authentication", endpoint, e)
+        if isinstance(anonymous, Exception):
+            self._record_error("authentication", endpoint, anonymous)
+        elif anonymous.status_code == 200:
+            vulnerabilities.append({
+                'type': 'Broken Authentication',
+                'severity': 'HIGH',
+                'endpoint': endpoint,
+                'description': 'Endpoint acessível sem autenticação',
+                'response_code': anonymous.status_code
+            })
         
         # Teste com token inválido
-        try:
-            invalid_headers = {'Authorization': 'Bearer invalid_token_12345'}
-            response = requests.get(url, headers=invalid_headers, timeout=5)
-            if response.status_code == 200:
-                vulnerabilities.append({
-                    'type': 'Broken Authentication',
-                    'severity': 'CRITICAL',
-                    'endpoint': endpoint,
-                    'description': 'Endpoint aceita tokens inválidos',
-                    'response_code': response.status_code
-                })
-        except Exception as e:
-            self._record_error("authentication_invalid_token", endpoint, e)
+        if isinstance(invalid_token, Exception):
+            self._record_error("authentication_invalid_token", endpoint, invalid_token)
+        elif invalid_token.status_code == 200:
+            vulnerabilities.append({
+                'type': 'Broken Authentication',
+                'severity': 'CRITICAL',
+                'endpoint': endpoint,
+                'description': 'Endpoint aceita tokens inválidos',
+                'response_code': invalid_token.status_code
+            })
         
         return vulnerabilities
     
-    def test_authorization(self, endpoint: str) -> List[Dict]:
+    async def test_authorization(self, endpoint: str) -> List[Dict]:
         """Testa falhas de autorização e IDOR"""
-        vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
         
         # Testa IDOR (Insecure Direct Object Reference)
         test_ids = [1, 2, 999, 'admin', '../etc/passwd']
         
-        for test_id in test_ids:
+        async def probe(test_id) -> List[Dict]:
             try:
-                test_url = url.replace('{id}', str(test_id))
-                response = requests.get(test_url, headers=self.headers, timeout=5)
+                # Sem {id} na URL todas as tentativas são o mesmo GET, feito uma única vez
+                response = await self._get_shared(url.replace('{id}', str(test_id)), self.headers)
                 
                 if response.status_code == 200:
-                    vulnerabilities.append({
+                    return [{
                         'type': 'Broken Access Control (IDOR)',
                         'severity': 'HIGH',
                         'endpoint': endpoint,
                         'test_id': test_id,
                         'description': 'Possível IDOR - acesso a recursos sem validação adequada',
                         'response_code': response.status_code
-                    })
+                    }]
             except Exception as e:
                 self._record_error("authorization", endpoint, e)
+            return []
         
-        return vulnerabilities
+        found = await asyncio.gather(*(probe(test_id) for test_id in test_ids))
+        return [vuln for items in found for vuln in items]
     
-    def test_sensitive_data_exposure(self, endpoint: str) -> List[Dict]:
+    async def test_sensitive_data_exposure(self, endpoint: str) -> List[Dict]:
         """Testa exposição de dados sensíveis"""
         vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=5)
+            response = await self._get_shared(url, self.headers)
             
             sensitive_keywords = [
                 'password', 'secret', 'token', 'api_key', 
@@ -158,7 +200,7 @@ class APISecurityScanner:
         
         return vulnerabilities
     
-    def test_xxe(self, endpoint: str) -> List[Dict]:
+    async def test_xxe(self, endpoint: str) -> List[Dict]:
         """Testa XML External Entity (XXE)"""
         vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
@@ -172,7 +214,7 @@ class APISecurityScanner:
         try:
             headers = self.headers.copy()
             headers['Content-Type'] = 'application/xml'
-            response = requests.post(url, data=xxe_payload, headers=headers, timeout=5)
+            response = await self._request("POST", url, content=xxe_payload, headers=headers)
             
             if 'root:' in response.text or '/bin/bash' in response.text:
                 vulnerabilities.append({
@@ -187,7 +229,7 @@ class APISecurityScanner:
         
         return vulnerabilities
     
-    def test_security_headers(self, endpoint: str) -> List[Dict]:
+    async def test_security_headers(self, endpoint: str) -> List[Dict]:
         """Testa headers de segurança"""
         vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
@@ -201,7 +243,7 @@ class APISecurityScanner:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=5)
+            response = await self._get_shared(url, self.headers)
             
             for header, expected in required_headers.items():
                 if header not in response.headers:
@@ -218,24 +260,27 @@ class APISecurityScanner:
         
         return vulnerabilities
     
-    def test_rate_limiting(self, endpoint: str) -> List[Dict]:
+    async def test_rate_limiting(self, endpoint: str) -> List[Dict]:
         """Testa limitação de taxa (rate limiting)"""
         vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
         
-        # Faz múltiplas requisições rápidas
+        # Faz múltiplas requisições rápidas; a rajada é sequencial de propósito e
+        # interrompida assim que o alvo começa a limitar
         responses = []
-        for _ in range(50):
+        for _ in range(self.RATE_LIMIT_PROBES):
             try:
-                response = requests.get(url, headers=self.headers, timeout=5)
+                response = await self._request("GET", url, headers=self.headers)
                 responses.append(response.status_code)
-                time.sleep(0.01)
+                if response.status_code != 200:
+                    break
+                await asyncio.sleep(0.01)
             except Exception as e:
                 self._record_error("rate_limiting", endpoint, e)
                 break
         
         # Se todas as requisições forem bem-sucedidas, pode não haver rate limiting
-        if all(status == 200 for status in responses):
+        if responses and all(status == 200 for status in responses):
             vulnerabilities.append({
                 'type': 'Missing Rate Limiting',
                 'severity': 'MEDIUM',
@@ -246,9 +291,8 @@ class APISecurityScanner:
         
         return vulnerabilities
     
-    def test_cors(self, endpoint: str) -> List[Dict]:
+    async def test_cors(self, endpoint: str) -> List[Dict]:
         """Testa configuração CORS"""
-        vulnerabilities = []
         url = urljoin(self.base_url, endpoint)
         
         malicious_origins = [
@@ -257,45 +301,46 @@ class APISecurityScanner:
             'http://localhost'
         ]
         
-        for origin in malicious_origins:
+        async def probe(origin: str) -> List[Dict]:
             try:
                 headers = self.headers.copy()
                 headers['Origin'] = origin
-                response = requests.get(url, headers=headers, timeout=5)
+                response = await self._request("GET", url, headers=headers)
                 
                 if 'Access-Control-Allow-Origin' in response.headers:
                     allowed_origin = response.headers['Access-Control-Allow-Origin']
                     if allowed_origin == '*' or allowed_origin == origin:
-                        vulnerabilities.append({
+                        return [{
                             'type': 'CORS Misconfiguration',
                             'severity': 'MEDIUM',
                             'endpoint': endpoint,
                             'origin': origin,
                             'description': 'CORS configurado de forma insegura',
                             'recommendation': 'Restrinja origens permitidas'
-                        })
+                        }]
             except Exception as e:
                 self._record_error("cors", endpoint, e)
+            return []
         
-        return vulnerabilities
+        found = await asyncio.gather(*(probe(origin) for origin in malicious_origins))
+        return [vuln for items in found for vuln in items]
     
-    def scan_endpoint(self, endpoint: str, params: dict = None) -> Dict:
-        """Executa todos os testes em um endpoint"""
+    async def scan_endpoint(self, endpoint: str, params: dict = None) -> Dict:
+        """Executa todos os testes em um endpoint, concorrentemente"""
         params = params or {}
-        all_vulnerabilities = []
-        
         
-        # Executa todos os testes
-        all_vulnerabilities.extend(self.test_sql_injection(endpoint, params))
-        all_vulnerabilities.extend(self.test_authentication(endpoint))
-        all_vulnerabilities.extend(self.test_authorization(endpoint))
-        all_vulnerabilities.extend(self.test_sensitive_data_exposure(endpoint))
-        all_vulnerabilities.extend(self.test_xxe(endpoint))
-        all_vulnerabilities.extend(self.test_security_headers(endpoint))
-        all_vulnerabilities.extend(self.test_rate_limiting(endpoint))
-        all_vulnerabilities.extend(self.test_cors(endpoint))
-        
-        all_vulnerabilities = self._dedupe(all_vulnerabilities)
+        # Executa todos os testes (gather preserva a ordem original dos achados)
+        found = await asyncio.gather(
+            self.test_sql_injection(endpoint, params),
+            self.test_authentication(endpoint),
+            self.test_authorization(endpoint),
+            self.test_sensitive_data_exposure(endpoint),
+            self.test_xxe(endpoint),
+            self.test_security_headers(endpoint),
+            self.test_rate_limiting(endpoint),
+            self.test_cors(endpoint),
+        )
+        all_vulnerabilities = self._dedupe([vuln for items in found for vuln in items])
         # Estatísticas
         severity_count = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
         for vuln in all_vulnerabilities:
@@ -305,31 +350,50 @@ class APISecurityScanner:
             'endpoint': endpoint,
             'total_vulnerabilities': len(all_vulnerabilities),
             'vulnerabilities': all_vulnerabilities,
-            'severity_count': severity_count
-            , 'errors': self.errors
+            'severity_count': severity_count,
+            'errors': [error for error in self.errors if error['endpoint'] == endpoint]
         }
     
-    def full_scan(self, endpoints: List[str]) -> Dict:
-        """Executa varredura completa em múltiplos endpoints"""
-        all_results = []
-        total_vulns = 0
-        total_severity = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
+    async def scan(self, endpoints: List[str]) -> Dict:
+        """Executa varredura completa em múltiplos endpoints com um pool de conexões compartilhado"""
+        self.errors = []
+        self._host_limits = {}
+        self._shared_gets = {}
+        self._deadline = asyncio.get_running_loop().time() + self.time_budget
+        endpoint_limit = asyncio.Semaphore(self.ENDPOINT_CONCURRENCY)
         
-        for endpoint in endpoints:
+        async def run(endpoint: str) -> Dict:
             parsed = urlparse(endpoint)
             query_params = {key: value for key, value in parse_qsl(parsed.query, keep_blank_values=True)}
-            result = self.scan_endpoint(endpoint, query_params)
-            all_results.append(result)
+            async with endpoint_limit:
+                return await self.scan_endpoint(endpoint, query_params)
+        
+        limits = httpx.Limits(max_connections=self.MAX_CONNECTIONS, max_keepalive_connections=self.MAX_CONNECTIONS)
+        async with httpx.AsyncClient(limits=limits, follow_redirects=True, transport=self.transport) as client:
+            self._client = client
+            try:
+                all_results = await asyncio.gather(*(run(endpoint) for endpoint in endpoints))
+            finally:
+                self._client = None
+                self._shared_gets = {}
+        
+        total_vulns = 0
+        total_severity = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
+        for result in all_results:
             total_vulns += result['total_vulnerabilities']
-            
             for severity, count in result['severity_count'].items():
                 total_severity[severity] += count
         
+        self.results = list(all_results)
         return {
             'total_endpoints': len(endpoints),
             'total_vulnerabilities': total_vulns,
             'severity_count': total_severity,
-            'endpoint_results': all_results,
-            'scan_timestamp': time.time()
-            , 'errors': self.errors
+            'endpoint_results': self.results,
+            'scan_timestamp': time.time(),
+            'errors': self.errors
         }
+    
+    def full_scan(self, endpoints: List[str]) -> Dict:
+        """Versão síncrona de scan() para execução em threads de trabalho (ex.: io_executor)"""
+        return asyncio.run(self.scan(endpoints))
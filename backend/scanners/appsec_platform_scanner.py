@@ -6,9 +6,10 @@ import re
 from datetime import datetime
 from typing import Any, Dict, List
 
-from scanners.multilang_scanner import scan_code
+from scanners.multilang_scanner import default_scanner, scan_code
 from scanners.dependency_scanner import scan_dependencies
 from scanners.docker_graphql_scanner import scan_dockerfile, scan_docker_compose, scan_graphql
+from services.scan_cache import ruleset_version, scan_cache
 
 
 IAC_RULES = [
@@ -29,6 +30,8 @@ SECRET_RULES = [
     (r'(?i)(api[_-]?key|client[_-]?secret|password|token)\s*[:=]\s*["\'][^"\']{8,}["\']', 'Hardcoded Credential'),
 ]
 
+SAST_RULESET_VERSION = ruleset_version(default_scanner.ruleset_version, SECRET_RULES)
+
 
 def summarize(findings: List[Dict[str, Any]]) -> Dict[str, int]:
     return {
@@ -64,7 +67,7 @@ def enrich(findings: List[Dict[str, Any]], scanner: str) -> List[Dict[str, Any]]
     return result
 
 
-def scan_sast(content: str, filename: str) -> Dict[str, Any]:
+def _scan_sast(content: str, filename: str) -> Dict[str, Any]:
     result = scan_code(content, filename)
     findings = enrich(result.get('vulnerabilities', []), 'SAST')
     for line_number, line in enumerate(content.splitlines(), 1):
@@ -79,6 +82,11 @@ def scan_sast(content: str, filename: str) -> Dict[str, Any]:
     return {'scanner': 'SAST + Secrets', 'language': result.get('language'), 'findings': findings, 'summary': summarize(findings)}
 
 
+def scan_sast(content: str, filename: str) -> Dict[str, Any]:
+    language = default_scanner.detect_language(filename, content)
+    return scan_cache.get_or_compute('sast', SAST_RULESET_VERSION, content, {'language': language}, lambda: _scan_sast(content, filename))
+
+
 def scan_iac(content: str, filename: str) -> Dict[str, Any]:
     findings = []
     for line_number, line in enumerate(content.splitlines(), 1):
@@ -1,11 +1,44 @@
-import re
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
-class SQLInjectionScanner:
+from scanners.rule_engine import CompiledRuleSet, Rule
+from services.scan_cache import ruleset_version, scan_cache
+
+
+class RuleScanner:
+    """Base dos scanners por padrões: as regras são compiladas uma única vez e avaliadas pelo motor de passada única"""
+
+    PATTERNS: List[str] = []
+    LINE_REQUIRES: Optional[str] = None
+    VULN_TYPE = ''
+    SEVERITY = 'MEDIUM'
+    DESCRIPTION = ''
+    RECOMMENDATION = ''
+
+    def applies_to(self, code: str) -> bool:
+        return True
+
+    def format_code(self, line: str) -> str:
+        return line.strip()
+
+    def finding(self, line_number: int, line: str) -> Dict:
+        return {
+            'type': self.VULN_TYPE,
+            'severity': self.SEVERITY,
+            'line': line_number,
+            'code': self.format_code(line),
+            'description': self.DESCRIPTION,
+            'recommendation': self.RECOMMENDATION
+        }
+
+    def scan(self, code: str) -> List[Dict]:
+        return run_scanners([self], code)
+
+class SQLInjectionScanner(RuleScanner):
     """Scanner para detectar vulnerabilidades de Injeção SQL (A03:2021)"""
     
-    SQL_PATTERNS = [
+    PATTERNS = [
         r"execute\s*\(\s*['\"].*?\+.*?['\"]\s*\)",
         r"\.query\s*\(\s*['\"].*?\+.*?['\"]\s*\)",
         r"\.raw\s*\(\s*['\"].*?\+.*?['\"]\s*\)",
@@ -18,29 +51,16 @@ class SQLInjectionScanner:
         r"request\.(GET|POST|args|form)\[.*?\].*?INTO",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.SQL_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'SQL Injection',
-                        'severity': 'HIGH',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Possível vulnerabilidade de SQL Injection detectada',
-                        'recommendation': 'Use prepared statements ou ORM com parametrização'
-                    })
-        
-        return vulnerabilities
-
-
-class XSSScanner:
+    VULN_TYPE = 'SQL Injection'
+    SEVERITY = 'HIGH'
+    DESCRIPTION = 'Possível vulnerabilidade de SQL Injection detectada'
+    RECOMMENDATION = 'Use prepared statements ou ORM com parametrização'
+
+
+class XSSScanner(RuleScanner):
     """Scanner para detectar vulnerabilidades de Cross-Site Scripting (A03:2021)"""
     
-    XSS_PATTERNS = [
+    PATTERNS = [
         r"innerHTML\s*=",
         r"document\.write\s*\(",
         r"eval\s*\(",
@@ -50,29 +70,16 @@ class XSSScanner:
         r"<.*?>\s*\{\{.*?\}\}",  # Template injection
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.XSS_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Cross-Site Scripting (XSS)',
-                        'severity': 'HIGH',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Possível vulnerabilidade de XSS detectada',
-                        'recommendation': 'Sanitize e escape todos os inputs do usuário'
-                    })
-        
-        return vulnerabilities
-
-
-class AuthenticationScanner:
+    VULN_TYPE = 'Cross-Site Scripting (XSS)'
+    SEVERITY = 'HIGH'
+    DESCRIPTION = 'Possível vulnerabilidade de XSS detectada'
+    RECOMMENDATION = 'Sanitize e escape todos os inputs do usuário'
+
+
+class AuthenticationScanner(RuleScanner):
     """Scanner para detectar falhas de autenticação (A07:2021)"""
     
-    AUTH_PATTERNS = [
+    PATTERNS = [
         r"password\s*=\s*['\"].*?['\"]",  # Senhas hardcoded
         r"api_key\s*=\s*['\"].*?['\"]",
         r"secret\s*=\s*['\"].*?['\"]",
@@ -82,29 +89,16 @@ class AuthenticationScanner:
         r"session\[.*?\]\s*=\s*request",  # Session fixation
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.AUTH_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Broken Authentication',
-                        'severity': 'CRITICAL',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Possível falha de autenticação detectada',
-                        'recommendation': 'Use bibliotecas de autenticação seguras e não armazene credenciais em código'
-                    })
-        
-        return vulnerabilities
-
-
-class SensitiveDataScanner:
+    VULN_TYPE = 'Broken Authentication'
+    SEVERITY = 'CRITICAL'
+    DESCRIPTION = 'Possível falha de autenticação detectada'
+    RECOMMENDATION = 'Use bibliotecas de autenticação seguras e não armazene credenciais em código'
+
+
+class SensitiveDataScanner(RuleScanner):
     """Scanner para detectar exposição de dados sensíveis (A02:2021)"""
     
-    SENSITIVE_PATTERNS = [
+    PATTERNS = [
         r"['\"]?password['\"]?\s*:\s*['\"]",
         r"credit_card|card_number",
         r"ssn|social_security",
@@ -114,59 +108,38 @@ class SensitiveDataScanner:
         r"SECRET|PRIVATE|CONFIDENTIAL",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.SENSITIVE_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Sensitive Data Exposure',
-                        'severity': 'HIGH',
-                        'line': i,
-                        'code': line.strip()[:50] + '...',
-                        'description': 'Possível exposição de dados sensíveis',
-                        'recommendation': 'Criptografe dados sensíveis e use variáveis de ambiente'
-                    })
-        
-        return vulnerabilities
-
-
-class CSRFScanner:
+    VULN_TYPE = 'Sensitive Data Exposure'
+    SEVERITY = 'HIGH'
+    DESCRIPTION = 'Possível exposição de dados sensíveis'
+    RECOMMENDATION = 'Criptografe dados sensíveis e use variáveis de ambiente'
+
+    def format_code(self, line: str) -> str:
+        return line.strip()[:50] + '...'
+
+
+class CSRFScanner(RuleScanner):
     """Scanner para detectar vulnerabilidades CSRF (A01:2021)"""
     
-    CSRF_PATTERNS = [
+    PATTERNS = [
         r"@app\.route\(.*?methods=\[.*?POST.*?\]",
         r"def.*?\(.*?request.*?\)",
         r"<form",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        has_csrf_protection = 'csrf' in code.lower()
-        
-        for i, line in enumerate(lines, 1):
-            if 'POST' in line and 'csrf' not in code.lower():
-                for pattern in self.CSRF_PATTERNS:
-                    if re.search(pattern, line, re.IGNORECASE):
-                        vulnerabilities.append({
-                            'type': 'Cross-Site Request Forgery (CSRF)',
-                            'severity': 'MEDIUM',
-                            'line': i,
-                            'code': line.strip(),
-                            'description': 'Possível vulnerabilidade CSRF - sem proteção detectada',
-                            'recommendation': 'Implemente tokens CSRF em todos os formulários'
-                        })
-        
-        return vulnerabilities
-
-
-class InsecureDesignScanner:
+    LINE_REQUIRES = 'POST'
+    VULN_TYPE = 'Cross-Site Request Forgery (CSRF)'
+    SEVERITY = 'MEDIUM'
+    DESCRIPTION = 'Possível vulnerabilidade CSRF - sem proteção detectada'
+    RECOMMENDATION = 'Implemente tokens CSRF em todos os formulários'
+
+    def applies_to(self, code: str) -> bool:
+        return 'csrf' not in code.lower()
+
+
+class InsecureDesignScanner(RuleScanner):
     """Scanner para detectar design inseguro (A04:2021)"""
     
-    DESIGN_PATTERNS = [
+    PATTERNS = [
         r"pickle\.loads",  # Desserialização insegura
         r"yaml\.load\(",  # YAML unsafe
         r"exec\s*\(",
@@ -175,29 +148,16 @@ class InsecureDesignScanner:
         r"subprocess\.(call|run|Popen).*?shell=True",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.DESIGN_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Insecure Design',
-                        'severity': 'CRITICAL',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Padrão de código inseguro detectado',
-                        'recommendation': 'Evite desserialização insegura e execução de código dinâmico'
-                    })
-        
-        return vulnerabilities
-
-
-class SecurityMisconfigurationScanner:
+    VULN_TYPE = 'Insecure Design'
+    SEVERITY = 'CRITICAL'
+    DESCRIPTION = 'Padrão de código inseguro detectado'
+    RECOMMENDATION = 'Evite desserialização insegura e execução de código dinâmico'
+
+
+class SecurityMisconfigurationScanner(RuleScanner):
     """Scanner para detectar configurações incorretas (A05:2021)"""
     
-    CONFIG_PATTERNS = [
+    PATTERNS = [
         r"DEBUG\s*=\s*True",
         r"debug\s*=\s*True",
         r"ALLOWED_HOSTS\s*=\s*\[\s*\*",
@@ -205,57 +165,31 @@ class SecurityMisconfigurationScanner:
         r"ssl_verify=False",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.CONFIG_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Security Misconfiguration',
-                        'severity': 'MEDIUM',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Configuração de segurança incorreta detectada',
-                        'recommendation': 'Desabilite modo debug em produção e valide SSL'
-                    })
-        
-        return vulnerabilities
-
-
-class ComponentScanner:
+    VULN_TYPE = 'Security Misconfiguration'
+    SEVERITY = 'MEDIUM'
+    DESCRIPTION = 'Configuração de segurança incorreta detectada'
+    RECOMMENDATION = 'Desabilite modo debug em produção e valide SSL'
+
+
+class ComponentScanner(RuleScanner):
     """Scanner para detectar componentes vulneráveis (A06:2021)"""
     
-    VULNERABLE_IMPORTS = [
+    PATTERNS = [
         r"import\s+pickle",
         r"from\s+pickle\s+import",
         r"import\s+marshal",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.VULNERABLE_IMPORTS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Vulnerable Components',
-                        'severity': 'MEDIUM',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Uso de componente potencialmente vulnerável',
-                        'recommendation': 'Revise o uso de bibliotecas e mantenha dependências atualizadas'
-                    })
-        
-        return vulnerabilities
-
-
-class PathTraversalScanner:
+    VULN_TYPE = 'Vulnerable Components'
+    SEVERITY = 'MEDIUM'
+    DESCRIPTION = 'Uso de componente potencialmente vulnerável'
+    RECOMMENDATION = 'Revise o uso de bibliotecas e mantenha dependências atualizadas'
+
+
+class PathTraversalScanner(RuleScanner):
     """Scanner para detectar Path Traversal (A01:2021)"""
     
-    PATH_PATTERNS = [
+    PATTERNS = [
         r"open\s*\(\s*.*?request",
         r"file_get_contents\s*\(\s*\$_",
         r"include\s*\(\s*\$_",
@@ -263,23 +197,53 @@ class PathTraversalScanner:
         r"readFile\s*\(\s*.*?req\.",
     ]
     
-    def scan(self, code: str) -> List[Dict]:
-        vulnerabilities = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            for pattern in self.PATH_PATTERNS:
-                if re.search(pattern, line, re.IGNORECASE):
-                    vulnerabilities.append({
-                        'type': 'Path Traversal',
-                        'severity': 'HIGH',
-                        'line': i,
-                        'code': line.strip(),
-                        'description': 'Possível vulnerabilidade de Path Traversal',
-                        'recommendation': 'Valide e sanitize todos os caminhos de arquivo'
-                    })
-        
-        return vulnerabilities
+    VULN_TYPE = 'Path Traversal'
+    SEVERITY = 'HIGH'
+    DESCRIPTION = 'Possível vulnerabilidade de Path Traversal'
+    RECOMMENDATION = 'Valide e sanitize todos os caminhos de arquivo'
+
+
+# Mapeamento de opções para scanners
+SCANNER_MAP = {
+    "sql_injection": SQLInjectionScanner(),
+    "xss": XSSScanner(),
+    "hardcoded_secrets": AuthenticationScanner(),
+    "insecure_functions": SensitiveDataScanner(),
+    "command_injection": InsecureDesignScanner(),
+    "path_traversal": PathTraversalScanner(),
+}
+
+# Scanners extras que sempre rodam
+EXTRA_SCANNERS = [
+    CSRFScanner(),
+    SecurityMisconfigurationScanner(),
+    ComponentScanner(),
+]
+
+
+RULESET_VERSION = ruleset_version([
+    (type(scanner).__name__, scanner.PATTERNS, scanner.LINE_REQUIRES, scanner.VULN_TYPE, scanner.SEVERITY, scanner.DESCRIPTION, scanner.RECOMMENDATION)
+    for scanner in [*SCANNER_MAP.values(), *EXTRA_SCANNERS]
+])
+
+
+@lru_cache(maxsize=256)
+def _compiled_rules(scanner_types: Tuple[type, ...]) -> CompiledRuleSet:
+    """Combina as regras dos scanners ativos; cada regra é marcada com a posição do seu scanner"""
+    return CompiledRuleSet([
+        Rule(pattern, tag=position, requires=scanner_type.LINE_REQUIRES)
+        for position, scanner_type in enumerate(scanner_types)
+        for pattern in scanner_type.PATTERNS
+    ])
+
+
+def run_scanners(scanners: List[RuleScanner], code: str) -> List[Dict]:
+    """Executa vários scanners em uma única passada, mantendo a ordem scanner -> linha -> padrão"""
+    active = [scanner for scanner in scanners if scanner.applies_to(code)]
+    results = [[] for _ in active]
+    for line_number, line, rule in _compiled_rules(tuple(type(scanner) for scanner in active)).matches(code):
+        results[rule.tag].append(active[rule.tag].finding(line_number, line))
+    return [vulnerability for findings in results for vulnerability in findings]
 
 
 def scan_code(code: str, options: Dict = None) -> Dict:
@@ -296,35 +260,12 @@ def scan_code(code: str, options: Dict = None) -> Dict:
             "insecure_functions": True
         }
     
-    # Mapeamento de opções para scanners
-    scanner_map = {
-        "sql_injection": SQLInjectionScanner(),
-        "xss": XSSScanner(),
-        "hardcoded_secrets": AuthenticationScanner(),
-        "insecure_functions": SensitiveDataScanner(),
-        "command_injection": InsecureDesignScanner(),
-        "path_traversal": PathTraversalScanner(),
-    }
+    # Scanners habilitados pelas opções, seguidos dos extras que sempre rodam
+    enabled = [option_key for option_key in SCANNER_MAP if options.get(option_key, True)]
+    scanners = [SCANNER_MAP[option_key] for option_key in enabled] + EXTRA_SCANNERS
     
-    # Adiciona scanners extras que sempre rodam
-    extra_scanners = [
-        CSRFScanner(),
-        SecurityMisconfigurationScanner(),
-        ComponentScanner(),
-    ]
-    
-    all_vulnerabilities = []
-    
-    # Executa scanners baseado nas opções
-    for option_key, scanner in scanner_map.items():
-        if options.get(option_key, True):
-            vulnerabilities = scanner.scan(code)
-            all_vulnerabilities.extend(vulnerabilities)
-    
-    # Executa scanners extras
-    for scanner in extra_scanners:
-        vulnerabilities = scanner.scan(code)
-        all_vulnerabilities.extend(vulnerabilities)
+    # Conteúdo idêntico com as mesmas regras e opções reaproveita os achados do cache
+    all_vulnerabilities = scan_cache.get_or_compute("code_scanner", RULESET_VERSION, code, enabled, lambda: run_scanners(scanners, code))
     
     # Estatísticas
     severity_count = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
@@ -338,3 +279,7 @@ def scan_code(code: str, options: Dict = None) -> Dict:
         'scan_date': datetime.now().isoformat(),
         'scan_options': options
     }
+
+
+# Compila o conjunto padrão (todas as opções habilitadas) já na importação
+_compiled_rules(tuple(type(scanner) for scanner in [*SCANNER_MAP.values(), *EXTRA_SCANNERS]))
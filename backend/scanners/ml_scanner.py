@@ -14,6 +14,8 @@ from sklearn.naive_bayes import MultinomialNB
 import joblib
 import os
 
+from services.scan_cache import ruleset_version, scan_cache
+
 
 class MLVulnerabilityDetector:
     """Detector de vulnerabilidades com Machine Learning"""
@@ -31,6 +33,7 @@ class MLVulnerabilityDetector:
         )
         self.is_trained = False
         self.vulnerability_patterns = self._load_training_data()
+        self.model_version = ruleset_version(self.vulnerability_patterns, self.vectorizer.get_params(), self.classifier.get_params())
     
     def _load_training_data(self) -> Dict[str, List[str]]:
         """Carrega dados de treinamento"""
@@ -115,8 +118,10 @@ class MLVulnerabilityDetector:
         return prediction, confidence
     
     def analyze_code_patterns(self, code: str) -> Dict[str, Any]:
-        """Analisa padrões no código usando ML"""
-        
+        """Analisa padrões no código usando ML (resultado em cache por conteúdo e versão do modelo)"""
+        return scan_cache.get_or_compute('ml_patterns', self.model_version, code, None, lambda: self._analyze_code_patterns(code))
+    
+    def _analyze_code_patterns(self, code: str) -> Dict[str, Any]:
         lines = code.split('\n')
         detections = []
         
@@ -3,10 +3,12 @@ Multi-Language Code Scanner
 Suporta análise de vulnerabilidades em múltiplas linguagens de programação
 """
 
-import re
 from typing import Dict, List, Any
 from dataclasses import dataclass
 
+from scanners.rule_engine import CompiledRuleSet, Rule
+from services.scan_cache import ruleset_version
+
 
 @dataclass
 class LanguagePattern:
@@ -21,6 +23,22 @@ class MultiLanguageScanner:
     
     def __init__(self):
         self.languages = self._initialize_language_patterns()
+        self.rule_sets = {lang_id: self._compile_rules(lang) for lang_id, lang in self.languages.items()}
+        self.ruleset_version = ruleset_version({
+            lang_id: [lang.name, lang.extensions, {
+                vuln_type: [patterns, self._get_description(vuln_type, lang_id), self._get_recommendation(vuln_type, lang_id)]
+                for vuln_type, patterns in lang.patterns.items()
+            }]
+            for lang_id, lang in self.languages.items()
+        })
+    
+    def _compile_rules(self, lang: LanguagePattern) -> CompiledRuleSet:
+        """Compila os padrões da linguagem com pré-filtro de literais (Aho-Corasick)"""
+        return CompiledRuleSet([
+            Rule(pattern_info['pattern'], tag=(vuln_type, pattern_info['severity']))
+            for vuln_type, patterns in lang.patterns.items()
+            for pattern_info in patterns
+        ])
     
     def _initialize_language_patterns(self) -> Dict[str, LanguagePattern]:
         """Inicializa padrões de vulnerabilidade para cada linguagem"""
@@ -255,25 +273,21 @@ class MultiLanguageScanner:
             }
         
         lang_config = self.languages[language]
-        vulnerabilities = []
-        lines = code.split('\n')
+        rule_set = self.rule_sets[language]
         
-        # Procurar vulnerabilidades
-        for vuln_type, patterns in lang_config.patterns.items():
-            for pattern_info in patterns:
-                pattern = pattern_info['pattern']
-                severity = pattern_info['severity']
-                
-                for line_num, line in enumerate(lines, 1):
-                    if re.search(pattern, line, re.IGNORECASE):
-                        vulnerabilities.append({
-                            'type': vuln_type.replace('_', ' ').title(),
-                            'severity': severity,
-                            'line': line_num,
-                            'code': line.strip(),
-                            'description': self._get_description(vuln_type, language),
-                            'recommendation': self._get_recommendation(vuln_type, language)
-                        })
+        # Procurar vulnerabilidades; só as linhas com literal obrigatório passam pela regex
+        matches_by_rule = {rule: [] for rule in rule_set.rules}
+        for line_num, line, rule in rule_set.matches(code):
+            vuln_type, severity = rule.tag
+            matches_by_rule[rule].append({
+                'type': vuln_type.replace('_', ' ').title(),
+                'severity': severity,
+                'line': line_num,
+                'code': line.strip(),
+                'description': self._get_description(vuln_type, language),
+                'recommendation': self._get_recommendation(vuln_type, language)
+            })
+        vulnerabilities = [vuln for rule in rule_set.rules for vuln in matches_by_rule[rule]]
         
         # Calcular resumo
         summary = {
@@ -331,7 +345,9 @@ class MultiLanguageScanner:
         return recommendations.get(vuln_type, 'Revise o código e aplique práticas seguras')
 
 
+default_scanner = MultiLanguageScanner()
+
+
 def scan_code(code: str, filename: str = "unknown.txt") -> Dict[str, Any]:
     """Função helper para scan de código"""
-    scanner = MultiLanguageScanner()
-    return scanner.scan(code, filename)
+    return default_scanner.scan(code, filename)
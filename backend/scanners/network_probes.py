@@ -0,0 +1,146 @@
+"""
+Network Probes
+Sondas asyncio (DNS, TCP, HTTP e eco ICMP) das verificações do Iron AI Shield
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import socket
+import struct
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+USER_AGENT = "IronAI-Shield/1.0"
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30.0)
+# Portas usadas para inferir alcance por TCP quando o eco ICMP sem privilégio não está disponível
+REACHABILITY_PORTS = (443, 80)
+
+# Um cliente por event loop: o pool de conexões do httpx não pode ser usado fora do loop que o criou.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_sequence = itertools.count(1)
+_icmp_permitted: Optional[bool] = None
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def http_client() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado (keep-alive) do event loop atual"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, follow_redirects=True, headers={"User-Agent": USER_AGENT},
+        )
+    return client
+
+
+async def close_http_client() -> None:
+    """Fecha o cliente do event loop atual (chamado no desligamento do processo)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def probe_http(url: str) -> Dict[str, Any]:
+    """GET com o cliente compartilhado; erros de transporte do httpx são propagados"""
+    started = time.perf_counter()
+    response = await http_client().get(url)
+    return {"status_code": response.status_code, "content_length": len(response.content), "response_time": _elapsed_ms(started)}
+
+
+async def resolve(host: str) -> str:
+    """Primeiro endereço do host; levanta socket.gaierror quando o DNS não resolve"""
+    try:
+        return str(ipaddress.ip_address(host))
+    except ValueError:
+        pass
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return infos[0][4][0]
+
+
+async def probe_tcp(host: str, port: int, timeout: float = 3.0) -> Dict[str, Any]:
+    """Testa uma porta TCP com asyncio.open_connection"""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except Exception as exc:
+        return {"port": port, "open": False, "response_time": _elapsed_ms(started), "error": str(exc) or type(exc).__name__}
+    writer.close()
+    return {"port": port, "open": True, "response_time": _elapsed_ms(started), "error": None}
+
+
+async def probe_tcp_ports(host: str, ports: List[int], timeout: float = 3.0) -> List[Dict[str, Any]]:
+    """Testa todas as portas concorrentemente no mesmo event loop"""
+    results = await asyncio.gather(*(probe_tcp(host, int(port), timeout) for port in ports or []))
+    return sorted(results, key=lambda item: item["port"])
+
+
+def _icmp_socket(family: int) -> Optional[socket.socket]:
+    """Socket de eco ICMP sem privilégio (SOCK_DGRAM); None se o kernel não permitir ao processo"""
+    global _icmp_permitted
+    if _icmp_permitted is False:
+        return None
+    protocol = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        sock = socket.socket(family, socket.SOCK_DGRAM, protocol)
+    except OSError:
+        # Linux só permite ao grupo em net.ipv4.ping_group_range; outros sistemas não têm o recurso.
+        _icmp_permitted = False
+        return None
+    _icmp_permitted = True
+    sock.setblocking(False)
+    return sock
+
+
+async def icmp_echo(address: str, timeout: float = 2.0) -> Optional[bool]:
+    """Eco ICMP no próprio processo, sem executar ping; None quando indisponível"""
+    family = socket.AF_INET6 if ipaddress.ip_address(address).version == 6 else socket.AF_INET
+    sock = _icmp_socket(family)
+    if sock is None:
+        return None
+    request_type, reply_type = (128, 129) if family == socket.AF_INET6 else (8, 0)
+    sequence = next(_sequence) & 0xFFFF
+    loop = asyncio.get_running_loop()
+    try:
+        # O kernel preenche identificador e checksum e entrega a este socket só as respostas dele.
+        await loop.sock_connect(sock, (address, 0))
+        await loop.sock_sendall(sock, struct.pack("!BBHHH", request_type, 0, 0, 0, sequence) + b"iron-ai-shield")
+        deadline = loop.time() + timeout
+        while True:
+            data = await asyncio.wait_for(loop.sock_recv(sock, 1024), max(0.0, deadline - loop.time()))
+            if len(data) >= 8 and data[0] == reply_type and struct.unpack("!H", data[6:8])[0] == sequence:
+                return True
+    except (asyncio.TimeoutError, OSError):
+        return False
+    finally:
+        sock.close()
+
+
+async def tcp_reachable(address: str, ports: Tuple[int, ...] = REACHABILITY_PORTS, timeout: float = 2.0) -> bool:
+    """Alcance por conexão TCP comum: aceitar ou recusar (RST) prova que o host respondeu"""
+    async def attempt(port: int) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        except ConnectionRefusedError:
+            return True
+        except (asyncio.TimeoutError, OSError):
+            return False
+        writer.close()
+        return True
+
+    return any(await asyncio.gather(*(attempt(port) for port in ports)))
+
+
+async def host_reachable(address: str) -> Tuple[bool, str]:
+    """Substitui o ping: eco ICMP quando permitido, senão conexão TCP; retorna (alcançável, método)"""
+    echoed = await icmp_echo(address)
+    if echoed is not None:
+        return echoed, "icmp"
+    return await tcp_reachable(address), "tcp"
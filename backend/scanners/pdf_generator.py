@@ -165,6 +165,10 @@ class PDFReportGenerator:
         if scan_data.get('scans_details'):
             story.append(PageBreak())
             story.extend(self._create_tools_responses_section(scan_data['scans_details']))
+            if scan_data.get('omitted_scans'):
+                story.append(Paragraph(
+                    f"Mais {scan_data['omitted_scans']} scan(s) anteriores omitidos do apêndice.",
+                    self.styles['SmallText']))
 
         story.extend(self._create_footer())
 
@@ -451,15 +455,17 @@ class PDFReportGenerator:
         return elements
 
     def _create_prioritization_section(self, scan_data: Dict) -> List:
-        vulnerabilities = self._findings(scan_data.get('vulnerabilities'))
-        if not vulnerabilities:
+        # Relatórios consolidados já trazem o top de prioridade calculado sobre todos os achados
+        ordered = self._findings(scan_data.get('prioritized_vulnerabilities'))
+        if not ordered:
+            ordered = sorted(
+                self._findings(scan_data.get('vulnerabilities')),
+                key=lambda item: ({'CRITICAL': 4, 'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}.get(
+                    self._severity(item.get('severity')), 0), self._number(item.get('cvss'))),
+                reverse=True,
+            )
+        if not ordered:
             return []
-        ordered = sorted(
-            vulnerabilities,
-            key=lambda item: ({'CRITICAL': 4, 'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}.get(
-                self._severity(item.get('severity')), 0), self._number(item.get('cvss'))),
-            reverse=True,
-        )
         elements = self._section_title(
             'Plano de priorização',
             'Ordem recomendada para triagem e remediação. A prioridade final deve considerar exposição e contexto de negócio.'
@@ -492,14 +498,21 @@ class PDFReportGenerator:
             return elements
 
         labels = {'CRITICAL': 'Críticos', 'HIGH': 'Altos', 'MEDIUM': 'Médios', 'LOW': 'Baixos'}
+        # severity_totals: total real por severidade quando a lista de detalhes foi limitada
+        totals = scan_data.get('severity_totals') or {}
         for severity in ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW'):
             group = [v for v in vulnerabilities if self._severity(v.get('severity')) == severity]
             if not group:
                 continue
+            total = max(int(self._number(totals.get(severity))), len(group))
             elements.append(Paragraph(
-                f'{labels[severity]} ({len(group)})', self.styles['CustomSection']))
+                f'{labels[severity]} ({total})', self.styles['CustomSection']))
             for index, vuln in enumerate(group, 1):
                 elements.extend(self._create_vulnerability_detail(vuln, severity, index))
+            if total > len(group):
+                elements.append(Paragraph(
+                    f'Exibindo {len(group)} de {total} achados. A lista completa está disponível na API de achados.',
+                    self.styles['SmallText']))
         return elements
 
     def _finding_cves(self, vuln: Dict) -> List[str]:
@@ -808,6 +821,10 @@ def generate_pdf_report(scan_data: Dict[str, Any], output_path: str = None) -> b
         # O relatório não deve deixar de ser emitido por causa de um campo atípico
         # retornado por algum scanner. A contingência preserva os dados essenciais.
         buffer = output_path or io.BytesIO()
+        if hasattr(buffer, 'truncate'):
+            # Descarta o que a tentativa anterior chegou a escrever no arquivo de saída
+            buffer.seek(0)
+            buffer.truncate()
         safe_data = scan_data if isinstance(scan_data, dict) else {}
         doc = SimpleDocTemplate(
             buffer, pagesize=A4, rightMargin=48, leftMargin=48,
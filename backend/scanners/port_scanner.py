@@ -3,6 +3,7 @@ Network and Port Scanner
 Escaneia portas e serviços em hosts
 """
 
+import asyncio
 import socket
 import subprocess
 from typing import Dict, List, Any, Optional
@@ -69,30 +70,61 @@ class PortScanner:
                 port = future_to_port[future]
                 try:
                     if future.result():
-                        service = self.COMMON_PORTS.get(port, 'Unknown')
-                        is_vulnerable = port in self.VULNERABLE_PORTS
-                        vulnerability = self.VULNERABLE_PORTS.get(port, '')
-                        
-                        port_info = {
-                            'port': port,
-                            'state': 'open',
-                            'service': service,
-                            'is_vulnerable': is_vulnerable,
-                            'vulnerability': vulnerability,
-                            'severity': 'HIGH' if is_vulnerable else 'MEDIUM'
-                        }
-                        
                         # Tentar detectar versão/banner
-                        banner = self._grab_banner(host, port)
-                        if banner:
-                            port_info['banner'] = banner
-                            port_info['version_info'] = self._parse_banner(banner)
-                        
-                        open_ports.append(port_info)
+                        open_ports.append(self._port_info(port, self._grab_banner(host, port)))
                 except Exception:
                     pass
         
-        # Análise de segurança
+        return self._host_result(host, ports, open_ports)
+    
+    async def scan_host_async(self, host: str, ports: Optional[List[int]] = None,
+                              max_concurrency: int = 100) -> Dict[str, Any]:
+        """Mesmo resultado de scan_host com conexões asyncio: sem pool de threads e
+        com o banner lido na própria conexão que comprovou a porta aberta"""
+        
+        if ports is None:
+            ports = list(self.COMMON_PORTS.keys())
+        
+        limit = asyncio.Semaphore(max_concurrency)
+        
+        async def probe(port: int):
+            async with limit:
+                try:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+                except Exception:
+                    return None
+                try:
+                    if port == 80 or port == 8080:
+                        writer.write(b'GET / HTTP/1.0\r\n\r\n')
+                        await writer.drain()
+                    banner = (await asyncio.wait_for(reader.read(1024), 2)).decode('utf-8', errors='ignore').strip()
+                except Exception:
+                    banner = None
+                finally:
+                    writer.close()
+                return self._port_info(port, banner or None)
+        
+        open_ports = [item for item in await asyncio.gather(*(probe(port) for port in ports)) if item]
+        return self._host_result(host, ports, open_ports)
+    
+    def _port_info(self, port: int, banner: Optional[str]) -> Dict[str, Any]:
+        """Monta o registro de uma porta aberta"""
+        is_vulnerable = port in self.VULNERABLE_PORTS
+        port_info = {
+            'port': port,
+            'state': 'open',
+            'service': self.COMMON_PORTS.get(port, 'Unknown'),
+            'is_vulnerable': is_vulnerable,
+            'vulnerability': self.VULNERABLE_PORTS.get(port, ''),
+            'severity': 'HIGH' if is_vulnerable else 'MEDIUM'
+        }
+        if banner:
+            port_info['banner'] = banner
+            port_info['version_info'] = self._parse_banner(banner)
+        return port_info
+    
+    def _host_result(self, host: str, ports: List[int], open_ports: List[Dict]) -> Dict[str, Any]:
+        """Análise de segurança e resumo do scan de um host"""
         vulnerabilities = self._analyze_security(open_ports)
         
         return {
@@ -355,3 +387,10 @@ def scan_ports(target: str, ports: Optional[List[int]] = None) -> Dict[str, Any]
         return scanner.scan_range(target, ports)
     else:
         return scanner.scan_host(target, ports)
+
+
+async def scan_ports_async(target: str, ports: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Versão assíncrona de scan_ports; faixas de rede continuam no scan em threads"""
+    if '/' in target or '-' in target.split('.')[-1]:
+        return await asyncio.to_thread(scan_ports, target, ports)
+    return await PortScanner().scan_host_async(target, ports)
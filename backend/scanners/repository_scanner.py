@@ -0,0 +1,234 @@
+"""
+Repository Scanner
+Escaneia repositórios inteiros (diretório, .zip ou tarball) distribuindo os arquivos em um pool de processos
+"""
+
+import argparse
+import json
+import os
+import sys
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, as_completed, wait
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from scanners.multilang_scanner import default_scanner
+
+# Extensão -> linguagem do MultiLanguageScanner (o fallback por conteúdo não é usado em repositórios)
+EXTENSION_LANGUAGES = {
+    extension: lang_id
+    for lang_id, lang in default_scanner.languages.items()
+    for extension in lang.extensions
+}
+SKIPPED_DIRECTORIES = {".git", ".hg", ".svn", "node_modules", "vendor", "venv", ".venv", "__pycache__", "dist", "build", ".tox"}
+MAX_FILE_BYTES = 2 * 1024 * 1024
+MAX_ARCHIVE_FILES = 50000
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+FILES_PER_TASK = 64
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+
+
+class ArchiveError(ValueError):
+    """Arquivo compactado inválido, inseguro ou acima dos limites"""
+
+
+def is_scannable(path: str) -> bool:
+    return Path(path).suffix.lower() in EXTENSION_LANGUAGES
+
+
+def _safe_member_name(name: str) -> Optional[str]:
+    """Normaliza o nome de um membro do arquivo; None para caminhos absolutos ou com '..'"""
+    path = PurePosixPath(name.replace("\\", "/"))
+    if path.is_absolute() or ".." in path.parts or not path.parts:
+        return None
+    if any(part in SKIPPED_DIRECTORIES for part in path.parts[:-1]):
+        return None
+    return str(path)
+
+
+def extract_archive(archive: BinaryIO, filename: str, destination: str) -> int:
+    """Extrai somente arquivos regulares escaneáveis, recusando path traversal e zip bombs"""
+    extracted = 0
+    total = 0
+
+    def write(name: str, source) -> None:
+        nonlocal extracted, total
+        with source() as handle:
+            data = handle.read(MAX_FILE_BYTES + 1)
+        if len(data) > MAX_FILE_BYTES:
+            return
+        extracted += 1
+        total += len(data)
+        if extracted > MAX_ARCHIVE_FILES or total > MAX_ARCHIVE_BYTES:
+            raise ArchiveError("Arquivo excede os limites de extração")
+        target = Path(destination, name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+    lowered = filename.lower()
+    try:
+        if lowered.endswith(".zip"):
+            with zipfile.ZipFile(archive) as bundle:
+                for info in bundle.infolist():
+                    name = _safe_member_name(info.filename)
+                    if info.is_dir() or not name or not is_scannable(name) or info.file_size > MAX_FILE_BYTES:
+                        continue
+                    write(name, lambda info=info: bundle.open(info))
+        elif lowered.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+            with tarfile.open(fileobj=archive, mode="r:*") as bundle:
+                for member in bundle:
+                    name = _safe_member_name(member.name)
+                    if not member.isfile() or not name or not is_scannable(name) or member.size > MAX_FILE_BYTES:
+                        continue
+                    write(name, lambda member=member: bundle.extractfile(member))
+        else:
+            raise ArchiveError("Formato não suportado. Use .zip, .tar, .tar.gz, .tgz, .tar.bz2 ou .tar.xz")
+    except (zipfile.BadZipFile, tarfile.TarError) as exc:
+        raise ArchiveError(f"Arquivo compactado inválido: {exc}") from exc
+    return extracted
+
+
+def iter_repository_files(root: str) -> Iterator[str]:
+    """Caminhos relativos (ordenados) dos arquivos escaneáveis sob root"""
+    for current, directories, files in os.walk(root):
+        directories[:] = sorted(d for d in directories if d not in SKIPPED_DIRECTORIES)
+        for name in sorted(files):
+            if is_scannable(name):
+                yield os.path.relpath(os.path.join(current, name), root).replace(os.sep, "/")
+
+
+def _scan_files(root: str, paths: List[str]) -> List[Dict[str, Any]]:
+    """Executado nos processos do pool: lê e escaneia um lote de arquivos"""
+    results = []
+    for path in paths:
+        full_path = os.path.join(root, path)
+        try:
+            if os.path.getsize(full_path) > MAX_FILE_BYTES:
+                results.append({'file': path, 'skipped': 'too_large'})
+                continue
+            with open(full_path, "rb") as handle:
+                raw = handle.read()
+            if b"\0" in raw:
+                results.append({'file': path, 'skipped': 'binary'})
+                continue
+            code = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            results.append({'file': path, 'skipped': 'binary'})
+            continue
+        except OSError as exc:
+            results.append({'file': path, 'skipped': 'unreadable', 'error': str(exc)})
+            continue
+        result = default_scanner.scan(code, path)
+        results.append({'file': path, 'language': result['language'], 'summary': result['summary'], 'vulnerabilities': result['vulnerabilities']})
+    return results
+
+
+def _batches(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_repository_scan(root: str, executor: Optional[Executor] = None, workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Gera o resultado de cada arquivo à medida que os processos terminam.
+
+    Os arquivos são enviados em lotes e no máximo dois lotes por processo ficam
+    em voo, limitando a memória mesmo em repositórios com dezenas de milhares
+    de arquivos.
+    """
+    workers = workers or os.cpu_count() or 1
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        for batch in _batches(iter_repository_files(root), FILES_PER_TASK):
+            pending.add(executor.submit(_scan_files, root, batch))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in as_completed(pending):
+            yield from future.result()
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+
+def merge_results(file_results: Iterable[Dict[str, Any]], target: str) -> Dict[str, Any]:
+    """Consolida os resultados por arquivo em um único resultado com achados por arquivo"""
+    files = []
+    skipped = []
+    languages: Dict[str, int] = {}
+    for item in file_results:
+        if item.get('skipped'):
+            skipped.append({'file': item['file'], 'reason': item['skipped']})
+            continue
+        languages[item['language']] = languages.get(item['language'], 0) + 1
+        files.append(item)
+    files.sort(key=lambda item: item['file'])
+    skipped.sort(key=lambda item: item['file'])
+    vulnerabilities = [dict(vuln, file=item['file']) for item in files for vuln in item['vulnerabilities']]
+    severity_count = {severity: 0 for severity in SEVERITIES}
+    for vuln in vulnerabilities:
+        if vuln['severity'] in severity_count:
+            severity_count[vuln['severity']] += 1
+    return {
+        'scanner': 'repository',
+        'target': target,
+        'files_scanned': len(files),
+        'files_skipped': skipped,
+        'languages': languages,
+        'files': [{'file': item['file'], 'language': item['language'], 'summary': item['summary']} for item in files if item['vulnerabilities']],
+        'vulnerabilities': vulnerabilities,
+        'total_vulnerabilities': len(vulnerabilities),
+        'severity_count': severity_count,
+        'summary': {'total': len(vulnerabilities), **{severity.lower(): count for severity, count in severity_count.items()}},
+    }
+
+
+def scan_repository(root: str, executor: Optional[Executor] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    return merge_results(iter_repository_scan(root, executor, workers), os.path.basename(os.path.abspath(root)))
+
+
+def scan_archive(archive: BinaryIO, filename: str, executor: Optional[Executor] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="repo-scan-") as root:
+        extract_archive(archive, filename, root)
+        result = merge_results(iter_repository_scan(root, executor, workers), filename)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Escaneia um diretório ou arquivo compactado com o MultiLanguageScanner")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--stream", action="store_true", help="imprime um JSON por arquivo (NDJSON) em vez do resultado consolidado")
+    args = parser.parse_args(argv)
+
+    def run(root: str, target: str) -> Optional[Dict[str, Any]]:
+        if args.stream:
+            for item in iter_repository_scan(root, workers=args.workers):
+                print(json.dumps(item, ensure_ascii=False), flush=True)
+            return None
+        return merge_results(iter_repository_scan(root, workers=args.workers), target)
+
+    if os.path.isdir(args.path):
+        result = run(args.path, os.path.basename(os.path.abspath(args.path)))
+    else:
+        with open(args.path, "rb") as archive, tempfile.TemporaryDirectory(prefix="repo-scan-") as root:
+            extract_archive(archive, os.path.basename(args.path), root)
+            result = run(root, os.path.basename(args.path))
+    if result is not None:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
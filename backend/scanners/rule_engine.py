@@ -0,0 +1,144 @@
+"""
+Rule Engine
+Avalia conjuntos de regras regex pré-compiladas em uma única passada sobre o texto
+"""
+
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import ahocorasick
+except ImportError:  # opcional: sem pyahocorasick o pré-filtro faz uma busca str.find por literal
+    ahocorasick = None
+
+NEWLINE = re.compile("\n")
+
+# Caracteres não-ASCII que o IGNORECASE do módulo re equipara a letras ASCII e que lower() não converte para elas
+CASE_FOLD_EXTRA = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+
+
+@dataclass(frozen=True, eq=False)
+class Rule:
+    """Regra de detecção avaliada linha a linha"""
+    pattern: str
+    tag: Any = None
+    requires: Optional[str] = None  # literal (case-sensitive) que precisa estar na linha
+
+
+def _sequence_literals(items) -> Optional[FrozenSet[str]]:
+    """Escolhe o melhor conjunto de literais obrigatórios de uma sequência do parser (um deles sempre ocorre no match)"""
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def close_run():
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run.clear()
+
+    for op, value in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value).lower())
+            continue
+        close_run()
+        if op is sre_parse.SUBPATTERN:
+            found = _sequence_literals(value[-1])
+        elif op is sre_parse.BRANCH:
+            branches = [_sequence_literals(branch) for branch in value[1]]
+            found = frozenset().union(*branches) if branches and all(branches) else None
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and value[0] >= 1:
+            found = _sequence_literals(value[2])
+        else:
+            found = None
+        if found:
+            candidates.append(found)
+    close_run()
+    if not candidates:
+        return None
+    return max(candidates, key=lambda literals: (min(len(literal) for literal in literals), -len(literals)))
+
+
+def required_literals(pattern: str) -> Optional[FrozenSet[str]]:
+    """Extrai literais (em minúsculas) dos quais ao menos um aparece em todo match do padrão; None quando não há âncora"""
+    try:
+        return _sequence_literals(sre_parse.parse(pattern).data)
+    except Exception:
+        return None
+
+
+class CompiledRuleSet:
+    """Conjunto de regras compilado uma única vez.
+
+    Cada regra tem seus literais obrigatórios extraídos na compilação e todos
+    entram em um autômato Aho-Corasick (pyahocorasick, quando instalado; senão
+    uma busca ``str.find`` por literal). Uma passada sobre o texto normalizado
+    aponta as linhas candidatas e só essas linhas são verificadas com a regex
+    da regra, preservando a semântica de ``re.search`` por linha e por padrão.
+    """
+
+    def __init__(self, rules: Sequence[Rule], flags: int = re.IGNORECASE):
+        self.rules = tuple(rules)
+        self._checks = tuple((re.compile(rule.pattern, flags).search, rule.requires, rule) for rule in self.rules)
+        literals: Dict[str, List[int]] = {}
+        self._unanchored: List[int] = []
+        for index, rule in enumerate(self.rules):
+            anchors = required_literals(rule.pattern)
+            if not anchors or "" in anchors:
+                self._unanchored.append(index)
+                continue
+            for literal in anchors:
+                literals.setdefault(literal, []).append(index)
+        self._literals = {literal: tuple(indexes) for literal, indexes in literals.items()}
+        self._automaton = None
+        if ahocorasick is not None and self._literals:
+            automaton = ahocorasick.Automaton()
+            for literal, indexes in self._literals.items():
+                automaton.add_word(literal, indexes)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def _literal_hits(self, folded: str, newlines: List[int]) -> Dict[int, set]:
+        """Mapeia índice de linha -> regras cujo literal obrigatório aparece nela"""
+        hits: Dict[int, set] = {}
+        if self._automaton is not None:
+            for end, rule_indexes in self._automaton.iter(folded):
+                hits.setdefault(bisect_left(newlines, end), set()).update(rule_indexes)
+            return hits
+        find = folded.find
+        for literal, rule_indexes in self._literals.items():
+            position = find(literal)
+            while position != -1:
+                line_index = bisect_left(newlines, position)
+                hits.setdefault(line_index, set()).update(rule_indexes)
+                position = find(literal, newlines[line_index] + 1)
+        return hits
+
+    def _candidates(self, text: str) -> Tuple[List[str], Dict[int, set]]:
+        folded = text.lower() if text.isascii() else text.translate(CASE_FOLD_EXTRA).lower()
+        lines = text.split("\n")
+        newlines = [match.start() for match in NEWLINE.finditer(folded)]
+        newlines.append(len(folded))
+        hits = self._literal_hits(folded, newlines)
+        if self._unanchored:
+            for line_index in range(len(lines)):
+                hits.setdefault(line_index, set()).update(self._unanchored)
+        return lines, hits
+
+    def matches(self, text: str) -> Iterator[Tuple[int, str, Rule]]:
+        """Gera (número da linha, linha, regra) na ordem do texto e, dentro da linha, na ordem das regras"""
+        if not self.rules:
+            return
+        lines, hits = self._candidates(text)
+        checks = self._checks
+        for line_index in sorted(hits):
+            line = lines[line_index]
+            for rule_index in sorted(hits[line_index]):
+                check, requires, rule = checks[rule_index]
+                if (requires is None or requires in line) and check(line):
+                    yield line_index + 1, line, rule
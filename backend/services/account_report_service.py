@@ -0,0 +1,199 @@
+"""Full-account PDF report built in one pass over the user's scans with bounded memory."""
+
+import hashlib
+import heapq
+import json
+import tempfile
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from models.scan import SUMMARY_SEVERITIES, Scan
+from scanners.pdf_generator import generate_pdf_report
+
+SCAN_BATCH = 100
+DETAIL_PER_SEVERITY = 50
+PRIORITY_LIMIT = 10
+APPENDIX_SCANS = 100
+EXCERPT_CHARS = 3000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+STREAM_CHUNK = 64 * 1024
+TOOLS = {
+    'code': 'Code Scanner',
+    'api': 'API Scanner',
+    'dependencies': 'Dependency Scanner',
+    'docker': 'Docker Scanner',
+    'graphql': 'GraphQL Scanner',
+    'network': 'Port Scanner',
+}
+SEVERITY_RANK = {'CRITICAL': 4, 'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+# Same identity as extended_scan_routes._dedupe_findings.
+IDENTITY_FIELDS = ("type", "severity", "description", "endpoint", "parameter", "file", "line", "port", "code", "package", "cve")
+
+
+def extract_vulnerabilities(results: Any) -> List[dict]:
+    vulns: Any = []
+    if isinstance(results, dict):
+        if results.get('vulnerabilities'):
+            vulns = results['vulnerabilities']
+        elif results.get('findings'):
+            vulns = results['findings']
+        elif results.get('endpoint_results'):
+            vulns = [v for er in results['endpoint_results'] for v in er.get('vulnerabilities', [])]
+    if isinstance(vulns, dict):
+        vulns = list(vulns.values())
+    if not isinstance(vulns, list):
+        return []
+    return [v for v in vulns if isinstance(v, dict)]
+
+
+def excerpt(value: Any) -> str:
+    try:
+        raw = json.dumps(value, ensure_ascii=False, indent=2)
+    except Exception:
+        raw = str(value)
+    return raw[:EXCERPT_CHARS] + ('\n... (conteúdo truncado)' if len(raw) > EXCERPT_CHARS else '')
+
+
+def _severity(value: Any) -> str:
+    severity = str(value or '').upper()
+    return severity if severity in SEVERITY_RANK else 'INFO'
+
+
+def _cvss(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FindingAccumulator:
+    """Deduplicates findings and keeps counters plus capped detail lists instead of every finding."""
+
+    def __init__(self, detail_per_severity: int = DETAIL_PER_SEVERITY, priority_limit: int = PRIORITY_LIMIT):
+        self.detail_per_severity = detail_per_severity
+        self.priority_limit = priority_limit
+        self.seen = set()
+        self.counts = {severity: 0 for severity in (*SEVERITY_RANK, 'INFO')}
+        self.details: Dict[str, List[dict]] = {severity: [] for severity in SEVERITY_RANK}
+        self._priority: List[tuple] = []
+        self._order = 0
+
+    def add(self, finding: dict) -> None:
+        # 16-byte digests keep the dedupe set small however long the evidence strings are.
+        key = hashlib.blake2b("\x1f".join(str(finding.get(field, "")).strip().lower() for field in IDENTITY_FIELDS).encode(), digest_size=16).digest()
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        severity = _severity(finding.get('severity'))
+        self.counts[severity] += 1
+        if severity in self.details and len(self.details[severity]) < self.detail_per_severity:
+            self.details[severity].append(finding)
+        # Min-heap of the highest (severity, cvss); the order counter keeps the first observed on ties.
+        self._order += 1
+        item = (SEVERITY_RANK.get(severity, 0), _cvss(finding.get('cvss')), -self._order, finding)
+        if len(self._priority) < self.priority_limit:
+            heapq.heappush(self._priority, item)
+        elif item[:3] > self._priority[0][:3]:
+            heapq.heapreplace(self._priority, item)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def prioritized(self) -> List[dict]:
+        return [item[3] for item in sorted(self._priority, key=lambda item: item[:3], reverse=True)]
+
+    def detail(self) -> List[dict]:
+        return [finding for severity in SEVERITY_RANK for finding in self.details[severity]]
+
+
+def _iter_scans(db: Session, user_id: int) -> Iterator[Scan]:
+    query = (
+        select(Scan)
+        .options(selectinload(Scan.result))
+        .where(Scan.user_id == user_id)
+        .order_by(Scan.created_at.desc(), Scan.id.desc())
+        .execution_options(yield_per=SCAN_BATCH)
+    )
+    for scan in db.scalars(query):
+        yield scan
+        # Drop the scan and its payload from the identity map once it has been folded in.
+        db.expunge(scan)
+
+
+def collect_account_report(db: Session, user_id: int, extra_items: Iterable[dict] = ()) -> Dict[str, Any]:
+    findings = FindingAccumulator()
+    tools: Dict[str, Dict[str, Any]] = {}
+    scans_details: List[dict] = []
+    total_scans = 0
+    omitted_scans = 0
+    for scan in _iter_scans(db, user_id):
+        total_scans += 1
+        tool = TOOLS.get(scan.scan_type, scan.scan_type)
+        try:
+            results = scan.load_results() or {}
+        except Exception:
+            results = {}
+        for vuln in extract_vulnerabilities(results):
+            detailed = dict(vuln)
+            detailed.setdefault('scan_id', scan.id)
+            detailed.setdefault('scanner', tool)
+            detailed.setdefault('file', scan.target)
+            findings.add(detailed)
+        entry = tools.setdefault(tool, {'tool': tool, 'scans': 0, 'vulnerabilities': 0})
+        entry['scans'] += 1
+        entry['vulnerabilities'] += scan.findings_total or 0
+        if len(scans_details) >= APPENDIX_SCANS:
+            omitted_scans += 1
+            continue
+        scans_details.append({
+            'id': scan.id,
+            'tool': tool,
+            'scan_type': scan.scan_type,
+            'target': scan.target,
+            'created_at': scan.created_at.isoformat(),
+            'total_vulnerabilities': scan.findings_total or 0,
+            'severity_count': {severity.upper(): getattr(scan, f"{severity}_count") or 0 for severity in SUMMARY_SEVERITIES},
+            'raw_excerpt': excerpt(results),
+        })
+    for item in extra_items:
+        entry = tools.setdefault(item['tool'], {'tool': item['tool'], 'scans': 0, 'vulnerabilities': 0})
+        entry['scans'] += 1
+        scans_details.append(item)
+
+    severity_count = {severity: findings.counts[severity] for severity in SEVERITY_RANK}
+    summary = {'total': findings.total, **{severity.lower(): count for severity, count in severity_count.items()}}
+    return {
+        'scan_id': 'ALL',
+        'scan_type': 'full',
+        'target': 'Todos',
+        'report_theme': 'platform',
+        'created_at': datetime.utcnow().isoformat(),
+        'summary': summary,
+        'vulnerabilities': findings.detail(),
+        'prioritized_vulnerabilities': findings.prioritized(),
+        'severity_totals': severity_count,
+        'user_overview': {'total_scans': total_scans, 'total_vulnerabilities': findings.total, 'severity_count': severity_count},
+        'tools_summary': list(tools.values()),
+        'scans_details': scans_details,
+        'omitted_scans': omitted_scans,
+    }
+
+
+def write_account_report(db: Session, user_id: int, extra_items: Iterable[dict] = (), output: Optional[BinaryIO] = None) -> BinaryIO:
+    """Render the report into a spooled temporary file (memory up to SPOOL_MAX_BYTES, disk beyond) positioned at 0."""
+    output = output or tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    generate_pdf_report(collect_account_report(db, user_id, extra_items), output)
+    output.seek(0)
+    return output
+
+
+def iter_file(handle: BinaryIO, chunk_size: int = STREAM_CHUNK) -> Iterator[bytes]:
+    try:
+        while chunk := handle.read(chunk_size):
+            yield chunk
+    finally:
+        handle.close()
@@ -67,6 +67,41 @@ def queue_security_alerts(db: Session, event: SecurityEvent) -> int:
     return queued
 
 
+def queue_security_alerts_batch(db: Session, events: list[SecurityEvent]) -> int:
+    """queue_security_alerts for a batch of events with one subscription query, one dedupe query and one flush."""
+    events = list({event.id: event for event in events}.values())
+    if not events:
+        return 0
+    subscriptions = db.query(SecurityAlertSubscription).filter(
+        SecurityAlertSubscription.organization_id.in_({event.organization_id for event in events}),
+        SecurityAlertSubscription.enabled.is_(True),
+    ).all()
+    candidates = [
+        (subscription, event, f"event:{event.id}:{event.occurrence_count}")
+        for event in events for subscription in subscriptions
+        if subscription.organization_id == event.organization_id
+        and SEVERITY_RANK.get(event.severity, 0) >= SEVERITY_RANK.get(subscription.minimum_severity, 3)
+    ]
+    if not candidates:
+        return 0
+    existing = set(db.query(SecurityAlertDelivery.subscription_id, SecurityAlertDelivery.dedupe_key).filter(
+        SecurityAlertDelivery.subscription_id.in_({subscription.id for subscription, _, _ in candidates}),
+        SecurityAlertDelivery.dedupe_key.in_({key for _, _, key in candidates}),
+    ).all())
+    deliveries = [
+        SecurityAlertDelivery(organization_id=event.organization_id, subscription_id=subscription.id, security_event_id=event.id, dedupe_key=key, status="queued")
+        for subscription, event, key in candidates if (subscription.id, key) not in existing
+    ]
+    db.add_all(deliveries)
+    try:
+        with db.begin_nested():
+            db.flush()
+    except IntegrityError:
+        # A concurrent ingest queued some of them first: fall back to per-delivery savepoints.
+        return sum(queue_security_alerts(db, event) for event in events)
+    return len(deliveries)
+
+
 def _event_payload(db: Session, delivery: SecurityAlertDelivery) -> dict:
     event = db.query(SecurityEvent).filter(SecurityEvent.id == delivery.security_event_id).first()
     if not event:
@@ -0,0 +1,54 @@
+"""Per-organization protection allowlists compiled into prefix trees and cached in process."""
+
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.saas import ProtectionAllowlist
+from services.ip_prefix_tree import PrefixTree
+
+_lock = threading.Lock()
+_compiled: dict[int, tuple[float, PrefixTree]] = {}
+_generations: dict[int, int] = {}
+
+
+def compiled_allowlist(db: Session, organization_id: int) -> PrefixTree:
+    """Active allowlist of the organization; each prefix carries its asset scope (None = every asset).
+
+    Entries are dropped by invalidate_allowlist in this process and expire after
+    ALLOWLIST_CACHE_SECONDS, which bounds how long other processes serve a stale copy.
+    """
+    now = time.monotonic()
+    cached = _compiled.get(organization_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    generation = _generations.get(organization_id, 0)
+    tree = PrefixTree()
+    for network, asset_id in db.query(ProtectionAllowlist.network, ProtectionAllowlist.asset_id).filter(
+        ProtectionAllowlist.organization_id == organization_id,
+        ProtectionAllowlist.active.is_(True),
+    ):
+        try:
+            tree.add(network, asset_id)
+        except ValueError:
+            continue
+    with _lock:
+        # An invalidation while the rows were loading means they may predate it: use them once, don't cache.
+        if _generations.get(organization_id, 0) == generation:
+            _compiled[organization_id] = (now + settings.ALLOWLIST_CACHE_SECONDS, tree)
+    return tree
+
+
+def is_allowlisted(db: Session, organization_id: int, asset_id: int | None, value: str | None) -> bool:
+    return any(
+        scope is None or (asset_id is not None and scope == asset_id)
+        for scope in compiled_allowlist(db, organization_id).matches(value)
+    )
+
+
+def invalidate_allowlist(organization_id: int) -> None:
+    with _lock:
+        _generations[organization_id] = _generations.get(organization_id, 0) + 1
+        _compiled.pop(organization_id, None)
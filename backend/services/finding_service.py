@@ -5,14 +5,20 @@ import json
 from datetime import datetime
 from typing import Any, Iterable, Optional
 
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from models.saas import Asset, Finding, Organization, OrganizationMember
 from models.user import User
+from risk.engine import track_inserted_findings
 
 SEVERITIES = {"informational", "low", "medium", "high", "critical"}
 SEVERITY_ALIASES = {"info": "informational", "informative": "informational", "warning": "medium"}
 CONFIDENCES = {"low", "medium", "high", "confirmed"}
+FINGERPRINT_CHUNK = 500
+INSERT_BATCH_SIZE = 1000
 
 
 def normalize_severity(value: Any) -> str:
@@ -71,45 +77,110 @@ def get_or_create_asset(db: Session, organization_id: int, target: str, asset_ty
     return asset
 
 
+def _existing_findings(db: Session, organization_id: int, fingerprints: Iterable[str]) -> dict[str, Finding]:
+    existing = {}
+    fingerprints = list(dict.fromkeys(fingerprints))
+    for start in range(0, len(fingerprints), FINGERPRINT_CHUNK):
+        chunk = fingerprints[start:start + FINGERPRINT_CHUNK]
+        for finding in db.query(Finding).filter(Finding.organization_id == organization_id, Finding.fingerprint.in_(chunk)):
+            existing[finding.fingerprint] = finding
+    return existing
+
+
+def _touch_finding(finding: Finding, item: dict, now: datetime) -> None:
+    finding.last_seen_at = now
+    finding.occurrence_count = (finding.occurrence_count or 0) + 1
+    finding.evidence = str(_value(item, "evidence", "details", "description", default=finding.evidence or ""))[:10000]
+    if finding.status in {"resolved", "false_positive"}:
+        finding.status = "open"
+
+
+def _new_finding_row(organization_id: int, asset_id: int, scan_job_id: Optional[int], scanner_source: str, fingerprint: str, item: dict, now: datetime) -> dict:
+    return {
+        "organization_id": organization_id,
+        "asset_id": asset_id,
+        "scan_job_id": scan_job_id,
+        "fingerprint": fingerprint,
+        "title": str(_value(item, "title", "name", "type", default="Security finding"))[:255],
+        "description": str(_value(item, "description", "details", default="Resultado normalizado de scanner"))[:10000],
+        "category": str(_value(item, "category", "type", default="security"))[:80],
+        "severity": normalize_severity(_value(item, "severity", "level", default="medium")),
+        "confidence": normalize_confidence(_value(item, "confidence", default="medium")),
+        "status": "open",
+        "cve": _value(item, "cve"),
+        "cwe": _value(item, "cwe"),
+        "cvss_score": str(_value(item, "cvss", "cvss_score", default=""))[:16] or None,
+        "evidence": str(_value(item, "evidence", "details", default=""))[:10000],
+        "remediation": str(_value(item, "remediation", "recommendation", "solution", default=""))[:10000],
+        "scanner_source": scanner_source[:80],
+        "occurrence_count": 1,
+        "first_seen_at": now,
+        "last_seen_at": now,
+    }
+
+
+def _merge_new_row(finding: Finding, row: dict) -> None:
+    finding.last_seen_at = row["last_seen_at"]
+    finding.occurrence_count = (finding.occurrence_count or 0) + row["occurrence_count"]
+    finding.evidence = row["evidence"]
+    if finding.status in {"resolved", "false_positive"}:
+        finding.status = "open"
+
+
+def _insert_findings(db: Session, rows: list[dict]) -> dict[str, Finding]:
+    """Batched insert of new findings; returns only the rows actually inserted.
+
+    On PostgreSQL and SQLite a row whose (organization_id, fingerprint) was inserted
+    by a concurrent scan since the lookup is skipped instead of failing the batch."""
+    dialect = db.get_bind().dialect.name
+    if dialect in {"postgresql", "sqlite"}:
+        statement = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(Finding).on_conflict_do_nothing(
+            index_elements=[Finding.organization_id, Finding.fingerprint],
+        )
+    else:
+        statement = insert(Finding)
+    inserted = {}
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        result = db.scalars(statement.returning(Finding), rows[start:start + INSERT_BATCH_SIZE], execution_options={"populate_existing": True})
+        inserted.update((finding.fingerprint, finding) for finding in result)
+    return inserted
+
+
 def persist_scan_findings(db: Session, user: User, results: Any, scanner_source: str, target: str, scan_job_id: Optional[int] = None) -> list[Finding]:
+    """Upsert a scan's findings with one chunked IN lookup and batched writes instead of a query per finding.
+
+    Returns one Finding per input item, in input order; items sharing a fingerprint share the Finding."""
     organization = get_default_organization(db, user)
     if not organization:
         return []
     asset = get_or_create_asset(db, organization.id, target)
-    persisted = []
-    for item in _as_findings(results):
-        severity = normalize_severity(_value(item, "severity", "level", default="medium"))
-        confidence = normalize_confidence(_value(item, "confidence", default="medium"))
-        fingerprint = finding_fingerprint(organization.id, asset.id, scanner_source, item)
-        finding = db.query(Finding).filter(Finding.organization_id == organization.id, Finding.fingerprint == fingerprint).first()
-        now = datetime.utcnow()
-        if finding:
-            finding.last_seen_at = now
-            finding.occurrence_count = (finding.occurrence_count or 0) + 1
-            finding.evidence = str(_value(item, "evidence", "details", "description", default=finding.evidence or ""))[:10000]
-            if finding.status in {"resolved", "false_positive"}:
-                finding.status = "open"
+    items = _as_findings(results)
+    fingerprints = [finding_fingerprint(organization.id, asset.id, scanner_source, item) for item in items]
+    existing = _existing_findings(db, organization.id, fingerprints)
+    now = datetime.utcnow()
+    new_rows: dict[str, dict] = {}
+    for fingerprint, item in zip(fingerprints, items):
+        if fingerprint in existing:
+            _touch_finding(existing[fingerprint], item, now)
+        elif fingerprint in new_rows:
+            row = new_rows[fingerprint]
+            row["occurrence_count"] += 1
+            row["evidence"] = str(_value(item, "evidence", "details", "description", default=row["evidence"] or ""))[:10000]
         else:
-            finding = Finding(
-                organization_id=organization.id,
-                asset_id=asset.id,
-                scan_job_id=scan_job_id,
-                fingerprint=fingerprint,
-                title=str(_value(item, "title", "name", "type", default="Security finding"))[:255],
-                description=str(_value(item, "description", "details", default="Resultado normalizado de scanner"))[:10000],
-                category=str(_value(item, "category", "type", default="security"))[:80],
-                severity=severity,
-                confidence=confidence,
-                cve=_value(item, "cve"),
-                cwe=_value(item, "cwe"),
-                cvss_score=str(_value(item, "cvss", "cvss_score", default=""))[:16] or None,
-                evidence=str(_value(item, "evidence", "details", default=""))[:10000],
-                remediation=str(_value(item, "remediation", "recommendation", "solution", default=""))[:10000],
-                scanner_source=scanner_source[:80],
-                first_seen_at=now,
-                last_seen_at=now,
-            )
-            db.add(finding)
-        persisted.append(finding)
+            new_rows[fingerprint] = _new_finding_row(organization.id, asset.id, scan_job_id, scanner_source, fingerprint, item, now)
     db.flush()
-    return persisted
+    pending = list(new_rows.values())
+    while pending:
+        inserted = _insert_findings(db, pending)
+        track_inserted_findings(db, inserted.values())
+        existing.update(inserted)
+        raced = [row["fingerprint"] for row in pending if row["fingerprint"] not in inserted]
+        # Inserted by a concurrent scan since the lookup: merged through the ORM, so the risk
+        # aggregate gets the change against the stored status instead of a second full count.
+        found = _existing_findings(db, organization.id, raced) if raced else {}
+        for fingerprint, finding in found.items():
+            _merge_new_row(finding, new_rows[fingerprint])
+        existing.update(found)
+        # A conflicting row that is gone again (its transaction rolled back) is inserted on the next pass.
+        pending = [new_rows[fingerprint] for fingerprint in raced if fingerprint not in found]
+    return [existing[fingerprint] for fingerprint in fingerprints]
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 import os
 import socket
 
+from config import settings
 from models.saas import ProcessHeartbeat
 
 
@@ -20,10 +21,12 @@ def beat(db, process_type: str, metadata: dict | None = None):
 
 def process_status(db) -> dict:
     thresholds = {"worker": 30, "scheduler": 660}
+    if settings.SHIELD_SCHEDULER != "off":
+        thresholds["shield_scheduler"] = 120
     result = {}
     now = datetime.utcnow()
     for process_type, max_age in thresholds.items():
         latest = db.query(ProcessHeartbeat).filter(ProcessHeartbeat.process_type == process_type).order_by(ProcessHeartbeat.last_seen_at.desc()).first()
         age = int((now - latest.last_seen_at).total_seconds()) if latest else None
-        result[process_type] = {"healthy": age is not None and age <= max_age, "age_seconds": age, "last_seen_at": latest.last_seen_at.isoformat() if latest else None, "instances": db.query(ProcessHeartbeat).filter(ProcessHeartbeat.process_type == process_type, ProcessHeartbeat.last_seen_at >= now - timedelta(seconds=max_age)).count()}
+        result[process_type] = {"healthy": age is not None and age <= max_age, "age_seconds": age, "last_seen_at": latest.last_seen_at.isoformat() if latest else None, "instances": db.query(ProcessHeartbeat).filter(ProcessHeartbeat.process_type == process_type, ProcessHeartbeat.last_seen_at >= now - timedelta(seconds=max_age)).count(), "metrics": latest.metadata_json if latest else None}
     return result
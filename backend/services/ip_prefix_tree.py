@@ -0,0 +1,97 @@
+"""Binary radix (Patricia) tree answering "which stored IPv4/IPv6 prefixes contain this address"."""
+
+import ipaddress
+from typing import Any, Iterable, Iterator
+
+WIDTHS = {4: 32, 6: 128}
+
+
+class _Node:
+    __slots__ = ("bits", "length", "children", "values")
+
+    def __init__(self, bits: int, length: int, values: list | None = None):
+        self.bits = bits
+        self.length = length
+        self.children: list = [None, None]
+        self.values = values
+
+
+def _parse(address) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+    if isinstance(address, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        return address
+    try:
+        return ipaddress.ip_address(str(address or "").strip())
+    except ValueError:
+        return None
+
+
+class PrefixTree:
+    """Path-compressed binary trie per IP version.
+
+    A lookup follows at most one node per stored prefix or branch point on the
+    address's path, i.e. O(prefix length) bit work however many networks are
+    stored. Each prefix carries the values it was added with (an allowlist scope,
+    for instance); `None` is a valid value.
+    """
+
+    def __init__(self, networks: Iterable = ()):
+        self._roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self.size = 0
+        for network in networks:
+            self.add(network)
+
+    def add(self, network, value: Any = None) -> None:
+        network = network if isinstance(network, (ipaddress.IPv4Network, ipaddress.IPv6Network)) else ipaddress.ip_network(str(network).strip(), strict=False)
+        width = WIDTHS[network.version]
+        length = network.prefixlen
+        bits = int(network.network_address) >> (width - length)
+        node = self._roots[network.version]
+        self.size += 1
+        while True:
+            if node.length == length:
+                node.values = (node.values or []) + [value]
+                return
+            branch = (bits >> (length - node.length - 1)) & 1
+            child = node.children[branch]
+            if child is None:
+                node.children[branch] = _Node(bits, length, [value])
+                return
+            shared = min(child.length, length)
+            common = shared - ((child.bits >> (child.length - shared)) ^ (bits >> (length - shared))).bit_length()
+            if common == child.length:
+                node = child
+                continue
+            # Split the edge at the first differing bit.
+            middle = _Node(bits >> (length - common), common)
+            middle.children[(child.bits >> (child.length - common - 1)) & 1] = child
+            node.children[branch] = middle
+            if common == length:
+                middle.values = [value]
+            else:
+                middle.children[(bits >> (length - common - 1)) & 1] = _Node(bits, length, [value])
+            return
+
+    def matches(self, address) -> Iterator[Any]:
+        """Values of every stored prefix containing `address`, shortest prefix first."""
+        parsed = _parse(address)
+        if parsed is None:
+            return
+        width = WIDTHS[parsed.version]
+        value = int(parsed)
+        node = self._roots[parsed.version]
+        while node is not None:
+            if value >> (width - node.length) != node.bits:
+                return
+            if node.values:
+                yield from node.values
+            if node.length == width:
+                return
+            node = node.children[(value >> (width - node.length - 1)) & 1]
+
+    def __contains__(self, address) -> bool:
+        for _ in self.matches(address):
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return self.size
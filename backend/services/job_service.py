@@ -1,34 +1,250 @@
 """Durable database queue used by dedicated worker processes."""
 
-from datetime import datetime
-from typing import Optional
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Callable, Iterable, Iterator, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, event, func, or_, text, update
+from sqlalchemy.orm import Session, aliased
 
+from config import settings
 from models.saas import ScanJob
+from services.heartbeat_service import INSTANCE_ID
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_JOB_TYPES = {"web_security_scan", "authenticated_web_scan", "security_snapshot", "executive_report", "technical_report"}
+# Higher runs first: on-demand scans and reports ahead of the scheduler's periodic snapshots.
+JOB_PRIORITIES = {"web_security_scan": 50, "authenticated_web_scan": 50, "executive_report": 40, "technical_report": 40, "security_snapshot": 10}
+CLAIM_WINDOW_FACTOR = 4
+JOB_CHANNEL = "scan_jobs"
+_PENDING_WAKEUP = "scan_jobs_wakeup"
+_redis = None
+
+
+def _redis_client():
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        try:
+            import redis
+            client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+            client.ping()
+            _redis = client
+        except Exception:
+            _redis = False
+    return _redis or None
+
+
+def _signal_workers(db: Session, job_type: str) -> None:
+    """Wake idle workers once the enqueuing transaction commits.
+
+    PostgreSQL delivers NOTIFY only on commit; elsewhere the Redis publish is deferred to after_commit.
+    """
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": JOB_CHANNEL, "payload": job_type})
+    else:
+        db.info.setdefault(_PENDING_WAKEUP, set()).add(job_type)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_wakeups(session: Session) -> None:
+    pending = session.info.pop(_PENDING_WAKEUP, None)
+    client = _redis_client() if pending else None
+    if client is not None:
+        for job_type in pending:
+            try:
+                client.publish(JOB_CHANNEL, job_type)
+            except Exception:
+                break
 
 
-def enqueue_job(db: Session, organization_id: int, user_id: int, job_type: str, asset_id: Optional[int] = None) -> ScanJob:
+@event.listens_for(Session, "after_rollback")
+def _discard_wakeups(session: Session) -> None:
+    session.info.pop(_PENDING_WAKEUP, None)
+
+
+def current_worker_id() -> str:
+    """Lease owner recorded in ScanJob.locked_by."""
+    return f"{INSTANCE_ID}:{os.getpid()}"
+
+
+def enqueue_job(db: Session, organization_id: int, user_id: int, job_type: str, asset_id: Optional[int] = None, priority: Optional[int] = None) -> ScanJob:
     if job_type not in ALLOWED_JOB_TYPES:
         raise ValueError("Unsupported job type")
-    job = ScanJob(organization_id=organization_id, asset_id=asset_id, scanner_type=job_type, status="queued", progress=0, created_by=user_id)
+    job = ScanJob(
+        organization_id=organization_id, asset_id=asset_id, scanner_type=job_type, status="queued", progress=0, created_by=user_id,
+        priority=JOB_PRIORITIES.get(job_type, 0) if priority is None else priority, max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
     db.add(job)
     db.flush()
+    _signal_workers(db, job_type)
     return job
 
 
-def claim_next_job(db: Session) -> Optional[ScanJob]:
-    query = db.query(ScanJob).filter(ScanJob.status == "queued").order_by(ScanJob.created_at.asc())
+def _fair_pick(candidates: list[ScanJob], limit: int, type_capacity: dict[str, int]) -> list[ScanJob]:
+    """Highest priority first; within a priority level, round-robin across organizations
+    (those with fewer running jobs first) so a tenant with a large backlog cannot starve the others."""
+    capacity = dict(type_capacity)
+    picked = []
+    for _, level in groupby(candidates, key=lambda job: job.priority):
+        queues: dict[int, deque] = {}
+        for job in level:
+            queues.setdefault(job.organization_id, deque()).append(job)
+        while queues and len(picked) < limit:
+            for organization_id in list(queues):
+                queue = queues[organization_id]
+                while queue and capacity.get(queue[0].scanner_type, limit) <= 0:
+                    queue.popleft()
+                if not queue:
+                    del queues[organization_id]
+                    continue
+                job = queue.popleft()
+                picked.append(job)
+                if job.scanner_type in capacity:
+                    capacity[job.scanner_type] -= 1
+                if len(picked) >= limit:
+                    break
+        if len(picked) >= limit:
+            break
+    return picked
+
+
+def claim_jobs(db: Session, limit: int = 1, type_capacity: Optional[dict[str, int]] = None, worker_id: Optional[str] = None) -> list[ScanJob]:
+    """Lease up to `limit` jobs with one locking statement.
+
+    Queued jobs whose retry delay has passed and running jobs whose lease expired
+    (crashed worker) are both claimable. On PostgreSQL the candidate window is
+    locked with FOR UPDATE SKIP LOCKED, so concurrent workers claim disjoint jobs.
+    `type_capacity` maps a job type to the slots still free for it.
+    """
+    type_capacity = type_capacity or {}
+    now = datetime.utcnow()
+    running_jobs = aliased(ScanJob)
+    running = (
+        db.query(running_jobs.organization_id.label("organization_id"), func.count(running_jobs.id).label("running"))
+        .filter(running_jobs.status == "running")
+        .group_by(running_jobs.organization_id)
+        .subquery()
+    )
+    query = db.query(ScanJob).outerjoin(running, running.c.organization_id == ScanJob.organization_id).filter(or_(
+        and_(ScanJob.status == "queued", or_(ScanJob.available_at.is_(None), ScanJob.available_at <= now)),
+        and_(ScanJob.status == "running", ScanJob.lease_expires_at < now),
+    ))
+    saturated = [job_type for job_type, free in type_capacity.items() if free <= 0]
+    if saturated:
+        query = query.filter(ScanJob.scanner_type.notin_(saturated))
+    query = query.order_by(ScanJob.priority.desc(), func.coalesce(running.c.running, 0).asc(), ScanJob.created_at.asc(), ScanJob.id.asc())
+    query = query.limit(max(limit, 1) * CLAIM_WINDOW_FACTOR)
     if db.bind.dialect.name == "postgresql":
-        query = query.with_for_update(skip_locked=True)
-    job = query.first()
-    if not job:
-        return None
-    job.status = "running"
-    job.progress = 5
-    job.started_at = datetime.utcnow()
+        query = query.with_for_update(skip_locked=True, of=ScanJob)
+    claimed = []
+    for job in _fair_pick(query.all(), limit, type_capacity):
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.error = f"Worker lease expired after {job.attempts} attempts"
+            job.completed_at = now
+            job.lease_expires_at = job.locked_by = None
+            continue
+        job.status = "running"
+        job.progress = 5
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = now
+        job.lease_expires_at = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        job.locked_by = worker_id
+        claimed.append(job.id)
     db.commit()
-    db.refresh(job)
-    return job
+    if not claimed:
+        return []
+    jobs = {job.id: job for job in db.query(ScanJob).filter(ScanJob.id.in_(claimed))}
+    return [jobs[job_id] for job_id in claimed]
+
+
+def claim_next_job(db: Session, exclude_types: Optional[Iterable[str]] = None, worker_id: Optional[str] = None) -> Optional[ScanJob]:
+    jobs = claim_jobs(db, 1, {job_type: 0 for job_type in exclude_types or ()}, worker_id)
+    return jobs[0] if jobs else None
+
+
+def claim_job(db: Session, job_id: int, worker_id: Optional[str] = None) -> Optional[ScanJob]:
+    """Lease one specific queued job (compare-and-set), e.g. when the API runs it in a background task."""
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(ScanJob)
+        .where(ScanJob.id == job_id, ScanJob.status == "queued")
+        .values(status="running", progress=5, attempts=ScanJob.attempts + 1, started_at=now, lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS), locked_by=worker_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return db.query(ScanJob).filter(ScanJob.id == job_id).first() if claimed else None
+
+
+def renew_leases(db: Session, job_ids: Iterable[int], worker_id: Optional[str] = None) -> int:
+    """Heartbeat: extend the leases of jobs this worker is still running."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return 0
+    renewed = db.execute(
+        update(ScanJob)
+        .where(ScanJob.id.in_(job_ids), ScanJob.status == "running", ScanJob.locked_by == worker_id if worker_id else ScanJob.locked_by.is_(None))
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return renewed
+
+
+@contextmanager
+def lease_heartbeat(session_factory: Callable[[], Session], job_id: int, worker_id: Optional[str] = None,
+                    interval: Optional[float] = None) -> Iterator[None]:
+    """Renew the lease of a job run outside the worker pool (e.g. an API background task) while the block runs.
+
+    Without it a run longer than JOB_LEASE_SECONDS looks abandoned and a worker
+    claims it again. Renewal stops once the lease is gone.
+    """
+    interval = settings.JOB_LEASE_SECONDS / 3 if interval is None else interval
+    done = threading.Event()
+
+    def renew() -> None:
+        while not done.wait(interval):
+            db = session_factory()
+            try:
+                if not renew_leases(db, [job_id], worker_id):
+                    return
+            except Exception as exc:
+                logger.warning("Lease renewal of job %s failed: %s", job_id, exc)
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=renew, name=f"job-lease-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def complete_job(job: ScanJob) -> None:
+    job.status = "completed"
+    job.progress = 100
+    job.completed_at = datetime.utcnow()
+    job.lease_expires_at = job.locked_by = None
+
+
+def fail_job(job: ScanJob, exc: Exception) -> None:
+    """Requeue with exponential backoff while attempts remain; ValueError marks a permanent failure."""
+    now = datetime.utcnow()
+    job.error = str(exc)[:2000]
+    job.lease_expires_at = job.locked_by = None
+    if not isinstance(exc, ValueError) and (job.attempts or 0) < (job.max_attempts or 1):
+        delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** max(0, (job.attempts or 1) - 1))
+        job.status = "queued"
+        job.progress = 0
+        job.available_at = now + timedelta(seconds=delay)
+        return
+    job.status = "failed"
+    job.completed_at = now
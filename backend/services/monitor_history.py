@@ -0,0 +1,250 @@
+"""Buffered Iron AI Shield check logs with compact payloads, hourly/daily rollups and retention."""
+
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.monitor import MonitorCheckRollup, MonitorLog
+
+logger = logging.getLogger(__name__)
+
+HEAVY_KEYS = ("security_scan", "deep_assessment", "vulnerabilities")
+CHECK_LOG_TYPES = ("check", "alert")
+PERIODS = ("hour", "day")
+MAX_BUFFERED = 10000
+
+
+def bucket_start(moment: datetime, period: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if period == "day" else moment
+
+
+def _payload_identity(heavy: dict) -> dict:
+    # Scan timestamps, response headers and HTTP banners change on every check; the findings and services do not.
+    scan = heavy.get("security_scan") or {}
+    deep = heavy.get("deep_assessment") or {}
+    return {
+        "vulnerabilities": heavy.get("vulnerabilities") or [],
+        "ports": [(item.get("port"), item.get("service"), item.get("version_info")) for item in scan.get("ports") or []],
+        "deep": {key: deep.get(key) for key in ("status_code", "summary", "tls", "error")},
+    }
+
+
+def split_payload(health_result: dict) -> tuple[dict, dict, str]:
+    """Log data of a check without its heavy scan payload, the payload and its hash.
+
+    Whether the payload is stored is decided when the batch is written, against
+    the latest payload in the database; the hash is always recorded in metadata.
+    """
+    metadata = dict(health_result.get("metadata") or {})
+    heavy = {key: metadata.pop(key) for key in HEAVY_KEYS if key in metadata}
+    payload_hash = hashlib.sha256(json.dumps(_payload_identity(heavy), sort_keys=True, default=str).encode()).hexdigest()
+    metadata["payload_hash"] = payload_hash
+    return {**health_result, "metadata": metadata}, heavy, payload_hash
+
+
+def _stored_hashes(db: Session, target_ids: set[int]) -> dict[int, str]:
+    latest = select(func.max(MonitorLog.id)).where(
+        MonitorLog.target_id.in_(target_ids), MonitorLog.payload_hash.isnot(None),
+    ).group_by(MonitorLog.target_id)
+    return dict(db.query(MonitorLog.target_id, MonitorLog.payload_hash).filter(MonitorLog.id.in_(latest)).all())
+
+
+def _compact_rows(db: Session, pending: list[tuple[dict, dict]]) -> list[dict]:
+    """Keep a check's payload only when its hash differs from the target's latest stored (or earlier batch) payload.
+
+    Reading the hash in the writing transaction, not from a per-process cache,
+    means a compact log always refers to a payload row that exists, whichever
+    process stored it.
+    """
+    latest = _stored_hashes(db, {row["target_id"] for row, _ in pending})
+    rows = []
+    for row, heavy in pending:
+        payload_hash = row["data"]["metadata"]["payload_hash"]
+        if payload_hash == latest.get(row["target_id"]):
+            rows.append({**row, "payload_hash": None})
+            continue
+        latest[row["target_id"]] = payload_hash
+        rows.append({**row, "data": {**row["data"], "metadata": {**row["data"]["metadata"], **heavy}}, "payload_hash": payload_hash})
+    return rows
+
+
+class MonitorLogWriter:
+    """Buffers check logs and their rollup increments and writes each batch in one transaction.
+
+    A batch is written once MONITOR_LOG_BATCH_SIZE checks are buffered or, via
+    flush_due(), MONITOR_LOG_FLUSH_SECONDS after its first check. A failed write
+    stays buffered (at most MAX_BUFFERED logs) for the next flush.
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal, batch_size: Optional[int] = None,
+                 flush_seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.MONITOR_LOG_BATCH_SIZE
+        self.flush_seconds = settings.MONITOR_LOG_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (log row, heavy payload) pairs; the payload is dropped at write time if unchanged.
+        self._rows: list[tuple[dict, dict]] = []
+        self._rollups: dict[tuple, list] = {}
+        self._oldest: Optional[float] = None
+
+    def add(self, db: Session, target, log_type: str, message: str, level: str, health_result: dict,
+            created_at: Optional[datetime] = None) -> None:
+        created_at = created_at or datetime.utcnow()
+        response_time = float(health_result.get("response_time") or 0)
+        failed = not health_result.get("is_healthy")
+        data, heavy, _ = split_payload(health_result)
+        with self._lock:
+            self._rows.append(({
+                "target_id": target.id, "user_id": target.user_id, "log_type": log_type, "message": message,
+                "level": level, "data": data, "created_at": created_at,
+            }, heavy))
+            for period in PERIODS:
+                totals = self._rollups.setdefault((target.id, target.user_id, period, bucket_start(created_at, period)), [0, 0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += int(failed)
+                totals[2] += response_time
+                totals[3] = max(totals[3], response_time)
+            if self._oldest is None:
+                self._oldest = self.clock()
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def pending_checks(self, target_id: int, since: datetime) -> int:
+        with self._lock:
+            return sum(1 for row, _ in self._rows if row["target_id"] == target_id and row["log_type"] == "check" and row["created_at"] >= since)
+
+    def flush_due(self) -> bool:
+        oldest = self._oldest
+        return oldest is not None and self.clock() - oldest >= self.flush_seconds
+
+    def flush(self) -> int:
+        """Write the buffered logs and rollups; returns the number of logs written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, rollups = self._rows, self._rollups
+                self._rows, self._rollups, self._oldest = [], {}, None
+            if not rows:
+                return 0
+            try:
+                self._write(rows, rollups)
+            except Exception as exc:
+                logger.warning("Monitor log batch of %s checks not written, keeping it buffered: %s", len(rows), exc)
+                with self._lock:
+                    self._rows = (rows + self._rows)[-MAX_BUFFERED:]
+                    for key, (checks, failures, total, peak) in rollups.items():
+                        totals = self._rollups.setdefault(key, [0, 0, 0.0, 0.0])
+                        totals[0] += checks
+                        totals[1] += failures
+                        totals[2] += total
+                        totals[3] = max(totals[3], peak)
+                    self._oldest = self._oldest or self.clock()
+                return 0
+            return len(rows)
+
+    def _write(self, rows: list[tuple[dict, dict]], rollups: dict[tuple, list]) -> None:
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                db.execute(insert(MonitorLog), _compact_rows(db, rows))
+                _apply_rollups(db, rollups)
+                db.commit()
+                return
+            except IntegrityError:
+                # Another writer created one of the buckets first; the retry updates it instead.
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+
+
+def _apply_rollups(db: Session, rollups: dict[tuple, list]) -> None:
+    table = MonitorCheckRollup
+    existing = {
+        (target_id, period, start): rollup_id
+        for rollup_id, target_id, period, start in db.query(table.id, table.target_id, table.period, table.bucket_start).filter(
+            table.target_id.in_({key[0] for key in rollups}),
+            table.bucket_start.in_({key[3] for key in rollups}),
+        )
+    }
+    for (target_id, user_id, period, start), (checks, failures, total, peak) in rollups.items():
+        rollup_id = existing.get((target_id, period, start))
+        if rollup_id is None:
+            db.add(table(target_id=target_id, user_id=user_id, period=period, bucket_start=start, checks=checks,
+                         failures=failures, response_time_sum=total, response_time_max=peak))
+            continue
+        # Increments in SQL, so concurrent writers never overwrite each other's counts.
+        db.query(table).filter(table.id == rollup_id).update({
+            table.checks: table.checks + checks,
+            table.failures: table.failures + failures,
+            table.response_time_sum: table.response_time_sum + total,
+            table.response_time_max: case((table.response_time_max < peak, peak), else_=table.response_time_max),
+        }, synchronize_session=False)
+    db.flush()
+
+
+def checks_since(db: Session, target_id: int, since: datetime, writer: Optional[MonitorLogWriter] = None) -> int:
+    """Check logs (not alerts) of the target created since `since`, counting those still buffered in `writer`."""
+    stored = db.query(func.count(MonitorLog.id)).filter(
+        MonitorLog.target_id == target_id,
+        MonitorLog.log_type == "check",
+        MonitorLog.created_at >= since,
+    ).scalar()
+    return stored + (writer or monitor_log_writer).pending_checks(target_id, since)
+
+
+def rollup_series(db: Session, target_id: int, period: str, since: datetime) -> list[dict[str, Any]]:
+    rows = db.query(MonitorCheckRollup).filter(
+        MonitorCheckRollup.target_id == target_id,
+        MonitorCheckRollup.period == period,
+        MonitorCheckRollup.bucket_start >= bucket_start(since, period),
+    ).order_by(MonitorCheckRollup.bucket_start.asc()).all()
+    return [{
+        "bucket_start": row.bucket_start,
+        "checks": row.checks,
+        "failures": row.failures,
+        "uptime": round((row.checks - row.failures) / row.checks * 100, 2) if row.checks else None,
+        "avg_response_time": round(row.response_time_sum / row.checks, 2) if row.checks else None,
+        "max_response_time": round(row.response_time_max, 2),
+    } for row in rows]
+
+
+def prune_history(db: Session, now: Optional[datetime] = None) -> dict[str, int]:
+    """Delete check logs and hourly rollups past retention; daily rollups are kept.
+
+    The newest log carrying each target's scan payload survives, since later
+    compact logs refer to it by hash.
+    """
+    now = now or datetime.utcnow()
+    keep = select(func.max(MonitorLog.id)).where(MonitorLog.payload_hash.isnot(None)).group_by(MonitorLog.target_id)
+    logs = db.query(MonitorLog).filter(
+        MonitorLog.target_id.isnot(None),
+        MonitorLog.log_type.in_(CHECK_LOG_TYPES),
+        MonitorLog.created_at < now - timedelta(days=settings.MONITOR_LOG_RETENTION_DAYS),
+        MonitorLog.id.notin_(keep),
+    ).delete(synchronize_session=False)
+    rollups = db.query(MonitorCheckRollup).filter(
+        MonitorCheckRollup.period == "hour",
+        MonitorCheckRollup.bucket_start < now - timedelta(days=settings.MONITOR_HOURLY_ROLLUP_RETENTION_DAYS),
+    ).delete(synchronize_session=False)
+    return {"logs": logs, "hourly_rollups": rollups}
+
+
+monitor_log_writer = MonitorLogWriter()
@@ -0,0 +1,121 @@
+"""Monitoring dashboard counters from one aggregate query, with a short per-organization cache."""
+
+from datetime import datetime, timedelta
+import threading
+import time
+from typing import Any, Callable
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.saas import ContainmentAction, Integration, SecurityEvent, SecuritySensor
+from services.security_monitoring_service import OPEN_EVENT_STATUSES
+
+ACTIVE_ACTION_STATUSES = ("approved", "executed", "release_pending")
+SENSOR_ACTIVE_WINDOW = timedelta(minutes=5)
+
+_lock = threading.Lock()
+_cached: dict[int, tuple[float, dict]] = {}
+_generations: dict[int, int] = {}
+_builds: dict[int, "_Build"] = {}
+
+
+class _Build:
+    """An overview snapshot being built; concurrent misses of the same generation wait for it."""
+
+    __slots__ = ("generation", "done", "snapshot")
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.done = threading.Event()
+        self.snapshot = None
+
+
+def overview_state(db: Session, organization_id: int, now: datetime | None = None) -> dict[str, Any]:
+    """Counters and containment context of the dashboard in four queries, whatever the event volume."""
+    now = now or datetime.utcnow()
+    is_open = SecurityEvent.status.in_(OPEN_EVENT_STATUSES)
+    # count() skips the NULLs of an unmatched CASE, so each column counts only its own condition.
+    open_count, critical_count, last_24h, latest_event_id = db.execute(select(
+        func.count(case((is_open, 1))),
+        func.count(case((and_(is_open, SecurityEvent.severity == "critical"), 1))),
+        func.count(case((SecurityEvent.last_seen_at >= now - timedelta(hours=24), 1))),
+        func.max(SecurityEvent.id),
+    ).where(SecurityEvent.organization_id == organization_id)).one()
+    sensors = db.query(SecuritySensor.asset_id, SecuritySensor.containment_enabled).filter(
+        SecuritySensor.organization_id == organization_id,
+        SecuritySensor.revoked_at.is_(None),
+        SecuritySensor.last_seen_at >= now - SENSOR_ACTIVE_WINDOW,
+    ).all()
+    actions = db.query(ContainmentAction.id, ContainmentAction.security_event_id, ContainmentAction.provider, ContainmentAction.status).filter(
+        ContainmentAction.organization_id == organization_id,
+        ContainmentAction.status.in_(ACTIVE_ACTION_STATUSES),
+    ).order_by(ContainmentAction.created_at.asc()).all()
+    waf = db.query(Integration.configuration).filter(
+        Integration.organization_id == organization_id,
+        Integration.provider == "cloudflare_waf",
+        Integration.status == "connected",
+    ).first()
+    host_firewall_assets = {asset_id for asset_id, containment_enabled in sensors if containment_enabled}
+    return {
+        "metrics": {
+            "open": open_count or 0,
+            "critical": critical_count or 0,
+            "last_24h": last_24h or 0,
+            "active_sensors": len(sensors),
+            "host_firewalls": sum(1 for _, containment_enabled in sensors if containment_enabled),
+            "active_blocks": sum(1 for *_, status in actions if status == "executed"),
+        },
+        "latest_event_id": latest_event_id or 0,
+        # The most recent action wins, as the dashboard shows one containment per event.
+        "action_by_event": {event_id: (action_id, provider) for action_id, event_id, provider, _ in actions if event_id},
+        "host_firewall_assets": host_firewall_assets,
+        "waf_configuration": (waf[0] or {}) if waf else None,
+    }
+
+
+def cached_overview(organization_id: int, build: Callable[[], dict]) -> dict:
+    """Snapshot of the organization's overview, rebuilt at most every MONITORING_OVERVIEW_CACHE_SECONDS.
+
+    Concurrent misses share one build (e.g. every open stream woken by the same
+    publish), so N dashboards cost one rebuild per change. Writes in this
+    process call invalidate_overview; other processes see them once the TTL
+    lapses, which the dashboard's polling interval already tolerates.
+    """
+    now = time.monotonic()
+    cached = _cached.get(organization_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    with _lock:
+        cached = _cached.get(organization_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        generation = _generations.get(organization_id, 0)
+        pending = _builds.get(organization_id)
+        # A build started before the last invalidation may miss the change: start a fresh one instead of joining it.
+        leader = pending is None or pending.generation != generation
+        if leader:
+            pending = _builds[organization_id] = _Build(generation)
+    if not leader:
+        pending.done.wait()
+        if pending.snapshot is not None:
+            return pending.snapshot
+        # The shared build failed; build on this caller's own session instead.
+        return build()
+    try:
+        pending.snapshot = build()
+    finally:
+        with _lock:
+            if _builds.get(organization_id) is pending:
+                del _builds[organization_id]
+            if pending.snapshot is not None and _generations.get(organization_id, 0) == generation:
+                _cached[organization_id] = (time.monotonic() + settings.MONITORING_OVERVIEW_CACHE_SECONDS, pending.snapshot)
+        pending.done.set()
+    return pending.snapshot
+
+
+def invalidate_overview(organization_id: int) -> None:
+    with _lock:
+        _generations[organization_id] = _generations.get(organization_id, 0) + 1
+        _cached.pop(organization_id, None)
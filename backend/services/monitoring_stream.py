@@ -0,0 +1,130 @@
+"""Organization-scoped change notifications for the live monitoring stream, in process or over Redis pub/sub."""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from config import settings
+from services.monitoring_overview_service import invalidate_overview
+
+logger = logging.getLogger(__name__)
+
+MONITORING_CHANNEL = "security_monitoring"
+
+
+class Subscription:
+    """Wake-up flag of one stream; notifications arriving while it is busy coalesce into one."""
+
+    def __init__(self, bus: "MonitoringBus", organization_id: int):
+        self.bus = bus
+        self.organization_id = organization_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The stream's loop is already closed; close() will drop the subscription.
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """True when the organization changed, False when `timeout` elapsed first."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class MonitoringBus:
+    """Fans out "organization N changed" to the streams of every API process.
+
+    Without REDIS_URL notifications stay in this process. With Redis they are
+    published on MONITORING_CHANNEL and a listener thread, started with the
+    first subscription, delivers them locally and drops the receiving process's
+    cached overview, so a change committed by any worker reaches every stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self._redis = None
+        self._listener: Optional[threading.Thread] = None
+
+    def _client(self):
+        if self._redis is None and settings.REDIS_URL:
+            try:
+                import redis
+                client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+                client.ping()
+                self._redis = client
+            except Exception:
+                self._redis = False
+        return self._redis or None
+
+    def subscribe(self, organization_id: int) -> Subscription:
+        subscription = Subscription(self, organization_id)
+        with self._lock:
+            self._subscribers.setdefault(organization_id, set()).add(subscription)
+            if self._listener is None and self._client() is not None:
+                self._listener = threading.Thread(target=self._listen, name="monitoring-stream", daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.organization_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.organization_id]
+
+    def deliver(self, organization_id: int) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(organization_id, ()))
+        for subscription in subscribers:
+            subscription.notify()
+
+    def publish(self, organization_id: int) -> None:
+        """Call after the change is committed; the local cached overview is dropped right away."""
+        invalidate_overview(organization_id)
+        client = self._client()
+        if client is not None:
+            try:
+                client.publish(MONITORING_CHANNEL, str(organization_id))
+                return
+            except Exception as exc:
+                logger.warning("Monitoring notification not published to Redis: %s", exc)
+        self.deliver(organization_id)
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                import redis
+
+                # A client of its own: the publisher's socket_timeout would break the blocking read.
+                pubsub = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(MONITORING_CHANNEL)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        organization_id = int(message["data"])
+                        invalidate_overview(organization_id)
+                        self.deliver(organization_id)
+            except Exception as exc:
+                logger.warning("Monitoring stream listener failed, retrying: %s", exc)
+                time.sleep(5)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+monitoring_bus = MonitoringBus()
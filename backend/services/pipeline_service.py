@@ -9,7 +9,7 @@ import re
 from typing import Any
 
 from models.saas import Finding, FindingEvidence
-from risk.engine import create_snapshot, refresh_finding_scores
+from risk.engine import create_snapshot
 
 SEVERITIES = {"critical", "high", "medium", "low", "informational"}
 SARIF_LEVELS = {"error": "high", "warning": "medium", "note": "low", "none": "informational"}
@@ -155,7 +155,6 @@ def consolidate_findings(db, organization_id: int, asset_id: int, source: str, i
                 finding.resolved_at = now
                 resolved += 1
 
-    refresh_finding_scores(db, organization_id)
     snapshot = create_snapshot(db, organization_id)
     return {"created": created, "updated": updated, "resolved": resolved, "total_received": len(items), "security_score": snapshot.score}
 
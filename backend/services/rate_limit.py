@@ -1,16 +1,148 @@
 """Shared rate limit backend with a safe single-process fallback."""
 
+import asyncio
+from collections import OrderedDict
+import logging
+import math
 import threading
 import time
+from typing import Callable, Optional
 
 from config import settings
 
+logger = logging.getLogger(__name__)
+
+# GCRA: each key stores its theoretical arrival time (TAT, ms). A hit is allowed while the
+# TAT it would push stays within one window of now, so `limit` hits per window are spread
+# out instead of all landing at a fixed window boundary. Returns
+# {allowed, remaining, ms until the key is empty, ms until the next hit is allowed}; the
+# 0.001 ms slack absorbs float rounding of window/limit.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+if new_tat - now > window + 0.001 then
+  return {0, 0, math.ceil(tat - now), math.ceil(new_tat - window - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((window + 0.001 - (new_tat - now)) / interval), math.ceil(new_tat - now), 0}
+"""
+
+
+class _Shard:
+    __slots__ = ("lock", "entries", "wheel", "cursor", "max_keys")
+
+    def __init__(self, max_keys: int):
+        self.lock = threading.Lock()
+        # key -> [expires_at, value, wheel second]; ordered from least to most recently used.
+        self.entries: OrderedDict[str, list] = OrderedDict()
+        # Each key sits in exactly one slot, the second it expires in, so the wheel never outgrows entries.
+        self.wheel: dict[int, set[str]] = {}
+        self.cursor = 0
+        self.max_keys = max_keys
+
+    def _unslot(self, key: str, slot: int) -> None:
+        keys = self.wheel.get(slot)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.wheel[slot]
+
+    def expire(self, now: float) -> None:
+        """Drop the keys of every whole second already past; called with the lock held."""
+        second = int(now)
+        if second <= self.cursor:
+            return
+        # After a long idle period walk the occupied seconds instead of every elapsed one.
+        due = range(self.cursor, second) if second - self.cursor <= len(self.wheel) else [slot for slot in self.wheel if slot < second]
+        for slot in due:
+            for key in self.wheel.pop(slot, ()):
+                del self.entries[key]
+        self.cursor = second
+
+    def get(self, key: str, now: float):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, value, expires_at: float) -> None:
+        # A key already past expiry goes in the next slot swept, never behind the cursor.
+        slot = max(int(expires_at), self.cursor)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [expires_at, value, slot]
+            if len(self.entries) > self.max_keys:
+                evicted, (_, _, evicted_slot) = self.entries.popitem(last=False)
+                self._unslot(evicted, evicted_slot)
+        else:
+            self.entries.move_to_end(key)
+            entry[0], entry[1] = expires_at, value
+            if entry[2] == slot:
+                return
+            self._unslot(key, entry[2])
+            entry[2] = slot
+        self.wheel.setdefault(slot, set()).add(key)
+
+
+class LocalRateLimiter:
+    """In-process limiter state without Redis.
+
+    Keys are spread over `shards` independently locked shards. Each shard
+    expires keys through a wheel of one-second slots, so eviction is amortized
+    O(1) per hit instead of a scan of every key, and holds at most
+    max_keys / shards keys, evicting the least recently used first.
+    """
+
+    def __init__(self, max_keys: Optional[int] = None, shards: int = 16, clock: Callable[[], float] = time.time):
+        max_keys = settings.RATE_LIMIT_LOCAL_MAX_KEYS if max_keys is None else max_keys
+        self._shards = [_Shard(max(1, max_keys // shards)) for _ in range(shards)]
+        self.clock = clock
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def incr(self, key: str, expires_at: float) -> int:
+        """Fixed-window counter: the key's count after this hit."""
+        shard = self._shard(key)
+        now = self.clock()
+        with shard.lock:
+            shard.expire(now)
+            count = (shard.get(key, now) or 0) + 1
+            shard.put(key, count, expires_at)
+        return count
+
+    def gcra(self, key: str, now_ms: float, interval: float, window: float) -> tuple:
+        shard = self._shard(key)
+        with shard.lock:
+            shard.expire(now_ms / 1000)
+            tat = max(shard.get(key, now_ms / 1000) or now_ms, now_ms)
+            new_tat = tat + interval
+            if new_tat - now_ms > window + 0.001:
+                return 0, 0, math.ceil(tat - now_ms), math.ceil(new_tat - window - now_ms)
+            shard.put(key, new_tat, new_tat / 1000)
+            return 1, math.floor((window + 0.001 - (new_tat - now_ms)) / interval), math.ceil(new_tat - now_ms), 0
+
+    def __contains__(self, key: str) -> bool:
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.get(key, self.clock()) is not None
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
 
 class RateLimitBackend:
     def __init__(self):
-        self._local = {}
-        self._lock = threading.Lock()
+        self._local = LocalRateLimiter()
         self._redis = None
+        self._async_redis = None
+        self._async_loop = None
+        self._gcra = None
         if settings.REDIS_URL:
             try:
                 import redis
@@ -34,12 +166,35 @@ class RateLimitBackend:
             pipeline.expire(bucket, window_seconds + 2)
             count, _ = pipeline.execute()
         else:
-            with self._lock:
-                self._local = {k: v for k, v in self._local.items() if v[1] > now}
-                count, _ = self._local.get(bucket, (0, reset_at))
-                count += 1
-                self._local[bucket] = (count, reset_at)
+            count = self._local.incr(bucket, reset_at)
         return count <= limit, max(limit - count, 0), reset_at
 
+    def _async_script(self):
+        # redis.asyncio connections belong to the loop that opened them.
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            import redis.asyncio
+
+            self._async_redis = redis.asyncio.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+            self._gcra = self._async_redis.register_script(GCRA_SCRIPT)
+            self._async_loop = loop
+        return self._gcra
+
+    async def hit_async(self, key: str, limit: int, window_seconds: int = 60) -> tuple[bool, int, int, int]:
+        """GCRA hit without blocking the event loop: (allowed, remaining, reset epoch, retry-after seconds)."""
+        now_ms = time.time() * 1000
+        interval, window = window_seconds * 1000 / limit, window_seconds * 1000
+        result = None
+        if self._redis is not None:
+            try:
+                result = await self._async_script()(keys=[key], args=[int(now_ms), interval, window])
+            except Exception as exc:
+                # Fail over to the in-process limiter rather than rejecting or skipping the request.
+                logger.warning("Redis rate limit unavailable, limiting in process: %s", exc)
+        if result is None:
+            result = self._local.gcra(key, now_ms, interval, window)
+        allowed, remaining, empty_ms, retry_ms = (int(value) for value in result)
+        return bool(allowed), remaining, math.ceil((now_ms + empty_ms) / 1000), max(math.ceil(retry_ms / 1000), 1 if not allowed else 0)
+
 
 rate_limit_backend = RateLimitBackend()
@@ -1,5 +1,7 @@
 """Evidence-backed, organization-scoped security reports."""
 
+import hashlib
+import json
 from collections import Counter
 from datetime import datetime, timedelta
 from io import BytesIO
@@ -12,12 +14,17 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import mm
 from reportlab.platypus import HRFlowable, Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
-from models.saas import Asset, Finding, Integration, Organization, RemediationTask, Report, ScanJob, SecuritySnapshot
+from models.saas import (
+    Asset, AuditLog, ComplianceAttestation, Finding, Integration, Organization, OrganizationMember, OrganizationRiskAggregate,
+    PipelineApiKey, RemediationTask, Report, ReportArtifact, ScanJob, SecuritySnapshot,
+)
 from models.user import User
 from risk.engine import organization_security_score
 from services.compliance_service import compliance_summary
+from services.job_service import enqueue_job
 
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
@@ -32,6 +39,10 @@ SEVERITY_COLORS = {"critical": colors.HexColor("#B91C1C"), "high": colors.HexCol
 SEVERITY_LABELS = {"critical": "Crítico", "high": "Alto", "medium": "Médio", "low": "Baixo", "informational": "Informativo"}
 STATUS_LABELS = {"open": "Aberto", "in_progress": "Em tratamento", "resolved": "Resolvido", "accepted_risk": "Risco aceito", "false_positive": "Falso positivo", "completed": "Concluído", "failed": "Falhou"}
 LOGO_PATH = Path(__file__).resolve().parents[2] / "frontend" / "assets" / "ironnet-logo.jpeg"
+REPORT_TYPES = {"executive", "technical"}
+# Report rendering jobs are bookkeeping, not scans: they stay out of scan metrics and the data watermark.
+REPORT_JOB_TYPES = tuple(f"{report_type}_report" for report_type in sorted(REPORT_TYPES))
+PENDING_STATUSES = ("queued", "running")
 
 
 def _iso(value):
@@ -69,10 +80,51 @@ def _recommendations(metrics, compliance, tasks):
     return items[:6]
 
 
-def generate_report(db: Session, organization_id: int, user_id: int, report_type: str, period_days: int = 30) -> Report:
-    if report_type not in {"executive", "technical"}:
+def _validate(report_type: str, period_days: int) -> int:
+    if report_type not in REPORT_TYPES:
         raise ValueError("Unsupported report type")
-    period_days = min(max(period_days, 1), 365)
+    return min(max(period_days, 1), 365)
+
+
+def report_watermark(db: Session, organization_id: int, period_days: int, now: datetime | None = None) -> str:
+    """Digest of every input the report payload depends on, from cheap aggregate queries.
+
+    Equal watermarks mean a previously rendered report is still current. The UTC
+    day is part of it because the period window and overdue counts move daily.
+    """
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=period_days)
+    scans = ScanJob.organization_id == organization_id, ScanJob.created_at >= since, ScanJob.scanner_type.notin_(REPORT_JOB_TYPES)
+    parts = [
+        now.date().isoformat(),
+        db.query(Organization.name, Organization.updated_at).filter(Organization.id == organization_id).first(),
+        db.query(OrganizationRiskAggregate.updated_at).filter(OrganizationRiskAggregate.organization_id == organization_id).scalar(),
+        db.query(func.count(Finding.id), func.max(Finding.last_seen_at), func.max(Finding.resolved_at), func.max(Finding.risk_scored_at), func.sum(Finding.risk_score), func.sum(Finding.occurrence_count)).filter(Finding.organization_id == organization_id).one(),
+        db.query(Finding.status, Finding.severity, func.count(Finding.id)).filter(Finding.organization_id == organization_id).group_by(Finding.status, Finding.severity).order_by(Finding.status, Finding.severity).all(),
+        db.query(func.count(Asset.id), func.max(Asset.updated_at)).filter(Asset.organization_id == organization_id).one(),
+        db.query(RemediationTask.status, func.count(RemediationTask.id), func.max(RemediationTask.created_at), func.max(RemediationTask.completed_at)).filter(RemediationTask.organization_id == organization_id).group_by(RemediationTask.status).order_by(RemediationTask.status).all(),
+        db.query(func.count(ScanJob.id), func.max(ScanJob.created_at), func.max(ScanJob.started_at), func.max(ScanJob.completed_at)).filter(*scans).one(),
+        db.query(func.count(SecuritySnapshot.id), func.max(SecuritySnapshot.created_at)).filter(SecuritySnapshot.organization_id == organization_id, SecuritySnapshot.created_at >= since).one(),
+        db.query(func.count(Integration.id), func.max(Integration.updated_at), func.max(Integration.last_synced_at)).filter(Integration.organization_id == organization_id).one(),
+        db.query(func.count(ComplianceAttestation.id), func.max(ComplianceAttestation.updated_at)).filter(ComplianceAttestation.organization_id == organization_id).one(),
+        db.query(func.count(PipelineApiKey.id), func.max(PipelineApiKey.created_at), func.max(PipelineApiKey.revoked_at)).filter(PipelineApiKey.organization_id == organization_id).one(),
+        db.query(func.count(User.id), func.sum(case((User.mfa_enabled == True, 1), else_=0))).join(OrganizationMember, OrganizationMember.user_id == User.id).filter(OrganizationMember.organization_id == organization_id, OrganizationMember.role.in_(("owner", "admin"))).one(),  # noqa: E712
+        db.query(AuditLog.id).filter(AuditLog.organization_id == organization_id).first() is not None,
+    ]
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def generate_report(db: Session, organization_id: int, user_id: int, report_type: str, period_days: int = 30) -> Report:
+    """Synchronous build of a completed report (payload only; the PDF is rendered on first download)."""
+    period_days = _validate(report_type, period_days)
+    payload = _report_payload(db, organization_id, user_id, report_type, period_days)
+    report = Report(organization_id=organization_id, created_by=user_id, report_type=report_type, period_days=period_days, payload=payload, data_watermark=report_watermark(db, organization_id, period_days))
+    db.add(report)
+    db.flush()
+    return report
+
+
+def _report_payload(db: Session, organization_id: int, user_id: int, report_type: str, period_days: int) -> dict:
     generated_at = datetime.utcnow()
     since = generated_at - timedelta(days=period_days)
     organization = db.query(Organization).filter(Organization.id == organization_id).first()
@@ -81,7 +133,7 @@ def generate_report(db: Session, organization_id: int, user_id: int, report_type
     findings = db.query(Finding).filter(Finding.organization_id == organization_id).order_by(Finding.risk_score.desc(), Finding.first_seen_at.asc()).all()
     assets = db.query(Asset).filter(Asset.organization_id == organization_id).order_by(Asset.criticality.desc(), Asset.name.asc()).all()
     tasks = db.query(RemediationTask).filter(RemediationTask.organization_id == organization_id).all()
-    scans = db.query(ScanJob).filter(ScanJob.organization_id == organization_id, ScanJob.created_at >= since).order_by(ScanJob.created_at.desc()).all()
+    scans = db.query(ScanJob).filter(ScanJob.organization_id == organization_id, ScanJob.created_at >= since, ScanJob.scanner_type.notin_(REPORT_JOB_TYPES)).order_by(ScanJob.created_at.desc()).all()
     integrations = db.query(Integration).filter(Integration.organization_id == organization_id).all()
     snapshots = db.query(SecuritySnapshot).filter(SecuritySnapshot.organization_id == organization_id, SecuritySnapshot.created_at >= since).order_by(SecuritySnapshot.created_at.asc()).all()
     compliance = compliance_summary(db, organization_id)
@@ -134,12 +186,81 @@ def generate_report(db: Session, organization_id: int, user_id: int, report_type
             "cve": item.cve, "cwe": item.cwe, "cvss": item.cvss_score, "confidence": item.confidence,
             "occurrence_count": item.occurrence_count, "first_seen_at": _iso(item.first_seen_at), "last_seen_at": _iso(item.last_seen_at), "remediation": item.remediation,
         } for item in findings[:500]]
-    report = Report(organization_id=organization_id, created_by=user_id, report_type=report_type, period_days=period_days, payload=payload)
+    return payload
+
+
+def request_report(db: Session, organization_id: int, user_id: int, report_type: str, period_days: int = 30) -> tuple[Report, bool]:
+    """Return (report, cached).
+
+    A completed report with the current data watermark is reused as is; a queued or
+    running one for the same key is shared; otherwise a placeholder is queued for the
+    worker, which builds the payload and renders the PDF once.
+    """
+    period_days = _validate(report_type, period_days)
+    watermark = report_watermark(db, organization_id, period_days)
+    same_key = db.query(Report).filter(
+        Report.organization_id == organization_id, Report.report_type == report_type,
+        Report.period_days == period_days, Report.data_watermark == watermark,
+    )
+    cached = same_key.filter(Report.status == "completed").order_by(Report.id.desc()).first()
+    if cached:
+        return cached, True
+    pending = same_key.filter(Report.status.in_(PENDING_STATUSES)).order_by(Report.id.desc()).first()
+    if pending:
+        return pending, False
+    report = Report(organization_id=organization_id, created_by=user_id, report_type=report_type, period_days=period_days, status="queued", payload={}, data_watermark=watermark)
     db.add(report)
+    report.job_id = enqueue_job(db, organization_id, user_id, f"{report_type}_report").id
     db.flush()
+    return report, False
+
+
+def render_report_artifact(db: Session, report: Report) -> bytes:
+    content = render_report_pdf(report)
+    artifact = db.get(ReportArtifact, report.id) or ReportArtifact(report_id=report.id)
+    artifact.content = content
+    artifact.created_at = datetime.utcnow()
+    db.add(artifact)
+    report.pdf_etag = hashlib.sha256(content).hexdigest()
+    report.pdf_size = len(content)
+    report.rendered_at = artifact.created_at
+    return content
+
+
+def report_pdf_content(db: Session, report: Report) -> bytes:
+    """Stored artifact bytes; reports created before artifacts existed are rendered once and kept."""
+    artifact = db.get(ReportArtifact, report.id)
+    if artifact is not None:
+        return artifact.content
+    content = render_report_artifact(db, report)
+    db.commit()
+    return content
+
+
+def run_report_job(db: Session, job: ScanJob) -> Report:
+    """Worker side of executive_report/technical_report jobs: payload, watermark and PDF in one go."""
+    report_type = job.scanner_type.removesuffix("_report")
+    report = db.query(Report).filter(Report.job_id == job.id).first()
+    if report is None:
+        # Jobs enqueued directly through /jobs have no placeholder report.
+        report = Report(organization_id=job.organization_id, created_by=job.created_by, report_type=report_type, period_days=30, payload={}, job_id=job.id)
+        db.add(report)
+    report.status = "running"
+    period_days = _validate(report_type, report.period_days or 30)
+    report.payload = _report_payload(db, job.organization_id, report.created_by, report_type, period_days)
+    # Taken after the payload, which may refresh risk scores, so the next request with unchanged data hits the cache.
+    report.data_watermark = report_watermark(db, job.organization_id, period_days)
+    db.flush()
+    render_report_artifact(db, report)
+    report.status = "completed"
     return report
 
 
+def fail_report_job(db: Session, job: ScanJob) -> None:
+    if job.status == "failed":
+        db.query(Report).filter(Report.job_id == job.id, Report.status.in_(PENDING_STATUSES)).update({Report.status: "failed"}, synchronize_session=False)
+
+
 def _styles():
     base = getSampleStyleSheet()
     return {
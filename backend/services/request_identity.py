@@ -0,0 +1,135 @@
+"""Rate-limit identity of API requests: memoized JWT subjects and a short per-user plan/organization cache."""
+
+from collections import OrderedDict
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from jose import jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from models.saas import OrganizationMember
+from models.user import User
+
+_PENDING_INVALIDATION = "request_identity_invalidate"
+
+_lock = threading.Lock()
+_subjects: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_identities: dict[str, tuple[float, Optional["Identity"]]] = {}
+_generation = 0
+
+
+class Identity(NamedTuple):
+    user_id: int
+    plan: Optional[str]
+    organization_id: Optional[int]
+
+
+def token_subject(token: str) -> Optional[str]:
+    """`sub` of a valid bearer token; decoded once per token and reused until it expires."""
+    now = time.time()
+    cached = _subjects.get(token)
+    if cached is not None:
+        if cached[0] > now:
+            return cached[1]
+        with _lock:
+            _subjects.pop(token, None)
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except Exception:
+        return None
+    subject, expires = payload.get("sub"), payload.get("exp")
+    # Invalid tokens are not cached, so random tokens cannot evict the valid ones.
+    if subject and expires:
+        with _lock:
+            _subjects[token] = (float(expires), subject)
+            while len(_subjects) > settings.RATE_LIMIT_TOKEN_CACHE_SIZE:
+                _subjects.popitem(last=False)
+    return subject
+
+
+def load_identity(username: str) -> Optional[Identity]:
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        row = db.query(User.id, User.subscription_plan, OrganizationMember.organization_id).outerjoin(
+            OrganizationMember, OrganizationMember.user_id == User.id,
+        ).filter(User.username == username).order_by(OrganizationMember.id.asc()).first()
+        return Identity(*row) if row else None
+    finally:
+        db.close()
+
+
+def cached_identity(username: str, load: Optional[Callable[[str], Optional[Identity]]] = None) -> Optional[Identity]:
+    """User id, plan and first organization of `username` (None if unknown), kept RATE_LIMIT_IDENTITY_CACHE_SECONDS.
+
+    Commits that change a user's plan or memberships in this process drop the
+    entry; other processes pick the change up when it expires.
+    """
+    now = time.monotonic()
+    cached = _identities.get(username)
+    if cached and cached[0] > now:
+        return cached[1]
+    generation = _generation
+    identity = (load or load_identity)(username)
+    with _lock:
+        if _generation == generation:
+            _identities[username] = (now + settings.RATE_LIMIT_IDENTITY_CACHE_SECONDS, identity)
+    return identity
+
+
+def invalidate_identities(user_ids: set[int] = frozenset(), usernames: set[str] = frozenset()) -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        for username, (_, identity) in list(_identities.items()):
+            if username in usernames or (identity is not None and identity.user_id in user_ids):
+                del _identities[username]
+
+
+@event.listens_for(Session, "after_flush")
+def _track_identity_changes(session: Session, _context) -> None:
+    user_ids, usernames = set(), set()
+    for instance in list(session.new) + list(session.deleted):
+        if isinstance(instance, User):
+            usernames.add(instance.username)
+        elif isinstance(instance, OrganizationMember):
+            user_ids.add(instance.user_id)
+    for instance in session.dirty:
+        if isinstance(instance, User) and (_changed(instance, "subscription_plan") or _changed(instance, "username")):
+            user_ids.add(instance.id)
+        elif isinstance(instance, OrganizationMember) and _changed(instance, "organization_id"):
+            user_ids.add(instance.user_id)
+    if user_ids or usernames:
+        pending = session.info.setdefault(_PENDING_INVALIDATION, (set(), set()))
+        pending[0].update(user_ids)
+        pending[1].update(usernames)
+
+
+def _changed(instance, name: str) -> bool:
+    return inspect(instance).attrs[name].history.has_changes()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidation(session: Session) -> None:
+    pending = session.info.pop(_PENDING_INVALIDATION, None)
+    if pending:
+        invalidate_identities(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidation(session: Session) -> None:
+    session.info.pop(_PENDING_INVALIDATION, None)
+
+
+async def identity_for(username: str) -> Optional[Identity]:
+    """cached_identity for async callers: a hit stays on the event loop, a miss loads in the threadpool."""
+    cached = _identities.get(username)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return await run_in_threadpool(cached_identity, username)
@@ -0,0 +1,93 @@
+"""Content-addressed cache for deterministic scanner results with a Redis tier when configured."""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config import settings
+
+
+def ruleset_version(*parts: Any) -> str:
+    """Stable digest of a scanner's rules; any pattern change yields a new version and new cache keys."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ScanResultCache:
+    def __init__(self, max_entries: int = settings.SCAN_CACHE_MAX_ENTRIES, ttl_seconds: int = settings.SCAN_CACHE_TTL_SECONDS, max_entry_bytes: int = 4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self._local: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if settings.REDIS_URL:
+            try:
+                import redis
+                client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+                client.ping()
+                self._redis = client
+            except Exception:
+                self._redis = None
+
+    @property
+    def distributed(self) -> bool:
+        return self._redis is not None
+
+    @staticmethod
+    def key(namespace: str, version: str, content: str, options: Any = None) -> str:
+        content_digest = hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+        options_digest = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return f"scan-cache:{namespace}:{version}:{content_digest}:{options_digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            payload = self._local.get(key)
+            if payload is not None:
+                self._local.move_to_end(key)
+        if payload is None and self._redis is not None:
+            try:
+                raw = self._redis.get(key)
+            except Exception:
+                raw = None
+            if raw is not None:
+                payload = raw.decode()
+                self._remember(key, payload)
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, default=float)
+        if len(payload) > self.max_entry_bytes:
+            return
+        self._remember(key, payload)
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, self.ttl_seconds, payload)
+            except Exception:
+                pass
+
+    def get_or_compute(self, namespace: str, version: str, content: str, options: Any, compute: Callable[[], Any]) -> Any:
+        key = self.key(namespace, version, content, options)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def _remember(self, key: str, payload: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._local[key] = payload
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+scan_cache = ScanResultCache()
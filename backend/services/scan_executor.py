@@ -0,0 +1,109 @@
+"""Bounded executors that keep blocking scanner work off the asyncio event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+from config import settings
+
+
+class ExecutorSaturated(RuntimeError):
+    """Every worker is busy and the admission queue is full; callers should answer 503."""
+
+
+class BoundedExecutor:
+    """Executor with admission control: at most max_workers running plus max_queue waiting.
+
+    A slot is released when the submitted work finishes, not when the awaiting
+    request goes away, so cancelled requests cannot overbook the pool.
+    """
+
+    def __init__(self, name: str, factory: Callable[[int], Executor], max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory(self.max_workers)
+            return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {"workers": self.max_workers, "queue": self.max_queue, "in_flight": in_flight, "queued": max(0, in_flight - self.max_workers)}
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_freed.notify()
+
+    def submit(self, function: Callable[..., Any], *args, block: bool = False, **kwargs) -> Future:
+        """Admit and submit one task; when full raise ExecutorSaturated or, with block=True, wait for a slot."""
+        with self._lock:
+            while self._in_flight >= self.capacity:
+                if not block:
+                    raise ExecutorSaturated(self.name)
+                self._slot_freed.wait()
+            self._in_flight += 1
+        try:
+            future = self.executor.submit(partial(function, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def batches(self) -> "AdmittedBatches":
+        return AdmittedBatches(self)
+
+    async def run(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        future = self.submit(function, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AdmittedBatches:
+    """Executor facade for a job split into many tasks (e.g. a repository scan).
+
+    The first task is admitted or rejected like run(), so a saturated pool still
+    answers 503; once admitted, later tasks wait for a free slot instead of
+    failing the job halfway. Must be used from a worker thread, never the event loop.
+    """
+
+    def __init__(self, bounded: BoundedExecutor):
+        self._bounded = bounded
+        self._admitted = False
+
+    def submit(self, function: Callable[..., Any], *args, **kwargs) -> Future:
+        future = self._bounded.submit(function, *args, block=self._admitted, **kwargs)
+        self._admitted = True
+        return future
+
+
+cpu_executor = BoundedExecutor("scan-cpu", lambda workers: ProcessPoolExecutor(max_workers=workers), settings.SCAN_CPU_WORKERS, settings.SCAN_CPU_QUEUE)
+io_executor = BoundedExecutor("scan-io", lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-io"), settings.SCAN_IO_WORKERS, settings.SCAN_IO_QUEUE)
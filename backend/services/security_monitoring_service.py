@@ -3,11 +3,13 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 import hashlib
 import ipaddress
 import re
 
 from models.saas import SecurityEvent
+from services.ip_prefix_tree import PrefixTree
 
 
 SIGNALS = {
@@ -29,6 +31,19 @@ SCANNER_UA = re.compile(r"(?:nmap|nikto|sqlmap|masscan|nuclei|zgrab|gobuster|dir
 SUSPICIOUS_PATH = re.compile(r"(?:/\.env|/\.git|wp-admin|phpmyadmin|\.\./|%2e%2e|etc/passwd|proc/self|cgi-bin|vendor/phpunit)", re.I)
 SQLI_PATH = re.compile(r"(?:union(?:%20|\s)+select|sleep\(|benchmark\(|or(?:%20|\s)+1=1)", re.I)
 XSS_PATH = re.compile(r"(?:<script|%3cscript|javascript:|onerror=|onload=)", re.I)
+# Path signatures above as one scanner, in precedence order. The lookahead yields a hit at every
+# position where any signature starts, so one pass over the path finds the strongest signal.
+PATH_SIGNATURES = (
+    ("sql_injection", SQLI_PATH.pattern),
+    ("xss", XSS_PATH.pattern),
+    ("path_traversal", r"(?:\.\./|%2e%2e|etc/passwd)"),
+    ("exploit_attempt", r"(?:/\.env|/\.git|wp-admin|phpmyadmin|proc/self|cgi-bin|vendor/phpunit)"),
+)
+PATH_SCANNER = re.compile("(?=" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in PATH_SIGNATURES) + ")", re.I)
+PATH_PRECEDENCE = {name: index for index, (name, _) in enumerate(PATH_SIGNATURES)}
+SEVERITY_ORDER = {"informational": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+OPEN_EVENT_STATUSES = ("open", "investigating")
+CORRELATION_WINDOW = timedelta(hours=24)
 AUTHORIZED_TEST_PATH = re.compile(r"^/\.well-known/iron-ai-containment-test(?:\?|$)", re.I)
 CLOUDFLARE_NETWORKS = tuple(ipaddress.ip_network(value) for value in (
     "173.245.48.0/20", "103.21.244.0/22", "103.22.200.0/22", "103.31.4.0/22",
@@ -38,6 +53,7 @@ CLOUDFLARE_NETWORKS = tuple(ipaddress.ip_network(value) for value in (
     "2606:4700::/32", "2803:f800::/32", "2405:b500::/32", "2405:8100::/32",
     "2a06:98c0::/29", "2c0f:f248::/32",
 ))
+CLOUDFLARE_TREE = PrefixTree(CLOUDFLARE_NETWORKS)
 
 REMEDIATIONS = {
     "port_scan": "Bloqueie temporariamente o IP no WAF, restrinja portas públicas ao mínimo necessário e revise os logs do firewall para identificar outros destinos consultados.",
@@ -70,7 +86,24 @@ def is_blockable_ip(value: str | None) -> bool:
     except ValueError:
         return False
     unsafe = any((address.is_private, address.is_loopback, address.is_link_local, address.is_reserved, address.is_multicast, address.is_unspecified))
-    return not unsafe and not any(address in network for network in CLOUDFLARE_NETWORKS)
+    return not unsafe and address not in CLOUDFLARE_TREE
+
+
+def is_cloudflare_ip(address) -> bool:
+    return address in CLOUDFLARE_TREE
+
+
+@lru_cache(maxsize=4096)
+def path_signal(path: str) -> str | None:
+    """Strongest path signature in one scan; sensors resend the same probe paths, hence the cache."""
+    best = None
+    for match in PATH_SCANNER.finditer(path):
+        rank = PATH_PRECEDENCE[match.lastgroup]
+        if best is None or rank < best:
+            best = rank
+            if rank == 0:
+                break
+    return None if best is None else PATH_SIGNATURES[best][0]
 
 
 def classify_telemetry(item: dict) -> dict | None:
@@ -88,12 +121,8 @@ def classify_telemetry(item: dict) -> dict | None:
             signal = "reconnaissance"
         elif rate >= 30 or count >= 1000:
             signal = "ddos"
-        elif SQLI_PATH.search(path):
-            signal = "sql_injection"
-        elif XSS_PATH.search(path):
-            signal = "xss"
-        elif SUSPICIOUS_PATH.search(path):
-            signal = "path_traversal" if re.search(r"\.\./|%2e%2e|etc/passwd", path, re.I) else "exploit_attempt"
+        elif path_detected := path_signal(path):
+            signal = path_detected
         elif status_code in (401, 403) and count >= 20:
             signal = "brute_force"
         elif SCANNER_UA.search(user_agent) or int(item.get("distinct_paths") or 0) >= 20:
@@ -136,42 +165,67 @@ def _fingerprint(organization_id: int, asset_id: int, detected: dict) -> str:
     return hashlib.sha256(stable.encode()).hexdigest()
 
 
-def correlate_event(db, organization_id: int, asset_id: int, sensor_id: int | None, detected: dict) -> SecurityEvent:
+def classify_batch(items: list[dict]) -> list[dict]:
+    """Detections of a sensor batch, in order; benign aggregates are dropped."""
+    return [detected for detected in map(classify_telemetry, items) if detected]
+
+
+def _new_event(organization_id: int, asset_id: int, sensor_id: int | None, fingerprint: str, detected: dict) -> SecurityEvent:
+    return SecurityEvent(
+        organization_id=organization_id,
+        asset_id=asset_id,
+        sensor_id=sensor_id,
+        fingerprint=fingerprint,
+        event_type=detected["event_type"],
+        severity=detected["severity"],
+        title=detected["title"],
+        description=detected["description"],
+        remediation=detected["remediation"],
+        source_ip=detected.get("source_ip"),
+        method=detected.get("method"),
+        request_path=detected.get("request_path"),
+        status_code=detected.get("status_code"),
+        request_count=detected["request_count"],
+        evidence_json=detected.get("evidence"),
+    )
+
+
+def correlate_events(db, organization_id: int, asset_id: int, sensor_id: int | None, detections: list[dict]) -> list[SecurityEvent]:
+    """Correlate a batch of detections with one SELECT and one flush.
+
+    Returns the event of each detection, in order. Detections sharing a fingerprint
+    (within the batch or with an open event of the last 24h) fold into one event.
+    """
+    if not detections:
+        return []
     now = datetime.utcnow()
-    fingerprint = _fingerprint(organization_id, asset_id, detected)
-    event = db.query(SecurityEvent).filter(
+    fingerprints = [_fingerprint(organization_id, asset_id, detected) for detected in detections]
+    open_events = {}
+    for event in db.query(SecurityEvent).filter(
         SecurityEvent.organization_id == organization_id,
-        SecurityEvent.fingerprint == fingerprint,
-        SecurityEvent.status.in_(["open", "investigating"]),
-        SecurityEvent.last_seen_at >= now - timedelta(hours=24),
-    ).first()
-    if event is None:
-        event = SecurityEvent(
-            organization_id=organization_id,
-            asset_id=asset_id,
-            sensor_id=sensor_id,
-            fingerprint=fingerprint,
-            event_type=detected["event_type"],
-            severity=detected["severity"],
-            title=detected["title"],
-            description=detected["description"],
-            remediation=detected["remediation"],
-            source_ip=detected.get("source_ip"),
-            method=detected.get("method"),
-            request_path=detected.get("request_path"),
-            status_code=detected.get("status_code"),
-            request_count=detected["request_count"],
-            evidence_json=detected.get("evidence"),
-        )
-        db.add(event)
-    else:
-        event.occurrence_count += 1
-        event.request_count += detected["request_count"]
-        event.last_seen_at = now
-        event.description = detected["description"]
-        event.evidence_json = detected.get("evidence")
-        rank = {"informational": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
-        if rank.get(detected["severity"], 2) > rank.get(event.severity, 2):
-            event.severity = detected["severity"]
+        SecurityEvent.fingerprint.in_(set(fingerprints)),
+        SecurityEvent.status.in_(OPEN_EVENT_STATUSES),
+        SecurityEvent.last_seen_at >= now - CORRELATION_WINDOW,
+    ).order_by(SecurityEvent.id):
+        open_events.setdefault(event.fingerprint, event)
+    events = []
+    for fingerprint, detected in zip(fingerprints, detections):
+        event = open_events.get(fingerprint)
+        if event is None:
+            event = open_events[fingerprint] = _new_event(organization_id, asset_id, sensor_id, fingerprint, detected)
+            db.add(event)
+        else:
+            event.occurrence_count = (event.occurrence_count or 1) + 1
+            event.request_count = (event.request_count or 0) + detected["request_count"]
+            event.last_seen_at = now
+            event.description = detected["description"]
+            event.evidence_json = detected.get("evidence")
+            if SEVERITY_ORDER.get(detected["severity"], 2) > SEVERITY_ORDER.get(event.severity, 2):
+                event.severity = detected["severity"]
+        events.append(event)
     db.flush()
-    return event
+    return events
+
+
+def correlate_event(db, organization_id: int, asset_id: int, sensor_id: int | None, detected: dict) -> SecurityEvent:
+    return correlate_events(db, organization_id, asset_id, sensor_id, [detected])[0]
@@ -5,9 +5,10 @@ from datetime import datetime
 from database import SessionLocal
 from models.saas import Asset, AuthenticatedScanProfile, Finding, ScanJob
 from models.user import User
-from risk.engine import create_snapshot, refresh_finding_scores
+from risk.engine import create_snapshot
 from scanners.web_security_scanner import WebSecurityScanner
 from services.finding_service import persist_scan_findings
+from services.job_service import claim_job, complete_job, current_worker_id, fail_job, lease_heartbeat
 from services.credential_vault import CredentialVault
 
 
@@ -66,7 +67,6 @@ def execute_web_scan(db, job: ScanJob) -> None:
     asset.hostname = result["network"]["hostname"]
     asset.ip_address = (result["network"]["ip_addresses"] or [None])[0]
     asset.last_seen_at = datetime.utcnow()
-    refresh_finding_scores(db, job.organization_id)
     snapshot = create_snapshot(db, job.organization_id)
     job.result_json = {
         "target": result["target"],
@@ -84,21 +84,18 @@ def execute_web_scan(db, job: ScanJob) -> None:
 def run_web_scan_job(job_id: int) -> None:
     db = SessionLocal()
     try:
-        job = db.query(ScanJob).filter(ScanJob.id == job_id).first()
-        if not job or job.status not in {"queued", "running"}:
+        # Compare-and-set: if a worker already leased this job, the background task stands down.
+        worker_id = current_worker_id()
+        job = claim_job(db, job_id, worker_id=worker_id)
+        if not job:
             return
-        job.status = "running"
-        job.progress = 10
-        job.started_at = job.started_at or datetime.utcnow()
-        db.commit()
         try:
-            execute_web_scan(db, job)
-            job.status = "completed"
-            job.progress = 100
+            # No worker pool renews this lease; without the heartbeat a long scan would be claimed and run again.
+            with lease_heartbeat(SessionLocal, job.id, worker_id):
+                execute_web_scan(db, job)
+            complete_job(job)
         except Exception as exc:
-            job.status = "failed"
-            job.error = str(exc)[:2000]
-        job.completed_at = datetime.utcnow()
+            fail_job(job, exc)
         db.commit()
     finally:
         db.close()
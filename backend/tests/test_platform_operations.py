@@ -1,7 +1,7 @@
 from cryptography.fernet import Fernet
 import asyncio
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -9,13 +9,13 @@ from config import settings
 from database import Base
 from models.saas import (
     Asset, ContainmentAction, ContainmentTest, Finding, Integration, IntegrationCredential, Organization,
-    OrganizationMember, RemediationTask, SecurityEvent, SecuritySensor, SSOLoginState,
+    OrganizationMember, RemediationTask, ScanJob, SecurityEvent, SecuritySensor, SSOLoginState,
     SecurityAlertDelivery, SecurityAlertSubscription,
 )
 from models.user import User
 from services.ai_action_service import execute_action, propose_action, transition_remediation_task
 from services.credential_vault import CredentialVault
-from services.job_service import claim_next_job, enqueue_job
+from services.job_service import claim_jobs, claim_next_job, enqueue_job, fail_job, renew_leases
 from services.pipeline_service import consolidate_findings, evaluate_gate, normalize_findings, normalize_sarif
 from services.mfa_service import consume_recovery_code, current_code, dump_recovery_hashes, generate_recovery_codes, generate_secret, verify_code
 from services.compliance_service import attest_control, compliance_summary
@@ -24,7 +24,7 @@ from services.security_monitoring_service import classify_telemetry, correlate_e
 from services.alert_service import queue_security_alerts, validate_target
 from scanners.web_security_scanner import WebSecurityScanner
 from ai.provider import configured_provider
-from services.report_service import generate_report, render_report_pdf
+from services.report_service import generate_report, render_report_pdf, request_report
 from auth import decode_renewal_token, get_password_hash, require_developer, require_enterprise, require_enterprise_developer
 from fastapi import HTTPException
 from starlette.requests import Request
@@ -32,7 +32,8 @@ from routes.auth_routes import MFACodeRequest, login, mfa_confirm, mfa_disable,
 from routes.sso_routes import SSOExchange, _hash, exchange_sso
 from routes import security_monitoring_routes
 from routes.security_monitoring_routes import SensorContext, TelemetryBatch, TelemetryItem
-from scripts.iron_ai_sensor import aggregate as aggregate_nginx_logs, apply_firewall_action, parse_line as parse_nginx_line
+from scripts import iron_ai_sensor
+from scripts.iron_ai_sensor import LogTailer, StreamingAggregator, aggregate as aggregate_nginx_logs, apply_firewall_action, parse_line as parse_nginx_line
 from middleware.subscription import CANCELLATION_WINDOW_DAYS, sync_owned_organization_plans
 from routes import payment_routes
 from routes.ai_action_routes import approve_action, reject_action, run_action
@@ -146,6 +147,82 @@ def test_nginx_sensor_sends_only_sanitized_request_metadata():
     assert set(events[0]) == {"source_ip", "method", "path", "status_code", "user_agent", "request_count", "window_seconds", "source", "distinct_paths"}
 
 
+def test_sensor_aggregation_stays_bounded_under_flood_and_keeps_heavy_hitters():
+    aggregator = StreamingAggregator(10, capacity=200)
+    flood = '198.51.100.7 - - [17/Aug/2026:12:00:00 +0000] "POST /login HTTP/1.1" 401 12 "-" "python-requests"'
+    for index in range(60_000):
+        if index % 3 == 0:
+            aggregator.add_line(flood)
+        else:
+            aggregator.add_line(f'203.0.113.{index % 250} - - [17/Aug/2026:12:00:00 +0000] "GET /probe/{index} HTTP/1.1" 404 12 "-" "nuclei"')
+        assert len(aggregator.candidates) <= 400 and len(aggregator.ips) <= 400
+    events = aggregator.flush()
+    assert len(events) == 100
+    assert (events[0]["source_ip"], events[0]["path"], events[0]["status_code"]) == ("198.51.100.7", "/login", 401)
+    assert 20_000 <= events[0]["request_count"] <= 20_000 + 60_000 // 4096 * 4
+    scanners = [event["distinct_paths"] for event in events if event["source_ip"] != "198.51.100.7"]
+    assert scanners and all(abs(value - 160) <= 40 for value in scanners)
+    assert aggregator.candidates == {} and aggregator.lines == 0
+
+
+def test_sensor_tailer_follows_globs_across_rename_and_copytruncate_rotation(tmp_path, monkeypatch):
+    access, api = tmp_path / "access.log", tmp_path / "api.log"
+    access.write_text("before start\n")
+    api.write_text("")
+    tailer = LogTailer([str(tmp_path / "*.log")], rescan_seconds=0, use_inotify=False)
+    try:
+        assert tailer.read_lines() == []
+        with access.open("a") as handle:
+            handle.write("one\ntw")
+        with api.open("a") as handle:
+            handle.write("api\n")
+        assert sorted(tailer.read_lines()) == ["api", "one"]
+        with access.open("a") as handle:
+            handle.write("o\n")
+        assert tailer.read_lines() == ["two"]
+
+        # logrotate renames the log; Nginx writes to the old inode until it reopens.
+        access.rename(tmp_path / "access.log.1")
+        access.write_text("after rotation\n")
+        with (tmp_path / "access.log.1").open("a") as handle:
+            handle.write("late\n")
+        assert sorted(tailer.read_lines()) == ["after rotation", "late"]
+        monkeypatch.setattr(iron_ai_sensor, "ROTATION_GRACE_SECONDS", 0)
+        tailer.read_lines()
+        assert len(tailer.files) == 2
+
+        with api.open("r+") as handle:
+            handle.truncate(0)
+        api.write_text("after truncate\n")
+        assert tailer.read_lines() == ["after truncate"]
+    finally:
+        tailer.close()
+
+
+def test_gzip_sensor_upload_is_inflated_and_bounded():
+    import gzip
+    import json as json_module
+    from fastapi import APIRouter, FastAPI
+    from fastapi.testclient import TestClient
+
+    router = APIRouter(route_class=security_monitoring_routes.GzipRoute)
+
+    @router.post("/ingest")
+    def echo(payload: TelemetryBatch):
+        return {"received": len(payload.events)}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    body = json_module.dumps({"events": [{"source_ip": "8.8.8.8", "path": "/.env", "request_count": 3}] * 5}).encode()
+    assert client.post("/ingest", content=body, headers={"Content-Type": "application/json"}).json() == {"received": 5}
+    compressed = client.post("/ingest", content=gzip.compress(body), headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert compressed.json() == {"received": 5}
+    bomb = gzip.compress(b"[" + b" " * (security_monitoring_routes.MAX_INFLATED_BODY_BYTES + 1) + b"]")
+    assert client.post("/ingest", content=bomb, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}).status_code == 413
+    assert client.post("/ingest", content=b"not gzip", headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}).status_code == 400
+
+
 def test_signed_sensor_ingestion_persists_only_detected_events():
     db, user, organization, finding = _database()
     user.subscription_plan = "professional"
@@ -170,6 +247,37 @@ def test_signed_sensor_ingestion_persists_only_detected_events():
     assert events[0].event_type == "brute_force"
 
 
+def test_sensor_batch_is_correlated_with_one_lookup_and_alerts_queued_once():
+    from sqlalchemy import event as sa_event
+
+    db, user, organization, finding = _database()
+    organization.plan = "enterprise"
+    sensor = SecuritySensor(
+        organization_id=organization.id, asset_id=finding.asset_id, name="Nginx edge",
+        key_prefix="iais_batch", key_hash="unused", created_by=user.id,
+    )
+    db.add_all([sensor, SecurityAlertSubscription(
+        organization_id=organization.id, channel="email", target_encrypted="encrypted", target_hint="ope…", minimum_severity="high", created_by=user.id,
+    )])
+    db.commit()
+    probe = dict(source_ip="8.8.8.8", path="/wp-admin/../../etc/passwd", status_code=404, request_count=3)
+    payload = TelemetryBatch(events=[TelemetryItem(**probe) for _ in range(50)] + [
+        TelemetryItem(source_ip="8.8.4.4", path="/search?q=1%20UNION%20SELECT%20password", status_code=200),
+        TelemetryItem(source_ip="8.8.4.4", path="/produtos", status_code=200),
+    ])
+    lookups = []
+    listener = lambda *args: lookups.append(args[2]) if args[2].lstrip().upper().startswith("SELECT") and "security_events" in args[2] else None
+    sa_event.listen(db.get_bind(), "before_cursor_execute", listener)
+    result = security_monitoring_routes.ingest_telemetry(payload, request=None, context=SensorContext(organization=organization, sensor=sensor), db=db)
+    sa_event.remove(db.get_bind(), "before_cursor_execute", listener)
+    events = {item.event_type: item for item in db.query(SecurityEvent).filter(SecurityEvent.organization_id == organization.id)}
+    assert (result["received"], result["detected"], len(result["event_ids"])) == (52, 51, 2)
+    assert len(lookups) == 1
+    assert (events["path_traversal"].occurrence_count, events["path_traversal"].request_count) == (50, 150)
+    assert events["sql_injection"].occurrence_count == 1
+    assert db.query(SecurityAlertDelivery).count() == 2
+
+
 def test_cloudflare_containment_executes_real_provider_path_after_approval(monkeypatch):
     db, user, organization, finding = _database()
     user.subscription_plan = "professional"
@@ -437,6 +545,44 @@ def test_protection_allowlist_prevents_manual_containment():
     assert exc.value.status_code == 409
 
 
+def test_prefix_tree_matches_like_network_membership():
+    import ipaddress
+    from services.ip_prefix_tree import PrefixTree
+
+    networks = ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.3/32", "192.168.0.0/24", "2001:db8::/32", "2001:db8:1::/48", "::/0"]
+    tree = PrefixTree()
+    for index, network in enumerate(networks):
+        tree.add(network, index)
+    for address in ("10.1.2.3", "10.1.9.9", "10.200.0.1", "192.168.0.255", "192.168.1.0", "8.8.8.8", "2001:db8:1::5", "2001:db9::1"):
+        expected = [index for index, network in enumerate(networks) if ipaddress.ip_address(address) in ipaddress.ip_network(network)]
+        assert sorted(tree.matches(address)) == expected
+    assert "not-an-ip" not in tree and len(tree) == len(networks)
+
+
+def test_allowlist_is_compiled_once_and_invalidated_on_change():
+    from sqlalchemy import event as sa_event
+    from services.allowlist_service import invalidate_allowlist, is_allowlisted
+
+    db, user, organization, finding = _database()
+    user.subscription_plan = "enterprise"
+    membership = db.query(OrganizationMember).filter_by(organization_id=organization.id, user_id=user.id).one()
+    context = TenantContext(user=user, organization=organization, membership=membership)
+    invalidate_allowlist(organization.id)
+    created = security_monitoring_routes.create_protection_allowlist(
+        security_monitoring_routes.ProtectionAllowlistCreate(network="203.0.113.0/24", label="Escritório"), request=None, context=context, db=db,
+    )
+    assert is_allowlisted(db, organization.id, finding.asset_id, "203.0.113.77")
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    sa_event.listen(db.get_bind(), "before_cursor_execute", listener)
+    assert is_allowlisted(db, organization.id, None, "203.0.113.8")
+    assert not is_allowlisted(db, organization.id, finding.asset_id, "203.0.114.1")
+    sa_event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert statements == []
+    security_monitoring_routes.delete_protection_allowlist(created["id"], request=None, context=context, db=db)
+    assert not is_allowlisted(db, organization.id, finding.asset_id, "203.0.113.77")
+
+
 def test_security_alerts_are_queued_once_per_event_subscription():
     db, user, organization, finding = _database()
     user.subscription_plan = "enterprise"
@@ -467,6 +613,157 @@ def test_realtime_monitoring_rejects_starter_on_server():
         assert exc.detail["error"] == "professional_required"
 
 
+def test_monitoring_overview_counts_in_one_query_and_serves_polls_from_cache():
+    from sqlalchemy import event as sa_event
+    from services.monitoring_overview_service import invalidate_overview
+
+    db, user, organization, finding = _database()
+    user.subscription_plan = "enterprise"
+    organization.plan = "enterprise"
+    membership = db.query(OrganizationMember).filter_by(organization_id=organization.id, user_id=user.id).one()
+    context = security_monitoring_routes.TenantContext(user=user, organization=organization, membership=membership)
+    sensor = SecuritySensor(
+        organization_id=organization.id, asset_id=finding.asset_id, name="Nginx edge", key_prefix="iais_view",
+        key_hash="unused", created_by=user.id, containment_enabled=True, last_seen_at=datetime.utcnow(),
+    )
+    db.add(sensor)
+    events = [correlate_event(db, organization.id, finding.asset_id, None, classify_telemetry(item)) for item in (
+        {"signal": "sql_injection", "source_ip": "8.8.8.8", "path": "/search?q=1 UNION SELECT password"},
+        {"signal": "web_scan", "source_ip": "8.8.4.4", "path": "/.env", "request_count": 40},
+    )]
+    events[1].status = "resolved"
+    db.add(ContainmentAction(
+        organization_id=organization.id, security_event_id=events[0].id, provider="host_firewall", action_type="block_ip",
+        target="8.8.8.8", status="executed", approved_by=user.id, sensor_id=sensor.id,
+    ))
+    db.commit()
+    invalidate_overview(organization.id)
+    assert user.subscription_plan == "enterprise"
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    sa_event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        first = security_monitoring_routes.monitoring_overview(context=context, db=db)
+        built = len(statements)
+        polled = security_monitoring_routes.monitoring_overview(since_id=first["latest_id"], context=context, db=db)
+        again = security_monitoring_routes.monitoring_overview(context=context, db=db)
+        assert len(statements) == built <= 5
+        assert sum("security_events" in statement and "count(" in statement.lower() for statement in statements) == 1
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", listener)
+    critical = sum(event.severity == "critical" and event.status == "open" for event in events)
+    assert first["metrics"] == {"open": 1, "critical": critical, "last_24h": 2, "active_sensors": 1, "host_firewalls": 1, "active_blocks": 1}
+    assert first["protection_status"]["level"] == "healthy" and again is first
+    assert {event["id"]: event["containment_action_id"] is not None for event in first["events"]} == {events[0].id: True, events[1].id: False}
+    assert polled["events"] == [] and polled["latest_id"] == first["latest_id"]
+
+    newer = correlate_event(db, organization.id, finding.asset_id, None, classify_telemetry({"signal": "xss", "source_ip": "9.9.9.9", "path": "/?q=<script>"}))
+    db.commit()
+    invalidate_overview(organization.id)
+    polled = security_monitoring_routes.monitoring_overview(since_id=first["latest_id"], context=context, db=db)
+    assert [event["id"] for event in polled["events"]] == [newer.id] and polled["metrics"]["open"] == 2
+
+
+def test_monitoring_stream_pushes_committed_events_as_deltas(monkeypatch):
+    import json as json_module
+    from services.monitoring_overview_service import invalidate_overview
+    from services.monitoring_stream import monitoring_bus
+
+    db, user, organization, finding = _database()
+    user.subscription_plan = "enterprise"
+    organization.plan = "enterprise"
+    first = correlate_event(db, organization.id, finding.asset_id, None, classify_telemetry({"signal": "web_scan", "source_ip": "8.8.4.4", "path": "/.env", "request_count": 40}))
+    db.commit()
+    membership = db.query(OrganizationMember).filter_by(organization_id=organization.id, user_id=user.id).one()
+    context = security_monitoring_routes.TenantContext(user=user, organization=organization, membership=membership)
+    organization_id, asset_id, first_id = organization.id, finding.asset_id, first.id
+
+    async def inline(function, *args):
+        return function(*args)
+
+    # The in-memory database lives on this thread's connection.
+    monkeypatch.setattr(security_monitoring_routes, "run_in_threadpool", inline)
+    monkeypatch.setattr(security_monitoring_routes, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+    async def scenario():
+        invalidate_overview(organization_id)
+        response = await security_monitoring_routes.monitoring_stream(context=context, db=db)
+        stream = response.body_iterator
+        assert (await stream.__anext__()).startswith("retry:")
+        snapshot = json_module.loads((await stream.__anext__()).split("data: ", 1)[1])
+        assert snapshot["reset"] and [event["id"] for event in snapshot["events"]] == [first_id] and snapshot["metrics"]["open"] == 1
+        writer = sessionmaker(bind=db.get_bind())()
+        newer = correlate_event(writer, organization_id, asset_id, None, classify_telemetry({"signal": "xss", "source_ip": "9.9.9.9", "path": "/?q=<script>"}))
+        writer.commit()
+        monitoring_bus.publish(organization_id)
+        message = await asyncio.wait_for(stream.__anext__(), 1)
+        delta = json_module.loads(message.split("data: ", 1)[1])
+        assert message.startswith("event: overview") and "reset" not in delta
+        assert [event["id"] for event in delta["events"]] == [newer.id] and delta["removed"] == []
+        assert delta["metrics"]["open"] == 2 and delta["latest_id"] == newer.id
+        assert organization_id in monitoring_bus._subscribers
+        await stream.aclose()
+        assert organization_id not in monitoring_bus._subscribers
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_monitoring_streams_share_one_overview_build_per_change(tmp_path, monkeypatch):
+    import json as json_module
+    import time
+
+    from services.monitoring_overview_service import invalidate_overview
+    from services.monitoring_stream import monitoring_bus
+
+    # A file database, so the streams' threadpool builds all see the same rows.
+    engine = create_engine(f"sqlite:///{tmp_path / 'monitoring.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    db = factory()
+    user = User(username="watcher", email="watcher@example.com", hashed_password="unused", subscription_plan="enterprise")
+    organization = Organization(name="Watch Org", slug="watch-org", plan="enterprise")
+    db.add_all([user, organization])
+    db.flush()
+    membership = OrganizationMember(organization_id=organization.id, user_id=user.id, role="owner")
+    asset = Asset(organization_id=organization.id, type="api", name="watch.example.com")
+    db.add_all([membership, asset])
+    db.commit()
+    context = security_monitoring_routes.TenantContext(user=user, organization=organization, membership=membership)
+    organization_id, asset_id = organization.id, asset.id
+    builds = []
+    real_snapshot = security_monitoring_routes._overview_snapshot
+
+    def slow_snapshot(db, organization_id):
+        builds.append(organization_id)
+        time.sleep(0.1)
+        return real_snapshot(db, organization_id)
+
+    monkeypatch.setattr(security_monitoring_routes, "_overview_snapshot", slow_snapshot)
+    monkeypatch.setattr(security_monitoring_routes, "SessionLocal", factory)
+
+    async def scenario():
+        invalidate_overview(organization_id)
+        streams = [(await security_monitoring_routes.monitoring_stream(context=context, db=factory())).body_iterator for _ in range(5)]
+        for stream in streams:
+            assert (await stream.__anext__()).startswith("retry:")
+        snapshots = await asyncio.gather(*(stream.__anext__() for stream in streams))
+        assert len(builds) == 1 and all('"reset": true' in message for message in snapshots)
+
+        writer = factory()
+        newer = correlate_event(writer, organization_id, asset_id, None, classify_telemetry({"signal": "xss", "source_ip": "9.9.9.9", "path": "/?q=<script>"}))
+        writer.commit()
+        writer.close()
+        monitoring_bus.publish(organization_id)
+        messages = await asyncio.wait_for(asyncio.gather(*(stream.__anext__() for stream in streams)), 5)
+        # Every woken stream missed the cache at once; one of them built the snapshot for all.
+        assert len(builds) == 2
+        assert all([event["id"] for event in json_module.loads(message.split("data: ", 1)[1])["events"]] == [newer.id] for message in messages)
+        for stream in streams:
+            await stream.aclose()
+
+    asyncio.run(scenario())
+
+
 def test_commercial_plan_values_and_exact_terms():
     start = datetime(2026, 1, 31, 12, 0, 0)
     assert PLAN_POLICY["starter"]["amount_cents"] == 38990
@@ -533,6 +830,44 @@ def test_report_metrics_and_pdf_come_from_persisted_facts():
         assert len(pdf) > 20_000
 
 
+def test_report_requests_render_once_in_worker_and_reuse_cached_artifact(monkeypatch):
+    from routes.report_routes import report_pdf
+    from services import report_service
+    from workers.runner import execute_job
+
+    db, user, organization, finding = _database()
+    context = TenantContext(user=user, organization=organization, membership=db.query(OrganizationMember).first())
+    report, cached = request_report(db, organization.id, user.id, "executive", 30)
+    db.commit()
+    assert (report.status, cached) == ("queued", False)
+    assert report_pdf(report.id, None, context, db).status_code == 202
+    # A second request before the worker runs shares the queued report and job.
+    assert request_report(db, organization.id, user.id, "executive", 30) == (report, False)
+    assert db.query(ScanJob).filter(ScanJob.scanner_type == "executive_report").count() == 1
+
+    renders = []
+    original = report_service.render_report_pdf
+    monkeypatch.setattr(report_service, "render_report_pdf", lambda item: renders.append(item.id) or original(item))
+    job = claim_next_job(db)
+    execute_job(db, job)
+    db.refresh(report)
+    assert (job.status, report.status, report.payload["metrics"]["findings"]["critical"]) == ("completed", "completed", 1)
+    assert report.pdf_size and len(report.pdf_etag) == 64
+
+    again, cached = request_report(db, organization.id, user.id, "executive", 30)
+    assert (again.id, cached) == (report.id, True)
+    response = report_pdf(report.id, None, context, db)
+    assert response.body.startswith(b"%PDF") and response.headers["etag"] == f'"{report.pdf_etag}"'
+    assert report_pdf(report.id, f'W/"{report.pdf_etag}"', context, db).status_code == 304
+    assert renders == [report.id]
+
+    finding.status = "resolved"
+    finding.resolved_at = datetime.utcnow()
+    db.commit()
+    fresh, cached = request_report(db, organization.id, user.id, "executive", 30)
+    assert fresh.id != report.id and not cached
+
+
 def test_ai_action_requires_human_approval():
     db, user, organization, finding = _database()
     action = propose_action(db, organization.id, user.id, "create_remediation_task", {"finding_id": finding.id})
@@ -615,6 +950,87 @@ def test_durable_job_is_claimed_once():
     assert claim_next_job(db) is None
 
 
+def test_job_queue_claims_batches_by_priority_fairly_and_reclaims_expired_leases():
+    db, user, organization, finding = _database()
+    other = Organization(name="Other Org", slug="other-org")
+    db.add(other)
+    db.flush()
+    snapshot = enqueue_job(db, organization.id, user.id, "security_snapshot")
+    backlog = [enqueue_job(db, organization.id, user.id, "web_security_scan") for _ in range(4)]
+    late = enqueue_job(db, other.id, user.id, "web_security_scan")
+    db.commit()
+
+    batch = claim_jobs(db, 3, {"web_security_scan": 2}, worker_id="worker-a")
+    # Scans outrank snapshots, the second tenant is not starved by the backlog and the type cap holds.
+    assert [job.id for job in batch] == [backlog[0].id, late.id, snapshot.id]
+    assert all(job.status == "running" and job.attempts == 1 and job.locked_by == "worker-a" for job in batch)
+    assert renew_leases(db, [job.id for job in batch], "worker-a") == 3
+    assert renew_leases(db, [job.id for job in batch], "worker-b") == 0
+
+    crashed = batch[0]
+    crashed.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    reclaimed = claim_jobs(db, 2, worker_id="worker-b")
+    assert [job.id for job in reclaimed] == [crashed.id, backlog[1].id]
+    assert crashed.attempts == 2 and crashed.locked_by == "worker-b"
+
+
+def test_failed_job_is_retried_with_backoff_until_max_attempts():
+    db, user, organization, finding = _database()
+    job = enqueue_job(db, organization.id, user.id, "security_snapshot")
+    job.max_attempts = 2
+    db.commit()
+    claim_next_job(db)
+    fail_job(job, RuntimeError("provider timeout"))
+    db.commit()
+    assert job.status == "queued" and job.available_at > datetime.utcnow() + timedelta(seconds=settings.JOB_RETRY_BASE_SECONDS - 5)
+    assert claim_next_job(db) is None
+    job.available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert claim_next_job(db).attempts == 2
+    fail_job(job, RuntimeError("provider timeout"))
+    db.commit()
+    assert job.status == "failed" and job.error == "provider timeout" and job.lease_expires_at is None
+
+    permanent = enqueue_job(db, organization.id, user.id, "security_snapshot")
+    db.commit()
+    claim_next_job(db)
+    fail_job(permanent, ValueError("Unsupported queued job"))
+    assert permanent.status == "failed"
+
+
+def test_background_web_scan_renews_its_lease_so_workers_do_not_run_it_again(tmp_path, monkeypatch):
+    import time
+
+    from services import web_scan_service
+
+    # A file database, so the lease heartbeat thread sees the same tables.
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    job_id = enqueue_job(db, 1, 1, "web_security_scan").id
+    db.commit()
+    db.close()
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.3)
+    monkeypatch.setattr(web_scan_service, "SessionLocal", factory)
+    reclaimed = []
+
+    def slow_scan(db, job):
+        time.sleep(0.8)
+        worker = factory()
+        try:
+            reclaimed.extend(job.id for job in claim_jobs(worker, 5, worker_id="worker-b"))
+        finally:
+            worker.close()
+
+    monkeypatch.setattr(web_scan_service, "execute_web_scan", slow_scan)
+    web_scan_service.run_web_scan_job(job_id)
+    db = factory()
+    job = db.get(ScanJob, job_id)
+    assert reclaimed == [] and job.status == "completed" and job.attempts == 1 and job.lease_expires_at is None
+
+
 def test_credential_vault_uses_authenticated_encryption():
     original = settings.CREDENTIAL_ENCRYPTION_KEY
     settings.CREDENTIAL_ENCRYPTION_KEY = Fernet.generate_key().decode()
@@ -830,3 +1246,300 @@ def test_worker_heartbeat_is_observable():
     status = process_status(db)
     assert status["worker"]["healthy"] is True
     assert status["scheduler"]["healthy"] is True
+
+
+def test_worker_pool_runs_jobs_concurrently_within_type_limits_and_drains_on_stop(monkeypatch):
+    import signal
+    import threading
+    import time
+
+    from models.saas import ScanJob
+    from workers import pool as worker_pool
+
+    db, user, organization, _ = _database()
+    for job_type in ["web_security_scan"] * 3 + ["security_snapshot"] * 3:
+        enqueue_job(db, organization.id, user.id, job_type)
+    db.commit()
+    monkeypatch.setattr(worker_pool, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+    lock = threading.Lock()
+    active, peaks, done = {}, {}, []
+
+    def run_job(job_id):
+        job_type = "web" if job_id <= 3 else "snapshot"
+        with lock:
+            active[job_type] = active.get(job_type, 0) + 1
+            peaks[job_type] = max(peaks.get(job_type, 0), active[job_type])
+            peaks["total"] = max(peaks.get("total", 0), sum(active.values()))
+        time.sleep(0.05)
+        with lock:
+            active[job_type] -= 1
+            done.append(job_id)
+            if len(done) == 6:
+                workers.stop()
+
+    handlers = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    workers = worker_pool.WorkerPool(run_job, concurrency=3, mode="thread", type_limits={"web_security_scan": 1}, poll_interval=0.01)
+    try:
+        workers.run()
+    finally:
+        signal.signal(signal.SIGTERM, handlers[0])
+        signal.signal(signal.SIGINT, handlers[1])
+    assert sorted(done) == [1, 2, 3, 4, 5, 6]
+    assert peaks["web"] == 1 and peaks["total"] == 3
+    assert db.query(ScanJob).filter(ScanJob.status == "running").count() == 6
+    assert claim_next_job(db) is None
+    assert worker_pool.parse_type_limits("a=2, b = 1,,c") == {"a": 2, "b": 1}
+
+
+def test_shield_scheduler_runs_due_checks_concurrently_within_host_limits_and_claims_each_once():
+    from models.monitor import MonitorTarget
+    from workers.shield_scheduler import ShieldScheduler
+
+    db, user, organization, finding = _database()
+    factory = sessionmaker(bind=db.get_bind())
+    now = datetime.utcnow()
+    addresses = ["https://a.example.com/", "https://a.example.com/login", "a.example.com:8443", "https://b.example.com", "203.0.113.7"]
+    for index, address in enumerate(addresses):
+        db.add(MonitorTarget(user_id=user.id, name=f"target-{index}", target_type="application", target_address=address, check_interval=300, last_check=now - timedelta(seconds=600)))
+    db.add(MonitorTarget(user_id=user.id, name="fresh", target_type="application", target_address="https://c.example.com", check_interval=300, last_check=now - timedelta(seconds=10)))
+    db.add(MonitorTarget(user_id=user.id, name="paused", target_type="application", target_address="https://d.example.com", status="paused"))
+    db.commit()
+
+    running = {"total": 0, "peak": 0}
+    per_host, host_peaks, checked = {}, {}, []
+
+    async def fake_check(target, session):
+        host = target.target_address.split("//")[-1].split("/")[0].split(":")[0]
+        running["total"] += 1
+        per_host[host] = per_host.get(host, 0) + 1
+        running["peak"] = max(running["peak"], running["total"])
+        host_peaks[host] = max(host_peaks.get(host, 0), per_host[host])
+        await asyncio.sleep(0.02)
+        running["total"] -= 1
+        per_host[host] -= 1
+        checked.append(target.name)
+        target.last_check = datetime.utcnow()
+        session.commit()
+
+    clock = lambda: datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
+    scheduler = ShieldScheduler(concurrency=3, per_host=2, jitter_ratio=0, check=fake_check, session_factory=factory, clock=clock)
+    # A second instance computed the same due times before the first one checked anything.
+    late = ShieldScheduler(concurrency=3, per_host=2, jitter_ratio=0, check=fake_check, session_factory=factory, clock=clock)
+    scheduler.sync(db)
+    late.sync(db)
+    assert len(scheduler.entries) == 6
+
+    async def drive(instance):
+        due = instance.due_targets(clock())
+        instance._slots = asyncio.Semaphore(instance.concurrency)
+        await asyncio.gather(*(instance.start_check(target_id, scheduled) for target_id, scheduled in due))
+        return due
+
+    assert len(asyncio.run(drive(scheduler))) == 5
+    assert sorted(checked) == [f"target-{index}" for index in range(5)]
+    assert running["peak"] == 3 and host_peaks["a.example.com"] == 2
+    metrics = scheduler.metrics()
+    assert metrics["completed"] == 5 and metrics["running"] == 0 and metrics["waiting"] == 0
+    assert metrics["lag_p95_seconds"] is not None and metrics["lag_max_seconds"] >= metrics["lag_p50_seconds"]
+    # Checked targets are due again one interval later; the fresh one keeps its own slot.
+    assert scheduler.due_targets(clock()) == []
+    assert 280 < scheduler.next_due() - clock() <= 300
+
+    asyncio.run(drive(late))
+    assert len(checked) == 5
+    assert late.metrics()["skipped"] == 5 and late.metrics()["completed"] == 0
+    assert late.due_targets(clock()) == []
+
+
+def test_monitor_log_writer_batches_compacts_payloads_rolls_up_and_prunes():
+    from models.monitor import MonitorCheckRollup, MonitorLog, MonitorTarget
+    from services.monitor_history import MonitorLogWriter, checks_since, prune_history, rollup_series
+
+    db, user, organization, finding = _database()
+    factory = sessionmaker(bind=db.get_bind())
+    target = MonitorTarget(user_id=user.id, name="api", target_type="api", target_address="https://api.example.com")
+    db.add(target)
+    db.commit()
+    checked_at = datetime(2026, 3, 10, 14, 5)
+
+    def health(healthy, response_time, ports, scan_time):
+        scan = {"scan_time": scan_time, "ports": [{"port": port, "service": "HTTPS"} for port in ports], "vulnerabilities": []}
+        return {"target_id": target.id, "is_healthy": healthy, "response_time": response_time, "issues": [], "metadata": {"status_code": 200, "security_scan": scan, "vulnerabilities": []}}
+
+    writer = MonitorLogWriter(session_factory=factory, batch_size=3, flush_seconds=5, clock=lambda: 100.0)
+    writer.add(db, target, "check", "ok", "info", health(True, 120.0, [443], "t1"), created_at=checked_at)
+    writer.add(db, target, "check", "ok", "info", health(True, 80.0, [443], "t2"), created_at=checked_at + timedelta(minutes=5))
+    assert db.query(MonitorLog).count() == 0 and writer.pending() == 2
+    writer.clock = lambda: 105.0
+    assert writer.flush_due() is True
+    writer.add(db, target, "alert", "down", "warning", health(False, 900.0, [443, 22], "t3"), created_at=checked_at + timedelta(minutes=10))
+    assert writer.pending() == 0 and writer.flush_due() is False
+
+    logs = db.query(MonitorLog).order_by(MonitorLog.id).all()
+    assert len(logs) == 3
+    # A new scan timestamp alone is not a change: the second log keeps only the hash.
+    assert logs[0].payload_hash and "security_scan" in logs[0].data["metadata"]
+    assert logs[1].payload_hash is None and "security_scan" not in logs[1].data["metadata"]
+    assert logs[1].data["metadata"]["payload_hash"] == logs[0].payload_hash
+    assert logs[2].payload_hash not in (None, logs[0].payload_hash) and logs[2].data["metadata"]["security_scan"]["ports"][1]["port"] == 22
+
+    hourly = db.query(MonitorCheckRollup).filter(MonitorCheckRollup.period == "hour").one()
+    assert (hourly.bucket_start, hourly.checks, hourly.failures, hourly.response_time_sum, hourly.response_time_max) == (datetime(2026, 3, 10, 14), 3, 1, 1100.0, 900.0)
+    # A second process adds to the same buckets with SQL increments.
+    other = MonitorLogWriter(session_factory=factory, batch_size=10)
+    other.add(db, target, "check", "ok", "info", health(True, 100.0, [443, 22], "t4"), created_at=checked_at + timedelta(minutes=20))
+    assert other.flush() == 1
+    assert db.query(MonitorLog).order_by(MonitorLog.id.desc()).first().payload_hash is None
+    # An exact window over check logs only: the alert and the checks before `since` do not count, buffered checks do.
+    assert checks_since(db, target.id, checked_at, writer=other) == 3
+    assert checks_since(db, target.id, checked_at + timedelta(minutes=6), writer=other) == 1
+    other.add(db, target, "check", "ok", "info", health(True, 90.0, [443, 22], "t5"), created_at=checked_at + timedelta(minutes=25))
+    assert checks_since(db, target.id, checked_at + timedelta(minutes=6), writer=other) == 2
+    assert other.flush() == 1
+    daily = rollup_series(db, target.id, "day", checked_at)
+    assert daily == [{"bucket_start": datetime(2026, 3, 10), "checks": 5, "failures": 1, "uptime": 80.0, "avg_response_time": 258.0, "max_response_time": 900.0}]
+
+    removed = prune_history(db, now=checked_at + timedelta(days=100))
+    db.commit()
+    assert removed == {"logs": 4, "hourly_rollups": 1}
+    assert [log.id for log in db.query(MonitorLog).all()] == [logs[2].id]
+    assert db.query(MonitorCheckRollup).filter(MonitorCheckRollup.period == "day").count() == 1
+
+
+def test_monitor_log_writers_in_different_processes_never_refer_to_a_payload_they_did_not_store():
+    from models.monitor import MonitorLog, MonitorTarget
+    from services.monitor_history import MonitorLogWriter, prune_history
+
+    db, user, organization, finding = _database()
+    factory = sessionmaker(bind=db.get_bind())
+    target = MonitorTarget(user_id=user.id, name="api", target_type="api", target_address="https://api.example.com")
+    db.add(target)
+    db.commit()
+    checked_at = datetime(2026, 3, 10, 14, 5)
+
+    def health(ports):
+        scan = {"ports": [{"port": port, "service": "HTTPS"} for port in ports], "vulnerabilities": []}
+        return {"target_id": target.id, "is_healthy": True, "response_time": 50.0, "issues": [], "metadata": {"security_scan": scan}}
+
+    first, second = (MonitorLogWriter(session_factory=factory, batch_size=1) for _ in range(2))
+    first.add(db, target, "check", "ok", "info", health([443]), created_at=checked_at)
+    second.add(db, target, "check", "ok", "info", health([443, 22]), created_at=checked_at + timedelta(minutes=5))
+    # The first writer last stored [443], but the database's latest payload is now [443, 22].
+    first.add(db, target, "check", "ok", "info", health([443]), created_at=checked_at + timedelta(minutes=10))
+    first.add(db, target, "check", "ok", "info", health([443]), created_at=checked_at + timedelta(minutes=15))
+    logs = db.query(MonitorLog).order_by(MonitorLog.id).all()
+    assert [log.payload_hash is not None for log in logs] == [True, True, True, False]
+    assert logs[2].data["metadata"]["security_scan"]["ports"] == [{"port": 443, "service": "HTTPS"}]
+    assert logs[3].data["metadata"]["payload_hash"] == logs[2].payload_hash
+
+    prune_history(db, now=checked_at + timedelta(days=100))
+    db.commit()
+    # The payload kept by pruning is the one the latest compact log refers to.
+    assert [log.id for log in db.query(MonitorLog).order_by(MonitorLog.id)] == [logs[2].id]
+
+
+def test_rate_limit_middleware_resolves_identity_from_caches_and_limits_with_gcra(monkeypatch):
+    import httpx
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    from auth import create_access_token
+    from middleware import rate_limit
+    from middleware.rate_limit import RateLimitMiddleware
+    from services import request_identity
+    from services.rate_limit import RateLimitBackend
+
+    db, user, organization, finding = _database()
+    user.subscription_plan = "starter"
+    db.commit()
+    loads, decodes = [], []
+    real_decode = request_identity.jwt.decode
+
+    def load(username):
+        loads.append(username)
+        row = db.query(User.id, User.subscription_plan, OrganizationMember.organization_id).outerjoin(
+            OrganizationMember, OrganizationMember.user_id == User.id,
+        ).filter(User.username == username).first()
+        return request_identity.Identity(*row) if row else None
+
+    async def inline(function, *args):
+        return function(*args)
+
+    monkeypatch.setattr(request_identity, "load_identity", load)
+    monkeypatch.setattr(request_identity, "run_in_threadpool", inline)
+    monkeypatch.setattr(request_identity.jwt, "decode", lambda *args, **kwargs: decodes.append(1) or real_decode(*args, **kwargs))
+    monkeypatch.setitem(rate_limit.PLAN_RATE_LIMITS, "free", 2)
+    request_identity.invalidate_identities(usernames={user.username})
+    backend = RateLimitBackend()
+    backend._redis = None
+    app = RateLimitMiddleware(Starlette(routes=[Route("/api/things", lambda request: PlainTextResponse("ok"))]), backend=backend)
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': user.username}, timedelta(minutes=5))}"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app, client=("203.0.113.5", 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [await client.get("/api/things", headers=auth) for _ in range(3)]
+            assert [response.headers["X-RateLimit-Limit"] for response in responses] == ["50"] * 3
+            assert [response.headers["X-RateLimit-Remaining"] for response in responses] == ["49", "48", "47"]
+            # One JWT decode and one identity query for three requests.
+            assert len(decodes) == 1 and loads == [user.username]
+
+            user.subscription_plan = "enterprise"
+            db.commit()
+            assert (await client.get("/api/things", headers=auth)).headers["X-RateLimit-Limit"] == "500"
+            assert loads == [user.username] * 2
+            db.delete(db.query(OrganizationMember).filter(OrganizationMember.user_id == user.id).one())
+            db.commit()
+            assert (await client.get("/api/things", headers=auth)).status_code == 200
+            assert len(loads) == 3 and f"ratelimit:none:{user.id}:/api/things" in backend._local
+
+            anonymous = [await client.get("/api/things") for _ in range(3)]
+            assert [response.status_code for response in anonymous] == [200, 200, 429]
+            assert anonymous[2].json() == {"detail": "Rate limit exceeded", "plan": "free"}
+            # GCRA spreads the two hits per minute: the next one is allowed 30 seconds after the first.
+            assert anonymous[2].headers["X-RateLimit-Remaining"] == "0" and 29 <= int(anonymous[2].headers["Retry-After"]) <= 30
+            assert (await client.get("/health")).status_code == 404 and len(decodes) == 1
+
+    asyncio.run(scenario())
+
+
+def test_local_rate_limiter_expires_through_the_wheel_and_bounds_keys_by_lru():
+    from services.rate_limit import LocalRateLimiter
+
+    clock = [1000.0]
+    limiter = LocalRateLimiter(max_keys=4, shards=2, clock=lambda: clock[0])
+    assert [limiter.incr("ip:a:16", 1020.0) for _ in range(3)] == [1, 2, 3]
+    # GCRA with 2 hits per 60 s: the second hit fills the window, the third waits 30 s.
+    assert limiter.gcra("user:1", 1000000.0, 30000.0, 60000.0)[:2] == (1, 1)
+    assert limiter.gcra("user:1", 1000000.0, 30000.0, 60000.0)[:2] == (1, 0)
+    assert limiter.gcra("user:1", 1000000.0, 30000.0, 60000.0) == (0, 0, 60000, 30000)
+
+    clock[0] = 1021.0
+    assert limiter.incr("ip:b:17", 1040.0) == 1
+    assert "ip:a:16" not in limiter and "user:1" in limiter
+    # The next hit on a shard sweeps only the wheel slots that have passed.
+    single = LocalRateLimiter(max_keys=10, shards=1, clock=lambda: clock[0])
+    single.incr("ip:a:17", 1030.0)
+    single.incr("ip:b:17", 1040.0)
+    clock[0] = 1035.0
+    single.incr("ip:c:17", 1040.0)
+    assert list(single._shards[0].entries) == ["ip:b:17", "ip:c:17"] and list(single._shards[0].wheel) == [1040]
+
+    def wheel_entries(limiter):
+        return sum(len(keys) for shard in limiter._shards for keys in shard.wheel.values())
+
+    for index in range(20):
+        limiter.incr(f"flood:{index}", 2000.0 + index)
+    # Evicted keys leave the wheel too: one wheel entry per live key at most.
+    assert len(limiter) <= 4 and wheel_entries(limiter) <= 4
+    assert all(len(shard.entries) <= 2 for shard in limiter._shards)
+    # A hot GCRA key moves its TAT into a new second on most hits but keeps a single wheel entry.
+    hot = LocalRateLimiter(max_keys=4, shards=1, clock=lambda: clock[0])
+    for hit in range(5000):
+        hot.gcra("user:hot", 1021000.0 + hit * 10, 600.0, 3600000.0)
+    assert len(hot) == 1 and wheel_entries(hot) == 1
+    clock[0] = 5000.0
+    limiter.incr("late", 5060.0)
+    assert "late" in limiter and "flood:19" not in limiter
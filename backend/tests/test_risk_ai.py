@@ -51,3 +51,69 @@ def test_iron_ai_only_uses_current_tenant_facts():
     response = IronAIService().answer(db, context, "Qual meu maior risco?")
     assert "Exposed API" not in response["summary"]
     assert response["facts"]["findings"][0]["title"] == "Exposed API"
+
+
+def test_incremental_scores_and_aggregates_match_full_recomputation():
+    from risk.engine import create_snapshot, rebuild_risk_aggregate, refresh_finding_scores
+
+    db, context = _context()
+    organization_id = context.organization.id
+
+    def legacy_summary():
+        findings = db.query(Finding).filter(Finding.organization_id == organization_id).all()
+        assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.organization_id == organization_id).all()}
+        scores = {finding.id: calculate_finding_risk(finding, assets.get(finding.asset_id))[0] for finding in findings if finding.status != "false_positive"}
+        opened = [finding for finding in findings if finding.status == "open"]
+        counts = {severity: sum(1 for finding in opened if finding.severity == severity) for severity in ("critical", "high", "medium", "low")}
+        penalty = sum(min(35, scores.get(finding.id, finding.risk_score or 0)) for finding in opened)
+        return {"score": min(100, max(0, 100 - penalty + min(10, len(assets)))), "findings": counts, "assets_total": len(assets), "assets_exposed": sum(1 for asset in assets.values() if asset.internet_exposed)}, scores, penalty
+
+    asset = Asset(organization_id=organization_id, type="web_application", name="app", criticality="high")
+    db.add(asset)
+    db.flush()
+    db.add_all([Finding(organization_id=organization_id, asset_id=asset.id, fingerprint=f"f{n}", title="t", severity=("critical", "high", "medium", "low", "informational")[n % 5], status="open" if n in (1, 2, 5) else "resolved") for n in range(6)])
+    db.commit()
+    expected, _, _ = legacy_summary()
+    assert organization_security_score(db, organization_id) == expected
+    db.commit()
+
+    findings = db.query(Finding).filter(Finding.organization_id == organization_id).order_by(Finding.id).all()
+    findings[0].status = "resolved"
+    findings[1].severity = "low"
+    findings[2].status = "false_positive"
+    findings[3].occurrence_count = 4
+    db.delete(findings[4])
+    db.commit()
+    db.expire_all()
+    asset.internet_exposed = True
+    db.commit()
+    assert refresh_finding_scores(db, organization_id) == 4
+    expected, scores, penalty = legacy_summary()
+    assert all(db.get(Finding, finding_id).risk_score == score for finding_id, score in scores.items())
+    snapshot = create_snapshot(db, organization_id)
+    assert (snapshot.score, snapshot.critical_findings, snapshot.high_findings, snapshot.low_findings, snapshot.assets_exposed) == (expected["score"], expected["findings"]["critical"], expected["findings"]["high"], expected["findings"]["low"], 1)
+    assert organization_security_score(db, organization_id) == expected
+    assert refresh_finding_scores(db, organization_id) == 0
+    assert 0 < expected["score"] < 100
+    assert rebuild_risk_aggregate(db, organization_id)["open_penalty"] == penalty
+
+
+def test_findings_changed_without_a_refresh_are_rescored_by_a_later_session():
+    from risk.engine import refresh_finding_scores
+
+    db, context = _context()
+    organization_id = context.organization.id
+    db.add_all([Finding(organization_id=organization_id, fingerprint=f"f{n}", title="t", severity="medium", status="open") for n in range(3)])
+    db.commit()
+    assert refresh_finding_scores(db, organization_id) == 3
+    db.commit()
+    finding = db.query(Finding).filter(Finding.fingerprint == "f0").one()
+    before = finding.risk_score
+    finding.occurrence_count = 6
+    # Committed and closed without refresh_finding_scores, like the scan routes' persist path.
+    db.commit()
+    db.close()
+
+    later = sessionmaker(bind=db.get_bind())()
+    assert refresh_finding_scores(later, organization_id) == 1
+    assert later.query(Finding).filter(Finding.fingerprint == "f0").one().risk_score == before + 5
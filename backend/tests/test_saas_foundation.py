@@ -79,3 +79,258 @@ def test_viewer_cannot_use_write_role_dependency():
         assert exc.status_code == 403
     else:
         raise AssertionError("viewer must not pass a write dependency")
+
+
+def test_persist_scan_findings_bulk_upserts_with_constant_round_trips():
+    from sqlalchemy import event
+
+    from models.saas import Finding
+    from services.finding_service import persist_scan_findings
+
+    db = _db()
+    user = _user(db, "scanner")
+    organization = _org(db, "Scanner", user)
+    results = {"vulnerabilities": [{"type": "SQL Injection", "severity": "CRITICAL", "file": f"app/{n % 2500}.py", "code": "execute(q)"} for n in range(3000)]}
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    first = persist_scan_findings(db, user, results, "code_scanner", "repo")
+    db.commit()
+    assert len(first) == 3000
+    assert first[0] is first[2500]
+    assert db.query(Finding).count() == 2500
+    assert first[0].occurrence_count == 2 and first[2499].occurrence_count == 1
+    assert len(statements) < 20
+
+    first[3].status = "resolved"
+    db.commit()
+    statements.clear()
+    second = persist_scan_findings(db, user, {"vulnerabilities": results["vulnerabilities"][:10] + [{"type": "XSS", "file": "web/a.js"}]}, "code_scanner", "repo")
+    db.commit()
+    assert sum(statement.startswith("SELECT findings") for statement in statements) == 1
+    assert len(statements) < 15
+    assert [finding.id for finding in second[:10]] == [finding.id for finding in first[:10]]
+    assert second[0].occurrence_count == 3 and second[3].status == "open"
+    assert second[10].severity == "medium" and second[10].organization_id == organization.id
+    assert db.query(Finding).count() == 2501
+
+
+def test_persist_scan_findings_counts_findings_inserted_by_a_concurrent_scan_once(monkeypatch):
+    from sqlalchemy import select
+
+    from models.saas import Finding, OrganizationRiskAggregate
+    from risk.engine import organization_security_score, rebuild_risk_aggregate
+    from services import finding_service
+
+    db = _db()
+    user = _user(db, "racer")
+    organization = _org(db, "Racer", user)
+    results = {"vulnerabilities": [{"type": "XSS", "file": "a.js", "severity": "HIGH"}, {"type": "SQL Injection", "file": "b.py", "severity": "CRITICAL"}]}
+    finding_service.persist_scan_findings(db, user, results, "code_scanner", "repo")
+    organization_security_score(db, organization.id)
+    db.query(Finding).filter(Finding.severity == "critical").one().status = "resolved"
+    db.commit()
+
+    lookups, real_lookup = [], finding_service._existing_findings
+
+    def raced_lookup(db, organization_id, fingerprints):
+        # The first lookup misses both findings, as if another scan inserted them right after it.
+        lookups.append(fingerprints)
+        return {} if len(lookups) == 1 else real_lookup(db, organization_id, fingerprints)
+
+    monkeypatch.setattr(finding_service, "_existing_findings", raced_lookup)
+    persisted = finding_service.persist_scan_findings(db, user, results, "code_scanner", "repo")
+    db.commit()
+    assert [finding.occurrence_count for finding in persisted] == [2, 2] and persisted[1].status == "open"
+    assert db.query(Finding).count() == 2
+    table = OrganizationRiskAggregate.__table__
+    incremental = dict(db.execute(select(table).where(table.c.organization_id == organization.id)).mappings().one())
+    expected = rebuild_risk_aggregate(db, organization.id)
+    assert {name: incremental[name] for name in expected} == expected and expected["high_open"] == expected["critical_open"] == 1
+
+
+def test_scan_history_is_keyset_paginated_and_dashboard_uses_summary_columns():
+    import asyncio
+    import json
+    from datetime import timedelta
+
+    from models.scan import Scan
+    from routes.scan_routes import get_dashboard_stats, get_user_scans
+
+    db = _db()
+    user = _user(db, "historian")
+    other = _user(db, "stranger")
+    started = datetime(2025, 1, 1)
+    for index in range(5):
+        results = {"vulnerabilities": [{"severity": "HIGH"}] * index, "severity_count": {"CRITICAL": 0, "HIGH": index, "MEDIUM": 0, "LOW": 0}, "total_vulnerabilities": index}
+        db.add(Scan(user_id=user.id, scan_type="code", target=f"file{index}.py", status="completed", results=json.dumps(results), created_at=started + timedelta(minutes=index // 2)))
+    db.add(Scan(user_id=other.id, scan_type="code", target="other.py", status="completed", results=json.dumps({"summary": {"total": 7, "critical": 7}})))
+    db.commit()
+
+    pages, cursor = [], None
+    while True:
+        page = asyncio.run(get_user_scans(limit=2, cursor=cursor, include_results=False, current_user=user, db=db))
+        pages.append(page["scans"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    targets = [scan["target"] for page in pages for scan in page]
+    assert targets == ["file4.py", "file3.py", "file2.py", "file1.py", "file0.py"] and page["total"] == 5
+    assert "results" not in pages[0][0] and pages[0][0]["summary"] == {"total": 4, "critical": 0, "high": 4, "medium": 0, "low": 0}
+    detailed = asyncio.run(get_user_scans(limit=1, cursor=None, include_results=True, current_user=user, db=db))
+    assert detailed["scans"][0]["results"]["total_vulnerabilities"] == 4
+
+    stats = asyncio.run(get_dashboard_stats(current_user=user, db=db))
+    assert stats["total_scans"] == 5 and stats["total_vulnerabilities"] == 10
+    assert stats["severity_count"] == {"CRITICAL": 0, "HIGH": 10, "MEDIUM": 0, "LOW": 0}
+    assert [scan["target"] for scan in stats["recent_scans"]][:2] == ["file4.py", "file3.py"]
+
+    scan = db.query(Scan).filter(Scan.target == "file4.py").one()
+    scan.results = json.dumps({"vulnerabilities": [{"severity": "LOW"}]})
+    db.commit()
+    assert (scan.findings_total, scan.high_count, scan.low_count) == (1, 0, 1)
+
+
+def test_scan_results_are_compressed_out_of_row_and_streamed_back():
+    import asyncio
+    import json
+
+    from models.scan import Scan, ScanResult
+    from routes.scan_routes import get_scan_details
+
+    db = _db()
+    user = _user(db, "archivist")
+    results = {"vulnerabilities": [{"severity": "CRITICAL", "description": "Chave AWS exposta " * 20}] * 500}
+    scan = Scan(user_id=user.id, scan_type="code", target="big.py", status="completed", results=json.dumps(results))
+    legacy = Scan(user_id=user.id, scan_type="code", target="old.py", status="completed", stored_results=json.dumps({"vulnerabilities": []}))
+    db.add_all([scan, legacy])
+    db.commit()
+    scan_id, legacy_id = scan.id, legacy.id
+    db.expunge(scan)
+    db.expunge(legacy)
+
+    stored = db.query(ScanResult).one()
+    assert stored.raw_size == len(json.dumps(results)) and len(stored.payload) * 20 < stored.raw_size
+    assert db.query(Scan.stored_results).filter(Scan.target == "big.py").scalar() is None
+    assert db.query(Scan).filter(Scan.target == "big.py").one().critical_count == 500
+
+    async def read(scan_id):
+        response = await get_scan_details(scan_id=scan_id, current_user=user, db=db)
+        return json.loads(b"".join([chunk async for chunk in response.body_iterator]))
+
+    assert asyncio.run(read(scan_id))["results"] == results
+    assert asyncio.run(read(legacy_id))["results"] == {"vulnerabilities": []}
+    reloaded = db.get(Scan, legacy_id)
+    reloaded.results = None
+    db.commit()
+    assert asyncio.run(read(legacy_id))["results"] is None and reloaded.findings_total == 0
+    broken = Scan(user_id=user.id, scan_type="code", target="broken.py", status="completed", stored_results="{'not': json")
+    db.add(broken)
+    db.commit()
+    assert asyncio.run(read(broken.id))["results"] == "{'not': json"
+
+
+def test_bulk_scan_deletes_remove_payloads_so_reused_ids_can_be_saved():
+    import json
+
+    from models.scan import Scan, ScanResult
+    from routes.admin_routes import clear_activity_logs, delete_user
+
+    db = _db()
+    admin = _user(db, "admin")
+    user = _user(db, "departing")
+    for owner in (user, user, admin):
+        db.add(Scan(user_id=owner.id, scan_type="code", target="app.py", status="completed", results=json.dumps({"vulnerabilities": []})))
+    db.commit()
+
+    delete_user(user_id=user.id, db=db, admin=admin)
+    assert db.query(Scan).count() == db.query(ScanResult).count() == 1
+    assert clear_activity_logs(db=db, admin=admin) == {"success": True, "deleted": 1}
+    assert db.query(ScanResult).count() == 0
+    # SQLite reuses the freed rowid; an orphaned payload would make this insert fail.
+    db.add(Scan(user_id=admin.id, scan_type="code", target="new.py", status="completed", results=json.dumps({"vulnerabilities": [{"severity": "LOW"}]})))
+    db.commit()
+    assert db.query(Scan).one().load_results() == {"vulnerabilities": [{"severity": "LOW"}]}
+
+
+def test_admitted_scan_is_saved_even_when_the_io_pool_is_full(tmp_path, monkeypatch):
+    import asyncio
+
+    from models.scan import Scan
+    from routes import scan_routes
+    from services.scan_executor import ExecutorSaturated
+
+    class Inline:
+        async def run(self, function, *args, **kwargs):
+            return function(*args, **kwargs)
+
+    class Saturated:
+        async def run(self, function, *args, **kwargs):
+            raise ExecutorSaturated("full")
+
+    # The final save runs in a worker thread, so the database must be shared across connections.
+    db = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'scans.db'}", connect_args={"check_same_thread": False}))()
+    Base.metadata.create_all(db.get_bind())
+    user = _user(db, "scanner")
+    user.subscription_plan = "enterprise"
+    db.commit()
+    monkeypatch.setattr(scan_routes, "cpu_executor", Inline())
+    monkeypatch.setattr(scan_routes, "io_executor", Saturated())
+
+    request = scan_routes.CodeScanRequest(code="password = 'hunter2'\n", filename="app.py")
+    response = asyncio.run(scan_routes.scan_code_endpoint(request=request, current_user=user, db=db))
+    saved = db.query(Scan).filter(Scan.id == response["scan_id"]).one()
+    assert saved.target == "app.py" and saved.load_results() == response["results"]
+
+
+def test_sqlite_migrator_carries_compressed_and_legacy_scan_payloads(tmp_path):
+    import json
+
+    from models.scan import Scan, ScanResult
+    from migrate_sqlite_to_postgres import migrate
+
+    source_engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    Base.metadata.create_all(source_engine)
+    source = sessionmaker(bind=source_engine)()
+    user = _user(source, "migrating")
+    results = {"vulnerabilities": [{"severity": "HIGH", "description": "SQL Injection"}] * 3}
+    source.add_all([
+        Scan(id=7, user_id=user.id, scan_type="code", target="app.py", status="completed", results=json.dumps(results)),
+        Scan(id=8, user_id=user.id, scan_type="code", target="old.py", status="completed", stored_results=json.dumps({"vulnerabilities": []})),
+    ])
+    source.commit()
+    source.close()
+    source_engine.dispose()
+
+    assert migrate(str(tmp_path / "source.db"), f"sqlite:///{tmp_path / 'target.db'}") == 0
+    target = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'target.db'}"))()
+    migrated = {scan.id: scan for scan in target.query(Scan)}
+    assert migrated[7].load_results() == results and migrated[7].high_count == 3
+    assert migrated[8].load_results() == {"vulnerabilities": []}
+    assert target.query(ScanResult).count() == 2
+
+
+def test_full_account_report_dedupes_and_caps_details_while_streaming_a_pdf():
+    import json
+
+    from models.scan import Scan
+    from services import account_report_service as reports
+
+    db = _db()
+    user = _user(db, "auditor")
+    for index in range(3):
+        vulnerabilities = [{"type": "XSS", "severity": "HIGH", "file": "app.js", "line": line} for line in range(60)]
+        vulnerabilities.append({"type": "RCE", "severity": "CRITICAL", "file": f"svc{index}.py", "line": 1, "cvss": 9 + index / 10})
+        db.add(Scan(user_id=user.id, scan_type="code", target=f"repo{index}", status="completed", results=json.dumps({"vulnerabilities": vulnerabilities})))
+    db.commit()
+
+    report = reports.collect_account_report(db, user.id)
+    # The 60 XSS findings repeat in every scan and collapse; each RCE is distinct.
+    assert report["summary"] == {"total": 63, "critical": 3, "high": 60, "medium": 0, "low": 0}
+    assert len(report["vulnerabilities"]) == 3 + reports.DETAIL_PER_SEVERITY
+    assert [item["cvss"] for item in report["prioritized_vulnerabilities"][:3]] == [9.2, 9.1, 9.0]
+    assert report["user_overview"]["total_scans"] == 3 and report["tools_summary"][0]["vulnerabilities"] == 183
+    assert not db.identity_map.keys() - {key for key in db.identity_map.keys() if key[0] is not Scan}
+
+    pdf = b"".join(reports.iter_file(reports.write_account_report(db, user.id)))
+    assert pdf.startswith(b"%PDF") and pdf.rstrip().endswith(b"%%EOF")
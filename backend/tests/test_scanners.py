@@ -0,0 +1,277 @@
+import re
+from pathlib import Path
+
+from scanners.code_scanner import EXTRA_SCANNERS, SCANNER_MAP, scan_code
+from scanners.rule_engine import CompiledRuleSet, Rule, required_literals
+
+EXAMPLE = (Path(__file__).resolve().parents[2] / "examples" / "vulnerable_code.py").read_text()
+
+
+def _legacy_scan(code, scanners):
+    vulnerabilities = []
+    for scanner in scanners:
+        if not scanner.applies_to(code):
+            continue
+        for number, line in enumerate(code.split("\n"), 1):
+            if scanner.LINE_REQUIRES and scanner.LINE_REQUIRES not in line:
+                continue
+            for pattern in scanner.PATTERNS:
+                if re.search(pattern, line, re.IGNORECASE):
+                    vulnerabilities.append(scanner.finding(number, line))
+    return vulnerabilities
+
+
+def test_single_pass_code_scan_matches_per_line_per_pattern_semantics():
+    samples = [EXAMPLE, EXAMPLE.replace("csrf", ""), "@app.route('/x', methods=['POST'])\n<form>\r\nPASSWORD = 'a'", "ımport pıckle\nİmport marshal\nſecret = 'x'", ""]
+    for code in samples:
+        expected = _legacy_scan(code, [*SCANNER_MAP.values(), *EXTRA_SCANNERS])
+        assert scan_code(code)["vulnerabilities"] == expected
+    disabled = scan_code(EXAMPLE, {"sql_injection": False, "xss": False})
+    assert {item["type"] for item in disabled["vulnerabilities"]}.isdisjoint({"SQL Injection", "Cross-Site Scripting (XSS)"})
+    assert disabled["total_vulnerabilities"] == sum(disabled["severity_count"].values())
+
+
+def test_rule_engine_extracts_literal_anchors_and_reports_each_matching_rule():
+    assert required_literals(r"cursor\.execute\s*\(") == frozenset({"cursor.execute"})
+    assert required_literals(r"SECRET|PRIVATE") == frozenset({"secret", "private"})
+    assert required_literals(r"\s*=") == frozenset({"="})
+    rules = CompiledRuleSet([Rule(r"eval\s*\(", tag="eval"), Rule(r"\(\w+\)", tag="call"), Rule(r"DEBUG\s*=\s*True", tag="debug", requires="DEBUG")])
+    found = [(number, rule.tag) for number, _, rule in rules.matches("x = 1\nEVAL (data)\ndebug = True\nDEBUG=true")]
+    assert found == [(2, "eval"), (2, "call"), (4, "debug")]
+
+
+def test_multilang_prefilter_keeps_rule_then_line_order_with_and_without_automaton(monkeypatch):
+    from scanners import rule_engine
+    from scanners.multilang_scanner import MultiLanguageScanner
+
+    code = "import os\nos.system('ping ' + host)\nresult = eval(data)\nPICKLE.loads(blob)\nvalue = eval(other)\n"
+
+    def legacy(scanner):
+        findings = []
+        for vuln_type, patterns in scanner.languages["python"].patterns.items():
+            for pattern_info in patterns:
+                for number, line in enumerate(code.split("\n"), 1):
+                    if re.search(pattern_info["pattern"], line, re.IGNORECASE):
+                        findings.append((vuln_type.replace("_", " ").title(), pattern_info["severity"], number))
+        return findings
+
+    for automaton in (rule_engine.ahocorasick, None):
+        monkeypatch.setattr(rule_engine, "ahocorasick", automaton)
+        scanner = MultiLanguageScanner()
+        result = scanner.scan(code, "app.py")
+        assert [(item["type"], item["severity"], item["line"]) for item in result["vulnerabilities"]] == legacy(scanner)
+        assert [item["line"] for item in result["vulnerabilities"] if item["code"].startswith(("result", "value"))] == [3, 5]
+        assert result["summary"]["critical"] == 4
+
+
+def test_repository_archive_scan_fans_out_files_and_refuses_unsafe_members():
+    import io
+    import zipfile
+
+    from scanners.repository_scanner import scan_archive
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        bundle.writestr("app/db.py", "cursor.execute('SELECT ' + name)\n")
+        bundle.writestr("web/view.js", "node.innerHTML = value\n")
+        bundle.writestr("web/clean.go", "package main\n")
+        bundle.writestr("../escape.py", "eval(payload)\n")
+        bundle.writestr("node_modules/lib/index.js", "eval(payload)\n")
+        bundle.writestr("README.md", "eval(payload)\n")
+        bundle.writestr("app/blob.py", b"\0\1eval(")
+    buffer.seek(0)
+    result = scan_archive(buffer, "repo.zip", workers=2)
+    assert result["files_scanned"] == 3
+    assert result["files_skipped"] == [{"file": "app/blob.py", "reason": "binary"}]
+    assert result["languages"] == {"Python": 1, "JavaScript/TypeScript": 1, "Go": 1}
+    assert [item["file"] for item in result["files"]] == ["app/db.py", "web/view.js"]
+    assert {(item["file"], item["type"]) for item in result["vulnerabilities"]} == {("app/db.py", "Sql Injection"), ("web/view.js", "Xss")}
+    assert result["total_vulnerabilities"] == sum(result["severity_count"].values()) == 2
+
+
+def test_scan_cache_is_content_addressed_versioned_and_bounded(monkeypatch):
+    from scanners import code_scanner
+    from services.scan_cache import ScanResultCache, ruleset_version
+
+    cache = ScanResultCache(max_entries=2)
+    monkeypatch.setattr(code_scanner, "scan_cache", cache)
+    calls = []
+    original = code_scanner.run_scanners
+    monkeypatch.setattr(code_scanner, "run_scanners", lambda scanners, code: calls.append(code) or original(scanners, code))
+    first = scan_code("eval(data)\n")
+    second = scan_code("eval(data)\n")
+    assert len(calls) == 1
+    assert first["vulnerabilities"] == second["vulnerabilities"]
+    second["vulnerabilities"][0]["code"] = "mutated"
+    assert scan_code("eval(data)\n")["vulnerabilities"][0]["code"] == "eval(data)"
+    scan_code("eval(data)\n", {"xss": False})
+    assert len(calls) == 2
+    monkeypatch.setattr(code_scanner, "RULESET_VERSION", ruleset_version("changed-rules"))
+    scan_code("eval(data)\n")
+    assert len(calls) == 3
+    assert len(cache._local) == 2
+    assert ruleset_version(["a"]) != ruleset_version(["b"])
+
+
+def test_bounded_executor_rejects_work_beyond_workers_plus_queue_and_releases_slots():
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import pytest
+    from services.scan_executor import BoundedExecutor, ExecutorSaturated
+
+    gate = threading.Event()
+    executor = BoundedExecutor("test", lambda workers: ThreadPoolExecutor(max_workers=workers), max_workers=1, max_queue=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(gate.wait, 5))
+        second = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        assert executor.stats()["in_flight"] == 2
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: "rejected")
+        gate.set()
+        assert await first is True
+        assert await second == "queued"
+        assert await executor.run(lambda: "after") == "after"
+
+    asyncio.run(scenario())
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_repository_scan_batches_go_through_executor_admission(tmp_path, monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    import pytest
+    from scanners import repository_scanner
+    from services.scan_executor import BoundedExecutor, ExecutorSaturated
+
+    for index in range(6):
+        (tmp_path / f"module{index}.py").write_text("eval(payload)\n")
+    monkeypatch.setattr(repository_scanner, "FILES_PER_TASK", 1)
+    executor = BoundedExecutor("test", lambda workers: ThreadPoolExecutor(max_workers=workers), max_workers=1, max_queue=1)
+    gate = threading.Event()
+    busy = [executor.submit(gate.wait, 5) for _ in range(2)]
+    # A saturated pool rejects the first batch, so the route can still answer 503.
+    with pytest.raises(ExecutorSaturated):
+        next(repository_scanner.iter_repository_scan(str(tmp_path), executor.batches(), 2))
+    gate.set()
+    assert all(future.result() for future in busy)
+
+    peaks = []
+    real_scan = repository_scanner._scan_files
+    monkeypatch.setattr(repository_scanner, "_scan_files", lambda root, paths: peaks.append(executor.stats()["in_flight"]) or real_scan(root, paths))
+    # Once admitted, later batches wait for a slot instead of exceeding workers + queue or failing the scan.
+    results = list(repository_scanner.iter_repository_scan(str(tmp_path), executor.batches(), 2))
+    assert len(results) == 6 and max(peaks) <= executor.capacity
+    # Slots are released by done-callbacks, which may run just after result() returns.
+    deadline = time.monotonic() + 2
+    while executor.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_api_scanner_runs_endpoints_concurrently_within_per_host_cap_and_budget():
+    import asyncio
+
+    import httpx
+    from scanners.api_scanner import APISecurityScanner
+
+    state = {"active": 0, "peak": 0, "requests": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["requests"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.001)
+        state["active"] -= 1
+        if request.url.path == "/limited" and state["requests"] % 3 == 0:
+            return httpx.Response(429)
+        if request.url.params.get("q", "").startswith("'"):
+            return httpx.Response(500, text="SQL syntax error")
+        return httpx.Response(200, text='{"password": "x"}', headers={"Access-Control-Allow-Origin": "*"})
+
+    scanner = APISecurityScanner("http://api.test", per_host_concurrency=4, transport=httpx.MockTransport(handler))
+    endpoints = ["/users?q=1", "/items", "/limited"] + [f"/bulk/{n}" for n in range(40)]
+    result = scanner.full_scan(endpoints)
+    assert state["peak"] <= 4
+    assert [item["endpoint"] for item in result["endpoint_results"]] == endpoints
+    users = result["endpoint_results"][0]
+    assert [vuln["type"] for vuln in users["vulnerabilities"]][:2] == ["SQL Injection", "Broken Authentication"]
+    assert {"Broken Authentication", "Sensitive Data Exposure", "Security Misconfiguration", "Missing Rate Limiting", "CORS Misconfiguration"} <= {vuln["type"] for vuln in users["vulnerabilities"]}
+    assert "Missing Rate Limiting" not in {vuln["type"] for vuln in result["endpoint_results"][2]["vulnerabilities"]}
+    assert result["total_vulnerabilities"] == sum(result["severity_count"].values()) == sum(item["total_vulnerabilities"] for item in result["endpoint_results"])
+    assert result["errors"] == []
+
+    exhausted = APISecurityScanner("http://api.test", time_budget=1e-9, transport=httpx.MockTransport(handler)).full_scan(["/items"])
+    assert exhausted["total_vulnerabilities"] == 0
+    assert exhausted["errors"] and exhausted["errors"] == exhausted["endpoint_results"][0]["errors"]
+
+
+def test_shield_health_probes_run_on_asyncio_and_reuse_one_keep_alive_http_client(monkeypatch):
+    import asyncio
+    import socket
+
+    from models.monitor import MonitorTarget
+    from routes import viggio_shield_routes
+    from scanners import network_probes
+    from scanners.port_scanner import PortScanner
+
+    monkeypatch.setattr(viggio_shield_routes, "deep_web_scan", lambda address, target_type: {"findings": []})
+    with socket.socket() as spare:
+        spare.bind(("127.0.0.1", 0))
+        closed_port = spare.getsockname()[1]
+    http_connections = []
+
+    async def serve_http(reader, writer):
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                # The security port scan also connects here; count only connections that carried requests.
+                if writer not in http_connections:
+                    http_connections.append(writer)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def serve_banner(reader, writer):
+        writer.write(b"SSH-2.0-OpenSSH_8.9\r\n")
+        await writer.drain()
+        writer.close()
+
+    async def scenario():
+        http_server = await asyncio.start_server(serve_http, "127.0.0.1", 0)
+        banner_server = await asyncio.start_server(serve_banner, "127.0.0.1", 0)
+        http_port = http_server.sockets[0].getsockname()[1]
+        banner_port = banner_server.sockets[0].getsockname()[1]
+        try:
+            ports = await network_probes.probe_tcp_ports("127.0.0.1", [banner_port, closed_port])
+            assert [(item["port"], item["open"]) for item in ports] == sorted([(banner_port, True), (closed_port, False)])
+            # A refused connection still proves the host answered.
+            assert await network_probes.tcp_reachable("127.0.0.1", (closed_port,)) is True
+            assert await network_probes.icmp_echo("127.0.0.1") in (True, None)
+            scan = await PortScanner().scan_host_async("127.0.0.1", [banner_port, closed_port])
+            assert scan["open_ports"] == 1 and scan["ports"][0]["banner"].startswith("SSH-2.0-OpenSSH_8.9")
+
+            application = MonitorTarget(id=1, target_type="application", target_address=f"http://127.0.0.1:{http_port}/")
+            first = await viggio_shield_routes.check_target_health(application)
+            second = await viggio_shield_routes.check_target_health(application)
+            assert first["is_healthy"] and second["metadata"]["status_code"] == 200
+            assert len(http_connections) == 1
+
+            server = MonitorTarget(id=2, target_type="server", target_address="127.0.0.1", monitoring_ports=[http_port, closed_port])
+            health = await viggio_shield_routes.check_target_health(server)
+            assert health["is_healthy"] is False
+            assert health["metadata"]["open_ports"] == [http_port] and health["metadata"]["closed_ports"] == [closed_port]
+            assert health["metadata"]["ping_ok"] is True and health["metadata"]["ping_method"] in ("icmp", "tcp")
+        finally:
+            await network_probes.close_http_client()
+            for server in (http_server, banner_server):
+                server.close()
+
+    asyncio.run(scenario())
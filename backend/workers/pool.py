@@ -0,0 +1,226 @@
+"""Concurrent job slots for the worker process, woken by PostgreSQL LISTEN/NOTIFY or Redis pub/sub."""
+
+import logging
+import select
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from config import settings
+from database import SessionLocal, engine
+from services.job_service import JOB_CHANNEL, claim_jobs, current_worker_id, renew_leases
+
+logger = logging.getLogger(__name__)
+
+
+def parse_type_limits(value: str) -> Dict[str, int]:
+    """'web_security_scan=2,technical_report=1' -> {'web_security_scan': 2, 'technical_report': 1}"""
+    limits = {}
+    for item in (value or "").split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = max(0, int(limit))
+    return limits
+
+
+class JobWakeup:
+    """Event set whenever a job may be claimable; a background listener turns queue notifications into wake-ups."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.source = "polling"
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "JobWakeup":
+        if engine.dialect.name == "postgresql":
+            target, self.source = self._listen_postgres, "postgres"
+        elif settings.REDIS_URL:
+            target, self.source = self._listen_redis, "redis"
+        else:
+            return self
+        self._thread = threading.Thread(target=self._supervise, args=(target,), name="job-wakeup", daemon=True)
+        self._thread.start()
+        return self
+
+    def _supervise(self, target: Callable[[], None]) -> None:
+        while not self._closed.is_set():
+            try:
+                target()
+            except Exception as exc:
+                logger.warning("Job wake-up listener (%s) failed, retrying: %s", self.source, exc)
+                # A lost notification channel must not stall the queue: wake the loop to claim by polling.
+                self.event.set()
+                self._closed.wait(5)
+
+    def _listen_postgres(self) -> None:
+        connection = engine.raw_connection()
+        try:
+            driver = connection.driver_connection
+            driver.autocommit = True
+            driver.cursor().execute(f"LISTEN {JOB_CHANNEL}")
+            while not self._closed.is_set():
+                if select.select([driver], [], [], 1.0)[0]:
+                    driver.poll()
+                    if driver.notifies:
+                        driver.notifies.clear()
+                        self.event.set()
+        finally:
+            connection.invalidate()
+
+    def _listen_redis(self) -> None:
+        import redis
+
+        pubsub = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2).pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(JOB_CHANNEL)
+            while not self._closed.is_set():
+                if pubsub.get_message(timeout=1.0):
+                    self.event.set()
+        finally:
+            pubsub.close()
+
+    def wait(self, timeout: float) -> None:
+        self.event.wait(timeout)
+        self.event.clear()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.event.set()
+
+
+def _reset_engine() -> None:
+    # Forked processes must not reuse the parent's pooled database connections.
+    engine.dispose(close=False)
+
+
+class WorkerPool:
+    """Claims jobs into N slots, honouring per-type limits, and drains running jobs on shutdown.
+
+    Free slots are filled with one batched claim_jobs call (FOR UPDATE SKIP LOCKED
+    on PostgreSQL), so any number of worker hosts can share the queue. Leases of
+    running jobs are renewed every third of JOB_LEASE_SECONDS; a job whose worker
+    died is reclaimed by another worker once its lease expires.
+    """
+
+    def __init__(self, run_job: Callable[[int], None], concurrency: int = settings.WORKER_CONCURRENCY, mode: str = settings.WORKER_MODE,
+                 type_limits: Optional[Dict[str, int]] = None, wakeup: Optional[JobWakeup] = None, poll_interval: float = 5.0,
+                 housekeeping: Optional[Callable[[], None]] = None, housekeeping_interval: float = 2.0):
+        if mode not in {"thread", "process"}:
+            raise ValueError("WORKER_MODE must be 'thread' or 'process'")
+        self.run_job = run_job
+        self.concurrency = max(1, concurrency)
+        self.mode = mode
+        self.type_limits = parse_type_limits(settings.WORKER_TYPE_LIMITS) if type_limits is None else type_limits
+        self.wakeup = wakeup or JobWakeup()
+        self.poll_interval = poll_interval
+        self.housekeeping = housekeeping
+        self.housekeeping_interval = housekeeping_interval
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.worker_id = current_worker_id()
+        self.lease_interval = max(1.0, settings.JOB_LEASE_SECONDS / 3)
+        self._running: Dict[Future, Tuple[int, str]] = {}
+        self._executor: Optional[Executor] = None
+
+    def _create_executor(self) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_reset_engine)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-slot")
+
+    def running(self) -> Counter:
+        with self._lock:
+            return Counter(job_type for _, job_type in self._running.values())
+
+    def running_job_ids(self) -> list:
+        with self._lock:
+            return [job_id for job_id, _ in self._running.values()]
+
+    def _type_capacity(self, running: Counter) -> Dict[str, int]:
+        return {job_type: max(0, limit - running[job_type]) for job_type, limit in self.type_limits.items()}
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._running.pop(future, None)
+        if future.exception() is not None:
+            logger.error("Job slot crashed: %s", future.exception())
+        self.wakeup.event.set()
+
+    def fill_slots(self) -> int:
+        """Claim a batch of jobs for every free slot, or as many eligible ones as are queued."""
+        if self.stopping.is_set():
+            return 0
+        running = self.running()
+        free = self.concurrency - sum(running.values())
+        if free <= 0:
+            return 0
+        db = SessionLocal()
+        try:
+            jobs = [(job.id, job.scanner_type) for job in claim_jobs(db, free, self._type_capacity(running), self.worker_id)]
+        finally:
+            db.close()
+        for job_id, job_type in jobs:
+            future = self._executor.submit(self.run_job, job_id)
+            with self._lock:
+                self._running[future] = (job_id, job_type)
+            future.add_done_callback(self._finished)
+        return len(jobs)
+
+    def renew_leases(self) -> int:
+        job_ids = self.running_job_ids()
+        if not job_ids:
+            return 0
+        db = SessionLocal()
+        try:
+            return renew_leases(db, job_ids, self.worker_id)
+        finally:
+            db.close()
+
+    def _housekeeping_loop(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                self.housekeeping()
+            except Exception as exc:
+                logger.warning("Worker housekeeping failed: %s", exc)
+            self.stopping.wait(self.housekeeping_interval)
+
+    def stop(self, *_args) -> None:
+        self.stopping.set()
+        self.wakeup.event.set()
+
+    def run(self) -> None:
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        self._executor = self._create_executor()
+        self.wakeup.start()
+        housekeeping = None
+        if self.housekeeping:
+            housekeeping = threading.Thread(target=self._housekeeping_loop, name="worker-housekeeping", daemon=True)
+            housekeeping.start()
+        logger.info("Worker pool started: %s %s slots, wake-up via %s", self.concurrency, self.mode, self.wakeup.source)
+        next_renewal = time.monotonic() + self.lease_interval
+        try:
+            while not self.stopping.is_set():
+                try:
+                    self.fill_slots()
+                except Exception as exc:
+                    logger.warning("Job claim failed: %s", exc)
+                if time.monotonic() >= next_renewal:
+                    try:
+                        self.renew_leases()
+                    except Exception as exc:
+                        logger.warning("Job lease renewal failed: %s", exc)
+                    next_renewal = time.monotonic() + self.lease_interval
+                # Notifications make this wait return within milliseconds; the timeout is only a safety net.
+                self.wakeup.wait(min(self.poll_interval, self.lease_interval))
+        finally:
+            self.wakeup.close()
+            # Graceful shutdown: no new claims, running jobs finish and commit their final status.
+            self._executor.shutdown(wait=True)
+            if housekeeping:
+                housekeeping.join(timeout=self.housekeeping_interval + 1)
+            logger.info("Worker pool stopped")
@@ -1,15 +1,58 @@
 import argparse
-import time
-from datetime import datetime
+import logging
 
+from config import settings
 from database import SessionLocal
 from models.saas import ScanJob
 from risk.engine import create_snapshot
-from services.job_service import claim_next_job
-from services.report_service import generate_report
+from services.job_service import claim_next_job, complete_job, current_worker_id, fail_job
+from services.report_service import fail_report_job, run_report_job
 from services.web_scan_service import execute_web_scan
 from services.heartbeat_service import beat
 from services.alert_service import deliver_pending_alerts
+from workers.pool import WorkerPool, parse_type_limits
+from workers.shield_scheduler import run_in_thread
+
+
+def execute_job(db, job: ScanJob) -> None:
+    try:
+        if job.scanner_type in {"web_security_scan", "authenticated_web_scan"}:
+            execute_web_scan(db, job)
+        elif job.scanner_type == "security_snapshot":
+            create_snapshot(db, job.organization_id)
+        elif job.scanner_type in {"executive_report", "technical_report"}:
+            run_report_job(db, job)
+        else:
+            raise ValueError("Unsupported queued job")
+        complete_job(job)
+    except Exception as exc:
+        db.rollback()
+        fail_job(job, exc)
+        fail_report_job(db, job)
+    db.commit()
+
+
+def run_job(job_id: int) -> None:
+    """Entry point of a pool slot (thread or process): runs an already-claimed job in its own session."""
+    db = SessionLocal()
+    try:
+        job = db.query(ScanJob).filter(ScanJob.id == job_id).first()
+        if job and job.status == "running":
+            execute_job(db, job)
+    finally:
+        db.close()
+
+
+def housekeeping() -> None:
+    """Heartbeat and alert delivery run beside the job slots instead of between jobs."""
+    db = SessionLocal()
+    try:
+        beat(db, "worker")
+        db.commit()
+        deliver_pending_alerts(db)
+        db.commit()
+    finally:
+        db.close()
 
 
 def process_one() -> bool:
@@ -18,26 +61,10 @@ def process_one() -> bool:
         beat(db, "worker")
         delivered = deliver_pending_alerts(db)
         db.commit()
-        job = claim_next_job(db)
+        job = claim_next_job(db, worker_id=current_worker_id())
         if not job:
             return delivered > 0
-        try:
-            if job.scanner_type in {"web_security_scan", "authenticated_web_scan"}:
-                execute_web_scan(db, job)
-            elif job.scanner_type == "security_snapshot":
-                create_snapshot(db, job.organization_id)
-            elif job.scanner_type in {"executive_report", "technical_report"}:
-                generate_report(db, job.organization_id, job.created_by, job.scanner_type.replace("_report", ""), 30)
-            else:
-                raise ValueError("Unsupported queued job")
-            job.status = "completed"
-            job.progress = 100
-            job.completed_at = datetime.utcnow()
-        except Exception as exc:
-            job.status = "failed"
-            job.error = str(exc)[:2000]
-            job.completed_at = datetime.utcnow()
-        db.commit()
+        execute_job(db, job)
         return True
     finally:
         db.close()
@@ -46,13 +73,20 @@ def process_one() -> bool:
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--once", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY, help="concurrent job slots")
+    parser.add_argument("--mode", choices=("thread", "process"), default=settings.WORKER_MODE)
+    parser.add_argument("--type-limits", default=settings.WORKER_TYPE_LIMITS, help="per-type slot caps, e.g. web_security_scan=2,technical_report=1")
     args = parser.parse_args()
-    while True:
-        worked = process_one()
-        if args.once:
-            break
-        if not worked:
-            time.sleep(2)
+    if args.once:
+        process_one()
+        return
+    logging.basicConfig(level=logging.INFO)
+    pool = WorkerPool(run_job, concurrency=args.concurrency, mode=args.mode, type_limits=parse_type_limits(args.type_limits), housekeeping=housekeeping)
+    # With SHIELD_SCHEDULER=worker the automatic target checks run beside the job slots and stop with the pool.
+    shield = run_in_thread(pool.stopping) if settings.SHIELD_SCHEDULER == "worker" else None
+    pool.run()
+    if shield:
+        shield.join(timeout=30)
 
 
 if __name__ == "__main__":
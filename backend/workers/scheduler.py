@@ -5,6 +5,7 @@ from database import SessionLocal
 from models.saas import Organization, ScanJob
 from services.job_service import enqueue_job
 from services.heartbeat_service import beat
+from services.monitor_history import prune_history
 
 
 def schedule_due_jobs():
@@ -25,9 +26,20 @@ def schedule_due_jobs():
         db.close()
 
 
+def prune_monitor_history():
+    db = SessionLocal()
+    try:
+        removed = prune_history(db)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+
 def main():
     while True:
         schedule_due_jobs()
+        prune_monitor_history()
         time.sleep(300)
 
 
@@ -0,0 +1,294 @@
+"""Iron AI Shield automatic target checks, scheduled by next due time and run concurrently."""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import heapq
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import settings
+from database import SessionLocal
+from models.monitor import MonitorTarget
+from scanners.network_probes import close_http_client
+from services.heartbeat_service import beat
+from services.monitor_history import monitor_log_writer
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL_SECONDS = 60
+LAG_SAMPLES = 1000
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+def _host(address: str) -> str:
+    from routes.viggio_shield_routes import extract_host
+
+    try:
+        return extract_host(address or "").lower() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+async def _default_check(target: MonitorTarget, db) -> None:
+    from routes.viggio_shield_routes import run_automatic_target_check
+
+    await run_automatic_target_check(target, db)
+
+
+class _Entry:
+    __slots__ = ("interval", "host", "last_check", "version")
+
+    def __init__(self, interval: int, host: str, last_check: Optional[datetime]):
+        self.interval = interval
+        self.host = host
+        self.last_check = last_check
+        self.version = 0
+
+
+class ShieldScheduler:
+    """Min-heap of (next due time, target) feeding a bounded pool of concurrent checks.
+
+    Targets are re-read every `sync_interval` seconds with their last check, so
+    new, paused or edited targets and checks run elsewhere are picked up. A due
+    check first takes its host's slot (`per_host`) and then one of
+    `concurrency` global slots; each runs with its own session and claims the
+    target by moving `last_check` conditionally, so several scheduler instances
+    never check the same target twice for one due time. Next due times get
+    ±jitter_ratio/2 of the interval to spread targets created together.
+    Schedule lag (start time minus due time) is exposed by metrics() and
+    published on the `shield_scheduler` heartbeat.
+    """
+
+    def __init__(self, concurrency: int = settings.SHIELD_CHECK_CONCURRENCY, per_host: int = settings.SHIELD_CHECKS_PER_HOST,
+                 jitter_ratio: float = settings.SHIELD_JITTER_RATIO, sync_interval: float = 30.0,
+                 check: Callable[[MonitorTarget, object], Awaitable[None]] = _default_check,
+                 session_factory: Callable = SessionLocal, clock: Callable[[], float] = time.time):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.jitter_ratio = max(0.0, jitter_ratio)
+        self.sync_interval = sync_interval
+        self.check = check
+        self.session_factory = session_factory
+        self.clock = clock
+        self.entries: Dict[int, _Entry] = {}
+        self.running: set = set()
+        self.active = 0
+        self._heap: list = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self.lags: deque = deque(maxlen=LAG_SAMPLES)
+        self.counters = {"completed": 0, "failed": 0, "skipped": 0}
+
+    def _jitter(self, interval: int) -> float:
+        return random.uniform(-0.5, 0.5) * interval * self.jitter_ratio
+
+    def _schedule(self, target_id: int, entry: _Entry, due: float) -> None:
+        entry.version += 1
+        heapq.heappush(self._heap, (due, target_id, entry.version))
+
+    def sync(self, db) -> None:
+        """Bring the schedule in line with the active targets (called with a short-lived session)."""
+        now = self.clock()
+        seen = set()
+        for target_id, address, check_interval, last_check in db.query(
+            MonitorTarget.id, MonitorTarget.target_address, MonitorTarget.check_interval, MonitorTarget.last_check,
+        ).filter(MonitorTarget.is_active.is_(True), MonitorTarget.status == "active"):
+            seen.add(target_id)
+            interval = max(int(check_interval or 300), MIN_INTERVAL_SECONDS)
+            entry = self.entries.get(target_id)
+            if entry is None:
+                entry = self.entries[target_id] = _Entry(interval, _host(address), last_check)
+                # Overdue targets (e.g. after a restart) are spread over one jitter window instead of starting together.
+                base = _timestamp(last_check) + interval if last_check else now
+                self._schedule(target_id, entry, max(base, now) + abs(self._jitter(interval)))
+                continue
+            entry.host = _host(address)
+            if target_id in self.running or (entry.interval == interval and entry.last_check == last_check):
+                continue
+            entry.interval, entry.last_check = interval, last_check
+            base = _timestamp(last_check) + interval if last_check else now
+            self._schedule(target_id, entry, max(base, now) + self._jitter(interval))
+        for target_id in set(self.entries) - seen:
+            if target_id not in self.running:
+                del self.entries[target_id]
+
+    def due_targets(self, now: float) -> list:
+        """Pop every current heap entry due by `now`; stale versions and running targets are skipped."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            scheduled, target_id, version = heapq.heappop(self._heap)
+            entry = self.entries.get(target_id)
+            if entry is None or entry.version != version or target_id in self.running:
+                continue
+            due.append((target_id, scheduled))
+        return due
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            _, target_id, version = self._heap[0]
+            entry = self.entries.get(target_id)
+            if entry is not None and entry.version == version and target_id not in self.running:
+                return self._heap[0][0]
+            heapq.heappop(self._heap)
+        return None
+
+    def start_check(self, target_id: int, scheduled: float) -> asyncio.Task:
+        self.running.add(target_id)
+        task = asyncio.get_running_loop().create_task(self._run_check(target_id, scheduled))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run_check(self, target_id: int, scheduled: float) -> None:
+        entry = self.entries[target_id]
+        host_slot = self._hosts.setdefault(entry.host, asyncio.Semaphore(self.per_host))
+        last_check = entry.last_check
+        try:
+            async with host_slot, self._slots:
+                self.lags.append(max(0.0, self.clock() - scheduled))
+                self.active += 1
+                try:
+                    last_check = await self._check_once(target_id, entry)
+                finally:
+                    self.active -= 1
+        finally:
+            self.running.discard(target_id)
+            if target_id in self.entries:
+                entry.last_check = last_check
+                base = _timestamp(last_check) if last_check else self.clock()
+                self._schedule(target_id, entry, max(base + entry.interval, self.clock()) + self._jitter(entry.interval))
+            if not any(self.entries[other].host == entry.host for other in self.running if other in self.entries):
+                self._hosts.pop(entry.host, None)
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _check_once(self, target_id: int, entry: _Entry) -> Optional[datetime]:
+        """Claim and check one target; returns its last_check afterwards."""
+        db = self.session_factory()
+        try:
+            target = db.query(MonitorTarget).filter(MonitorTarget.id == target_id, MonitorTarget.is_active.is_(True), MonitorTarget.status == "active").first()
+            if target is None:
+                self.counters["skipped"] += 1
+                return entry.last_check
+            previous = target.last_check
+            claimed_at = datetime.utcnow()
+            condition = MonitorTarget.last_check.is_(None) if previous is None else MonitorTarget.last_check == previous
+            claimed = previous == entry.last_check and db.query(MonitorTarget).filter(MonitorTarget.id == target_id, condition).update(
+                {MonitorTarget.last_check: claimed_at}, synchronize_session=False,
+            )
+            db.commit()
+            if not claimed:
+                # Checked by another instance, or by hand, since this due time was computed.
+                self.counters["skipped"] += 1
+                db.refresh(target)
+                return target.last_check
+            db.refresh(target)
+            try:
+                await self.check(target, db)
+            except Exception as exc:
+                db.rollback()
+                self.counters["failed"] += 1
+                logger.warning("Shield check of target %s failed: %s", target_id, exc)
+                return claimed_at
+            self.counters["completed"] += 1
+            return target.last_check
+        finally:
+            db.close()
+
+    def metrics(self) -> dict:
+        lags = sorted(self.lags)
+        percentile = lambda share: round(lags[min(len(lags) - 1, int(share * len(lags)))], 3) if lags else None
+        return {
+            "targets": len(self.entries),
+            "running": self.active,
+            "waiting": len(self.running) - self.active,
+            **self.counters,
+            "lag_p50_seconds": percentile(0.5),
+            "lag_p95_seconds": percentile(0.95),
+            "lag_max_seconds": round(lags[-1], 3) if lags else None,
+        }
+
+    def _sync_and_beat(self) -> None:
+        db = self.session_factory()
+        try:
+            self.sync(db)
+            beat(db, "shield_scheduler", self.metrics())
+            db.commit()
+        finally:
+            db.close()
+
+    async def run(self, stopping: Optional[threading.Event] = None) -> None:
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        next_sync = 0.0
+        logger.info("Shield scheduler started: %s concurrent checks, %s per host", self.concurrency, self.per_host)
+        try:
+            while not (stopping and stopping.is_set()):
+                now = self.clock()
+                if now >= next_sync:
+                    try:
+                        await asyncio.to_thread(self._sync_and_beat)
+                    except Exception as exc:
+                        # A database outage must not end the scheduler; the next sync retries.
+                        logger.warning("Shield scheduler sync failed: %s", exc)
+                    next_sync = now + self.sync_interval
+                if monitor_log_writer.flush_due():
+                    await asyncio.to_thread(monitor_log_writer.flush)
+                for target_id, scheduled in self.due_targets(self.clock()):
+                    self.start_check(target_id, scheduled)
+                upcoming = self.next_due()
+                timeout = max(0.0, min(next_sync, upcoming if upcoming is not None else next_sync) - self.clock())
+                self._wakeup.clear()
+                try:
+                    # Woken early when a check finishes, capped at 1s so a stop request is seen promptly.
+                    await asyncio.wait_for(self._wakeup.wait(), min(timeout, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await asyncio.to_thread(monitor_log_writer.flush)
+
+
+def run_in_thread(stopping: threading.Event) -> threading.Thread:
+    """Run the scheduler on its own event loop beside the worker pool."""
+    def target() -> None:
+        loop = asyncio.new_event_loop()
+        # Checks offload HTTP, ping and port scans to threads; size the pool for every slot.
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=settings.SHIELD_CHECK_CONCURRENCY * 2, thread_name_prefix="shield-check"))
+        try:
+            loop.run_until_complete(ShieldScheduler().run(stopping))
+        finally:
+            loop.run_until_complete(close_http_client())
+            loop.close()
+
+    thread = threading.Thread(target=target, name="shield-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+
+async def _run_standalone() -> None:
+    try:
+        await ShieldScheduler().run()
+    finally:
+        await close_http_client()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_standalone())
+
+
+if __name__ == "__main__":
+    main()
@@ -1187,20 +1187,13 @@ async function loadDashboardStats() {
         
         // Load scan stats para vulnerabilidades e relatórios
         try {
-            const scansResponse = await apiRequest('/scans');
+            const stats = await apiRequest('/dashboard/stats');
             
-            const totalReports = scansResponse.total || 0;
+            const totalReports = stats.total_scans || 0;
             document.getElementById('total-reports').textContent = totalReports;
             localStorage.setItem('dashboard.totalReports', String(totalReports));
             
-            let totalVulns = 0;
-            if (scansResponse.scans) {
-                scansResponse.scans.forEach(scan => {
-                    if (scan.results && scan.results.vulnerabilities) {
-                        totalVulns += scan.results.vulnerabilities.length;
-                    }
-                });
-            }
+            const totalVulns = stats.total_vulnerabilities || 0;
         document.getElementById('total-vulns').textContent = totalVulns;
             localStorage.setItem('dashboard.totalVulns', String(totalVulns));
         } catch (error) {
@@ -2628,14 +2621,24 @@ function displayPortScanResults(results) {
 
 // ==================== REPORTS ====================
 
-async function loadAvailableScans() {
+// /scans é paginado por cursor: cada chamada traz uma página só com o resumo (sem results)
+async function fetchScansPage(cursor = null, limit = 50) {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    return apiRequest(`/scans?${params}`);
+}
+
+let availableScansCursor = null;
+
+async function loadAvailableScans(append = false) {
     const container = document.getElementById('available-scans');
     
     try {
-        const response = await apiRequest('/scans');
-        const scans = response.scans || [];
+        const page = await fetchScansPage(append ? availableScansCursor : null);
+        const scans = page.scans || [];
+        availableScansCursor = page.next_cursor;
         
-        if (scans.length === 0) {
+        if (!append && scans.length === 0) {
             container.innerHTML = `
                 <div class="alert alert-info">
                     <i class="fas fa-info-circle"></i>
@@ -2646,7 +2649,7 @@ async function loadAvailableScans() {
             return;
         }
         
-        let html = '<div class="scans-list">';
+        let html = '';
         
         scans.forEach(scan => {
             const date = new Date(scan.created_at || scan.completed_at).toLocaleString('pt-BR');
@@ -2686,10 +2689,27 @@ async function loadAvailableScans() {
             `;
         });
         
-        html += '</div>';
-        container.innerHTML = html;
+        if (!append) {
+            container.innerHTML = '<div class="scans-list"></div>';
+        }
+        container.querySelector('.scans-list').insertAdjacentHTML('beforeend', html);
+        container.querySelector('.scans-load-more')?.remove();
+        if (availableScansCursor) {
+            container.insertAdjacentHTML('beforeend', `
+                <div class="scans-load-more" style="margin-top: 15px; text-align: center;">
+                    <button class="btn-sm" onclick="runWithButtonLoading(this, () => loadAvailableScans(true), 'Carregando...')">
+                        <i class="fas fa-chevron-down"></i>
+                        Carregar mais (${container.querySelectorAll('.scan-item').length} de ${page.total})
+                    </button>
+                </div>
+            `);
+        }
         
     } catch (error) {
+        if (append) {
+            showToast('Erro ao carregar scans: ' + error.message, 'error');
+            return;
+        }
         container.innerHTML = `
             <div class="alert alert-error">
                 <i class="fas fa-exclamation-circle"></i>
@@ -2801,8 +2821,12 @@ async function showFullReportPreview() {
             return;
         }
 
-        const scansResp = await apiRequest('/scans');
-        const scans = scansResp.scans || [];
+        // Só colunas de resumo: totais da conta via /dashboard/stats e a página mais recente de scans, sem results
+        const [stats, page] = await Promise.all([
+            apiRequest('/dashboard/stats'),
+            fetchScansPage(null, 200)
+        ]);
+        const scans = page.scans || [];
 
         const toolsMap = {
             'code': 'Code Scanner',
@@ -2814,68 +2838,22 @@ async function showFullReportPreview() {
             'network': 'Port Scanner'
         };
 
-        function extractVulns(res) {
-            const vulns = [];
-            if (res && typeof res === 'object') {
-                if (Array.isArray(res.vulnerabilities)) {
-                    return res.vulnerabilities;
-                }
-                if (Array.isArray(res.endpoint_results)) {
-                    res.endpoint_results.forEach(er => {
-                        (er.vulnerabilities || []).forEach(v => vulns.push(v));
-                    });
-                }
-            }
-            return vulns;
-        }
-
-        function extractSummary(res) {
-            if (!res || typeof res !== 'object') {
-                return { total: 0, critical: 0, high: 0, medium: 0, low: 0 };
-            }
-            if (res.summary) return res.summary;
-            if (res.severity_count) {
-                const sc = res.severity_count;
-                const total = res.total_vulnerabilities || (sc.CRITICAL || 0) + (sc.HIGH || 0) + (sc.MEDIUM || 0) + (sc.LOW || 0);
-                return {
-                    total,
-                    critical: sc.CRITICAL || 0,
-                    high: sc.HIGH || 0,
-                    medium: sc.MEDIUM || 0,
-                    low: sc.LOW || 0
-                };
-            }
-            const vulns = extractVulns(res);
-            return {
-                total: vulns.length,
-                critical: vulns.filter(v => v.severity === 'CRITICAL').length,
-                high: vulns.filter(v => v.severity === 'HIGH').length,
-                medium: vulns.filter(v => v.severity === 'MEDIUM').length,
-                low: vulns.filter(v => v.severity === 'LOW').length
-            };
-        }
-
         const groups = {};
         scans.forEach(s => {
-            const res = s.results || {};
             const tname = toolsMap[s.scan_type] || s.scan_type;
             if (!groups[tname]) groups[tname] = [];
-            let rawJson;
-            try { rawJson = JSON.stringify(res, null, 2); } catch (_) { rawJson = String(res); }
-            const maxLen = 3000;
-            const excerpt = rawJson.length > maxLen ? (rawJson.slice(0, maxLen) + '\n... (conteúdo truncado)') : rawJson;
-            const summ = extractSummary(res);
+            const summ = s.summary || {};
             groups[tname].push({
                 id: s.id,
                 target: s.target,
                 created_at: s.created_at,
                 severity_count: {
-                    CRITICAL: summ.critical,
-                    HIGH: summ.high,
-                    MEDIUM: summ.medium,
-                    LOW: summ.low
+                    CRITICAL: summ.critical || 0,
+                    HIGH: summ.high || 0,
+                    MEDIUM: summ.medium || 0,
+                    LOW: summ.low || 0
                 },
-                raw_excerpt: excerpt
+                raw_excerpt: ''
             });
         });
 
@@ -2925,7 +2903,11 @@ async function showFullReportPreview() {
               <div style="display:flex; gap:16px; flex-wrap:wrap; background: var(--bg-tertiary); color: var(--text); padding:12px; margin-top:12px; border-radius: var(--border-radius); border: 1px solid var(--border);">
                 <div><strong>Data:</strong> ${new Date().toLocaleString('pt-BR')}</div>
                 <div><strong>Analista:</strong> ${localStorage.getItem('username') || 'Usuário'}</div>
+                <div><strong>Scans:</strong> ${stats.total_scans || 0}</div>
+                <div><strong>Vulnerabilidades:</strong> ${stats.total_vulnerabilities || 0}</div>
+                <div><strong>Críticas/Altas/Médias/Baixas:</strong> ${['CRITICAL', 'HIGH', 'MEDIUM', 'LOW'].map(sev => (stats.severity_count || {})[sev] || 0).join(' / ')}</div>
               </div>
+              ${page.next_cursor ? `<p style="margin-top:10px; color: var(--text-secondary);">Exibindo os ${scans.length} scans mais recentes de ${page.total}. O PDF completo traz todos.</p>` : ''}
             </header>`;
 
         const toolNames = Object.keys(groups);
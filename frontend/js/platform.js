@@ -1,5 +1,5 @@
 const API = '/api';
-const state = {bootstrap:null, overview:null, assets:[], findings:[], tasks:[], jobs:[], reports:[], integrations:[], compliance:null, aiActions:[], securityEvents:[], securityMonitoring:null, securitySensors:[], realtimeMonitoringAllowed:false, latestSecurityEventId:0, currentView:'overview', currentFinding:null, monitoringTimer:null, sensorVerificationTimer:null, protectionTestTimer:null, protectionTest:null, lastRefreshAt:null, onboarding:{step:1,domain:'',cloud:'',github:'later',employees:''}};
+const state = {bootstrap:null, overview:null, assets:[], findings:[], tasks:[], jobs:[], reports:[], integrations:[], compliance:null, aiActions:[], securityEvents:[], securityMonitoring:null, securitySensors:[], realtimeMonitoringAllowed:false, latestSecurityEventId:0, currentView:'overview', currentFinding:null, monitoringTimer:null, securityStream:null, securityStreamLive:false, sensorVerificationTimer:null, protectionTestTimer:null, protectionTest:null, lastRefreshAt:null, onboarding:{step:1,domain:'',cloud:'',github:'later',employees:''}};
 const labels = {overview:'Visão Geral',assets:'Ativos',risks:'Riscos',monitoring:'Monitoramento',reports:'Relatórios',compliance:'Conformidade',ai:'Iron AI',integrations:'Integrações',settings:'Configurações'};
 const actionLabels = {asset_created:'Ativo adicionado',findings_reconciled:'Scans importados',finding_status_changed:'Status de risco alterado',report_generated:'Relatório gerado',integration_connected:'Integração conectada',integration_synced:'Integração sincronizada',ai_action_proposed:'Ação proposta pela Iron AI',ai_action_approved:'Ação da IA aprovada',ai_action_rejected:'Ação da IA rejeitada',ai_action_executed:'Ação da IA executada',remediation_status_changed:'Tarefa de correção atualizada',job_queued:'Job adicionado à fila',organization_updated:'Organização atualizada',compliance_control_updated:'Controle de conformidade atualizado'};
 
@@ -45,7 +45,9 @@ function clearSession(){['access_token','token','username'].forEach(k=>localStor
 function toast(message,type='success'){const el=document.createElement('div');el.className=`toast ${type}`;el.innerHTML=`<i class="fa-solid ${type==='error'?'fa-circle-exclamation':'fa-circle-check'}"></i><span>${escapeHtml(message)}</span>`;$('#toast-container').appendChild(el);setTimeout(()=>el.remove(),4200)}
 function setBusy(button,busy,text='Processando...'){if(!button)return;if(busy){button.dataset.original=button.innerHTML;button.disabled=true;button.innerHTML=`<i class="fa-solid fa-spinner fa-spin"></i> ${text}`}else{button.disabled=false;if(button.dataset.original)button.innerHTML=button.dataset.original}}
 function updateRefreshTimestamp(){state.lastRefreshAt=new Date();const label=state.lastRefreshAt.toLocaleTimeString('pt-BR',{hour:'2-digit',minute:'2-digit',second:'2-digit'});const monitoring=$('#monitoring-updated-at');if(monitoring)monitoring.innerHTML=`<i></i> Dados consultados às ${label}`;const button=$('#refresh-button');if(button)button.title=`Atualizar · última consulta às ${label}`}
-function syncMonitoringPolling(){if(state.monitoringTimer){clearInterval(state.monitoringTimer);state.monitoringTimer=null}if(state.currentView==='monitoring'&&!document.hidden){state.monitoringTimer=setInterval(()=>state.realtimeMonitoringAllowed?Promise.all([loadJobs({silent:true}),loadSecurityMonitoring({silent:true})]):loadJobs({silent:true}),5000)}}
+function syncMonitoringPolling(){if(state.monitoringTimer){clearInterval(state.monitoringTimer);state.monitoringTimer=null}const watching=state.currentView==='monitoring'&&!document.hidden;if(watching&&state.realtimeMonitoringAllowed)startSecurityStream();else stopSecurityStream();if(watching){state.monitoringTimer=setInterval(()=>state.realtimeMonitoringAllowed&&!state.securityStreamLive?Promise.all([loadJobs({silent:true}),loadSecurityMonitoring({silent:true})]):loadJobs({silent:true}),5000)}}
+async function startSecurityStream(){if(state.securityStream)return;const controller=new AbortController();state.securityStream=controller;let retryIn=15000;try{const response=await fetch(`${API}/security-monitoring/stream`,{headers:token()?{Authorization:`Bearer ${token()}`}:{},signal:controller.signal});if(!response.ok||!response.body)return;state.securityStreamLive=true;retryIn=1000;const reader=response.body.getReader(),decoder=new TextDecoder();let buffer='';while(true){const part=await reader.read();if(part.done)break;buffer+=decoder.decode(part.value,{stream:true});const messages=buffer.split('\n\n');buffer=messages.pop()||'';for(const message of messages){const line=message.split('\n').find(item=>item.startsWith('data:'));if(!line||!message.startsWith('event: overview'))continue;try{mergeSecurityMonitoring(JSON.parse(line.slice(5)))}catch(_){}}}}catch(_){}finally{state.securityStreamLive=false;if(state.securityStream===controller){state.securityStream=null;if(!controller.signal.aborted)setTimeout(syncMonitoringPolling,retryIn)}}}
+function stopSecurityStream(){if(state.securityStream){state.securityStream.abort();state.securityStream=null;state.securityStreamLive=false}}
 
 async function initialize(){
   if(!token()){location.href='/index.html';return}
@@ -118,7 +120,9 @@ async function openRisk(id){window.showPageProgress?.();try{const risk=await api
 async function setRiskStatus(status){if(!state.currentFinding)return;const confirmations={resolved:{variant:'info',icon:'fa-circle-check',title:'Marcar risco como resolvido?',message:'Confirme que a correção foi aplicada e validada.',confirmText:'Marcar resolvido',confirmIcon:'fa-check'},accepted_risk:{variant:'warning',icon:'fa-triangle-exclamation',title:'Aceitar este risco?',message:'O risco continuará existindo, mas deixará a fila de correção ativa.',details:'Registre esta decisão somente após avaliar impacto e responsabilidade.',confirmText:'Aceitar risco',confirmIcon:'fa-check'},false_positive:{variant:'warning',icon:'fa-filter-circle-xmark',title:'Marcar como falso positivo?',message:'O finding deixará a fila de riscos ativos.',details:'Confirme que a evidência foi revisada.',confirmText:'Marcar falso positivo',confirmIcon:'fa-check'}};if(confirmations[status]&&!await showConfirmDialog(confirmations[status]))return;window.showPageProgress?.();try{await api(`/findings/${state.currentFinding.id}/status`,{method:'PATCH',body:JSON.stringify({status})});toast(`Risco atualizado: ${statusLabel(status)}`);$('#risk-drawer').classList.remove('open');await refreshCore()}catch(error){toast(error.message,'error')}finally{window.hidePageProgress?.()}}
 
 async function loadJobs(options={}){try{const data=await api('/scan-jobs');state.jobs=data.jobs||[];$('#jobs-queued').textContent=state.jobs.filter(x=>x.status==='queued').length;$('#jobs-running').textContent=state.jobs.filter(x=>x.status==='running').length;$('#jobs-completed').textContent=state.jobs.filter(x=>x.status==='completed').length;$('#jobs-list').innerHTML=state.jobs.length?state.jobs.map(job=>{const result=job.result||{};const detail=['web_security_scan','authenticated_web_scan'].includes(job.job_type)&&job.status==='completed'?`HTTP ${result.http_status} · ${result.response_time_ms} ms · ${result.findings_total} findings · ${escapeHtml((result.ip_addresses||[]).join(', '))}`:`progresso ${job.progress}%`;return `<div class="job-row"><span class="job-icon"><i class="fa-solid ${job.status==='completed'?'fa-check':job.status==='failed'?'fa-triangle-exclamation':'fa-gears'}"></i></span><div><strong>${['web_security_scan','authenticated_web_scan'].includes(job.job_type)?job.job_type==='authenticated_web_scan'?'DAST autenticado real':'Scan web real':escapeHtml(job.job_type.replaceAll('_',' '))}</strong><small>${dateLabel(job.created_at)} · ${detail}${job.error?` · ${escapeHtml(job.error)}`:''}</small></div><span class="job-status ${job.status}">${statusLabel(job.status)}</span></div>`}).join(''):`<div class="empty-state compact"><p>Nenhum job processado.</p></div>`;updateRefreshTimestamp();return true}catch(error){if(!options.silent)toast(error.message,'error');return false}}
-async function loadSecurityMonitoring(options={}){if(!state.realtimeMonitoringAllowed){const box=$('#monitoring-coverage');box.className='monitoring-coverage panel partial';box.innerHTML='<i class="fa-solid fa-lock"></i><div><strong>Monitoramento em tempo real disponível no Professional</strong><span>Faça upgrade para conectar sensores, receber alertas contínuos e executar contenção aprovada no firewall do servidor ou na borda.</span></div><a class="secondary-button" href="/pricing.html">Ver planos</a>';$('#security-events-list').innerHTML='<div class="empty-state compact"><p>Os scans sob demanda continuam disponíveis no Starter.</p></div>';return false}try{const data=await api('/security-monitoring/overview');const previous=state.latestSecurityEventId;state.securityMonitoring=data;state.securityEvents=data.events||[];state.latestSecurityEventId=data.latest_id||previous;$('#security-events-critical').textContent=data.metrics.critical;$('#security-events-open').textContent=data.metrics.open;$('#security-sensors-active').textContent=data.metrics.active_sensors;$('#security-active-blocks').textContent=data.metrics.active_blocks;renderSecurityCoverage(data);renderSecurityEvents(data);if(!options.silent&&data.protection_status?.level==='degraded')toast('Proteção parcialmente configurada: confira o WAF, rate limiting e o sensor.','error');if(previous&&data.events.some(event=>event.id>previous)){const newest=data.events.find(event=>event.id>previous);toast(`${newest.severity==='critical'?'Incidente crítico':'Nova detecção'}: ${newest.title}`,newest.severity==='critical'?'error':'success')}updateRefreshTimestamp();return true}catch(error){if(!options.silent)toast(error.message,'error');return false}}
+async function loadSecurityMonitoring(options={}){if(!state.realtimeMonitoringAllowed){const box=$('#monitoring-coverage');box.className='monitoring-coverage panel partial';box.innerHTML='<i class="fa-solid fa-lock"></i><div><strong>Monitoramento em tempo real disponível no Professional</strong><span>Faça upgrade para conectar sensores, receber alertas contínuos e executar contenção aprovada no firewall do servidor ou na borda.</span></div><a class="secondary-button" href="/pricing.html">Ver planos</a>';$('#security-events-list').innerHTML='<div class="empty-state compact"><p>Os scans sob demanda continuam disponíveis no Starter.</p></div>';return false}try{applySecurityMonitoring(await api('/security-monitoring/overview'),options);return true}catch(error){if(!options.silent)toast(error.message,'error');return false}}
+function applySecurityMonitoring(data,options={}){const previous=state.latestSecurityEventId;state.securityMonitoring=data;state.securityEvents=data.events||[];state.latestSecurityEventId=data.latest_id||previous;$('#security-events-critical').textContent=data.metrics.critical;$('#security-events-open').textContent=data.metrics.open;$('#security-sensors-active').textContent=data.metrics.active_sensors;$('#security-active-blocks').textContent=data.metrics.active_blocks;renderSecurityCoverage(data);renderSecurityEvents(data);if(!options.silent&&data.protection_status?.level==='degraded')toast('Proteção parcialmente configurada: confira o WAF, rate limiting e o sensor.','error');if(previous&&data.events.some(event=>event.id>previous)){const newest=data.events.find(event=>event.id>previous);toast(`${newest.severity==='critical'?'Incidente crítico':'Nova detecção'}: ${newest.title}`,newest.severity==='critical'?'error':'success')}updateRefreshTimestamp()}
+function mergeSecurityMonitoring(delta){const current=state.securityMonitoring||{};const removed=new Set(delta.removed||[]);const changed=new Map((delta.events||[]).map(event=>[event.id,event]));const events=delta.reset?(delta.events||[]):[...changed.values(),...(current.events||[]).filter(event=>!changed.has(event.id)&&!removed.has(event.id))].sort((a,b)=>String(b.last_seen_at).localeCompare(String(a.last_seen_at)));const {reset,removed:_removed,...fields}=delta;applySecurityMonitoring({...current,...fields,events},{silent:true})}
 function renderSecurityCoverage(data){const box=$('#monitoring-coverage');const sensors=data.metrics.active_sensors||0;const layers=[data.cloudflare_connected?'Cloudflare edge':null,data.host_firewall_ready?'firewall do servidor':null].filter(Boolean);if(sensors&&layers.length){box.className='monitoring-coverage panel live';box.innerHTML=`<i class="fa-solid fa-shield-check"></i><div><strong>Detecção e contenção conectadas</strong><span>${sensors} sensor(es) enviando telemetria · bloqueio aprovado disponível em ${escapeHtml(layers.join(' e '))}.</span></div>`}else if(sensors){box.className='monitoring-coverage panel partial';box.innerHTML=`<i class="fa-solid fa-satellite-dish"></i><div><strong>Telemetria ativa; contenção indisponível</strong><span>Atualize o sensor para ativar o firewall do servidor ou conecte o Cloudflare como camada adicional.</span></div>`}else{box.className='monitoring-coverage panel';box.innerHTML=`<i class="fa-solid fa-triangle-exclamation"></i><div><strong>Sem telemetria em tempo real</strong><span>Scans externos continuam disponíveis, mas ataques ao ativo só serão detectados após conectar um sensor, proxy ou WAF.</span></div>`}}
 function renderSecurityEvents(data){const canManage=['owner','admin'].includes(state.bootstrap?.organization?.role);$('#security-events-list').innerHTML=state.securityEvents.length?state.securityEvents.map(event=>{const containmentReady=event.containment_available??(data.cloudflare_connected||data.host_firewall_ready);const providerLabel=event.containment_provider==='host_firewall'?'firewall do servidor':'Cloudflare';const blockControl=event.containment_status==='blocked'?`<span class="contained-badge"><i class="fa-solid fa-ban"></i> IP bloqueado · ${providerLabel}</span>${event.containment_action_id&&canManage?`<button class="text-button" data-release-event="${event.id}">Remover bloqueio</button>`:''}`:event.containment_status==='pending'?'<span class="contained-badge"><i class="fa-solid fa-circle-notch fa-spin"></i> Aplicando no servidor</span>':event.source_ip&&canManage?(containmentReady?`<button class="danger-button" data-contain-event="${event.id}"><i class="fa-solid fa-ban"></i> Bloquear IP</button>`:'<button class="secondary-button" data-open-waf><i class="fa-solid fa-link"></i> Ativar bloqueio</button>'):'';const statusControl=event.status==='resolved'?'<span class="contained-badge">Resolvido</span>':`<button class="text-button" data-resolve-security-event="${event.id}">Marcar resolvido</button>`;return `<article class="security-event ${escapeHtml(event.severity)}" data-security-event-id="${event.id}"><span class="security-event-icon"><i class="fa-solid ${event.event_type==='ddos'?'fa-gauge-high':event.event_type.includes('scan')?'fa-magnifying-glass':'fa-shield-virus'}"></i></span><div class="security-event-main"><h3>${escapeHtml(event.title)}</h3><p>${escapeHtml(event.description)}</p><div class="security-event-meta"><span>${escapeHtml(event.asset_name||`Ativo #${event.asset_id}`)}</span><span>${severityLabel(event.severity)}</span><span>${dateLabel(event.last_seen_at)}</span><span>${event.request_count} requisições</span>${event.status_code?`<span>HTTP ${event.status_code}</span>`:''}</div><div class="security-remediation"><strong>Próxima ação recomendada</strong>${escapeHtml(event.remediation)}</div></div><div class="security-event-actions">${blockControl}${statusControl}<button class="text-button" data-security-ai="${event.id}">Perguntar à Iron AI</button></div></article>`}).join(''):`<div class="empty-state compact"><i class="fa-solid fa-shield-halved"></i><p>Nenhuma tentativa hostil foi detectada pela telemetria conectada.</p></div>`}
 async function containSecurityEvent(id,button){const incident=state.securityEvents.find(item=>String(item.id)===String(id));if(!incident?.source_ip)return;const data=state.securityMonitoring||{};const layers=[data.cloudflare_connected?'Cloudflare':null,data.host_firewall_ready?'firewall do servidor por 24 horas':null].filter(Boolean).join(' e ');if(!await showConfirmDialog({variant:'warning',icon:'fa-ban',title:'Confirmar bloqueio do IP',message:`IP ${incident.source_ip} será bloqueado em ${layers||'uma camada conectada'}.`,details:`Ativo: ${incident.asset_name||`#${incident.asset_id}`} · Evidência: ${incident.request_count||1} requisição(ões). Não confirme se esse for seu IP administrativo ou um endereço compartilhado.`,confirmText:'Sim, bloquear IP',confirmIcon:'fa-ban'}))return;setBusy(button,true,'Aplicando proteção...');try{const result=await api(`/security-monitoring/events/${id}/contain`,{method:'POST'});const coverage=(result.coverage||[]).map(item=>item.provider==='host_firewall'?'servidor':'Cloudflare').join(' + ');toast(result.already_contained?'Esse IP já possui contenção ativa.':`Bloqueio aprovado${coverage?` · ${coverage}`:''}.`);if(result.warnings?.length)toast(result.warnings.join(' · '),'error');await loadSecurityMonitoring()}catch(error){toast(error.message,'error')}finally{setBusy(button,false)}}
@@ -159,9 +163,10 @@ async function submitManualContainment(event){event.preventDefault();const butto
 async function refreshJobs(button){setBusy(button,true,'Atualizando...');try{const ok=await loadJobs();if(!ok)throw new Error('Não foi possível consultar os jobs.');toast('Monitoramento atualizado com dados do servidor.')}catch(error){toast(error.message,'error')}finally{setBusy(button,false)}}
 async function createSnapshot(){const button=$('#snapshot-button');setBusy(button,true,'Criando...');try{await api('/security/snapshot',{method:'POST'});toast('Snapshot de segurança criado.');await Promise.all([loadTrend(),refreshCore()])}catch(error){toast(error.message,'error')}finally{setBusy(button,false)}}
 
-async function loadReports(){try{const data=await api('/reports');state.reports=data.reports||[];$('#reports-list').innerHTML=state.reports.length?state.reports.map(report=>`<div class="report-row"><span class="report-icon"><i class="fa-regular fa-file-pdf"></i></span><div><strong>Relatório ${report.report_type==='executive'?'Executivo':'Técnico'}</strong><small>${report.period_days} dias · ${dateLabel(report.created_at)}</small></div><a href="#" data-download-report="${report.id}">Baixar PDF <i class="fa-solid fa-download"></i></a></div>`).join(''):`<div class="empty-state compact"><p>Nenhum relatório gerado.</p></div>`;return true}catch(error){toast(error.message,'error');return false}}
-async function generateReport(type,button){setBusy(button,true,'Gerando...');try{await api(`/reports/${type}?period_days=30`,{method:'POST'});toast('Relatório gerado com métricas atuais.');await loadReports()}catch(error){toast(error.message,'error')}finally{setBusy(button,false)}}
-async function downloadReport(id){const link=$(`[data-download-report="${id}"]`);setBusy(link,true,'Gerando...');try{const response=await fetch(`${API}/reports/${id}/pdf`,{headers:{Authorization:`Bearer ${token()}`}});if(!response.ok)throw new Error('Não foi possível gerar o PDF.');const blob=await response.blob();const url=URL.createObjectURL(blob);const download=document.createElement('a');download.href=url;download.download=`iron-ai-report-${id}.pdf`;download.click();setTimeout(()=>URL.revokeObjectURL(url),1000)}catch(error){toast(error.message,'error')}finally{setBusy(link,false)}}
+async function loadReports(){try{const data=await api('/reports');state.reports=data.reports||[];$('#reports-list').innerHTML=state.reports.length?state.reports.map(report=>`<div class="report-row"><span class="report-icon"><i class="fa-regular fa-file-pdf"></i></span><div><strong>Relatório ${report.report_type==='executive'?'Executivo':'Técnico'}</strong><small>${report.period_days} dias · ${dateLabel(report.created_at)}</small></div>${['queued','running'].includes(report.status)?'<small>Gerando...</small>':report.status==='failed'?'<small>Falhou</small>':`<a href="#" data-download-report="${report.id}">Baixar PDF <i class="fa-solid fa-download"></i></a>`}</div>`).join(''):`<div class="empty-state compact"><p>Nenhum relatório gerado.</p></div>`;return true}catch(error){toast(error.message,'error');return false}}
+async function generateReport(type,button){setBusy(button,true,'Gerando...');try{const report=await api(`/reports/${type}?period_days=30`,{method:'POST'});toast(report.cached?'Os dados não mudaram: o relatório mais recente foi reaproveitado.':'Relatório em geração com métricas atuais.');await loadReports();if(!report.cached)pollReport(report.id)}catch(error){toast(error.message,'error')}finally{setBusy(button,false)}}
+function pollReport(reportId){let attempts=0;const timer=setInterval(async()=>{attempts++;const report=await api(`/reports/${reportId}`).catch(()=>null);if(!report||!['queued','running'].includes(report.status)||attempts>60){clearInterval(timer);await loadReports();if(report?.status==='completed')toast('Relatório pronto para download.');if(report?.status==='failed')toast('Não foi possível gerar o relatório.','error')}},3000)}
+async function downloadReport(id){const link=$(`[data-download-report="${id}"]`);setBusy(link,true,'Gerando...');try{const response=await fetch(`${API}/reports/${id}/pdf`,{headers:{Authorization:`Bearer ${token()}`}});if(response.status===202){toast('O relatório ainda está sendo gerado.');return}if(!response.ok)throw new Error('Não foi possível gerar o PDF.');const blob=await response.blob();const url=URL.createObjectURL(blob);const download=document.createElement('a');download.href=url;download.download=`iron-ai-report-${id}.pdf`;download.click();setTimeout(()=>URL.revokeObjectURL(url),1000)}catch(error){toast(error.message,'error')}finally{setBusy(link,false)}}
 
 async function loadCompliance(){
   const box=$('#compliance-controls');box?.setAttribute('aria-busy','true');if(box)box.innerHTML='<div class="empty-state compact"><i class="fa-solid fa-circle-notch fa-spin"></i><p>Consultando evidências reais...</p></div>';
@@ -0,0 +1,45 @@
+"""Back the bulk finding upsert with a unique index on (organization_id, fingerprint)."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import engine  # noqa: E402
+
+VERSION = "021_finding_fingerprint_unique"
+KEY = ["organization_id", "fingerprint"]
+
+
+def _is_unique(inspector):
+    constraints = inspector.get_unique_constraints("findings")
+    indexes = [index for index in inspector.get_indexes("findings") if index.get("unique")]
+    return any(item["column_names"] == KEY for item in [*constraints, *indexes])
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if not inspector.has_table("findings") or _is_unique(inspector):
+        return
+    with engine.begin() as connection:
+        # Tables created before the constraint may hold duplicates: fold them into the oldest row.
+        duplicates = connection.execute(text(
+            "SELECT organization_id, fingerprint, MIN(id), SUM(occurrence_count), MAX(last_seen_at) "
+            "FROM findings GROUP BY organization_id, fingerprint HAVING COUNT(*) > 1"
+        )).fetchall()
+        for organization_id, fingerprint, keep_id, occurrences, last_seen_at in duplicates:
+            params = {"organization_id": organization_id, "fingerprint": fingerprint, "keep_id": keep_id}
+            duplicate_ids = "SELECT id FROM findings WHERE organization_id = :organization_id AND fingerprint = :fingerprint AND id <> :keep_id"
+            for table in ("finding_evidence", "remediation_tasks"):
+                if inspector.has_table(table):
+                    connection.execute(text(f"UPDATE {table} SET finding_id = :keep_id WHERE finding_id IN ({duplicate_ids})"), params)
+            connection.execute(text(f"DELETE FROM findings WHERE id IN ({duplicate_ids})"), params)
+            connection.execute(
+                text("UPDATE findings SET occurrence_count = :occurrences, last_seen_at = :last_seen_at WHERE id = :keep_id"),
+                {"keep_id": keep_id, "occurrences": occurrences, "last_seen_at": last_seen_at},
+            )
+        connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_finding_org_fingerprint ON findings (organization_id, fingerprint)"))
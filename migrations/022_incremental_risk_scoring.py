@@ -0,0 +1,28 @@
+"""Track when each finding was scored and keep per-organization risk aggregates."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import Base, engine  # noqa: E402
+from models import saas  # noqa: F401,E402
+
+VERSION = "022_incremental_risk_scoring"
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if inspector.has_table("findings"):
+        columns = {column["name"] for column in inspector.get_columns("findings")}
+        with engine.begin() as connection:
+            if "risk_scored_at" not in columns:
+                # NULL marks every existing finding as stale; risk.engine rescores them in bounded batches.
+                connection.execute(text("ALTER TABLE findings ADD COLUMN risk_scored_at TIMESTAMP"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_findings_org_risk_scored ON findings (organization_id, risk_scored_at)"))
+    # Aggregates are built lazily from the findings table on first use per organization.
+    Base.metadata.create_all(bind=engine, tables=[saas.OrganizationRiskAggregate.__table__])
@@ -0,0 +1,36 @@
+"""Priorities, leases and retry bookkeeping for the scan job queue."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import engine  # noqa: E402
+
+VERSION = "023_scan_job_leases"
+COLUMNS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "max_attempts": "INTEGER NOT NULL DEFAULT 3",
+    "available_at": "TIMESTAMP",
+    "lease_expires_at": "TIMESTAMP",
+    "locked_by": "VARCHAR(160)",
+}
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if not inspector.has_table("scan_jobs"):
+        return
+    existing = {column["name"] for column in inspector.get_columns("scan_jobs")}
+    with engine.begin() as connection:
+        for name, ddl in COLUMNS.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE scan_jobs ADD COLUMN {name} {ddl}"))
+        # Jobs left running by pre-lease workers count as one attempt and become reclaimable right away.
+        connection.execute(text("UPDATE scan_jobs SET attempts = 1, lease_expires_at = CURRENT_TIMESTAMP WHERE status = 'running' AND lease_expires_at IS NULL"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_scan_jobs_claim ON scan_jobs (status, priority, created_at)"))
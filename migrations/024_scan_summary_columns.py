@@ -0,0 +1,47 @@
+"""Summary columns on scans so history and dashboard queries never decode results."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import engine  # noqa: E402
+from models.scan import SUMMARY_SEVERITIES, summarize_results  # noqa: E402
+
+VERSION = "024_scan_summary_columns"
+COLUMNS = ["findings_total", *(f"{severity}_count" for severity in SUMMARY_SEVERITIES)]
+BATCH_SIZE = 500
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if not inspector.has_table("scans"):
+        return
+    existing = {column["name"] for column in inspector.get_columns("scans")}
+    missing = [name for name in COLUMNS if name not in existing]
+    with engine.begin() as connection:
+        for name in missing:
+            connection.execute(text(f"ALTER TABLE scans ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_scans_user_created ON scans (user_id, created_at, id)"))
+    if not missing:
+        return
+    # Backfill por faixas de id: cada lote decodifica no máximo BATCH_SIZE blobs de results.
+    update = text(
+        "UPDATE scans SET findings_total = :total, critical_count = :critical, high_count = :high, "
+        "medium_count = :medium, low_count = :low WHERE id = :scan_id"
+    )
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT id, results FROM scans WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).fetchall()
+            if not rows:
+                return
+            connection.execute(update, [{"scan_id": scan_id, **summarize_results(results)} for scan_id, results in rows])
+            last_id = rows[-1][0]
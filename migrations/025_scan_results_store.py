@@ -0,0 +1,46 @@
+"""Move Scan.results payloads out of the scans table into compressed scan_results rows."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import Base, engine  # noqa: E402
+from models.scan import RESULTS_ENCODING, ScanResult  # noqa: E402
+
+VERSION = "025_scan_results_store"
+BATCH_SIZE = 200
+
+
+def upgrade():
+    if not inspect(engine).has_table("scans"):
+        return
+    Base.metadata.create_all(bind=engine, tables=[ScanResult.__table__])
+    table = ScanResult.__table__
+    last_id = 0
+    while True:
+        # One transaction per batch: a restart resumes from the rows whose results are still inline.
+        with engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT id, results FROM scans WHERE results IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).fetchall()
+            if not rows:
+                break
+            ids = [scan_id for scan_id, _ in rows]
+            connection.execute(table.delete().where(table.c.scan_id.in_(ids)))
+            payloads = []
+            for scan_id, results in rows:
+                raw_size, payload = ScanResult.pack(results)
+                payloads.append({"scan_id": scan_id, "encoding": RESULTS_ENCODING, "raw_size": raw_size, "payload": payload})
+            connection.execute(table.insert(), payloads)
+            connection.execute(text("UPDATE scans SET results = NULL WHERE id IN (" + ",".join(str(scan_id) for scan_id in ids) + ")"))
+            last_id = ids[-1]
+    if engine.dialect.name == "postgresql":
+        # Reclaim the space of the moved TOAST data outside of a transaction block.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM ANALYZE scans"))
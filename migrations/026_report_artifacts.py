@@ -0,0 +1,37 @@
+"""Report cache key, render bookkeeping and the out-of-row PDF artifact table."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import Base, engine  # noqa: E402
+from models.saas import ReportArtifact  # noqa: E402
+
+VERSION = "026_report_artifacts"
+COLUMNS = {
+    "job_id": "INTEGER REFERENCES scan_jobs(id) ON DELETE SET NULL",
+    "data_watermark": "VARCHAR(64)",
+    "pdf_etag": "VARCHAR(64)",
+    "pdf_size": "INTEGER",
+    "rendered_at": "TIMESTAMP",
+}
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if not inspector.has_table("reports"):
+        return
+    existing = {column["name"] for column in inspector.get_columns("reports")}
+    with engine.begin() as connection:
+        for name, ddl in COLUMNS.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE reports ADD COLUMN {name} {ddl}"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_job_id ON reports (job_id)"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_cache_key ON reports (organization_id, report_type, period_days, data_watermark)"))
+    # Existing reports keep a NULL watermark (never served as cache hits) and get their PDF stored on first download.
+    Base.metadata.create_all(bind=engine, tables=[ReportArtifact.__table__])
@@ -0,0 +1,27 @@
+"""Hash column and lookup index for monitor_logs, plus the hourly/daily check rollup table."""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from database import Base, engine  # noqa: E402
+from models.monitor import MonitorCheckRollup  # noqa: E402
+
+VERSION = "027_monitor_history"
+
+
+def upgrade():
+    inspector = inspect(engine)
+    if inspector.has_table("monitor_logs"):
+        existing = {column["name"] for column in inspector.get_columns("monitor_logs")}
+        with engine.begin() as connection:
+            if "payload_hash" not in existing:
+                connection.execute(text("ALTER TABLE monitor_logs ADD COLUMN payload_hash VARCHAR(64)"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_monitor_logs_target_type_created ON monitor_logs (target_id, log_type, created_at)"))
+    # Existing check logs keep their full payload; rollups start with the first flushed batch.
+    Base.metadata.create_all(bind=engine, tables=[MonitorCheckRollup.__table__])
@@ -0,0 +1,80 @@
+"""Compare the legacy per-line/per-pattern loop with the single-pass rule engine of scan_code (result cache disabled)."""
+
+import argparse
+import os
+from pathlib import Path
+import re
+import sys
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+os.environ["REDIS_URL"] = ""
+
+from scanners.code_scanner import EXTRA_SCANNERS, SCANNER_MAP, scan_code  # noqa: E402
+from services.scan_cache import scan_cache  # noqa: E402
+
+BENIGN_LINES = [
+    "def handler(event, context):",
+    "    total = sum(item.price for item in event.items)",
+    "    logger.info('processed %d items', len(event.items))",
+    "    return {'statusCode': 200, 'body': json.dumps(total)}",
+    "",
+    "class Repository:",
+    "    def __init__(self, session):",
+    "        self.session = session",
+]
+
+
+def legacy_scan(code: str) -> list:
+    """Reference implementation: walk the source once per scanner and call re.search per line per pattern."""
+    vulnerabilities = []
+    for scanner in [*SCANNER_MAP.values(), *EXTRA_SCANNERS]:
+        if not scanner.applies_to(code):
+            continue
+        for number, line in enumerate(code.split("\n"), 1):
+            if scanner.LINE_REQUIRES and scanner.LINE_REQUIRES not in line:
+                continue
+            for pattern in scanner.PATTERNS:
+                if re.search(pattern, line, re.IGNORECASE):
+                    vulnerabilities.append(scanner.finding(number, line))
+    return vulnerabilities
+
+
+def build_corpus(lines: int) -> str:
+    sample = (PROJECT_ROOT / "examples" / "vulnerable_code.py").read_text().split("\n")
+    corpus = []
+    while len(corpus) < lines:
+        corpus.extend(BENIGN_LINES * 20)
+        corpus.extend(sample)
+    return "\n".join(corpus[:lines])
+
+
+def _timed(function, code: str, rounds: int) -> tuple[float, list]:
+    best = float("inf")
+    result = []
+    for _ in range(rounds):
+        scan_cache.clear()
+        started = time.perf_counter()
+        result = function(code)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    code = build_corpus(args.lines)
+    before, expected = _timed(legacy_scan, code, args.rounds)
+    after, result = _timed(lambda text: scan_code(text)["vulnerabilities"], code, args.rounds)
+    if result != expected:
+        raise SystemExit("single-pass engine output differs from the legacy scanner")
+    print(f"lines={args.lines} findings={len(result)}")
+    print(f"legacy per-line loop: {before * 1000:.1f} ms")
+    print(f"single-pass engine:  {after * 1000:.1f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
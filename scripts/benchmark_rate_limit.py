@@ -0,0 +1,70 @@
+"""Compare the legacy rebuild-on-every-hit local rate limit fallback with the sharded LocalRateLimiter across threads."""
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+os.environ["REDIS_URL"] = ""
+
+from services.rate_limit import LocalRateLimiter  # noqa: E402
+
+
+class LegacyLocal:
+    """Reference implementation: one global lock and a copy of every live key on each hit."""
+
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, expires_at: float) -> int:
+        now = time.time()
+        with self._lock:
+            self._local = {k: v for k, v in self._local.items() if v[1] > now}
+            count, _ = self._local.get(key, (0, expires_at))
+            count += 1
+            self._local[key] = (count, expires_at)
+        return count
+
+
+def _hits_per_second(limiter, keys: list[str], threads: int, hits: int) -> float:
+    expires_at = time.time() + 3600
+    for key in keys:
+        limiter.incr(key, expires_at)
+    start = threading.Barrier(threads + 1)
+
+    def work(offset: int) -> None:
+        start.wait()
+        for index in range(hits):
+            limiter.incr(keys[(offset + index * 7919) % len(keys)], expires_at)
+
+    workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return threads * hits / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--hits", type=int, default=2000, help="hits per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    keys = [f"ratelimit:ip:198.51.100.{index % 250}:/api/{index}" for index in range(args.keys)]
+    print(f"active keys={args.keys} hits per thread={args.hits}")
+    for threads in args.threads:
+        before = _hits_per_second(LegacyLocal(), keys, threads, args.hits)
+        after = _hits_per_second(LocalRateLimiter(max_keys=args.keys * 2), keys, threads, args.hits)
+        print(f"threads={threads}: legacy {before:,.0f} hits/s, sharded {after:,.0f} hits/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
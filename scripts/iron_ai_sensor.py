@@ -1,18 +1,29 @@
 #!/usr/bin/env python3
-"""Tail an Nginx combined access log and send sanitized aggregates to Iron AI.
+"""Tail Nginx combined access logs and send sanitized aggregates to Iron AI.
 
 The sensor never sends request bodies, cookies or authorization headers.
+Lines are folded into bounded sketches as they arrive, so memory stays flat
+however much traffic an interval carries.
 """
 
 import argparse
-from collections import defaultdict
+from array import array
+import ctypes
+import ctypes.util
+import glob
+import gzip
+import heapq
 import ipaddress
 import json
+import math
+from operator import itemgetter
 import os
 from pathlib import Path
 import re
+import select
 import shutil
 import signal
+import struct
 import subprocess
 import sys
 import time
@@ -25,8 +36,24 @@ COMBINED_LOG = re.compile(
 )
 RUNNING = True
 APPLIED_ACTIONS = set()
-AGENT_VERSION = "1.1"
+AGENT_VERSION = "1.2"
 MAX_BLOCK_SECONDS = 7 * 24 * 60 * 60
+MAX_EVENTS = 100
+HEAVY_HITTERS = 1000
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 3
+DISTINCT_EXACT_LIMIT = 64
+HLL_PRECISION = 8
+HASH_MASK = (1 << 64) - 1
+SCANNER_DISTINCT_PATHS = 20
+SCANNER_SLOTS = 20
+COMPRESS_UPLOADS = True
+TAIL_CHUNK_BYTES = 1 << 20
+MAX_LINE_BYTES = 64 * 1024
+RESCAN_SECONDS = 1.0
+ROTATION_GRACE_SECONDS = 5.0
+POLL_SECONDS = 0.25
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
 PROTECTED_NETWORKS = tuple(ipaddress.ip_network(value) for value in (
     "173.245.48.0/20", "103.21.244.0/22", "103.22.200.0/22", "103.31.4.0/22",
     "141.101.64.0/18", "108.162.192.0/18", "190.93.240.0/20", "188.114.96.0/20",
@@ -37,47 +64,403 @@ PROTECTED_NETWORKS = tuple(ipaddress.ip_network(value) for value in (
 ))
 
 
-def parse_line(line: str):
+def _fields(line: str):
     match = COMBINED_LOG.match(line.strip())
     if not match:
         return None
-    item = match.groupdict()
-    return {
-        "source_ip": item["ip"], "method": item["method"], "path": item["path"][:2048],
-        "status_code": int(item["status"]), "user_agent": item["user_agent"][:512],
-    }
+    ip, method, path, status_code, user_agent = match.group("ip", "method", "path", "status", "user_agent")
+    return ip, method, path[:2048], int(status_code), user_agent[:512]
+
+
+def parse_line(line: str):
+    fields = _fields(line)
+    if not fields:
+        return None
+    return dict(zip(("source_ip", "method", "path", "status_code", "user_agent"), fields))
+
+
+class CountMinSketch:
+    """Fixed-size frequency estimates that never undercount; collisions overcount by about total/width."""
+
+    __slots__ = ("width", "offsets", "table")
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.offsets = tuple(range(0, width * depth, width))
+        self.table = array("L", [0]) * (width * depth)
+
+    def add(self, key_hash: int) -> int:
+        # Kirsch-Mitzenmacher: the rows' indexes derived from two halves of one hash.
+        low, high = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        width, table = self.width, self.table
+        estimate = 1 << 62
+        for offset in self.offsets:
+            index = offset + low % width
+            low += high
+            value = table[index] = table[index] + 1
+            if value < estimate:
+                estimate = value
+        return estimate
+
+    def raise_to(self, key_hash: int, count: int) -> None:
+        """Record that the key occurred at least `count` times (conservative update)."""
+        low, high = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        for offset in self.offsets:
+            index = offset + low % self.width
+            low += high
+            if self.table[index] < count:
+                self.table[index] = count
+
+
+class DistinctCounter:
+    """Exact set of hashes while small, then a HyperLogLog with 2**HLL_PRECISION one-byte registers."""
+
+    __slots__ = ("exact", "registers")
+
+    def __init__(self):
+        self.exact = set()
+        self.registers = None
+
+    def add(self, value_hash: int) -> None:
+        if self.registers is None:
+            self.exact.add(value_hash)
+            if len(self.exact) > DISTINCT_EXACT_LIMIT:
+                self.registers = bytearray(1 << HLL_PRECISION)
+                for item in self.exact:
+                    self._register(item)
+                self.exact = None
+            return
+        self._register(value_hash)
+
+    def _register(self, value_hash: int) -> None:
+        index = value_hash & ((1 << HLL_PRECISION) - 1)
+        rest = value_hash >> HLL_PRECISION
+        rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __len__(self) -> int:
+        if self.registers is None:
+            return len(self.exact)
+        size = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / size)) * size * size / sum(2.0 ** -value for value in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+
+class StreamingAggregator:
+    """Incremental per-interval aggregation with bounded memory.
+
+    The heaviest (ip, method, path, status, user agent) keys and the busiest IPs,
+    each with a distinct path counter, are tracked in tables pruned back to
+    `capacity` whenever they double. Occurrences of untracked entries go to
+    count-min sketches, and an entry is (re)admitted once its estimate beats the
+    smallest count kept, so pruning never loses a heavy hitter. Below `capacity`
+    keys and IPs per interval every figure is exact.
+    """
+
+    def __init__(self, window_seconds: int, capacity: int = HEAVY_HITTERS, source: str = "nginx"):
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.source = source
+        self.reset()
+
+    def reset(self) -> None:
+        self.sketch = CountMinSketch()
+        self.ip_sketch = CountMinSketch()
+        self.candidates = {}
+        self.floor = 0
+        self.ips = {}
+        self.ip_floor = 0
+        self.lines = 0
+
+    def add_line(self, line: str) -> bool:
+        # _fields inlined: this runs once per log line.
+        match = COMBINED_LOG.match(line.strip())
+        if not match:
+            return False
+        ip, method, path, status_code, user_agent = match.group("ip", "method", "path", "status", "user_agent")
+        self.add((ip, method, path[:2048], int(status_code), user_agent[:512]))
+        return True
+
+    def add(self, fields: tuple) -> None:
+        # Tracked keys and IPs count exactly in their tables; only the others go through the sketches.
+        self.lines += 1
+        count = self.candidates.get(fields)
+        if count is not None:
+            self.candidates[fields] = count + 1
+        else:
+            estimate = self.sketch.add(hash(fields) & HASH_MASK)
+            if estimate > self.floor:
+                self.candidates[fields] = estimate
+                if len(self.candidates) > 2 * self.capacity:
+                    self._prune_keys()
+        ip = fields[0]
+        entry = self.ips.get(ip)
+        if entry is None:
+            estimate = self.ip_sketch.add(hash(ip) & HASH_MASK)
+            if estimate <= self.ip_floor:
+                return
+            # [requests, latest key, distinct paths]; the latest key represents the IP if none of its keys ranks.
+            entry = self.ips[ip] = [estimate - 1, fields, DistinctCounter()]
+        entry[0] += 1
+        entry[1] = fields
+        entry[2].add(hash(fields[2]) & HASH_MASK)
+        if len(self.ips) > 2 * self.capacity:
+            self._prune_ips()
+
+    def _prune_keys(self) -> None:
+        ranked = sorted(self.candidates.items(), key=itemgetter(1), reverse=True)
+        self.candidates = dict(ranked[:self.capacity])
+        self.floor = ranked[self.capacity - 1][1]
+        # Dropped keys are not forgotten: if they return, the sketch resumes from their count.
+        for fields, count in ranked[self.capacity:]:
+            self.sketch.raise_to(hash(fields) & HASH_MASK, count)
+
+    def _prune_ips(self) -> None:
+        ranked = sorted(self.ips.items(), key=lambda item: item[1][0], reverse=True)
+        self.ips = dict(ranked[:self.capacity])
+        self.ip_floor = ranked[self.capacity - 1][1][0]
+        for ip, entry in ranked[self.capacity:]:
+            self.ip_sketch.raise_to(hash(ip) & HASH_MASK, entry[0])
+
+    def _event(self, fields: tuple, count: int) -> dict:
+        ip, method, path, status_code, user_agent = fields
+        entry = self.ips.get(ip)
+        return {
+            "source_ip": ip, "method": method, "path": path, "status_code": status_code, "user_agent": user_agent,
+            "request_count": count, "window_seconds": self.window_seconds, "source": self.source,
+            "distinct_paths": len(entry[2]) if entry is not None else 1,
+        }
+
+    def flush(self) -> list[dict]:
+        """Heaviest MAX_EVENTS aggregates in the TelemetryBatch item shape, then start a new interval.
+
+        IPs spreading requests over many distinct paths (scanners) get a slot even
+        when none of their keys is heavy enough to rank on its own.
+        """
+        ranked = heapq.nlargest(MAX_EVENTS, self.candidates.items(), key=itemgetter(1))
+        listed = {fields[0] for fields, _ in ranked}
+        scanners = heapq.nlargest(SCANNER_SLOTS, (
+            (len(distinct), fields) for ip, (_, fields, distinct) in self.ips.items()
+            if ip not in listed and len(distinct) >= SCANNER_DISTINCT_PATHS
+        ), key=itemgetter(0))
+        ranked = ranked[:MAX_EVENTS - len(scanners)]
+        events = [self._event(fields, count) for fields, count in ranked]
+        events += [self._event(fields, self.candidates.get(fields, 1)) for _, fields in scanners]
+        self.reset()
+        return events
 
 
 def aggregate(lines, window_seconds: int):
-    buckets = {}
-    paths_by_ip = defaultdict(set)
+    aggregator = StreamingAggregator(window_seconds)
     for line in lines:
-        item = parse_line(line)
-        if not item:
-            continue
-        paths_by_ip[item["source_ip"]].add(item["path"])
-        key = (item["source_ip"], item["method"], item["path"], item["status_code"], item["user_agent"])
-        if key not in buckets and len(buckets) >= 5000:
-            continue
-        bucket = buckets.setdefault(key, {**item, "request_count": 0, "window_seconds": window_seconds, "source": "nginx"})
-        bucket["request_count"] += 1
-    for item in buckets.values():
-        item["distinct_paths"] = len(paths_by_ip[item["source_ip"]])
-    return sorted(buckets.values(), key=lambda item: item["request_count"], reverse=True)[:100]
+        aggregator.add_line(line)
+    return aggregator.flush()
+
+
+def expand_logs(patterns) -> list:
+    """Existing, uncompressed files matching each path or glob, in argument order."""
+    paths = []
+    for pattern in patterns:
+        for path in (sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]):
+            if not path.endswith(COMPRESSED_SUFFIXES) and os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+class _FollowedFile:
+    __slots__ = ("path", "fd", "offset", "last_byte", "partial", "skipping", "orphaned_at")
+
+    def __init__(self, path: str, fd: int, offset: int):
+        self.path = path
+        self.fd = fd
+        self.offset = offset
+        self.last_byte = os.pread(fd, 1, offset - 1) if offset else b""
+        self.partial = b""
+        self.skipping = False
+        self.orphaned_at = None
+
+
+class _Inotify:
+    """Directory watches through libc's inotify, so the tailer sleeps until a log is written or rotated."""
+
+    MODIFY, CLOSE_WRITE, MOVED_FROM, MOVED_TO, CREATE, DELETE = 0x2, 0x8, 0x40, 0x80, 0x100, 0x200
+    NONBLOCK_CLOEXEC = os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0)
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = libc.inotify_init1(self.NONBLOCK_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mask = self.MODIFY | self.CLOSE_WRITE | self.MOVED_FROM | self.MOVED_TO | self.CREATE | self.DELETE
+        watched = 0
+        for directory in directories:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) >= 0:
+                watched += 1
+        if not watched:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+
+    def wait(self, timeout: float) -> bool:
+        """Block until events arrive; True when a file was created, moved or deleted."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        renamed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return renamed
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = struct.unpack_from("iIII", data, offset)
+                renamed = renamed or bool(mask & (self.MOVED_FROM | self.MOVED_TO | self.CREATE | self.DELETE))
+                offset += 16 + length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class LogTailer:
+    """Follows every file matching the given paths/globs across logrotate.
+
+    Files are tracked by (device, inode). A rename rotation keeps the old inode
+    open for ROTATION_GRACE_SECONDS, so lines Nginx writes before reopening its
+    log are not lost, while the new file is read from its first byte; a
+    copytruncate rotation is noticed when the file no longer holds what was read.
+    Data is read in TAIL_CHUNK_BYTES chunks with os.pread and split with one
+    decode per chunk. Linux hosts sleep on inotify; elsewhere the tailer polls.
+    """
+
+    def __init__(self, patterns, from_start: bool = False, rescan_seconds: float = RESCAN_SECONDS, use_inotify: bool = True):
+        self.patterns = list(patterns)
+        self.rescan_seconds = rescan_seconds
+        self.files = {}
+        self._next_rescan = 0.0
+        self.rescan(from_end=not from_start)
+        self.inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            directories = {os.path.dirname(os.path.abspath(pattern)) for pattern in self.patterns}
+            try:
+                self.inotify = _Inotify(sorted(directory for directory in directories if not glob.has_magic(directory)))
+            except (OSError, AttributeError):
+                self.inotify = None
+
+    def rescan(self, from_end: bool = False) -> None:
+        """Open new or rotated-in files, rewind truncated ones and orphan those rotated away."""
+        seen = set()
+        for path in expand_logs(self.patterns):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            identity = (stat.st_dev, stat.st_ino)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            followed = self.files.get(identity)
+            if followed is None:
+                try:
+                    fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+                except OSError:
+                    continue
+                offset = os.fstat(fd).st_size if from_end else 0
+                self.files[identity] = _FollowedFile(path, fd, offset)
+                continue
+            followed.path = path
+            followed.orphaned_at = None
+            # A truncated file is smaller than what was read, or no longer holds the last byte read
+            # when it has already grown past that point again.
+            if stat.st_size < followed.offset or (followed.offset and os.pread(followed.fd, 1, followed.offset - 1) != followed.last_byte):
+                followed.offset = 0
+                followed.last_byte = b""
+                followed.partial = b""
+                followed.skipping = False
+        now = time.monotonic()
+        for identity, followed in self.files.items():
+            if identity not in seen and followed.orphaned_at is None:
+                followed.orphaned_at = now
+        self._next_rescan = now + self.rescan_seconds
+
+    def read_lines(self) -> list:
+        """Complete lines appended since the last call, at most one chunk per file."""
+        if time.monotonic() >= self._next_rescan:
+            self.rescan()
+        lines = []
+        for identity, followed in list(self.files.items()):
+            try:
+                chunk = os.pread(followed.fd, TAIL_CHUNK_BYTES, followed.offset)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                if followed.orphaned_at is not None and time.monotonic() - followed.orphaned_at >= ROTATION_GRACE_SECONDS:
+                    if followed.partial and not followed.skipping:
+                        lines.append(followed.partial.decode("utf-8", "replace"))
+                    os.close(followed.fd)
+                    del self.files[identity]
+                continue
+            followed.offset += len(chunk)
+            followed.last_byte = chunk[-1:]
+            data = followed.partial + chunk if followed.partial else chunk
+            end = data.rfind(b"\n")
+            if end < 0:
+                followed.partial = data
+            else:
+                followed.partial = data[end + 1:]
+                text = data[:end].decode("utf-8", "replace")
+                if followed.skipping:
+                    # Tail of an over-long line whose start was already discarded.
+                    text = text.partition("\n")[2]
+                    followed.skipping = False
+                if text:
+                    lines.extend(text.split("\n"))
+            if len(followed.partial) > MAX_LINE_BYTES:
+                followed.partial = b""
+                followed.skipping = True
+        return lines
+
+    def wait(self, timeout: float) -> None:
+        timeout = max(0.0, min(timeout, self.rescan_seconds))
+        if self.inotify is None:
+            time.sleep(min(timeout, POLL_SECONDS))
+        elif self.inotify.wait(timeout):
+            self._next_rescan = 0.0
+
+    def close(self) -> None:
+        for followed in self.files.values():
+            os.close(followed.fd)
+        self.files.clear()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+def _post_events(endpoint: str, key: str, events: list[dict], compress: bool):
+    payload = json.dumps({"events": events}, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json", "X-Iron-AI-Sensor-Key": key, "User-Agent": f"Iron-AI-Sensor/{AGENT_VERSION}"}
+    if compress:
+        payload = gzip.compress(payload, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    req = request.Request(endpoint.rstrip("/") + "/api/security-monitoring/ingest", data=payload, method="POST", headers=headers)
+    with request.urlopen(req, timeout=15) as response:
+        return json.loads(response.read().decode())
 
 
 def send(endpoint: str, key: str, events: list[dict]):
+    global COMPRESS_UPLOADS
     if not events:
         return {"received": 0, "detected": 0}
-    payload = json.dumps({"events": events}, separators=(",", ":")).encode()
-    req = request.Request(
-        endpoint.rstrip("/") + "/api/security-monitoring/ingest",
-        data=payload,
-        method="POST",
-        headers={"Content-Type": "application/json", "X-Iron-AI-Sensor-Key": key, "User-Agent": "Iron-AI-Sensor/1.0"},
-    )
-    with request.urlopen(req, timeout=15) as response:
-        return json.loads(response.read().decode())
+    try:
+        return _post_events(endpoint, key, events, COMPRESS_UPLOADS)
+    except error.HTTPError as exc:
+        # Platforms without gzip request support reject the body: fall back to plain JSON for good.
+        if not COMPRESS_UPLOADS or exc.code not in (400, 415, 422):
+            raise
+        COMPRESS_UPLOADS = False
+        return _post_events(endpoint, key, events, False)
 
 
 def firewall_available():
@@ -225,8 +608,8 @@ def detect_nginx_log():
 def install_service(args):
     if os.geteuid() != 0:
         raise SystemExit("execute a instalação com sudo")
-    log_path = detect_nginx_log() if args.log == "auto" else args.log
-    if not log_path or not Path(log_path).is_file():
+    log_paths = [detect_nginx_log()] if args.log == ["auto"] else args.log
+    if not all(log_paths) or not expand_logs(log_paths):
         raise SystemExit("não foi possível localizar o access.log do Nginx; informe --log manualmente")
     enrollment = redeem_enrollment(args.endpoint, args.enrollment_token)
     key = enrollment.get("key", "")
@@ -239,6 +622,9 @@ def install_service(args):
     env_path = Path("/etc/iron-ai-sensor.env")
     env_path.write_text(f"IRON_AI_SENSOR_KEY={key}\n", encoding="utf-8")
     env_path.chmod(0o600)
+    log_arguments = " ".join(f"--log {path}" for path in log_paths)
+    # Rotation creates new files next to the log, so the whole directory must stay readable.
+    read_only_paths = " ".join(sorted({os.path.dirname(os.path.abspath(path)) for path in log_paths}))
     unit = f"""[Unit]
 Description=Iron AI Nginx security sensor
 After=network-online.target
@@ -247,7 +633,7 @@ Wants=network-online.target
 [Service]
 Type=simple
 EnvironmentFile={env_path}
-ExecStart=/usr/bin/env python3 {script_path} --log {log_path} --endpoint {args.endpoint}
+ExecStart=/usr/bin/env python3 {script_path} {log_arguments} --endpoint {args.endpoint}
 Restart=always
 RestartSec=10
 NoNewPrivileges=true
@@ -255,7 +641,7 @@ CapabilityBoundingSet=CAP_NET_ADMIN CAP_DAC_READ_SEARCH
 PrivateTmp=true
 ProtectSystem=strict
 ProtectHome=true
-ReadOnlyPaths={log_path}
+ReadOnlyPaths={read_only_paths}
 
 [Install]
 WantedBy=multi-user.target
@@ -264,7 +650,7 @@ WantedBy=multi-user.target
     unit_path.write_text(unit, encoding="utf-8")
     subprocess.run(["systemctl", "daemon-reload"], check=True)
     subprocess.run(["systemctl", "enable", "--now", "iron-ai-sensor.service"], check=True)
-    print(f"Sensor instalado: {enrollment.get('sensor_name', 'Iron AI')} · log: {log_path}")
+    print(f"Sensor instalado: {enrollment.get('sensor_name', 'Iron AI')} · log: {', '.join(log_paths)}")
 
 
 def stop(*_):
@@ -274,7 +660,7 @@ def stop(*_):
 
 def main():
     parser = argparse.ArgumentParser(description="Iron AI sensor for Nginx combined access logs")
-    parser.add_argument("--log", required=True, help="Path to the Nginx access log")
+    parser.add_argument("--log", required=True, action="append", help="Nginx access log path or glob; repeat to follow several logs")
     parser.add_argument("--endpoint", required=True, help="Iron AI public HTTPS origin")
     parser.add_argument("--interval", type=int, default=10, choices=range(5, 61), metavar="5-60")
     parser.add_argument("--from-start", action="store_true", help="Read existing lines instead of following only new traffic")
@@ -293,25 +679,24 @@ def main():
         parser.error("set IRON_AI_SENSOR_KEY to the key shown once by the platform")
     if not args.endpoint.startswith("https://") and not args.endpoint.startswith("http://localhost"):
         parser.error("--endpoint must use HTTPS (HTTP is accepted only for localhost)")
-    path = Path(args.log)
-    if not path.is_file():
-        parser.error("the access log does not exist or is not a file")
+    if not expand_logs(args.log):
+        parser.error("no access log matches --log")
     signal.signal(signal.SIGTERM, stop)
     signal.signal(signal.SIGINT, stop)
-    with path.open("r", encoding="utf-8", errors="replace") as handle:
-        if not args.from_start:
-            handle.seek(0, 2)
+    tailer = LogTailer(args.log, from_start=args.from_start)
+    aggregator = StreamingAggregator(args.interval)
+    try:
         while RUNNING:
-            started = time.monotonic()
-            lines = []
-            while RUNNING and time.monotonic() - started < args.interval:
-                line = handle.readline()
-                if line:
-                    lines.append(line)
+            deadline = time.monotonic() + args.interval
+            while RUNNING and (remaining := deadline - time.monotonic()) > 0:
+                lines = tailer.read_lines()
+                if lines:
+                    for line in lines:
+                        aggregator.add_line(line)
                 else:
-                    time.sleep(0.25)
+                    tailer.wait(remaining)
             try:
-                result = send(args.endpoint, key, aggregate(lines, args.interval))
+                result = send(args.endpoint, key, aggregator.flush())
                 if result.get("detected"):
                     print(f"Iron AI: {result['detected']} incidente(s) detectado(s)", flush=True)
                 process_sensor_actions(args.endpoint, key)
@@ -319,6 +704,8 @@ def main():
                 print(f"Iron AI recusou a telemetria (HTTP {exc.code})", file=sys.stderr, flush=True)
             except (error.URLError, TimeoutError, json.JSONDecodeError) as exc:
                 print(f"Iron AI indisponível: {exc}", file=sys.stderr, flush=True)
+    finally:
+        tailer.close()
 
 
 if __name__ == "__main__":
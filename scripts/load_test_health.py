@@ -0,0 +1,105 @@
+"""Measure /api/health latency on a single uvicorn worker while code scans run inline vs. offloaded to the scan executors."""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+import statistics
+import sys
+import threading
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+os.environ["REDIS_URL"] = ""
+os.environ.setdefault("SCAN_CACHE_MAX_ENTRIES", "0")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, HTTPException  # noqa: E402
+
+from scanners.code_scanner import scan_code  # noqa: E402
+from services.scan_executor import ExecutorSaturated, cpu_executor  # noqa: E402
+
+SAMPLE = (PROJECT_ROOT / "examples" / "vulnerable_code.py").read_text()
+
+
+def build_app(code: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/health")
+    def health():
+        return {"status": "healthy"}
+
+    @app.post("/scan/inline")
+    async def scan_inline():
+        return {"total": scan_code(code)["total_vulnerabilities"]}
+
+    @app.post("/scan/offloaded")
+    async def scan_offloaded():
+        try:
+            result = await cpu_executor.run(scan_code, code)
+        except ExecutorSaturated:
+            raise HTTPException(status_code=503, headers={"Retry-After": "5"})
+        return {"total": result["total_vulnerabilities"]}
+
+    return app
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(base_url: str, mode: str, scanners: int, duration: float) -> dict:
+    latencies = []
+    statuses = {}
+    stop = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def scan_loop():
+            while time.perf_counter() < stop:
+                response = await client.post(f"/scan/{mode}")
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 503:
+                    await asyncio.sleep(0.05)
+
+        async def health_loop():
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                await client.get("/api/health")
+                latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(health_loop(), *(scan_loop() for _ in range(scanners)))
+    return {"mode": mode, "health_requests": len(latencies), "p50_ms": statistics.median(latencies), "p99_ms": percentile(latencies, 0.99), "scan_statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scanners", type=int, default=8, help="concurrent scan clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--lines", type=int, default=20000, help="lines of code per scan request")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    lines = SAMPLE.split("\n")
+    code = "\n".join((lines * (args.lines // len(lines) + 1))[:args.lines])
+    server = uvicorn.Server(uvicorn.Config(build_app(code), host="127.0.0.1", port=args.port, log_level="warning", workers=1))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        for mode in ("inline", "offloaded"):
+            report = asyncio.run(measure(f"http://127.0.0.1:{args.port}", mode, args.scanners, args.duration))
+            print(f"{report['mode']:>9}: health p50={report['p50_ms']:.1f} ms p99={report['p99_ms']:.1f} ms "
+                  f"({report['health_requests']} probes) scans={report['scan_statuses']}")
+    finally:
+        server.should_exit = True
+        thread.join()
+        cpu_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()